@@ -0,0 +1,176 @@
+"""
+Supervised background tasks - everything the bot fires off without
+awaiting: view re-renders after a click, Sheets exports at Save & Close,
+/refreshusersall jobs, the Control Sheet's trailing push.
+
+These used to be bare application.create_task()/loop.create_task() calls:
+nothing capped how many piled up during a click storm, a failure was only
+visible if the coroutine happened to log it itself, and a deploy that
+landed mid-broadcast either waited on them with no limit (PTB's stop()
+awaits its own create_task tasks) or dropped them on the floor. spawn()
+instead runs each one under a named task class:
+
+    class            limit   what runs in it
+    view_refresh       16    schedule_view_refresh - keyed by event_id
+    sheets              8    Sheets exports / EventUsers syncs at close
+    refresh_job         2    /refreshusersall jobs (see handlers.py)
+    control_sheet       1    the Control Sheet's startup/trailing pushes
+    admin_snapshot      2    a joined chat's admin list (see hub_resolver)
+
+At most `limit` tasks of a class run at once; the rest wait their turn.
+Spawning with a key that already has a task WAITING in that class (say, a
+second re-render of the same event while the first hasn't started yet)
+doesn't queue another one - the waiting task will render the latest state
+anyway - so the backlog is bounded by the number of distinct keys. Every
+class counts what's in flight, waiting, done, failed and coalesced
+(task_stats()), and a task that raises is logged with its class and key.
+
+drain_background_tasks() runs from post_stop (see main.py): it waits up to
+BACKGROUND_DRAIN_SECONDS for whatever is still running or waiting, then
+cancels the rest.
+"""
+import asyncio
+import time
+
+from config import logger, BACKGROUND_DRAIN_SECONDS
+
+# class name -> how many of its tasks may run at once
+TASK_CLASS_LIMITS = {
+    "view_refresh": 16,
+    "sheets": 8,
+    "refresh_job": 2,
+    "control_sheet": 1,
+    "admin_snapshot": 2,
+}
+
+# class name -> {"semaphore", "tasks": set, "waiting_keys": {key: task},
+#                "in_flight", "waiting", "done", "failed", "coalesced"},
+# created on first use (the semaphore has to be made inside a running loop).
+_task_classes = {}
+
+
+def _task_class(name):
+    state = _task_classes.get(name)
+    if state is None:
+        if name not in TASK_CLASS_LIMITS:
+            raise ValueError(f"Unknown background task class: {name!r}")
+        state = {
+            "semaphore": asyncio.Semaphore(TASK_CLASS_LIMITS[name]),
+            "tasks": set(),
+            "waiting_keys": {},
+            "in_flight": 0,
+            "waiting": 0,
+            "done": 0,
+            "failed": 0,
+            "coalesced": 0,
+        }
+        _task_classes[name] = state
+    return state
+
+
+def _stop_waiting(state, job):
+    state["waiting"] -= 1
+    key = job["key"]
+    if key is not None and state["waiting_keys"].get(key) is job["task"]:
+        del state["waiting_keys"][key]
+
+
+async def _supervised(name, state, job):
+    job["started"] = True
+    try:
+        await state["semaphore"].acquire()
+    finally:
+        # From here on a new spawn for the same key gets its own task -
+        # this one may already have read the state it's about to act on.
+        _stop_waiting(state, job)
+    state["in_flight"] += 1
+    try:
+        return await job["coro"]
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        state["failed"] += 1
+        key = job["key"]
+        logger.error(f"Background task {name}{f' [{key}]' if key is not None else ''} failed: {e!r}")
+    finally:
+        state["in_flight"] -= 1
+        state["done"] += 1
+        state["semaphore"].release()
+
+
+def _on_done(state, job, task):
+    state["tasks"].discard(task)
+    if not job["started"]:  # cancelled before it ever got to wait for a slot
+        _stop_waiting(state, job)
+    # no-op if it ran; if it never did, no "coroutine was never awaited"
+    job["coro"].close()
+
+
+def spawn(task_class: str, coro, key=None) -> asyncio.Task:
+    """
+    Runs `coro` in the background under `task_class` (one of
+    TASK_CLASS_LIMITS). With a `key`, and a task for that key already
+    waiting for a slot in this class, `coro` is discarded and that waiting
+    task is returned instead.
+    """
+    state = _task_class(task_class)
+    if key is not None:
+        waiting = state["waiting_keys"].get(key)
+        if waiting is not None:
+            coro.close()
+            state["coalesced"] += 1
+            return waiting
+    job = {"key": key, "coro": coro, "started": False, "task": None}
+    task = asyncio.get_running_loop().create_task(_supervised(task_class, state, job))
+    job["task"] = task
+    state["waiting"] += 1
+    state["tasks"].add(task)
+    task.add_done_callback(lambda t: _on_done(state, job, t))
+    if key is not None:
+        state["waiting_keys"][key] = task
+    return task
+
+
+def task_stats() -> dict:
+    """Per class: {"limit", "in_flight", "waiting", "done", "failed", "coalesced"}."""
+    return {
+        name: {
+            "limit": TASK_CLASS_LIMITS[name],
+            **{k: state[k] for k in ("in_flight", "waiting", "done", "failed", "coalesced")},
+        }
+        for name, state in _task_classes.items()
+    }
+
+
+def _outstanding():
+    return [task for state in _task_classes.values() for task in state["tasks"] if not task.done()]
+
+
+async def drain_background_tasks(application=None, timeout: float = None):
+    """
+    Shutdown: waits up to `timeout` (BACKGROUND_DRAIN_SECONDS by default)
+    for every supervised task to finish - including ones spawned while
+    draining, e.g. a re-render a finishing export asked for - then
+    cancels whatever is left. Returns how many had to be cancelled.
+    """
+    deadline = time.monotonic() + (BACKGROUND_DRAIN_SECONDS if timeout is None else timeout)
+    pending = _outstanding()
+    if pending:
+        logger.info(f"Waiting for {len(pending)} background tasks to finish...")
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        await asyncio.wait(pending, timeout=remaining)
+        pending = _outstanding()
+    if not pending:
+        return 0
+    logger.warning(
+        f"{len(pending)} background tasks still running after the drain deadline - cancelling: "
+        + ", ".join(f"{name}={state['in_flight'] + state['waiting']}"
+                    for name, state in _task_classes.items() if state["in_flight"] + state["waiting"])
+    )
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return len(pending)
@@ -8,6 +8,21 @@ from contextlib import contextmanager
 DB_PATH = "database.db"
 
 
+# What connect() passes as sqlite3.connect's factory - metrics.enable()
+# swaps in metrics.TimedConnection, which times every statement.
+_connection_factory = {"factory": sqlite3.Connection}
+
+
+def connect(db_path: str):
+    """
+    sqlite3.connect(), with whatever connection class metrics.enable() set
+    (see _connection_factory) - which is why every connection in this
+    module and sheets.py goes through here rather than calling
+    sqlite3.connect() itself.
+    """
+    return sqlite3.connect(db_path, factory=_connection_factory["factory"])
+
+
 @contextmanager
 def get_connection(db_path: str = None):
     """
@@ -32,7 +47,7 @@ def get_connection(db_path: str = None):
     """
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     try:
         yield conn
     finally:
@@ -140,13 +155,18 @@ def _seed_feature_flags(cursor):
     )
 
 
-def init_db(db_path: str = DB_PATH):
+def init_db(db_path: str = None):
     """
     Initializes the database schema and performs required migrations.
     Creates tables for chat settings, events, users, shares, and aliases.
-    Accepts an optional db_path so tests can use an isolated temp file.
+    Accepts an optional db_path so tests can use an isolated temp file;
+    without one it uses DB_PATH as it is at call time (see get_connection),
+    so a `db.DB_PATH = ...` set before startup - bench_e2e's scratch
+    database - gets the schema instead of ./database.db.
     """
-    conn = sqlite3.connect(db_path)
+    if db_path is None:
+        db_path = DB_PATH
+    conn = connect(db_path)
     cursor = conn.cursor()
 
     # Migration: rename legacy 'chat_settings' -> 'main_chat_settings' if the
@@ -201,7 +221,8 @@ def init_db(db_path: str = DB_PATH):
             subs_date_start TEXT DEFAULT NULL,
             subs_date_end TEXT DEFAULT NULL,
             visibility TEXT DEFAULT NULL,
-            date_bot_add TEXT DEFAULT NULL
+            date_bot_add TEXT DEFAULT NULL,
+            sheet_export_mode TEXT DEFAULT 'live'
         )
     """)
 
@@ -489,6 +510,137 @@ def init_db(db_path: str = DB_PATH):
         )
     """)
 
+    # Every state-changing click (and Add Extra Member), one row each - the
+    # local, always-on record of who did what to which event, from which
+    # chat, when. Written inside the same transaction as the state change
+    # itself (see record_action), for EVERY hub, with or without a Sheet.
+    # action uses the Sheets Actions-tab naming (GOING, ADD_editmode,
+    # ADD_EXTRA_PLAYER...), ts is "YYYY-MM-DD HH:MM:SS.mmm" (sortable as
+    # text), chat_id is where the click happened, not the hub.
+    # sheet_pending = 1 marks a row not yet exported to the hub's Actions
+    # tab because the hub is in 'deferred' export mode - cleared once Save
+    # & Close/Cancel has written it (see get_pending_sheet_actions).
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS action_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id TEXT NOT NULL,
+            chat_id TEXT,
+            user_id TEXT,
+            username TEXT,
+            action TEXT NOT NULL,
+            ts TEXT NOT NULL,
+            sheet_pending INTEGER DEFAULT 0
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_action_log_event ON action_log (event_id, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_action_log_user ON action_log (user_id, ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_action_log_chat_ts ON action_log (chat_id, ts)")
+
+    # Sheets writes queued for sheets_worker.py (only used with
+    # SHEETS_OFFLOAD=1). job_name is a sheets.sheets_job registry key,
+    # payload its JSON-encoded arguments. A row is deleted once its job
+    # succeeds, so what's left is only pending/running work and 'failed'
+    # jobs that ran out of attempts (kept, with last_error, for a human to
+    # look at). run_after is a unix timestamp - a retried job waits until
+    # then before it can be claimed again.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sheets_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_name TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT DEFAULT NULL,
+            created_at TEXT,
+            run_after REAL DEFAULT 0
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sheets_jobs_status ON sheets_jobs (status, job_id)"
+    )
+
+    # Who administers which chat - the index DM hub resolution
+    # (hub_resolver._get_known_candidate_chats) reads instead of asking
+    # Telegram about every chat the bot knows. Rows come from
+    # getChatAdministrators snapshots (replace_chat_admins) and live
+    # chat_member updates (set_chat_admin). chat_admin_snapshots records
+    # when each chat's full admin list was last taken (a unix timestamp) -
+    # snapshots are taken when the bot joins a chat and by a paced
+    # background sweep (hub_resolver.start_admin_snapshot_sweeper), never
+    # on a DM. A chat whose getChatAdministrators keeps failing (the bot was
+    # removed, a channel it can't read) counts its `failures` and isn't
+    # tried again before `retry_after`, with a growing delay.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_admins (
+            user_id TEXT NOT NULL,
+            chat_id TEXT NOT NULL,
+            updated_at TEXT,
+            PRIMARY KEY (user_id, chat_id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_admins_chat ON chat_admins (chat_id)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_admin_snapshots (
+            chat_id TEXT PRIMARY KEY,
+            taken_at REAL,
+            failures INTEGER NOT NULL DEFAULT 0,
+            retry_after REAL
+        )
+    """)
+
+    # /refreshusersall runs as a background job (see handlers.refreshusersall):
+    # one refresh_jobs row per run, one refresh_job_chats row per chat it
+    # covers - the hub first, then each monitored child - whose status
+    # ('pending' -> 'done'/'failed') is the checkpoint a job resumes from
+    # after a restart. The partial unique index is what refuses a second
+    # concurrent run for the same hub.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS refresh_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hub_chat_id TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            progress_chat_id TEXT,
+            progress_message_id TEXT,
+            created_at TEXT,
+            finished_at TEXT
+        )
+    """)
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_refresh_jobs_one_running "
+        "ON refresh_jobs (hub_chat_id) WHERE status = 'running'"
+    )
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS refresh_job_chats (
+            job_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            chat_id TEXT NOT NULL,
+            chat_name TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            removed INTEGER NOT NULL DEFAULT 0,
+            added INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (job_id, position)
+        )
+    """)
+
+    # PTB's per-user/per-chat conversation state (context.user_data /
+    # context.chat_data - the DM hub selection, a pending picker command,
+    # "waiting for the extra player's name"...), JSON-encoded, so it
+    # survives a restart. Written and read only by persistence.py.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS persisted_user_data (
+            user_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS persisted_chat_data (
+            chat_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at TEXT
+        )
+    """)
+
     # ── Migrations ────────────────────────────────────────────────────────────
 
     # -1. Add any of all_groups' newer columns if still missing (covers an
@@ -510,6 +662,8 @@ def init_db(db_path: str = DB_PATH):
         cursor.execute("ALTER TABLE all_groups ADD COLUMN visibility TEXT DEFAULT NULL")
     if "date_bot_add" not in mcs_cols:
         cursor.execute("ALTER TABLE all_groups ADD COLUMN date_bot_add TEXT DEFAULT NULL")
+    if "sheet_export_mode" not in mcs_cols:
+        cursor.execute("ALTER TABLE all_groups ADD COLUMN sheet_export_mode TEXT DEFAULT 'live'")
 
     # 0a2. Normalize any pre-existing lowercase 'free'/'pro' type values to
     # 'FREE'/'PRO' - covers rows written before this uppercase convention.
@@ -702,7 +856,7 @@ def track_user(chat_id: str, username: str, status: str = "active",
         return
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     if user_id is not None:
         cursor.execute("""
@@ -723,6 +877,29 @@ def track_user(chat_id: str, username: str, status: str = "active",
     conn.close()
 
 
+def remove_tracked_users(chat_id: str, usernames, db_path: str = None):
+    """Deletes these usernames' main_group_users rows for chat_id - one transaction for the lot."""
+    usernames = list(usernames)
+    if not usernames:
+        return
+    with get_connection(db_path) as conn:
+        conn.executemany(
+            "DELETE FROM main_group_users WHERE chat_id = ? AND username = ?",
+            [(str(chat_id), u) for u in usernames],
+        )
+        conn.commit()
+
+
+def get_tracked_users(chat_id: str, db_path: str = None) -> list:
+    """[(username, user_id, status), ...] for every tracked user of chat_id."""
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT username, user_id, status FROM main_group_users WHERE chat_id = ?", (str(chat_id),)
+        )
+        return cursor.fetchall()
+
+
 def get_display_name(chat_id: str, user_id: str, fallback: str, db_path: str = None) -> str:
     """
     Returns "First Last" for this user_id if we have it stored (from a
@@ -735,7 +912,7 @@ def get_display_name(chat_id: str, user_id: str, fallback: str, db_path: str = N
         return fallback
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     cursor.execute(
         "SELECT first_name, last_name FROM main_group_users WHERE chat_id = ? AND user_id = ? "
@@ -767,7 +944,7 @@ def register_chat_added(chat_id: str, chat_name: str, chat_type: str, visibility
     """
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     if chat_type == "channel":
         cursor.execute("""
@@ -799,13 +976,21 @@ def register_chat_removed(chat_id: str, date_bot_removed: str, db_path: str = No
     date_bot_add and the new date_bot_removed - the presence registries
     only ever reflect chats the bot is CURRENTLY in, the log is the
     historical trail.
+
+    Returns the sheet_id the removed group was bound to (None for channels,
+    unbound groups, or an unknown chat) - so the caller can drop any cached
+    Sheets handle for it, since nothing should be writing there anymore.
     """
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
 
-    cursor.execute("SELECT date_bot_add FROM all_groups WHERE chat_id = ?", (str(chat_id),))
+    # Its admin list is meaningless once the bot can't see the chat anymore
+    cursor.execute("DELETE FROM chat_admins WHERE chat_id = ?", (str(chat_id),))
+    cursor.execute("DELETE FROM chat_admin_snapshots WHERE chat_id = ?", (str(chat_id),))
+
+    cursor.execute("SELECT date_bot_add, sheet_id FROM all_groups WHERE chat_id = ?", (str(chat_id),))
     row = cursor.fetchone()
     if row is not None:
         cursor.execute(
@@ -815,7 +1000,7 @@ def register_chat_removed(chat_id: str, date_bot_removed: str, db_path: str = No
         cursor.execute("DELETE FROM all_groups WHERE chat_id = ?", (str(chat_id),))
         conn.commit()
         conn.close()
-        return
+        return row[1] or None
 
     cursor.execute("SELECT date_bot_add FROM all_channels WHERE chat_id = ?", (str(chat_id),))
     row = cursor.fetchone()
@@ -825,9 +1010,113 @@ def register_chat_removed(chat_id: str, date_bot_removed: str, db_path: str = No
             (str(chat_id), row[0], date_bot_removed),
         )
         cursor.execute("DELETE FROM all_channels WHERE chat_id = ?", (str(chat_id),))
-        conn.commit()
 
+    conn.commit()
     conn.close()
+    return None
+
+
+def replace_chat_admins(chat_id: str, user_ids, taken_at: float, db_path: str = None):
+    """
+    Stores a full getChatAdministrators snapshot as chat_id's admin list,
+    replacing whatever was indexed for it before, and stamps the chat as
+    snapshotted at `taken_at` (unix time) - clearing any failure backoff.
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM chat_admins WHERE chat_id = ?", (str(chat_id),))
+        cursor.executemany(
+            "INSERT OR REPLACE INTO chat_admins (user_id, chat_id, updated_at) VALUES (?, ?, ?)",
+            [(str(uid), str(chat_id), now) for uid in user_ids],
+        )
+        cursor.execute(
+            "INSERT OR REPLACE INTO chat_admin_snapshots (chat_id, taken_at) VALUES (?, ?)",
+            (str(chat_id), taken_at),
+        )
+        conn.commit()
+
+
+def set_chat_admin(chat_id: str, user_id, is_admin: bool, db_path: str = None):
+    """One user's admin status in one chat changed (a chat_member update, or a live re-check)."""
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        if is_admin:
+            cursor.execute(
+                "INSERT OR REPLACE INTO chat_admins (user_id, chat_id, updated_at) VALUES (?, ?, ?)",
+                (str(user_id), str(chat_id), datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+            )
+        else:
+            cursor.execute(
+                "DELETE FROM chat_admins WHERE user_id = ? AND chat_id = ?", (str(user_id), str(chat_id))
+            )
+        conn.commit()
+
+
+def get_indexed_admin_chats(user_id, db_path: str = None) -> list:
+    """
+    [(chat_id, chat_name or None), ...] for every chat the index lists
+    `user_id` as an admin of - one lookup on chat_admins' primary key.
+    """
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT ca.chat_id, ag.chat_name
+            FROM chat_admins ca LEFT JOIN all_groups ag ON ag.chat_id = ca.chat_id
+            WHERE ca.user_id = ?
+            """,
+            (str(user_id),),
+        )
+        return [(str(cid), name) for cid, name in cursor.fetchall()]
+
+
+def get_chats_needing_admin_snapshot(taken_before: float, now: float, limit: int, db_path: str = None) -> list:
+    """
+    [(chat_id, chat_name or None), ...] - up to `limit` chats the bot
+    knows of (all_groups UNION main_group_users, same as hub resolution
+    has always used) whose admin list was never snapshotted, or last
+    snapshotted before `taken_before` (unix time), and that aren't backing
+    off after a failed attempt (retry_after later than `now`). Never-
+    snapshotted chats first, then the stalest.
+    """
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT known.chat_id, ag.chat_name
+            FROM (SELECT chat_id FROM all_groups UNION SELECT chat_id FROM main_group_users) known
+            LEFT JOIN all_groups ag ON ag.chat_id = known.chat_id
+            LEFT JOIN chat_admin_snapshots s ON s.chat_id = known.chat_id
+            WHERE (s.taken_at IS NULL OR s.taken_at < ?)
+              AND (s.retry_after IS NULL OR s.retry_after <= ?)
+            ORDER BY s.taken_at IS NOT NULL, s.taken_at
+            LIMIT ?
+            """,
+            (taken_before, now, limit),
+        )
+        return [(str(cid), name) for cid, name in cursor.fetchall()]
+
+
+def record_admin_snapshot_failure(chat_id: str, failed_at: float, base_delay: float, max_delay: float,
+                                  db_path: str = None):
+    """
+    Records a failed getChatAdministrators for chat_id: it isn't offered by
+    get_chats_needing_admin_snapshot again for `base_delay` seconds after
+    the first failure, doubling with each one after that, up to
+    `max_delay`. A previous snapshot, if any, is kept as it was.
+    """
+    with get_connection(db_path) as conn:
+        conn.execute(
+            """
+            INSERT INTO chat_admin_snapshots (chat_id, taken_at, failures, retry_after) VALUES (?, NULL, 1, ?)
+            ON CONFLICT (chat_id) DO UPDATE SET
+                failures = failures + 1,
+                retry_after = ? + MIN(?, ? * (1 << MIN(failures, 30)))
+            """,
+            (str(chat_id), failed_at + min(base_delay, max_delay), failed_at, max_delay, base_delay),
+        )
+        conn.commit()
 
 
 def log_command_usage(chat_id: str, user_id, command: str, command_text: str, timestamp: str, db_path: str = None):
@@ -840,7 +1129,7 @@ def log_command_usage(chat_id: str, user_id, command: str, command_text: str, ti
     """
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     cursor.execute(
         "INSERT INTO command_log (chat_id, user_id, command, command_text, timestamp) VALUES (?, ?, ?, ?, ?)",
@@ -865,7 +1154,7 @@ def get_feature_flags(db_path: str = None):
     """
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     cursor.execute(
         "SELECT feature_key, feature_label, min_tier, limit_count, description "
@@ -899,7 +1188,7 @@ def update_feature_flag(feature_key: str, min_tier: str, limit_count=_NO_CHANGE,
     """
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
 
     sets = ["min_tier = ?"]
@@ -930,7 +1219,7 @@ def get_feature_limit_for_chat(chat_id: str, feature_key: str, db_path: str = No
     """
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
 
     cursor.execute("SELECT type, subs_date_end FROM all_groups WHERE chat_id = ?", (str(chat_id),))
@@ -980,7 +1269,7 @@ def get_shareevent_remaining_for_chat(chat_id: str, db_path: str = None):
 
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -1017,7 +1306,7 @@ def get_event_total_going_headcount(event_id: str, db_path: str = None) -> int:
     """
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT going_data, counters_data FROM events WHERE event_id = ?", (event_id,))
     row = cursor.fetchone()
@@ -1058,7 +1347,7 @@ def add_to_waitlist(event_id: str, chat_id: str, chat_name: str, username: str,
     """
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT waitlist_data FROM events WHERE event_id = ?", (event_id,))
     row = cursor.fetchone()
@@ -1103,7 +1392,7 @@ def promote_next_from_waitlist(event_id: str, chat_id: str, db_path: str = None)
     """
     if db_path is None:
         db_path = DB_PATH
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT waitlist_data FROM events WHERE event_id = ?", (event_id,))
     row = cursor.fetchone()
@@ -1151,3 +1440,406 @@ def dedupe_waitlist(waitlist: list) -> list:
         if key not in person_seen or entry.get("timestamp", "") < person_seen[key].get("timestamp", ""):
             person_seen[key] = entry
     return list(person_seen.values()) + guest_entries
+
+
+def enqueue_sheets_job(job_name: str, payload: str, db_path: str = None):
+    """
+    Queues one Sheets write for sheets_worker.py (see sheets.sheets_job).
+    payload is the job's already-JSON-encoded arguments. Returns the new
+    job_id.
+    """
+    if db_path is None:
+        db_path = DB_PATH
+    conn = connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO sheets_jobs (job_name, payload, created_at) VALUES (?, ?, ?)",
+        (job_name, payload, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+    )
+    job_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    return job_id
+
+
+def claim_sheets_job(now: float, db_path: str = None):
+    """
+    Atomically takes the oldest runnable pending job (run_after <= now) and
+    marks it 'running', bumping its attempt count. Returns (job_id,
+    job_name, payload, attempts) or None if there's nothing to do.
+
+    Oldest-first matters, not just fairness: a hub's Save & Close queues
+    the Events-row update BEFORE the EventUsers export, and the sheet
+    should see them in that order. The `AND status = 'pending'` guard on
+    the UPDATE makes a claim race (a second worker started by mistake)
+    harmless - the loser's UPDATE matches no row and it just moves on.
+    """
+    if db_path is None:
+        db_path = DB_PATH
+    conn = connect(db_path)
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute(
+                "SELECT job_id, job_name, payload, attempts FROM sheets_jobs "
+                "WHERE status = 'pending' AND run_after <= ? ORDER BY job_id LIMIT 1",
+                (now,),
+            )
+            row = cursor.fetchone()
+            if not row:
+                return None
+            cursor.execute(
+                "UPDATE sheets_jobs SET status = 'running', attempts = attempts + 1 "
+                "WHERE job_id = ? AND status = 'pending'",
+                (row[0],),
+            )
+            conn.commit()
+            if cursor.rowcount == 1:
+                return row[0], row[1], row[2], row[3] + 1
+    finally:
+        conn.close()
+
+
+def complete_sheets_job(job_id: int, db_path: str = None):
+    """Drops a job that ran successfully - the queue only keeps unfinished work."""
+    if db_path is None:
+        db_path = DB_PATH
+    conn = connect(db_path)
+    conn.execute("DELETE FROM sheets_jobs WHERE job_id = ?", (job_id,))
+    conn.commit()
+    conn.close()
+
+
+def fail_sheets_job(job_id: int, error: str, retry_at: float = None, db_path: str = None):
+    """
+    Records a failed attempt. With retry_at (a unix timestamp) the job goes
+    back to 'pending' and can't be claimed again before then; without it,
+    it's parked as 'failed' for good.
+    """
+    if db_path is None:
+        db_path = DB_PATH
+    conn = connect(db_path)
+    if retry_at is None:
+        conn.execute(
+            "UPDATE sheets_jobs SET status = 'failed', last_error = ? WHERE job_id = ?",
+            (error, job_id),
+        )
+    else:
+        conn.execute(
+            "UPDATE sheets_jobs SET status = 'pending', last_error = ?, run_after = ? WHERE job_id = ?",
+            (error, retry_at, job_id),
+        )
+    conn.commit()
+    conn.close()
+
+
+def requeue_running_sheets_jobs(db_path: str = None) -> int:
+    """
+    Puts every 'running' job back to 'pending' - called once when
+    sheets_worker.py starts, since any job still 'running' then was
+    interrupted by the previous worker dying mid-job. (Only one worker is
+    ever meant to run per database, so nothing else can legitimately own
+    them.) Returns how many were requeued.
+    """
+    if db_path is None:
+        db_path = DB_PATH
+    conn = connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("UPDATE sheets_jobs SET status = 'pending' WHERE status = 'running'")
+    requeued = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return requeued
+
+
+def create_refresh_job(hub_chat_id: str, chats, created_at: str, db_path: str = None):
+    """
+    Records a new /refreshusersall run for hub_chat_id over `chats` - a
+    list of (chat_id, chat_name), in the order they'll be processed.
+    Returns the new job_id, or None if that hub already has a job running
+    (the idx_refresh_jobs_one_running unique index decides, so two runs
+    racing each other can't both get in).
+    """
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO refresh_jobs (hub_chat_id, created_at) VALUES (?, ?)",
+                (str(hub_chat_id), created_at),
+            )
+        except sqlite3.IntegrityError:
+            return None
+        job_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO refresh_job_chats (job_id, position, chat_id, chat_name) VALUES (?, ?, ?, ?)",
+            [(job_id, position, str(cid), name) for position, (cid, name) in enumerate(chats)],
+        )
+        conn.commit()
+        return job_id
+
+
+def set_refresh_job_progress_message(job_id: int, chat_id: str, message_id: str, db_path: str = None):
+    """Remembers which message shows this job's progress, so a resumed job keeps editing the same one."""
+    with get_connection(db_path) as conn:
+        conn.execute(
+            "UPDATE refresh_jobs SET progress_chat_id = ?, progress_message_id = ? WHERE job_id = ?",
+            (str(chat_id), str(message_id), job_id),
+        )
+        conn.commit()
+
+
+def get_refresh_job(job_id: int, db_path: str = None):
+    """(hub_chat_id, status, progress_chat_id, progress_message_id) or None."""
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT hub_chat_id, status, progress_chat_id, progress_message_id FROM refresh_jobs WHERE job_id = ?",
+            (job_id,),
+        )
+        return cursor.fetchone()
+
+
+def get_running_refresh_job_id(hub_chat_id: str, db_path: str = None):
+    """The job_id of hub_chat_id's running /refreshusersall, or None."""
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT job_id FROM refresh_jobs WHERE hub_chat_id = ? AND status = 'running'", (str(hub_chat_id),)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def get_running_refresh_job_ids(db_path: str = None) -> list:
+    """Every job still marked running - at startup, the ones a restart interrupted."""
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT job_id FROM refresh_jobs WHERE status = 'running' ORDER BY job_id")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def get_refresh_job_chats(job_id: int, db_path: str = None) -> list:
+    """[(position, chat_id, chat_name, status, removed, added), ...] in processing order."""
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT position, chat_id, chat_name, status, removed, added FROM refresh_job_chats "
+            "WHERE job_id = ? ORDER BY position",
+            (job_id,),
+        )
+        return cursor.fetchall()
+
+
+def complete_refresh_job_chat(job_id: int, position: int, status: str, removed: int = 0, added: int = 0,
+                              db_path: str = None):
+    """Checkpoints one chat of a job as 'done' (with its -removed/+added counts) or 'failed'."""
+    with get_connection(db_path) as conn:
+        conn.execute(
+            "UPDATE refresh_job_chats SET status = ?, removed = ?, added = ? WHERE job_id = ? AND position = ?",
+            (status, removed, added, job_id, position),
+        )
+        conn.commit()
+
+
+def finish_refresh_job(job_id: int, finished_at: str, status: str = "done", db_path: str = None):
+    """Marks a job finished ('done', or 'failed' if it couldn't run at all) - which frees its hub for the next run."""
+    with get_connection(db_path) as conn:
+        conn.execute(
+            "UPDATE refresh_jobs SET status = ?, finished_at = ? WHERE job_id = ?",
+            (status, finished_at, job_id),
+        )
+        conn.commit()
+
+
+_PERSISTED_DATA_TABLES = {"user": ("persisted_user_data", "user_id"), "chat": ("persisted_chat_data", "chat_id")}
+
+
+def load_persisted_data(kind: str, key, db_path: str = None):
+    """The stored JSON for one user ('user') or chat ('chat'), or None if nothing is stored."""
+    table, column = _PERSISTED_DATA_TABLES[kind]
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT data FROM {table} WHERE {column} = ?", (str(key),))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def save_persisted_data(kind: str, writes: dict, deletes=(), db_path: str = None):
+    """
+    Stores `writes` ({key: JSON string}) and removes `deletes` for users
+    ('user') or chats ('chat') - all in one transaction, however many
+    there are.
+    """
+    table, column = _PERSISTED_DATA_TABLES[kind]
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with get_connection(db_path) as conn:
+        if writes:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({column}, data, updated_at) VALUES (?, ?, ?)",
+                [(str(key), data, now) for key, data in writes.items()],
+            )
+        if deletes:
+            conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", [(str(key),) for key in deletes])
+        conn.commit()
+
+
+SHEET_EXPORT_MODES = ("live", "deferred")
+
+
+def get_sheet_export_mode(chat_id: str, db_path: str = None, cursor=None) -> str:
+    """
+    The hub's Sheets export mode (all_groups.sheet_export_mode):
+      - 'live'     - every click is appended to the Actions tab as it
+                     happens (the original behavior, and the default)
+      - 'deferred' - a running event makes no Sheets calls at all; its
+                     action_log rows are flagged sheet_pending and exported
+                     together with the Events row and EventUsers at Save &
+                     Close/Cancel
+    Anything unknown (an unregistered hub, a NULL) reads as 'live'.
+
+    Pass `cursor` to read through a caller's already-open transaction
+    (button_handler) instead of opening a second connection.
+    """
+    if cursor is not None:
+        cursor.execute("SELECT sheet_export_mode FROM all_groups WHERE chat_id = ?", (str(chat_id),))
+        row = cursor.fetchone()
+    else:
+        if db_path is None:
+            db_path = DB_PATH
+        conn = connect(db_path)
+        row = conn.execute("SELECT sheet_export_mode FROM all_groups WHERE chat_id = ?", (str(chat_id),)).fetchone()
+        conn.close()
+    if row and row[0] in SHEET_EXPORT_MODES:
+        return row[0]
+    return "live"
+
+
+def defers_sheet_actions(chat_id: str, cursor) -> bool:
+    """
+    Whether a click on this hub's event should be parked as sheet_pending
+    (record_action) - i.e. the hub is in 'deferred' export mode AND has a
+    sheet to export to at close: PRO, subscription running, sheet bound
+    (the same rules as sheets.get_sheet_for_chat). A 'deferred' hub with
+    no sheet never exports anything, so nothing would ever clear the flag.
+    Reads through the caller's cursor, like get_sheet_export_mode.
+    """
+    # subs_date_end is stored as subscription.SUBS_DATE_FORMAT, which
+    # compares correctly as a plain string.
+    cursor.execute(
+        "SELECT 1 FROM all_groups WHERE chat_id = ? AND sheet_export_mode = 'deferred' AND type = 'PRO' "
+        "AND sheet_id IS NOT NULL AND sheet_id != '' AND subs_date_end > ?",
+        (str(chat_id), datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+    )
+    return cursor.fetchone() is not None
+
+
+ACTION_LOG_TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"  # trimmed to milliseconds on write
+
+
+def _action_log_entries(cursor) -> list:
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, r)) for r in cursor.fetchall()]
+
+
+def record_action(cursor, event_id: str, chat_id: str, user_id, username: str, action: str,
+                  sheet_pending: bool = False) -> dict:
+    """
+    Appends one action_log row using the CALLER's cursor - so it commits
+    (or rolls back) together with the state change it describes, and never
+    opens a second connection mid-transaction (see button_handler's note on
+    "database is locked"). Returns the entry as a dict, same shape as the
+    query functions below return.
+    """
+    ts = datetime.now().strftime(ACTION_LOG_TS_FORMAT)[:-3]
+    cursor.execute(
+        "INSERT INTO action_log (event_id, chat_id, user_id, username, action, ts, sheet_pending) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (str(event_id), str(chat_id), str(user_id), username, action, ts, 1 if sheet_pending else 0),
+    )
+    return {
+        "id": cursor.lastrowid, "event_id": str(event_id), "chat_id": str(chat_id),
+        "user_id": str(user_id), "username": username, "action": action, "ts": ts,
+        "sheet_pending": 1 if sheet_pending else 0,
+    }
+
+
+def get_event_actions(event_id: str, db_path: str = None) -> list:
+    """Every logged action on this event, from every chat, oldest first."""
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM action_log WHERE event_id = ? ORDER BY id", (str(event_id),))
+        return _action_log_entries(cursor)
+
+
+def get_user_actions(user_id, chat_id: str = None, limit: int = 100, db_path: str = None) -> list:
+    """
+    One user's most recent actions, newest first - across every event and
+    chat, or only those made from `chat_id` if given.
+    """
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        if chat_id is None:
+            cursor.execute(
+                "SELECT * FROM action_log WHERE user_id = ? ORDER BY ts DESC, id DESC LIMIT ?",
+                (str(user_id), limit),
+            )
+        else:
+            cursor.execute(
+                "SELECT * FROM action_log WHERE user_id = ? AND chat_id = ? ORDER BY ts DESC, id DESC LIMIT ?",
+                (str(user_id), str(chat_id), limit),
+            )
+        return _action_log_entries(cursor)
+
+
+def get_chat_actions(chat_id: str, since: str = None, until: str = None, db_path: str = None) -> list:
+    """
+    Actions made from one chat, oldest first, optionally within [since,
+    until) - both "YYYY-MM-DD[ HH:MM:SS]" strings, compared as text
+    against ts (so a bare date means that day's midnight).
+    """
+    query, params = "SELECT * FROM action_log WHERE chat_id = ?", [str(chat_id)]
+    if since is not None:
+        query += " AND ts >= ?"
+        params.append(since)
+    if until is not None:
+        query += " AND ts < ?"
+        params.append(until)
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query + " ORDER BY ts, id", params)
+        return _action_log_entries(cursor)
+
+
+def get_pending_sheet_actions(event_id: str, db_path: str = None) -> list:
+    """This event's actions still waiting for a deferred Sheets export, oldest first."""
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM action_log WHERE event_id = ? AND sheet_pending = 1 ORDER BY id",
+            (str(event_id),),
+        )
+        return _action_log_entries(cursor)
+
+
+def has_pending_sheet_actions(event_id: str, db_path: str = None) -> bool:
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT 1 FROM action_log WHERE event_id = ? AND sheet_pending = 1 LIMIT 1", (str(event_id),)
+        )
+        return cursor.fetchone() is not None
+
+
+def mark_sheet_actions_exported(event_id: str, up_to_id: int, db_path: str = None):
+    """
+    Clears sheet_pending once a deferred export has written this event's
+    rows - only up to `up_to_id` (the last one actually sent), so a late
+    click that landed while the export was in flight stays pending rather
+    than silently never reaching the sheet.
+    """
+    with get_connection(db_path) as conn:
+        conn.execute(
+            "UPDATE action_log SET sheet_pending = 0 WHERE event_id = ? AND sheet_pending = 1 AND id <= ?",
+            (str(event_id), up_to_id),
+        )
+        conn.commit()
@@ -6,9 +6,9 @@ only loosely coupled to the rest of handlers.py's command functions
 (newevent, editevent, etc. never call into this module's internals).
 
 Covers:
-  - get_event_lock() / _event_locks - one lock per event_id so two
+  - event_lock() / _event_locks - one lock per event_id so two
     near-simultaneous button clicks on the same event can't interleave
-    their read-modify-write and silently drop one.
+    their read-modify-write and silently drop one (held only while in use).
   - schedule_view_refresh() / _get_refresh_state() / _refresh_state -
     coalesces multiple rapid state changes into a single re-render pass
     instead of racing to redraw the same message repeatedly.
@@ -22,8 +22,11 @@ Covers:
 
 import json
 import re
+import time
 import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import NamedTuple, Optional
 
 from telegram import Update
 from telegram.ext import ContextTypes
@@ -32,29 +35,119 @@ from telegram.error import BadRequest
 from keyboard import create_event_keyboard
 from config import (
     ICON_CANCEL_EVENT, ICON_CLOCK, ICON_GUEST, ICON_SHARED, ICON_STATS, ICON_STANDBY,
-    ICON_WARNING, logger,
+    ICON_WARNING, logger, CLICK_BURST, CLICKS_PER_SECOND, CLICK_DEDUPE_SECONDS,
 )
 from utils import escape_markdown, now2ddmmyy, is_real_admin
-from db import get_connection, get_display_name, track_user, dedupe_waitlist
-from sheets import get_sheet_for_chat, open_spreadsheet, sync_event_users_sheet
+from db import (
+    get_connection, get_display_name, track_user, dedupe_waitlist, get_sheet_export_mode, defers_sheet_actions,
+    record_action, get_pending_sheet_actions, has_pending_sheet_actions, mark_sheet_actions_exported,
+)
+from sheets import (
+    get_sheet_for_chat, open_spreadsheet, sync_event_users_sheet, sheets_job, action_log_row, reraise_in_worker,
+)
+from background_tasks import spawn
+import metrics
+import tracing
 
 
 # One lock per event_id so that two near-simultaneous button clicks on the
 # same event can't interleave their read-modify-write and silently drop one.
+# event_id -> {"lock": asyncio.Lock, "users": holders + waiters}. An entry
+# only exists while someone holds or waits for that event's lock - the
+# last one out removes it (see event_lock) - so this never grows with the
+# number of events the bot has ever seen, only with how many are being
+# clicked right now.
 _event_locks = {}
 
 
-def get_event_lock(event_id: str) -> asyncio.Lock:
-    lock = _event_locks.get(event_id)
-    if lock is None:
-        lock = asyncio.Lock()
-        _event_locks[event_id] = lock
-    return lock
+@asynccontextmanager
+async def event_lock(event_id: str):
+    """
+    `async with event_lock(event_id):` - this event's critical section.
+    Counting waiters as users is what makes dropping the entry safe: it's
+    only removed when nobody holds the lock AND nobody is queued on it, so
+    the next click simply starts a fresh lock that no one else can be
+    holding.
+    """
+    entry = _event_locks.get(event_id)
+    if entry is None:
+        entry = {"lock": asyncio.Lock(), "users": 0}
+        _event_locks[event_id] = entry
+    entry["users"] += 1
+    try:
+        async with entry["lock"]:
+            yield
+    finally:
+        entry["users"] -= 1
+        if entry["users"] == 0 and _event_locks.get(event_id) is entry:
+            del _event_locks[event_id]
+
+
+# ---------------------------------------------------------------------------
+# Click flood protection
+# ---------------------------------------------------------------------------
+
+# (user_id, event_id) -> {"tokens", "updated", "last_click", "last_at"}: one
+# token bucket per user per event (CLICK_BURST / CLICKS_PER_SECOND) plus the
+# last click admitted, for dropping double-taps. Checked BEFORE the
+# event lock is taken - a rejected click costs one dict lookup and an
+# answerCallbackQuery, never a read-modify-write or a broadcast.
+_click_buckets = {}
+# Past this many tracked (user, event) pairs, idle ones (bucket refilled,
+# nothing to remember) are dropped on the next admit_click.
+_CLICK_BUCKETS_PRUNE_AT = 10000
+
+CLICK_RATE_LIMITED_TEXT = "⏳ Too many clicks - give it a moment."
+
+
+def _prune_click_buckets(now):
+    idle_after = max(CLICK_BURST / max(CLICKS_PER_SECOND, 0.01), CLICK_DEDUPE_SECONDS)
+    for key in [k for k, b in _click_buckets.items() if now - b["updated"] >= idle_after]:
+        del _click_buckets[key]
+
+
+def admit_click(user_id, event_id, callback_data, chat_id=None, message_id=None, metered=True):
+    """
+    Whether one click may go on to the event lock: (True, None), or
+    (False, text to answer the callback with). The same button on the same
+    message (callback_data, chat_id, message_id) pressed again within
+    CLICK_DEDUPE_SECONDS is dropped silently (text None) - the first tap is
+    already being applied - and doesn't use up a token. The same button on
+    another chat's copy of the event is a different click, not a repeat.
+    Anything past the user's bucket for this event gets
+    CLICK_RATE_LIMITED_TEXT - unless metered is False (admin verification
+    taps, see ParsedCallback.metered), which are only deduplicated. Never
+    yields, so no lock is needed around it.
+    """
+    now = time.monotonic()
+    key = (user_id, event_id)
+    bucket = _click_buckets.get(key)
+    if bucket is None:
+        if len(_click_buckets) >= _CLICK_BUCKETS_PRUNE_AT:
+            _prune_click_buckets(now)
+        bucket = {"tokens": float(CLICK_BURST), "updated": now, "last_click": None, "last_at": 0.0}
+        _click_buckets[key] = bucket
+
+    click = (callback_data, chat_id, message_id)
+    if bucket["last_click"] == click and now - bucket["last_at"] < CLICK_DEDUPE_SECONDS:
+        return False, None
+
+    bucket["tokens"] = min(float(CLICK_BURST), bucket["tokens"] + (now - bucket["updated"]) * CLICKS_PER_SECOND)
+    bucket["updated"] = now
+    if metered:
+        if bucket["tokens"] < 1:
+            return False, CLICK_RATE_LIMITED_TEXT
+        bucket["tokens"] -= 1
+    bucket["last_click"] = click
+    bucket["last_at"] = now
+    return True, None
 
 # ---------------------------------------------------------------------------
 # Shared-view renderer
 # ---------------------------------------------------------------------------
 
+# event_id -> {"lock", "pending"} - only while a broadcast for that event
+# is running; schedule_view_refresh removes it when the broadcast ends.
 _refresh_state = {}
 
 
@@ -66,6 +159,27 @@ def _get_refresh_state(event_id):
     return state
 
 
+def forget_event(event_id: str) -> None:
+    """
+    An event just closed or was canceled: nobody can change it again, so
+    its per-user click buckets go now instead of waiting to be pruned.
+    (Its lock and refresh state need no help - they're dropped by their
+    last user, including the broadcast this close itself triggers.)
+    """
+    for key in [k for k in _click_buckets if k[1] == event_id]:
+        del _click_buckets[key]
+
+
+def registry_sizes() -> dict:
+    """How many entries each per-event/per-click registry in this module holds right now."""
+    return {
+        "event_locks": len(_event_locks),
+        "refresh_state": len(_refresh_state),
+        "click_buckets": len(_click_buckets),
+        "event_status_index": len(_event_status_index),
+    }
+
+
 async def schedule_view_refresh(context: ContextTypes.DEFAULT_TYPE, event_id: str):
     """
     Coalesces bursts of update_all_shared_views() calls for the same event.
@@ -84,19 +198,31 @@ async def schedule_view_refresh(context: ContextTypes.DEFAULT_TYPE, event_id: st
     This makes sure at most ONE broadcast is in flight per event at a time;
     if new changes arrive while one is running, they collapse into a single
     extra pass at the end instead of spawning another full broadcast.
+
+    Nobody ever waits on state["lock"] (a second caller only flags
+    "pending" and leaves), so once the broadcast is over the state can be
+    dropped outright - the next refresh for this event starts a new one.
     """
+    metrics.inc("bot_view_refresh_requests_total")
     state = _get_refresh_state(event_id)
     if state["lock"].locked():
         state["pending"] = True
         return
-    async with state["lock"]:
-        state["pending"] = False
-        await update_all_shared_views(context, event_id)
-        while state["pending"]:
+    try:
+        async with state["lock"]:
             state["pending"] = False
+            metrics.inc("bot_view_refresh_renders_total")
             await update_all_shared_views(context, event_id)
+            while state["pending"]:
+                state["pending"] = False
+                metrics.inc("bot_view_refresh_renders_total")
+                await update_all_shared_views(context, event_id)
+    finally:
+        if _refresh_state.get(event_id) is state:
+            del _refresh_state[event_id]
 
 
+@tracing.traced
 def _mention_link(chat_id: str, username: str, user_id=None, clickable: bool = True) -> str:
     """
     Builds a clickable MarkdownV2 mention - [First Last](tg://user?id=...) -
@@ -152,6 +278,20 @@ def _promotion_announcement_text(chat_id: str, username: str, user_id, is_guest:
     return f"{ICON_STANDBY} A spot opened up \\- {mention} has been moved from the Waitlist to Going\\!"
 
 
+def parse_going_list(going: list) -> list:
+    """
+    Splits stored going_data entries - "username (user_id)", or a bare
+    "username" for the oldest rows - into (username, user_id) pairs,
+    user_id None when there's no "(...)" part. Not validated: an entry
+    like "name (no_id_in_main_group)" comes back with that placeholder as
+    its user_id, which _mention_link already treats as "no id".
+    """
+    return [
+        (entry.split(" (")[0], entry.split("(")[-1].rstrip(")") if "(" in entry else None)
+        for entry in going
+    ]
+
+
 def _render_waitlist_local(waitlist: list, chat_id: str, clickable: bool = True) -> tuple:
     """
     Filters an event's waitlist_data down to entries added from THIS
@@ -253,6 +393,7 @@ def _render_waitlist_count(waitlist: list) -> int:
     return len(waitlist)
 
 
+@tracing.traced
 async def update_all_shared_views(context: ContextTypes.DEFAULT_TYPE, event_id: str):
     """
     Re-renders EVERY view of one event after its state changed: the master
@@ -387,22 +528,22 @@ async def update_all_shared_views(context: ContextTypes.DEFAULT_TYPE, event_id:
 
     master_clickable = clickability == "on"
 
+    master_going_parsed = parse_going_list(master_going)
     going_names_list = [
-        f"{going_icon} {_mention_link(main_chat_id, u.split(' (')[0], u.split('(')[-1].rstrip(')') if '(' in u else None, master_clickable)}"
-        for u in master_going
+        f"{going_icon} {_mention_link(main_chat_id, u_name, u_id, master_clickable)}"
+        for u_name, u_id in master_going_parsed
     ]
 
     # Guest lines are now folded directly into the Going list instead of a
     # separate "Guests:" section - one line per contributor, "N, from: Name".
     guest_lines = []
-    for entry in master_going:
-        u_name = entry.split(" (")[0]
-        u_id   = entry.split("(")[-1].rstrip(")") if "(" in entry else None
+    for u_name, u_id in master_going_parsed:
         if master_counters.get(u_name, 0) > 0:
             guest_lines.append(f"{ICON_GUEST} {master_counters[u_name]}, from: {_mention_link(main_chat_id, u_name, u_id, master_clickable)}")
     # Also include guests from users who are not going (kicked users with guests)
+    master_going_names = {u_name for u_name, _ in master_going_parsed}
     for k, count in master_counters.items():
-        if k not in {u.split(" (")[0] for u in master_going} and count > 0:
+        if k not in master_going_names and count > 0:
             guest_lines.append(f"{ICON_GUEST} {count}, from: {_mention_link(main_chat_id, k, None, master_clickable)}")
 
     going_list_text = "\n".join(going_names_list + guest_lines)
@@ -473,9 +614,7 @@ async def update_all_shared_views(context: ContextTypes.DEFAULT_TYPE, event_id:
                 if uid and str(uid).lstrip("-").isdigit():
                     display_names[uname] = get_display_name(str(resolve_chat_id), str(uid), uname)
 
-            for entry in master_going:
-                u_name = entry.split(" (")[0]
-                u_id   = entry.split("(")[-1].rstrip(")") if "(" in entry else None
+            for u_name, u_id in master_going_parsed:
                 _resolve(u_name, u_id)
             for u_name in master_kicked:
                 _resolve(u_name)
@@ -643,6 +782,177 @@ async def update_all_shared_views(context: ContextTypes.DEFAULT_TYPE, event_id:
         )
 
 
+# ---------------------------------------------------------------------------
+# Sheets writes made by button_handler
+# ---------------------------------------------------------------------------
+# Split out of button_handler's body as @sheets_job functions so that, with
+# SHEETS_OFFLOAD on, they're queued for sheets_worker.py instead of run
+# here. Each takes the hub's already-resolved sheet_id (get_sheet_for_chat
+# is a pure DB lookup, so it stays in the handler - a FREE hub's click
+# never even queues a job) and plain row values only.
+
+@sheets_job
+async def _sheets_log_action(sheet_target, row):
+    """Appends one row to the hub sheet's Actions tab."""
+    try:
+        ss = await open_spreadsheet(sheet_target)
+        ws = await ss.worksheet("Actions")
+        await ws.append_row(row)
+    except Exception as e:
+        logger.error(f"Sheets action log failed: {e}")
+        reraise_in_worker()
+
+
+@sheets_job
+async def _sheets_finish_event_row(sheet_target, event_id, status, total_going, fallback_row):
+    """
+    Marks the event's Events row as finished: CLOSED_AT, STATUS, GOING_COUNT
+    (columns F:H) - or appends `fallback_row` whole if the event has no row
+    yet. Returns True only if the sheet was actually written, so Save &
+    Close knows whether to go on and export EventUsers.
+    """
+    try:
+        ss = await open_spreadsheet(sheet_target)
+        if not ss:
+            return False  # free tier / no sheet configured / expired - SQLite-only, nothing more to do
+        ws      = await ss.worksheet("Events")
+        records = await ws.get_all_records()
+        for idx, r in enumerate(records, start=2):
+            if str(r.get("EVENT_ID")) == str(event_id):
+                await ws.update(f"F{idx}:H{idx}", [[now2ddmmyy(), status, total_going]])
+                return True
+        # Only append if row doesn't exist
+        await ws.append_row(fallback_row)
+        return True
+    except Exception as e:
+        logger.error(f"Sheets {status.lower()} pipeline failed: {e}")
+        reraise_in_worker()
+        return False
+
+
+@sheets_job
+async def _sheets_export_event(sheet_target, main_chat_id, event_id, status, total_going, fallback_row,
+                               going_ids=None):
+    """
+    A whole event's Sheets footprint in one go, for hubs in 'deferred'
+    export mode (see db.get_sheet_export_mode): every action_log row still
+    pending export (one append_rows call), then its Events row, then - for
+    a close, not a cancel (going_ids is None) - its EventUsers. A handful
+    of API calls per event instead of one per click.
+
+    Rows are only marked exported once they're actually in the sheet, so a
+    failed export leaves them pending for the next close attempt (e.g.
+    Save & Close after a Cancel that couldn't reach Sheets).
+    """
+    pending = get_pending_sheet_actions(event_id)
+    if pending:
+        try:
+            ss = await open_spreadsheet(sheet_target)
+            ws = await ss.worksheet("Actions")
+            await ws.append_rows([action_log_row(entry) for entry in pending])
+            mark_sheet_actions_exported(event_id, pending[-1]["id"])
+        except Exception as e:
+            logger.error(f"Sheets deferred Actions export failed for event {event_id}: {e}")
+            reraise_in_worker()
+
+    row_written = await _sheets_finish_event_row(sheet_target, event_id, status, total_going, fallback_row)
+    if row_written and going_ids is not None:
+        await sync_event_users_sheet(main_chat_id, event_id, going_ids)
+
+
+# Callback actions that check is_real_admin in button_handler (the creator
+# may also close/save their own event - see the master branch).
+_ADMIN_GATED_ACTIONS = frozenset({"close", "directclose", "save", "kick", "incgst", "decgst", "addext", "cancel"})
+# Callback actions admit_click doesn't count against the user's bucket
+# (double-taps are still dropped): verification is one tap per
+# participant, so an admin checking in a whole event would otherwise be
+# held to CLICKS_PER_SECOND after the first CLICK_BURST kicks/returns.
+_UNMETERED_ACTIONS = _ADMIN_GATED_ACTIONS | {"return"}
+
+
+class ParsedCallback(NamedTuple):
+    """One event button's callback_data, split up once in parse_callback_data."""
+    action: str
+    event_id: str
+    target_username: Optional[str] = None  # kick_<id>:<username> and friends
+
+    @property
+    def needs_admin(self) -> bool:
+        return self.action in _ADMIN_GATED_ACTIONS
+
+    @property
+    def metered(self) -> bool:
+        return self.action not in _UNMETERED_ACTIONS
+
+
+def parse_callback_data(callback_data: str) -> Optional[ParsedCallback]:
+    """
+    "<action>_<event_id>" or "<action>_<event_id>:<target_username>" into a
+    ParsedCallback - None for anything that isn't an event button ("noop",
+    help_*, empty or malformed data). event_ids never contain ':', usernames
+    may contain '_', so the target is split off first.
+    """
+    if not callback_data or callback_data == "noop" or callback_data.startswith("help_"):
+        return None
+    head, sep, target_username = callback_data.partition(":")
+    action, _, event_id = head.partition("_")
+    if not action or not event_id:
+        return None
+    return ParsedCallback(action, event_id, target_username if sep else None)
+
+
+# ---------------------------------------------------------------------------
+# Event status index
+# ---------------------------------------------------------------------------
+
+# event_id -> event_status, for events that can no longer change: closed
+# (2) or canceled (-1) - both are final, nothing ever reopens an event. A
+# click on an old post of one of these (Telegram keeps showing stale
+# keyboards until the edit lands, and people scroll up) is answered
+# straight from here: no event lock, no SQLite read. Filled in by
+# button_handler whenever it reads or writes a final status; the oldest
+# entries are dropped past _STATUS_INDEX_MAX.
+_event_status_index = {}
+_STATUS_INDEX_MAX = 5000
+_FINAL_EVENT_STATUSES = (2, -1)
+
+
+def note_event_status(event_id: str, event_status) -> None:
+    if event_status not in _FINAL_EVENT_STATUSES:
+        return
+    _event_status_index.pop(event_id, None)
+    _event_status_index[event_id] = event_status
+    while len(_event_status_index) > _STATUS_INDEX_MAX:
+        del _event_status_index[next(iter(_event_status_index))]
+
+
+def is_event_final(event_id: str) -> bool:
+    """True only when the index KNOWS event_id is closed/canceled - unknown means "ask the DB"."""
+    return event_id in _event_status_index
+
+
+def _logged_action_name(action: str) -> str:
+    """The ACTION value a click is logged under (action_log and the Actions tab)."""
+    if action == "incgst":
+        return "ADD_editmode"
+    if action == "decgst":
+        return "SUB_editmode"
+    return action.upper()
+
+
+async def _log_action(main_chat_id, entry):
+    """
+    Sends one click's action_log entry on to the hub's Actions tab - unless
+    it's sheet_pending (a 'deferred' hub: it goes out with the rest at
+    close) or the hub has no sheet at all.
+    """
+    if entry["sheet_pending"]:
+        return
+    sheet_target = await get_sheet_for_chat(main_chat_id)
+    if sheet_target:
+        await _sheets_log_action(sheet_target, action_log_row(entry))
+
+
 # ---------------------------------------------------------------------------
 # Button handler (main state machine)
 # ---------------------------------------------------------------------------
@@ -653,14 +963,17 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     (master hub or child) comes through here. Broad shape of what happens
     on each click:
 
-      1. Parse callback_data into (action, event_id) - or
-         (action, event_id, target_username) for per-person actions like
-         kick_<id>:<username> during verification.
+      1. Pre-dispatch, all in memory: parse callback_data once
+         (parse_callback_data -> action, event_id and, for per-person
+         actions like kick_<id>:<username> during verification,
+         target_username), then drop clicks on events the status index
+         already knows are closed/canceled, double-taps and floods
+         (admit_click) - answered right away, going no further.
       2. Figure out whether this click came from the master hub or a child
          chat (click_chat_id vs the event's own chat_id), and whether the
          clicker is an admin (needed to gate admin-only actions: close,
          cancel, kick/return, save, add-extra-player).
-      3. Acquire this event's lock (get_event_lock) so two near-simultaneous
+      3. Acquire this event's lock (event_lock) so two near-simultaneous
          clicks on the SAME event can't interleave their read-modify-write
          and silently drop one - this is the one place all DB writes for
          an event go through.
@@ -681,7 +994,10 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
       2  (closed) / -1 (canceled) - no buttons are shown at all (see
                             create_event_keyboard), so this function should
                             never actually receive a click for these -
-                            treated as a no-op safety net if it somehow does.
+                            but stale posts still show old buttons: the
+                            first such click finds the status in the row
+                            and notes it in the status index, every later
+                            one is dropped in pre-dispatch.
     """
     query         = update.callback_query
     callback_data = query.data
@@ -692,47 +1008,49 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # FIX: no '(id1234)' suffix when user has no @username
     username_raw = user.username if user.username else (user.first_name or f"user{user_id}")
 
-    try:
-        await query.answer()
-    except Exception as e:
-        logger.error(f"Failed to answer callback: {e}")
-
-    if callback_data == "noop":
-        return
-
-    if callback_data.startswith("help_"):
-        # These belong to help_callback_handler/help_back_handler - should
-        # never reach here if those are registered before button_handler in
-        # main.py, but guard anyway rather than silently misparsing
-        # "help_alias" as action="help", event_id="alias".
-        return
-
-    action = target_username = event_id = None
+    # ── Pre-dispatch: everything here is in-memory ────────────────────────
+    # callback_data is parsed exactly once; clicks that can't change
+    # anything - noop/help_* (help_* belong to help_callback_handler/
+    # help_back_handler, registered before this in main.py, so they should
+    # never get here), a button on an event already known to be closed or
+    # canceled, a double-tap or a flood (admit_click) - are answered and
+    # dropped before the event lock, the SQLite read or any Telegram call
+    # other than the answer itself.
+    parsed = parse_callback_data(callback_data)
+    admitted, rejection_text = parsed is not None, None
+    if parsed is not None:
+        if is_event_final(parsed.event_id):
+            admitted = False
+        else:
+            admitted, rejection_text = admit_click(
+                user_id, parsed.event_id, callback_data, click_chat_id, query.message.message_id,
+                metered=parsed.metered,
+            )
 
     try:
-        if ":" in callback_data:
-            action_prefix, target_username = callback_data.split(":", 1)
-            action, event_id = (
-                action_prefix.split("_", 1) if "_" in action_prefix else (None, None)
-            )
+        if rejection_text:
+            await query.answer(text=rejection_text)
         else:
-            action, event_id = (
-                callback_data.split("_", 1) if "_" in callback_data else (None, None)
-            )
+            await query.answer()
     except Exception as e:
-        logger.error(f"Callback parse error: {e}")
-        return
+        logger.error(f"Failed to answer callback: {e}")
 
-    if not action or not event_id:
+    if not admitted:
         return
 
-    is_admin = await is_real_admin(context.bot, query.message.chat.id, user)
+    action, event_id, target_username = parsed
+
+    # Only the actions gated on it below need admin status - a plain
+    # Going/Not Going click (the vast majority) never pays for the lookup.
+    is_admin = False
+    if parsed.needs_admin:
+        is_admin = await is_real_admin(context.bot, query.message.chat.id, user)
 
     data_changed = False
     event_status = 0
+    logged_entry = None  # this click's action_log row, once recorded
 
-    lock = get_event_lock(event_id)
-    async with lock:
+    async with event_lock(event_id):
         # track_user() opens its OWN separate SQLite connection - calling it
         # from inside the transaction below (before it commits) causes
         # "database is locked", since two connections would be trying to
@@ -858,7 +1176,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
                 waitlist_promotion = None  # set below if a notgoing/sub click frees a slot
 
-                if event_status in (2, -1):
+                if event_status in _FINAL_EVENT_STATUSES:
+                    note_event_status(event_id, event_status)
                     return
 
                 is_click_in_child  = (int(click_chat_id) != int(main_chat_id))
@@ -1039,6 +1358,12 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                         else:
                             return
 
+                    if data_changed:
+                        logged_entry = record_action(
+                            cursor, event_id, click_chat_id, user_id, username_raw, _logged_action_name(action),
+                            sheet_pending=defers_sheet_actions(main_chat_id, cursor),
+                        )
+
                     # Persist waitlist_data here too - this branch commits
                     # and returns early, entirely bypassing the shared final
                     # UPDATE further down (which only the master/open-event
@@ -1056,18 +1381,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                                    first_name=t_first_name, last_name=t_last_name)
 
                     if data_changed:
-                        try:
-                            sheet_target = await get_sheet_for_chat(main_chat_id)
-                            if sheet_target:
-                                ss = await open_spreadsheet(sheet_target)
-                                ws = await ss.worksheet("Actions")
-                                await ws.append_row([
-                                    event_id, action.upper(), username_raw,
-                                    str(user_id), now2ddmmyy(), str(click_chat_id),
-                                ])
-                        except Exception as e:
-                            logger.error(f"Sheets child action log failed: {e}")
-                        context.application.create_task(schedule_view_refresh(context, event_id))
+                        await _log_action(main_chat_id, logged_entry)
+                        spawn("view_refresh", schedule_view_refresh(context, event_id), key=event_id)
 
                     if waitlist_promotion:
                         promo_chat_id, promo_username, promo_user_id, promo_is_guest = waitlist_promotion
@@ -1301,11 +1616,19 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                         event_status = 2
                         data_changed = True
 
+                if data_changed:
+                    logged_entry = record_action(
+                        cursor, event_id, click_chat_id, user_id, username_raw, _logged_action_name(action),
+                        sheet_pending=defers_sheet_actions(main_chat_id, cursor),
+                    )
                 cursor.execute(
                     "UPDATE events SET event_status = ?, going_data = ?, notgoing_data = ?, counters_data = ?, kicked_data = ?, waitlist_data = ? WHERE event_id = ?",
                     (event_status, json.dumps(going), json.dumps(list(not_going)), json.dumps(counters), json.dumps(kicked), json.dumps(waitlist), event_id),
                 )
                 conn.commit()
+            if event_status in _FINAL_EVENT_STATUSES:
+                note_event_status(event_id, event_status)
+                forget_event(event_id)
 
         except Exception as db_err:
             logger.error(f"SQLite transaction failure: {db_err}")
@@ -1331,119 +1654,86 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         # Log action to Sheets
         if data_changed:
-            try:
-                sheet_target = await get_sheet_for_chat(main_chat_id)
-                if sheet_target:
-                    ss           = await open_spreadsheet(sheet_target)
-                    ws           = await ss.worksheet("Actions")
-                    if action == "incgst":
-                        logged_action = "ADD_editmode"
-                    elif action == "decgst":
-                        logged_action = "SUB_editmode"
-                    else:
-                        logged_action = action.upper()
-                    await ws.append_row([
-                        event_id, logged_action, username_raw,
-                        str(user_id), now2ddmmyy(), str(click_chat_id),
-                    ])
-            except Exception as e:
-                logger.error(f"Sheets master action log failed: {e}")
+            await _log_action(main_chat_id, logged_entry)
 
-            context.application.create_task(schedule_view_refresh(context, event_id))
+            spawn("view_refresh", schedule_view_refresh(context, event_id), key=event_id)
 
         # ── Save & Close Event: write ALL going users to EventUsers sheet ─
         if action in ("save", "directclose"):
-            try:
-                sheet_target = await get_sheet_for_chat(main_chat_id)
-                ss           = await open_spreadsheet(sheet_target)
-                if not ss:
-                    pass  # free tier / no sheet configured / expired - SQLite-only save, nothing more to do
-                else:
-                    # 1. Collect master going user_ids (stored as "username (user_id)").
-                    #    Entries added via "Add Extra Member" should have user_id
-                    #    If no user_id is available, use username as fallback
-                    master_going_ids = []
-                    for entry in going:
-                        m = re.search(r'\(([^)]+)\)', entry)
-                        if m:
-                            master_going_ids.append(m.group(1))
-                        else:
-                            # Extra player without user_id - use username as user_id
-                            username = entry.split(" (")[0]
-                            master_going_ids.append(username)
-
-                    # 2. Collect child going user_ids from event_users table
-                    with get_connection() as conn_eu:
-                        cursor_eu = conn_eu.cursor()
-                        cursor_eu.execute(
-                            "SELECT user_id FROM event_users WHERE event_id = ? AND status = 'going'",
-                            (event_id,),
-                        )
-                        child_going_ids = [r[0] for r in cursor_eu.fetchall()]
-
-                        all_going_ids = master_going_ids + child_going_ids
+            sheet_target = await get_sheet_for_chat(main_chat_id)
+            if sheet_target:
+                # 1. Collect master going user_ids (stored as "username (user_id)").
+                #    Entries added via "Add Extra Member" should have user_id
+                #    If no user_id is available, use username as fallback
+                master_going_ids = []
+                for entry in going:
+                    m = re.search(r'\(([^)]+)\)', entry)
+                    if m:
+                        master_going_ids.append(m.group(1))
+                    else:
+                        # Extra player without user_id - use username as user_id
+                        username = entry.split(" (")[0]
+                        master_going_ids.append(username)
+
+                # 2. Collect child going user_ids from event_users table
+                with get_connection() as conn_eu:
+                    cursor_eu = conn_eu.cursor()
+                    cursor_eu.execute(
+                        "SELECT user_id FROM event_users WHERE event_id = ? AND status = 'going'",
+                        (event_id,),
+                    )
+                    child_going_ids = [r[0] for r in cursor_eu.fetchall()]
 
-                        # 3. Compute total for Events sheet
-                        # Include all child users (going + those with guests) and their guests
-                        cursor_eu.execute(
-                            "SELECT status, guests FROM event_users WHERE event_id = ? AND (status = 'going' OR guests > 0)",
-                            (event_id,),
-                        )
-                        child_rows = cursor_eu.fetchall()
-                    # Count child users who are going, plus all their guests (including from non-going users)
-                    child_going_count = sum(1 for status, guests in child_rows if status == 'going')
-                    child_guests_total = sum(guests for status, guests in child_rows)
-                    # Master: going users + all guests (including from non-going users)
-                    total_going    = len(going) + sum(counters.values()) + child_going_count + child_guests_total
+                    all_going_ids = master_going_ids + child_going_ids
 
+                    # 3. Compute total for Events sheet
+                    # Include all child users (going + those with guests) and their guests
+                    cursor_eu.execute(
+                        "SELECT status, guests FROM event_users WHERE event_id = ? AND (status = 'going' OR guests > 0)",
+                        (event_id,),
+                    )
+                    child_rows = cursor_eu.fetchall()
+                # Count child users who are going, plus all their guests (including from non-going users)
+                child_going_count = sum(1 for status, guests in child_rows if status == 'going')
+                child_guests_total = sum(guests for status, guests in child_rows)
+                # Master: going users + all guests (including from non-going users)
+                total_going    = len(going) + sum(counters.values()) + child_going_count + child_guests_total
+
+                fallback_row = [
+                    event_id, name, now2ddmmyy(), username_raw,
+                    event_date or "", now2ddmmyy(), "CLOSED", total_going,
+                ]
+                # Deferred hub (or a hub switched back to live mid-event,
+                # still holding parked rows): Actions + Events + EventUsers
+                # all in one background export.
+                if get_sheet_export_mode(main_chat_id) == "deferred" or has_pending_sheet_actions(event_id):
+                    spawn("sheets", _sheets_export_event(
+                        sheet_target, main_chat_id, event_id, "CLOSED", total_going, fallback_row, all_going_ids,
+                    ))
+                else:
                     # 4. Update Events sheet row
-                    ws      = await ss.worksheet("Events")
-                    records = await ws.get_all_records()
-                    found   = False
-                    for idx, r in enumerate(records, start=2):
-                        if str(r.get("EVENT_ID")) == str(event_id):
-                            await ws.update(f"F{idx}:H{idx}", [[now2ddmmyy(), "CLOSED", total_going]])
-                            found = True
-                            break
-                    if not found:
-                        await ws.append_row([
-                            event_id, name, now2ddmmyy(), username_raw,
-                            event_date or "", now2ddmmyy(), "CLOSED", total_going,
-                        ])
-
-                    # 5. Write all going user_ids to EventUsers sheet
-                    context.application.create_task(
-                        sync_event_users_sheet(main_chat_id, event_id, all_going_ids)
+                    row_written = await _sheets_finish_event_row(
+                        sheet_target, event_id, "CLOSED", total_going, fallback_row,
                     )
 
-            except Exception as e:
-                logger.error(f"Sheets save pipeline failed: {e}")
+                    # 5. Write all going user_ids to EventUsers sheet
+                    if row_written:
+                        spawn("sheets", sync_event_users_sheet(main_chat_id, event_id, all_going_ids))
 
         # ── Cancel Event: mark Events row as Canceled, write NOTHING to EventUsers ─
         if action == "cancel":
-            try:
-                sheet_target = await get_sheet_for_chat(main_chat_id)
-                ss           = await open_spreadsheet(sheet_target)
-                if not ss:
-                    pass  # free tier / no sheet configured / expired - SQLite-only cancel, nothing more to do
+            sheet_target = await get_sheet_for_chat(main_chat_id)
+            if sheet_target:
+                fallback_row = [
+                    event_id, name, now2ddmmyy(), username_raw,
+                    event_date or "", now2ddmmyy(), "CANCELED", 0,
+                ]
+                if get_sheet_export_mode(main_chat_id) == "deferred" or has_pending_sheet_actions(event_id):
+                    spawn("sheets", _sheets_export_event(
+                        sheet_target, main_chat_id, event_id, "CANCELED", 0, fallback_row,
+                    ))
                 else:
-                    ws      = await ss.worksheet("Events")
-                    records = await ws.get_all_records()
-                    found   = False
-                    for idx, r in enumerate(records, start=2):
-                        if str(r.get("EVENT_ID")) == str(event_id):
-                            # Update existing row to CANCELED
-                            await ws.update(f"F{idx}:H{idx}", [[now2ddmmyy(), "CANCELED", 0]])
-                            found = True
-                            break
-                    if not found:
-                        # Only append if row doesn't exist
-                        await ws.append_row([
-                            event_id, name, now2ddmmyy(), username_raw,
-                            event_date or "", now2ddmmyy(), "CANCELED", 0,
-                        ])
-                    # Intentionally NOT calling sync_event_users_sheet here -
-                    # a cancelled event must not write anything to EventUsers.
-            except Exception as e:
-                logger.error(f"Sheets cancel pipeline failed: {e}")
+                    await _sheets_finish_event_row(sheet_target, event_id, "CANCELED", 0, fallback_row)
+                # Intentionally NOT calling sync_event_users_sheet here -
+                # a cancelled event must not write anything to EventUsers.
 
@@ -1,5 +1,7 @@
+import asyncio
 import json
 import re
+import time
 from uuid import uuid4
 
 from telegram import Update
@@ -15,7 +17,7 @@ from help_system import (
     upgrade_info_callback_handler,
 )
 from event_engine import (
-    get_event_lock, schedule_view_refresh, update_all_shared_views, button_handler, _mention_link,
+    event_lock, schedule_view_refresh, update_all_shared_views, button_handler, _mention_link,
     _render_waitlist_local, _render_waitlist_all, _promotion_announcement_text,
 )
 
@@ -24,11 +26,20 @@ from config import (
     ICON_SHARED, ICON_STATS, ICON_WARNING,
     ICON_CLOCK, ICON_NOTIFY, ICON_CLEAN, ICON_ADMIN_ONLY, ICON_GLOBE, ICON_STANDBY,
 )
-from utils import escape_markdown, now2ddmmyy, parse_event_date, is_real_admin, GROUP_ANONYMOUS_BOT_ID
-from db import track_user, get_connection, get_feature_limit_for_chat, dedupe_waitlist
-from hub_resolver import resolve_hub_chat_id, register_hub_command
+from utils import (
+    escape_markdown, now2ddmmyy, parse_event_date, is_real_admin, GROUP_ANONYMOUS_BOT_ID,
+)
+from db import (
+    track_user, get_connection, get_feature_limit_for_chat, dedupe_waitlist, get_sheet_export_mode, defers_sheet_actions,
+    record_action, get_tracked_users, remove_tracked_users, create_refresh_job, set_refresh_job_progress_message,
+    get_refresh_job, get_running_refresh_job_id, get_running_refresh_job_ids, get_refresh_job_chats,
+    complete_refresh_job_chat, finish_refresh_job,
+)
+from membership import verify_tracked_members
+from background_tasks import spawn
+from hub_resolver import resolve_hub_chat_id, register_hub_command, note_admin_snapshot
 from sheets import (
-    get_sheet_for_chat, open_spreadsheet, sync_users_sheet,
+    get_sheet_for_chat, open_spreadsheet, sync_users_sheet, sheets_job, action_log_row, reraise_in_worker,
 )
 
 
@@ -44,6 +55,45 @@ MODE_MAP = {
     "-oc": "-onlycount", "--count": "-onlycount", "-onlycount": "-onlycount",
 }
 
+# ---------------------------------------------------------------------------
+# Sheets writes (offloadable - see sheets.sheets_job)
+# ---------------------------------------------------------------------------
+
+@sheets_job
+async def _sheets_append_row(sheet_target, tab, row):
+    """Appends one row to a tab of the hub's sheet (Events on /newevent, Actions on Add Extra Member)."""
+    try:
+        ss = await open_spreadsheet(sheet_target)
+        ws = await ss.worksheet(tab)
+        await ws.append_row(row)
+    except Exception as e:
+        logger.error(f"Failed to append to Google Sheets {tab} tab: {e}")
+        reraise_in_worker()
+
+
+@sheets_job
+async def _sheets_update_event_details(sheet_target, event_id, name, event_date):
+    """
+    Rewrites an event's EVENT_NAME (column B) and/or EVENT_DATE (column E)
+    in the Events tab after /editevent. None means "not edited, leave as
+    is" - so clearing the date has to be passed as "", not None.
+    """
+    try:
+        ss = await open_spreadsheet(sheet_target)
+        ws = await ss.worksheet("Events")
+        records = await ws.get_all_records()
+        for idx, r in enumerate(records, start=2):
+            if str(r.get("EVENT_ID")) == str(event_id):
+                if name is not None:
+                    await ws.update(f"B{idx}", [[name]])
+                if event_date is not None:
+                    await ws.update(f"E{idx}", [[event_date]])
+                break
+    except Exception as e:
+        logger.error(f"Failed to sync event update to Google Sheets: {e}")
+        reraise_in_worker()
+
+
 # ---------------------------------------------------------------------------
 # Argument parsers
 # ---------------------------------------------------------------------------
@@ -412,15 +462,12 @@ async def newevent(update: Update, context: ContextTypes.DEFAULT_TYPE, override_
         sheet_target = await get_sheet_for_chat(chat_id)
         if not sheet_target:
             await message.reply_text("Please specify google sheet for save")
-        else:
-            try:
-                ss = await open_spreadsheet(sheet_target)
-                ws = await ss.worksheet("Events")
-                await ws.append_row([
-                    event_id, event_name_raw, now2ddmmyy(), user_raw, event_date or "", "", "OPEN", 0,
-                ])
-            except Exception as e:
-                logger.error(f"Failed to log event creation to Google Sheets: {e}")
+        elif get_sheet_export_mode(chat_id) == "live":
+            await _sheets_append_row(sheet_target, "Events", [
+                event_id, event_name_raw, now2ddmmyy(), user_raw, event_date or "", "", "OPEN", 0,
+            ])
+        # 'deferred' hubs get their Events row written at close instead
+        # (with the final name/date), by event_engine._sheets_export_event.
 
 
 @register_hub_command("editevent")
@@ -621,26 +668,18 @@ async def editevent(update: Update, context: ContextTypes.DEFAULT_TYPE, override
     await update.message.reply_text(
         "⚙️ *Event updated\\. Refreshing views\\.*", parse_mode="MarkdownV2"
     )
-    context.application.create_task(schedule_view_refresh(context, event_id))
+    spawn("view_refresh", schedule_view_refresh(context, event_id), key=event_id)
 
     # Sync updated name/date to Google Sheets Events tab
-    try:
-        sheet_target = await get_sheet_for_chat(chat_id)
-        if not sheet_target:
-            return
-        ss = await open_spreadsheet(sheet_target)
-        ws = await ss.worksheet("Events")
-        records = await ws.get_all_records()
-        for idx, r in enumerate(records, start=2):
-            if str(r.get("EVENT_ID")) == str(event_id):
-                # Column B = EVENT_NAME (2nd column), Column E = EVENT_DATE (5th column)
-                if new_name is not None:
-                    await ws.update(f"B{idx}", [[updated_name]])
-                if date_raw is not None:
-                    await ws.update(f"E{idx}", [[updated_date or ""]])
-                break
-    except Exception as e:
-        logger.error(f"Failed to sync event update to Google Sheets: {e}")
+    # ('deferred' hubs: nothing to update yet - the row is written at close.)
+    sheet_target = await get_sheet_for_chat(chat_id)
+    if not sheet_target or get_sheet_export_mode(chat_id) == "deferred":
+        return
+    await _sheets_update_event_details(
+        sheet_target, event_id,
+        updated_name if new_name is not None else None,
+        (updated_date or "") if date_raw is not None else None,
+    )
 
 
 @register_hub_command("notify")
@@ -782,6 +821,7 @@ async def updateuser(update: Update, context: ContextTypes.DEFAULT_TYPE, overrid
                 if admins_cache is None:
                     try:
                         admins_cache = await context.bot.get_chat_administrators(chat_id)
+                        note_admin_snapshot(chat_id, admins_cache)
                     except Exception:
                         admins_cache = []
                 target_username = username.lstrip("@")
@@ -964,6 +1004,7 @@ async def adduser(update: Update, context: ContextTypes.DEFAULT_TYPE, override_c
                 target_username = identifier.lstrip("@")
                 try:
                     admins = await context.bot.get_chat_administrators(target_chat_id)
+                    note_admin_snapshot(target_chat_id, admins)
                     match = next(
                         (a.user for a in admins if a.user.username and a.user.username.lower() == target_username.lower()),
                         None,
@@ -1051,100 +1092,77 @@ async def refreshusers(update: Update, context: ContextTypes.DEFAULT_TYPE, overr
         await update.message.reply_text(f"{ICON_ADMIN_ONLY} Only admins can use /refreshusers\\.", parse_mode="MarkdownV2")
         return
 
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT username, user_id, status FROM main_group_users WHERE chat_id = ?", (chat_id,)
-        )
-        rows = cursor.fetchall()
+    rows = get_tracked_users(chat_id)
 
-        # Fetched once up front - reused both for resolving unresolved
-        # entries below (giving a stale username-only row a real chance
-        # at healing instead of unconditional removal) and for "add
-        # missing admins" further down, avoiding a duplicate API call.
-        try:
-            admins = await context.bot.get_chat_administrators(chat_id)
-        except Exception as e:
-            logger.error(f"refreshusers: could not fetch admin list: {e}")
-            admins = []
-
-        # ── 1. Remove confirmed-departed/invalid/unverifiable users ──────────
-        removed        = []
-        resolved       = []  # usernames that were unresolved but just got a real user_id via the admin list
-        still_present  = []  # (user_id, LIVE username straight from Telegram) - verified currently in the chat
-
-        for username, user_id, status in rows:
-            if not user_id:
-                # No stored user_id at all - try resolving one now via
-                # the admin list (same as /updateuser's own resolution),
-                # in case this person has since become an admin. Only
-                # remove outright if that ALSO fails - there's still no
-                # way to verify membership without a numeric ID.
-                target_username = username.lstrip("@")
-                match = next(
-                    (a.user for a in admins if a.user.username and a.user.username.lower() == target_username.lower()),
-                    None,
-                )
-                if match:
-                    track_user(
-                        chat_id, username, status, user_id=str(match.id),
-                        first_name=match.first_name, last_name=match.last_name,
-                    )
-                    resolved.append(username)
-                else:
-                    removed.append(username)
-                continue
-            try:
-                m = await context.bot.get_chat_member(
-                    chat_id=int(chat_id), user_id=int(user_id)
-                )
-                if m.status in ["left", "kicked"]:
-                    removed.append(username)
-                else:
-                    # Use the live Telegram username (public @handle preferred),
-                    # not the possibly-stale one stored locally - this is what
-                    # lets the Users sheet sync actually detect a name change.
-                    live_username = getattr(m.user, "username", None) or getattr(m.user, "first_name", None) or username
-                    still_present.append((user_id, live_username, m.user.first_name, m.user.last_name))
-            except BadRequest as e:
-                # "User not found" / "Chat member not found" - this could mean:
-                # 1. User actually left the group
-                # 2. User was just re-added but bot hasn't cached them yet
-                # 3. Temporary API issue
-                # To avoid false positives for recently re-added users, keep them
-                # in the list. If they're truly gone, they'll be removed next time.
-                logger.error(f"refreshusers: BadRequest for user {username} (user_id={user_id}): {e}")
-                still_present.append((user_id, username, None, None))
-            except Exception as e:
-                # Any other error - keep them in list to avoid false removals
-                logger.error(f"refreshusers: Exception for user {username} (user_id={user_id}): {e}")
-                still_present.append((user_id, username, None, None))
-
-        if removed:
-            cursor.executemany(
-                "DELETE FROM main_group_users WHERE chat_id = ? AND username = ?",
-                [(chat_id, u) for u in removed],
+    # Fetched once up front - reused both for resolving unresolved
+    # entries below (giving a stale username-only row a real chance
+    # at healing instead of unconditional removal) and for "add
+    # missing admins" further down, avoiding a duplicate API call.
+    try:
+        admins = await context.bot.get_chat_administrators(chat_id)
+        note_admin_snapshot(chat_id, admins)
+    except Exception as e:
+        logger.error(f"refreshusers: could not fetch admin list: {e}")
+        admins = []
+
+    # ── 1. Remove confirmed-departed/invalid/unverifiable users ──────────
+    removed        = []
+    resolved       = []  # usernames that were unresolved but just got a real user_id via the admin list
+    to_verify      = []  # (username, user_id) - checked against live membership below
+
+    for username, user_id, status in rows:
+        if not user_id:
+            # No stored user_id at all - try resolving one now via
+            # the admin list (same as /updateuser's own resolution),
+            # in case this person has since become an admin. Only
+            # remove outright if that ALSO fails - there's still no
+            # way to verify membership without a numeric ID.
+            target_username = username.lstrip("@")
+            match = next(
+                (a.user for a in admins if a.user.username and a.user.username.lower() == target_username.lower()),
+                None,
             )
-            conn.commit()
+            if match:
+                track_user(
+                    chat_id, username, status, user_id=str(match.id),
+                    first_name=match.first_name, last_name=match.last_name,
+                )
+                resolved.append(username)
+            else:
+                removed.append(username)
+            continue
+        to_verify.append((username, user_id))
+
+    remove_tracked_users(chat_id, removed)
+
+    # Live membership, checked concurrently under the bot-wide getChatMember
+    # rate limit (see membership.py). A check that fails for any reason
+    # other than a definite "left"/"kicked" - "User not found" right after a
+    # re-add, a temporary API issue - keeps the user, to avoid false
+    # positives; if they're truly gone, they'll be removed next time.
+    # still_present carries the LIVE Telegram username (public @handle
+    # preferred), not the possibly-stale one stored locally - this is what
+    # lets the Users sheet sync actually detect a name change.
+    departed, still_present = await verify_tracked_members(context.bot, chat_id, to_verify)
+    removed.extend(departed)
+
+    # ── 2. Add missing chat administrators as 'active' ──────────────────────
+    added = []
+    try:
+        already_tracked = {r[0] for r in get_tracked_users(chat_id)}
 
-        # ── 2. Add missing chat administrators as 'active' ──────────────────────
-        added = []
-        try:
-            cursor.execute("SELECT username FROM main_group_users WHERE chat_id = ?", (chat_id,))
-            already_tracked = {r[0] for r in cursor.fetchall()}
-
-            for admin_member in admins:
-                u = admin_member.user
-                if u.is_bot:
-                    continue
-                uname = u.username or u.first_name or f"user{u.id}"
-                if uname not in already_tracked:
-                    track_user(chat_id, uname, "active", user_id=str(u.id),
-                               first_name=u.first_name, last_name=u.last_name)
-                    added.append(uname)
-                still_present.append((str(u.id), uname, u.first_name, u.last_name))
-        except Exception as e:
-            logger.error(f"refreshusers: error while processing admin list: {e}")
+        for admin_member in admins:
+            u = admin_member.user
+            if u.is_bot:
+                continue
+            uname = u.username or u.first_name or f"user{u.id}"
+            if uname not in already_tracked:
+                track_user(chat_id, uname, "active", user_id=str(u.id),
+                           first_name=u.first_name, last_name=u.last_name)
+                added.append(uname)
+            still_present.append((str(u.id), uname, u.first_name, u.last_name))
+    except Exception as e:
+        logger.error(f"refreshusers: error while processing admin list: {e}")
 
     # Dedupe still_present by user_id (an admin who was already tracked
     # would otherwise appear twice - once from step 1, once from step 2).
@@ -1206,6 +1224,17 @@ async def refreshusers(update: Update, context: ContextTypes.DEFAULT_TYPE, overr
     await update.message.reply_text("\n".join(lines), parse_mode="MarkdownV2")
 
 
+# Background /refreshusersall jobs still running in this process, by job_id
+# (the DB's refresh_jobs table is the durable record - see db.py). Holding
+# the task here keeps it from being garbage-collected mid-run, and lets
+# shutdown stop them cleanly (stop_refresh_jobs).
+_refresh_job_tasks = {}
+# The progress message is edited at most this often - plus once at the
+# very end. Telegram rate-limits edits per chat, and a hub with dozens of
+# small monitored chats would otherwise edit several times a second.
+_REFRESH_PROGRESS_EDIT_SECONDS = 3.0
+
+
 @register_hub_command("refreshusersall")
 async def refreshusersall(update: Update, context: ContextTypes.DEFAULT_TYPE, override_chat_id: str = None):
     """
@@ -1214,9 +1243,17 @@ async def refreshusersall(update: Update, context: ContextTypes.DEFAULT_TYPE, ov
     separate step, this replaces needing a plain /refreshusers call for
     the hub itself. This is a heavier, potentially slow bulk operation -
     it makes live Telegram API calls for every tracked user AND every
-    admin in EVERY chat it touches, one after another - so it's kept as
-    its own explicit command rather than a flag on the lightweight,
-    everyday /refreshusers.
+    admin in EVERY chat it touches (see membership.py for how those are
+    paced) - so it's kept as its own explicit command rather than a flag
+    on the lightweight, everyday /refreshusers.
+
+    For a big hub that takes minutes, so the command itself only starts
+    the run: it's recorded as a refresh_jobs row (one checkpoint row per
+    chat) and carried out in the background by _run_refresh_job, which
+    keeps editing ONE progress message as each chat finishes. A restart
+    mid-run resumes from the first unfinished chat (resume_refresh_jobs,
+    at startup). Only one run per hub at a time - a second /refreshusersall
+    while one is going just points at it.
     """
     chat_id = await resolve_hub_chat_id(update, context, "refreshusersall", override_chat_id)
     if chat_id is None:
@@ -1229,6 +1266,13 @@ async def refreshusersall(update: Update, context: ContextTypes.DEFAULT_TYPE, ov
     if not await require_premium(update, "Monitoring sync (/refreshusersall, tied to /addmonitor)", chat_id=chat_id):
         return
 
+    if get_running_refresh_job_id(chat_id) is not None:
+        await update.message.reply_text(
+            "⏳ A /refreshusersall for this group is already running \\- its progress message updates as it goes\\.",
+            parse_mode="MarkdownV2",
+        )
+        return
+
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
@@ -1246,91 +1290,173 @@ async def refreshusersall(update: Update, context: ContextTypes.DEFAULT_TYPE, ov
         hub_chat_name = hub_chat_obj.title or chat_id
     except Exception:
         hub_chat_name = chat_id
-    monitors = [(chat_id, "group", hub_chat_name)] + list(monitors)
+    chats = [(chat_id, hub_chat_name)] + [(mid, name or mid) for mid, _, name in monitors]
 
+    job_id = create_refresh_job(chat_id, chats, now2ddmmyy())
+    if job_id is None:
+        # lost a race with another run that started in between
+        await update.message.reply_text(
+            "⏳ A /refreshusersall for this group is already running\\.", parse_mode="MarkdownV2"
+        )
+        return
 
+    progress = await update.message.reply_text(
+        _render_refresh_progress(get_refresh_job_chats(job_id), finished=False), parse_mode="MarkdownV2"
+    )
+    try:
+        set_refresh_job_progress_message(job_id, progress.chat_id, progress.message_id)
+    except Exception as e:
+        logger.error(f"refreshusersall: could not record the progress message for job {job_id}: {e}")
+    start_refresh_job(context.bot, job_id)
 
+
+def _render_refresh_progress(job_chats, finished: bool) -> str:
+    """The progress message: one line per finished chat, then how far along the run is."""
     lines = [f"{ICON_GLOBE} *Processing monitored groups/channels:*"]
-    for monitor_chat_id, chat_type, chat_name in monitors:
-        try:
-            with get_connection() as conn_mon:
-                cursor_mon = conn_mon.cursor()
+    for _, _, chat_name, status, removed, added in job_chats:
+        if status == "done":
+            status_line = f"  ✅ Synced: `{escape_markdown(chat_name)}`"
+            if removed:
+                status_line += f" \\(-{removed}\\)"
+            if added:
+                status_line += f" \\(+{added}\\)"
+            lines.append(status_line)
+        elif status == "failed":
+            lines.append(f"  ❌ Failed: `{escape_markdown(chat_name)}`")
+    if not finished:
+        done = sum(1 for row in job_chats if row[3] != "pending")
+        lines.append(f"⏳ {done}/{len(job_chats)} done\\.\\.\\.")
+    return "\n".join(lines)
 
-                # Local sync for monitored group (remove departed, add admins)
-                cursor_mon.execute(
-                    "SELECT username, user_id, status FROM main_group_users WHERE chat_id = ?",
-                    (monitor_chat_id,),
-                )
-                monitor_rows = cursor_mon.fetchall()
 
-                monitor_removed = []
-                monitor_present = []
+async def _refresh_one_chat(bot, monitor_chat_id, chat_name):
+    """
+    One chat's share of a /refreshusersall run - drop departed tracked
+    users, add missing admins, sync its Users sheet. Returns (number
+    removed, number added); raises if the chat couldn't be synced at all.
+    """
+    # Local sync for monitored group (remove departed, add admins).
+    # Unlike /refreshusers, a member that can't be verified here is
+    # dropped - a monitored child is synced wholesale, not curated.
+    monitor_rows = get_tracked_users(monitor_chat_id)
+    monitor_removed = [username for username, user_id, _ in monitor_rows if not user_id]
+    remove_tracked_users(monitor_chat_id, monitor_removed)
+    departed, monitor_present = await verify_tracked_members(
+        bot, monitor_chat_id,
+        [(username, user_id) for username, user_id, _ in monitor_rows if user_id],
+        remove_unverifiable=True, log_prefix="refreshusersall",
+    )
+    monitor_removed.extend(departed)
 
-                for username, user_id, status in monitor_rows:
-                    if not user_id:
-                        monitor_removed.append(username)
-                        continue
-                    try:
-                        m = await context.bot.get_chat_member(
-                            chat_id=int(monitor_chat_id), user_id=int(user_id)
-                        )
-                        if m.status in ["left", "kicked"]:
-                            monitor_removed.append(username)
-                        else:
-                            live_username = getattr(m.user, "username", None) or getattr(m.user, "first_name", None) or username
-                            monitor_present.append((user_id, live_username, m.user.first_name, m.user.last_name))
-                    except BadRequest:
-                        monitor_removed.append(username)
-                    except Exception:
-                        monitor_removed.append(username)
+    # Add missing admins for monitored group
+    monitor_added = []
+    try:
+        monitor_admins = await bot.get_chat_administrators(int(monitor_chat_id))
+        note_admin_snapshot(monitor_chat_id, monitor_admins)
+        monitor_tracked = {r[0] for r in get_tracked_users(monitor_chat_id)}
 
-                if monitor_removed:
-                    cursor_mon.executemany(
-                        "DELETE FROM main_group_users WHERE chat_id = ? AND username = ?",
-                        [(monitor_chat_id, u) for u in monitor_removed],
-                    )
-                    conn_mon.commit()
+        for admin_member in monitor_admins:
+            u = admin_member.user
+            if u.is_bot:
+                continue
+            uname = u.username or u.first_name or f"user{u.id}"
+            if uname not in monitor_tracked:
+                track_user(monitor_chat_id, uname, "active", user_id=str(u.id),
+                           first_name=u.first_name, last_name=u.last_name)
+                monitor_added.append(uname)
+            monitor_present.append((str(u.id), uname, u.first_name, u.last_name))
+    except Exception as e:
+        logger.error(f"refreshusersall: could not fetch admins for {chat_name}: {e}")
 
-                # Add missing admins for monitored group
-                monitor_added = []
-                try:
-                    monitor_admins = await context.bot.get_chat_administrators(int(monitor_chat_id))
-                    cursor_mon.execute("SELECT username FROM main_group_users WHERE chat_id = ?", (monitor_chat_id,))
-                    monitor_tracked = {r[0] for r in cursor_mon.fetchall()}
+    # Dedupe monitor_present
+    monitor_present = list({
+        str(uid): (uid, uname, first_name, last_name)
+        for uid, uname, first_name, last_name in monitor_present
+    }.values())
 
-                    for admin_member in monitor_admins:
-                        u = admin_member.user
-                        if u.is_bot:
-                            continue
-                        uname = u.username or u.first_name or f"user{u.id}"
-                        if uname not in monitor_tracked:
-                            track_user(monitor_chat_id, uname, "active", user_id=str(u.id),
-                                       first_name=u.first_name, last_name=u.last_name)
-                            monitor_added.append(uname)
-                        monitor_present.append((str(u.id), uname, u.first_name, u.last_name))
-                except Exception as e:
-                    logger.error(f"refreshusersall: could not fetch admins for {chat_name}: {e}")
+    # Sync to sheets with chat_id (each monitor gets its own chat_id)
+    await sync_users_sheet(monitor_chat_id, monitor_present)
+    return len(monitor_removed), len(monitor_added)
 
-            # Dedupe monitor_present
-            monitor_present = list({
-                str(uid): (uid, uname, first_name, last_name)
-                for uid, uname, first_name, last_name in monitor_present
-            }.values())
 
-            # Sync to sheets with chat_id (each monitor gets its own chat_id)
-            await sync_users_sheet(monitor_chat_id, monitor_present)
+async def _show_refresh_progress(bot, job_id, finished: bool):
+    job = get_refresh_job(job_id)
+    if not job or not job[2] or not job[3]:
+        return
+    try:
+        await bot.edit_message_text(
+            chat_id=job[2], message_id=int(job[3]) if str(job[3]).isdigit() else job[3],
+            text=_render_refresh_progress(get_refresh_job_chats(job_id), finished),
+            parse_mode="MarkdownV2",
+        )
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            logger.warning(f"refreshusersall: could not update progress of job {job_id}: {e}")
+    except Exception as e:
+        logger.warning(f"refreshusersall: could not update progress of job {job_id}: {e}")
 
-            status_line = f"  ✅ Synced: `{escape_markdown(chat_name)}`"
-            if monitor_removed:
-                status_line += f" \\(-{len(monitor_removed)}\\)"
-            if monitor_added:
-                status_line += f" \\(+{len(monitor_added)}\\)"
-            lines.append(status_line)
-        except Exception as e:
-            logger.error(f"refreshusersall failed for {chat_name}: {e}")
-            lines.append(f"  ❌ Failed: `{escape_markdown(chat_name)}`")
 
-    await update.message.reply_text("\n".join(lines), parse_mode="MarkdownV2")
+async def _run_refresh_job(bot, job_id):
+    """
+    Works through a job's chats that are still 'pending', checkpointing
+    each one as it finishes - so a restart picks up at the first chat not
+    yet done, not from scratch. Cancellation (shutdown) leaves the job
+    'running' on purpose, for resume_refresh_jobs to continue it.
+    """
+    try:
+        last_edit = time.monotonic()
+        for position, monitor_chat_id, chat_name, status, _, _ in get_refresh_job_chats(job_id):
+            if status != "pending":
+                continue
+            try:
+                removed, added = await _refresh_one_chat(bot, monitor_chat_id, chat_name)
+                complete_refresh_job_chat(job_id, position, "done", removed, added)
+            except Exception as e:
+                logger.error(f"refreshusersall failed for {chat_name}: {e}")
+                complete_refresh_job_chat(job_id, position, "failed")
+            if time.monotonic() - last_edit >= _REFRESH_PROGRESS_EDIT_SECONDS:
+                await _show_refresh_progress(bot, job_id, finished=False)
+                last_edit = time.monotonic()
+        finish_refresh_job(job_id, now2ddmmyy())
+        await _show_refresh_progress(bot, job_id, finished=True)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"refreshusersall job {job_id} aborted: {e!r}")
+        finish_refresh_job(job_id, now2ddmmyy(), status="failed")
+
+
+def _forget_refresh_job(job_id, task):
+    # a done-callback, not a finally in _run_refresh_job: a task cancelled
+    # before its first step never runs the coroutine's body at all
+    if _refresh_job_tasks.get(job_id) is task:
+        del _refresh_job_tasks[job_id]
+
+
+def start_refresh_job(bot, job_id):
+    """Runs job_id in the background (no-op if it's already running in this process). Returns its task."""
+    task = _refresh_job_tasks.get(job_id)
+    if task is None:
+        task = spawn("refresh_job", _run_refresh_job(bot, job_id))
+        _refresh_job_tasks[job_id] = task
+        task.add_done_callback(lambda t: _forget_refresh_job(job_id, t))
+    return task
+
+
+async def resume_refresh_jobs(application):
+    """Startup: picks every /refreshusersall run a restart interrupted back up where it stopped."""
+    for job_id in get_running_refresh_job_ids():
+        logger.info(f"Resuming /refreshusersall job {job_id}")
+        start_refresh_job(application.bot, job_id)
+
+
+async def stop_refresh_jobs(application=None):
+    """Shutdown: stops the running jobs - their checkpoints stay, resume_refresh_jobs continues them."""
+    tasks = list(_refresh_job_tasks.values())
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 # ---------------------------------------------------------------------------
@@ -1655,7 +1781,7 @@ async def shareevent(update: Update, context: ContextTypes.DEFAULT_TYPE, overrid
         )
         return
 
-    context.application.create_task(schedule_view_refresh(context, event_id))
+    spawn("view_refresh", schedule_view_refresh(context, event_id), key=event_id)
 
 
 # ---------------------------------------------------------------------------
@@ -1713,8 +1839,7 @@ async def handle_extra_player_input(update: Update, context: ContextTypes.DEFAUL
         await update.message.reply_text("❌ Invalid username.")
         return
 
-    lock = get_event_lock(event_id)
-    async with lock:
+    async with event_lock(event_id):
         try:
             with get_connection() as conn:
                 cursor = conn.cursor()
@@ -1757,6 +1882,12 @@ async def handle_extra_player_input(update: Update, context: ContextTypes.DEFAUL
                     "UPDATE events SET going_data = ?, counters_data = ?, notgoing_data = ? WHERE event_id = ?",
                     (json.dumps(going), json.dumps(counters), json.dumps(not_going), event_id),
                 )
+                # Record the user who clicked the button, not the added player
+                user_raw = update.effective_user.username if update.effective_user.username else update.effective_user.first_name
+                logged_entry = record_action(
+                    cursor, event_id, chat_id, update.effective_user.id, user_raw, "ADD_EXTRA_PLAYER",
+                    sheet_pending=defers_sheet_actions(chat_id, cursor),
+                )
                 conn.commit()
         except Exception as e:
             logger.error(f"Extra player DB failure: {e}")
@@ -1767,20 +1898,13 @@ async def handle_extra_player_input(update: Update, context: ContextTypes.DEFAUL
     except Exception:
         pass
 
-    try:
+    # ('deferred' hubs: the row is sheet_pending and goes out at close.)
+    if not logged_entry["sheet_pending"]:
         sheet_target = await get_sheet_for_chat(chat_id)
         if sheet_target:
-            ss           = await open_spreadsheet(sheet_target)
-            ws           = await ss.worksheet("Actions")
-            # Record the user who clicked the button, not the added player
-            user_raw = update.effective_user.username if update.effective_user.username else update.effective_user.first_name
-            await ws.append_row([
-                event_id, "ADD_EXTRA_PLAYER", user_raw, str(update.effective_user.id), now2ddmmyy(), str(chat_id),
-            ])
-    except Exception as e:
-        logger.error(f"Sheets extra player log failed: {e}")
+            await _sheets_append_row(sheet_target, "Actions", action_log_row(logged_entry))
 
-    context.application.create_task(schedule_view_refresh(context, event_id))
+    spawn("view_refresh", schedule_view_refresh(context, event_id), key=event_id)
 
 
 # ---------------------------------------------------------------------------
@@ -163,6 +163,7 @@ def _build_main_help_text(pro: bool, has_event_limit: bool = False) -> str:
     if pro:
         text += "/setsheet \\[sheetid\\|sheeturl\\] \\- Bind this group to its own Google Sheet \\(Users/Events/Actions/EventUsers/UserPresenceLog tabs\\)\n"
         text += "sheetid\\|sheeturl \\- either the raw spreadsheet ID, or a full Google Sheets URL \\(the ID is extracted automatically\\)\n"
+        text += "\\-export live\\|deferred \\- write clicks to Sheets as they happen \\(live\\), or all at once when the event is closed/canceled \\(deferred\\)\n"
         text += "/stats \\- Event activity stats for this group \\(events created, closed, total/average headcount\\)\n"
     text += "\n📚 *More Info*"
     return text
@@ -268,7 +269,8 @@ async def help_callback_handler(update: Update, context: ContextTypes.DEFAULT_TY
             "/removemonitor \\[chat\\_id\\] \\- Remove from monitor list\n"
             "/listmonitors \\- Show all monitored groups/channels\n"
             "/refreshusersall \\- Sync user list for THIS group PLUS every monitored child under it in one go "
-            "\\(heavier/slower than plain /refreshusers, since it touches every monitored chat\\)\n\n"
+            "\\(heavier/slower than plain /refreshusers, since it touches every monitored chat \\- it runs in the "
+            "background and keeps one progress message updated\\)\n\n"
             "Monitored chats are tracked for user presence and can be synced with /refreshusersall"
         ),
         "help_dm_access": (
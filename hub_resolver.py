@@ -15,11 +15,12 @@ How it works:
        - If a group is already "selected" for this conversation
          (context.user_data["selected_hub_chat_id"]), it's used
          immediately - no lookup, no picker, no repeated questions.
-       - Otherwise, every group the bot is currently in (all_groups UNIONed
-         with the older main_group_users, which catches groups added
-         before all_groups existed) is checked with a LIVE
-         get_chat_member call - not a cached/assumed status - to see if
-         the person messaging the bot is a real admin there.
+       - Otherwise, the chat_admins index (see _get_known_candidate_chats)
+         says which of the groups the bot is in this person administers,
+         and only THOSE are re-checked with a LIVE get_chat_member call -
+         not a cached/assumed status - before being offered. The index is
+         filled off this path entirely: when the bot joins a chat, and by
+         a paced background sweep (start_admin_snapshot_sweeper).
            - No matches: told plainly, nothing else happens.
            - Exactly one match: used immediately AND remembered as the
              selected group for next time.
@@ -40,11 +41,43 @@ resolve_hub_chat_id(update, context, "commandname", override_chat_id) at
 the top instead of reading update.effective_chat.id directly.
 """
 
+import asyncio
+import time
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from db import get_connection
-from utils import escape_markdown
+from config import logger
+from db import (
+    get_connection, replace_chat_admins, set_chat_admin, get_indexed_admin_chats,
+    get_chats_needing_admin_snapshot, record_admin_snapshot_failure,
+)
+from utils import escape_markdown, remember_chat_admins
+
+# A chat's snapshotted admin list is trusted for this long. chat_member
+# updates keep it current in between - but only in chats where the bot is
+# itself an admin; anywhere else a promotion would go unseen, so the
+# background sweep re-takes the list once it's this old.
+ADMIN_SNAPSHOT_MAX_AGE_SECONDS = 24 * 3600
+# The sweep: how often it looks for chats due a snapshot, how many it takes
+# per pass, and how many getChatAdministrators calls it makes per second -
+# a few thousand chats get re-snapshotted well within a day without ever
+# competing with clicks for Telegram's per-bot rate limit.
+_SWEEP_INTERVAL_SECONDS = 60.0
+_SWEEP_BATCH = 100
+_SWEEP_CALLS_PER_SECOND = 2.0
+# A chat whose getChatAdministrators fails is left alone this long, then
+# twice as long after each further failure, up to the max.
+_SNAPSHOT_RETRY_SECONDS = 3600.0
+_SNAPSHOT_MAX_RETRY_SECONDS = 7 * 24 * 3600.0
+# A sweep pass that fails outright (e.g. "database is locked" while the
+# Sheets worker holds the file) is retried after this long, doubling up to
+# _SWEEP_INTERVAL_SECONDS while the failures keep coming.
+_SWEEP_ERROR_RETRY_SECONDS = 5.0
+# How many Telegram lookups one hub resolution may have in flight at once.
+_VERIFY_CONCURRENCY = 8
+
+_state = {"sweeper": None}
 
 # Filled in by aliases.py, handlers.py, monitors.py, subscription.py (and
 # whichever other modules opt into this) at import time - kept here rather
@@ -62,48 +95,149 @@ def register_hub_command(name):
     return _wrap
 
 
+def note_admin_snapshot(chat_id, admins):
+    """
+    Records a getChatAdministrators result: as the in-memory admin roster
+    is_real_admin reads (utils.remember_chat_admins), and as chat_id's rows
+    in the chat_admins index hub resolution reads. Call it wherever the
+    bot fetches that list anyway. An empty list is never a real chat's
+    admin list (there's always a creator) - only a failed or mocked fetch -
+    so it isn't stored as a snapshot.
+    """
+    remember_chat_admins(chat_id, admins)
+    try:
+        user_ids = [a.user.id for a in admins]
+    except Exception:
+        return
+    if user_ids:
+        replace_chat_admins(chat_id, user_ids, time.time())
+
+
+async def snapshot_chat_admins(bot, chat_id) -> bool:
+    """
+    Takes chat_id's full admin list with one getChatAdministrators call and
+    stores it (note_admin_snapshot). On failure - or an empty list, which
+    no real chat has - records the failure so the sweep backs off from
+    that chat. Returns whether a snapshot was stored.
+    """
+    try:
+        admins = await bot.get_chat_administrators(int(chat_id))
+    except Exception as e:
+        logger.info(f"Admin snapshot of chat {chat_id} failed: {e}")
+        admins = []
+    if admins:
+        note_admin_snapshot(chat_id, admins)
+        return True
+    record_admin_snapshot_failure(chat_id, time.time(), _SNAPSHOT_RETRY_SECONDS, _SNAPSHOT_MAX_RETRY_SECONDS)
+    return False
+
+
+async def _sweep_admin_snapshots(bot):
+    """
+    Forever: snapshots every known chat whose admin list is missing or
+    older than ADMIN_SNAPSHOT_MAX_AGE_SECONDS (and not backing off after a
+    failure), _SWEEP_BATCH at a time, one call at a time at
+    _SWEEP_CALLS_PER_SECOND - then waits _SWEEP_INTERVAL_SECONDS for more
+    to come due. Right after an upgrade that's every chat, so DM hub
+    resolution fills in over the first minutes of the first run.
+
+    DM hub resolution reads nothing but the index this keeps fresh, so a
+    pass that fails (SQLite locked, a bug) is logged and retried after a
+    backoff - it never ends the sweep.
+    """
+    error_delay = _SWEEP_ERROR_RETRY_SECONDS
+    while True:
+        try:
+            now = time.time()
+            due = get_chats_needing_admin_snapshot(now - ADMIN_SNAPSHOT_MAX_AGE_SECONDS, now, _SWEEP_BATCH)
+            for chat_id, _ in due:
+                await snapshot_chat_admins(bot, chat_id)
+                await asyncio.sleep(1 / _SWEEP_CALLS_PER_SECOND)
+        except Exception as e:
+            logger.error(f"Admin snapshot sweep pass failed, retrying in {error_delay:.0f}s: {e!r}")
+            await asyncio.sleep(error_delay)
+            error_delay = min(error_delay * 2, _SWEEP_INTERVAL_SECONDS)
+            continue
+        error_delay = _SWEEP_ERROR_RETRY_SECONDS
+        if len(due) < _SWEEP_BATCH:
+            await asyncio.sleep(_SWEEP_INTERVAL_SECONDS)
+
+
+def _on_sweeper_done(task):
+    if task.cancelled():
+        return
+    e = task.exception()
+    logger.error(f"Admin snapshot sweep stopped unexpectedly: {e!r} - "
+                 f"DM hub resolution won't see new admins until a restart.")
+
+
+async def start_admin_snapshot_sweeper(application):
+    """Starts the background admin snapshot sweep - called from main._post_init."""
+    task = asyncio.get_running_loop().create_task(_sweep_admin_snapshots(application.bot))
+    task.add_done_callback(_on_sweeper_done)
+    _state["sweeper"] = task
+
+
+async def stop_admin_snapshot_sweeper():
+    """Cancels the sweep (a pass cut short just carries on next start) - called from main._post_stop."""
+    task, _state["sweeper"] = _state["sweeper"], None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
 async def _get_known_candidate_chats(context: ContextTypes.DEFAULT_TYPE, user_id: int):
     """
-    Returns [(chat_id, display_name), ...] for every chat_id the bot has ANY
-    record of (from all_groups, populated going forward by the
-    MY_CHAT_MEMBER handler, UNIONed with main_group_users, which has
-    existed much longer and is populated by the older per-user
-    ChatMemberHandler plus most commands) where `user_id` is a real,
+    Returns [(chat_id, display_name), ...] for every chat the chat_admins
+    index lists `user_id` as an admin of where they're still a real,
     currently-verified admin.
 
-    all_groups alone would miss every group the bot was added to BEFORE
-    that table existed - main_group_users is the fallback that catches
-    those, since it's been populated since v2.0.
+    This used to ask Telegram about EVERY known chat (all_groups UNION
+    main_group_users), one after another - a bot in a few hundred groups
+    made each DM command wait on a few hundred getChatMember round trips.
+    Now the index answers "which chats might this user administer" in one
+    query, and only those chats get a live getChatMember re-check (a
+    demotion found there drops the row), at most _VERIFY_CONCURRENCY at a
+    time. Nothing on this path snapshots a chat - that happens when the
+    bot joins one and in the background sweep - so a DM costs the same
+    however many chats the bot is in, or how many of them can't be read.
     """
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT chat_id, chat_name FROM all_groups")
-        from_all_groups = {str(cid): name for cid, name in cursor.fetchall()}
-        cursor.execute("SELECT DISTINCT chat_id FROM main_group_users")
-        from_main_group_users = {str(row[0]) for row in cursor.fetchall()}
-
-    all_chat_ids = set(from_all_groups) | from_main_group_users
+    indexed = dict(get_indexed_admin_chats(user_id))
+    slots = asyncio.Semaphore(_VERIFY_CONCURRENCY)
 
-    admin_of = []
-    for candidate_chat_id in all_chat_ids:
+    async def _verify_indexed(candidate_chat_id):
+        async with slots:
+            try:
+                member = await context.bot.get_chat_member(int(candidate_chat_id), user_id)
+            except Exception:
+                # Bot may have been removed from that chat since it was last
+                # seen, or the chat_id is stale/inaccessible - skip it rather
+                # than failing the whole lookup over one bad candidate.
+                return False
+            is_admin = member.status in ("administrator", "creator")
+            if not is_admin:
+                set_chat_admin(candidate_chat_id, user_id, False)
+            return is_admin
+
+    candidate_ids = list(indexed)
+    results = await asyncio.gather(*(_verify_indexed(cid) for cid in candidate_ids))
+
+    async def _display_name(candidate_chat_id):
+        display_name = indexed.get(candidate_chat_id)
+        if display_name:
+            return display_name
         try:
-            member = await context.bot.get_chat_member(int(candidate_chat_id), user_id)
-            if member.status in ("administrator", "creator"):
-                display_name = from_all_groups.get(candidate_chat_id)
-                if not display_name:
-                    try:
-                        chat_obj = await context.bot.get_chat(int(candidate_chat_id))
-                        display_name = chat_obj.title or chat_obj.username or candidate_chat_id
-                    except Exception:
-                        display_name = candidate_chat_id
-                admin_of.append((candidate_chat_id, display_name))
+            chat_obj = await context.bot.get_chat(int(candidate_chat_id))
+            return chat_obj.title or chat_obj.username or candidate_chat_id
         except Exception:
-            # Bot may have been removed from that chat since it was last
-            # seen, or the chat_id is stale/inaccessible - skip it rather
-            # than failing the whole lookup over one bad candidate.
-            continue
+            return candidate_chat_id
 
-    return admin_of
+    admin_chat_ids = [cid for cid, is_admin in zip(candidate_ids, results) if is_admin]
+    display_names = await asyncio.gather(*(_display_name(cid) for cid in admin_chat_ids))
+    return list(zip(admin_chat_ids, display_names))
 
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -0,0 +1,155 @@
+"""
+Event-loop lag watchdog - catches the synchronous code that stalls every
+chat at once.
+
+Everything the bot does runs on one asyncio loop, and a lot of it is
+still synchronous: sqlite3 calls, json.loads of going_data, regexes,
+keyboard building. While one of those runs, no other update, answer or
+edit makes progress - for ANY chat. That cost doesn't show up in handler
+latency (the slow handler is the one doing the blocking, not the ones
+waiting on it), so it's measured here directly:
+
+  - a heartbeat task sleeps LOOP_LAG_INTERVAL_MS at a time and records
+    how late each wake-up was - the loop's scheduling lag - into the
+    bot_event_loop_lag_seconds histogram (see metrics.py),
+  - a watchdog THREAD (it has to run while the loop can't) notices when
+    the heartbeat is more than LOOP_LAG_THRESHOLD_MS overdue and grabs
+    the loop thread's stack right then, while the blocking call is still
+    on it. The stack is logged once per stall, and the innermost frame
+    in this project's code (e.g. "event_engine._mention_link") is counted
+    in bot_event_loop_stalls_total - compare those counts before and
+    after an optimization to see which paths still block.
+
+Started from main._post_init (LOOP_LAG_THRESHOLD_MS=0 turns it off) and
+stopped from _post_stop. Costs one wake-up per interval on the loop and
+one on the thread - nothing per update.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+
+import metrics
+from config import logger
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+# Generic helpers a blocking call is made THROUGH - the code that matters
+# is whoever called them (the same idea as metrics.call_site).
+_HELPERS = ("connect", "get_connection", "__enter__", "__exit__")
+
+_state = {"watchdog": None}
+
+
+def _name(frame) -> tuple:
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}", frame.f_lineno
+
+
+def _culprit(frame) -> tuple:
+    """
+    ("module.function", line) of the innermost frame in this project's own
+    code. If the running callback has none - the loop is blocked in a
+    library (httpx, PTB, asyncio itself) - the innermost frame, whatever it is.
+    """
+    innermost = frame
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_ASYNCIO_DIR):
+            break  # out of the running callback and into the loop itself
+        if (filename.startswith(_PROJECT_DIR) and filename != __file__
+                and frame.f_code.co_name not in _HELPERS):
+            return _name(frame)
+        frame = frame.f_back
+    return _name(innermost)
+
+
+class LoopWatchdog:
+    """
+    The heartbeat task + watchdog thread for one loop (see module
+    docstring). `stalls` keeps the culprit of every stall seen, newest
+    last, for tests and ad-hoc debugging.
+    """
+
+    def __init__(self, threshold: float, interval: float):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_lag = 0.0
+        self.stalls = []
+        self._loop = None
+        self._loop_thread_id = None
+        self._beat = 0.0
+        self._reported_beat = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = self._loop.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event loop watchdog started (stack dump past {self.threshold * 1000:.0f}ms of lag).")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = self._loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, self._loop.time() - expected)
+            self._beat = time.monotonic()
+            self.max_lag = max(self.max_lag, lag)
+            metrics.observe("bot_event_loop_lag_seconds", lag)
+            if self._reported_beat is not None:
+                self._reported_beat = None
+                logger.warning(f"Event loop unblocked - the stall lasted {lag * 1000:.0f}ms in total.")
+
+    def _watch(self):
+        # check often enough to catch the blocking call while it's still running
+        period = max(min(self.threshold / 4, 0.05), 0.001)
+        while not self._stop.wait(period):
+            beat = self._beat
+            overdue = time.monotonic() - beat - self.interval
+            if overdue < self.threshold or self._reported_beat == beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            culprit, line = _culprit(frame)
+            stack = "".join(traceback.format_stack(frame))
+            del frame
+            self._reported_beat = beat
+            self.stalls.append(culprit)
+            metrics.inc("bot_event_loop_stalls_total", site=culprit)
+            logger.warning(
+                f"Event loop blocked for {overdue * 1000:.0f}ms so far, in {culprit} (line {line}). "
+                f"Stack of the loop thread:\n{stack}"
+            )
+
+
+async def start_loop_watchdog(threshold_ms: float, interval_ms: float) -> LoopWatchdog:
+    watchdog = LoopWatchdog(threshold_ms / 1000, interval_ms / 1000)
+    await watchdog.start()
+    _state["watchdog"] = watchdog
+    return watchdog
+
+
+async def stop_loop_watchdog():
+    watchdog, _state["watchdog"] = _state["watchdog"], None
+    if watchdog is not None:
+        await watchdog.stop()
@@ -7,9 +7,19 @@ from telegram.ext import (
     filters,
 )
 from telegram.request import HTTPXRequest
-from config import TELEGRAM_TOKEN, TELEGRAM_PROXY, BOT_VERSION, CONTROL_SHEET_ID, OWNER_USER_IDS, logger
-from db import init_db, track_user, register_chat_added, register_chat_removed, log_command_usage
-from hub_resolver import hub_pick_callback_handler, start_command, switchgroup_command
+from config import (
+    TELEGRAM_TOKEN, TELEGRAM_PROXY, TELEGRAM_API_BASE_URL, BOT_VERSION, CONTROL_SHEET_ID, OWNER_USER_IDS,
+    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET_TOKEN, WEBHOOK_MAX_CONNECTIONS,
+    METRICS_PORT, METRICS_LISTEN, TRACE_FILE, TRACE_MAX_MB, TRACE_BACKUPS, TRACE_MIN_MS,
+    LOOP_LAG_THRESHOLD_MS, LOOP_LAG_INTERVAL_MS, logger,
+)
+from db import (
+    init_db, track_user, register_chat_added, register_chat_removed, log_command_usage, set_chat_admin,
+)
+from hub_resolver import (
+    hub_pick_callback_handler, start_command, switchgroup_command, snapshot_chat_admins,
+    start_admin_snapshot_sweeper, stop_admin_snapshot_sweeper,
+)
 from handlers import (
     help_command, help_callback_handler, help_back_handler, upgrade_info_callback_handler, userid, chatid,
     newevent, editevent,
@@ -21,14 +31,22 @@ from handlers import (
     button_handler,
     global_text_router,
     stats_command,
+    resume_refresh_jobs, stop_refresh_jobs,
 )
 from subscription import (
     setsub, setsheet, status_command, allgroups_command, allgroups_page_callback_handler,
     allchannels_command, allchannels_page_callback_handler, updatefeature,
-    _push_control_sheet_main, _push_control_sheet_channels, _push_control_sheet_botconfig,
-    _push_control_sheet_chats_log,
+    push_control_sheet_tabs, request_control_sheet_sync,
 )
-from utils import now2ddmmyy
+from sheets import invalidate_spreadsheet
+from utils import now2ddmmyy, note_chat_member_status
+from update_processing import KeyedApplication, MAX_IN_FLIGHT_UPDATES
+from webhook import run_webhook
+from persistence import SQLitePersistence
+from background_tasks import spawn, drain_background_tasks
+import metrics
+import tracing
+from loop_watchdog import start_loop_watchdog, stop_loop_watchdog
 
 
 async def track_command_interaction(update, context):
@@ -107,6 +125,12 @@ async def on_chat_member_update(update, context):
     new_member = result.new_chat_member
     user       = new_member.user
 
+    # Promotions/demotions arrive here too - keeps is_real_admin's cache
+    # and the chat_admins index DM hub resolution reads current without
+    # waiting for either to expire.
+    note_chat_member_status(chat_id, user.id, new_member.status)
+    set_chat_admin(chat_id, user.id, new_member.status in ("administrator", "creator"))
+
     if new_member.status in ["member", "administrator", "creator", "restricted"]:
         # User joined or was added
         username = user.username or user.first_name or f"user{user.id}"
@@ -123,19 +147,16 @@ async def on_chat_member_update(update, context):
         # UserPresenceLog will be updated by sync_users_sheet when status changes to LEFT
 
 
-async def _sync_control_sheet_on_startup(application):
+async def _push_control_sheet_on_startup():
     """
-    Runs once after the bot finishes initializing. If CONTROL_SHEET_ID is
-    configured, pushes the current all_groups + all_channels + feature
-    matrix to the Control Sheet right away - otherwise the sheet would stay
-    empty until the first /setsub call.
+    Pushes all four Control Sheet tabs concurrently (see
+    subscription.push_control_sheet_tabs) and logs the outcome.
     """
-    if not CONTROL_SHEET_ID:
-        return
-    groups_ok    = await _push_control_sheet_main()
-    channels_ok  = await _push_control_sheet_channels()
-    subconfig_ok = await _push_control_sheet_botconfig()
-    chats_log_ok = await _push_control_sheet_chats_log()
+    results = await push_control_sheet_tabs(["main", "channels", "botconfig", "chats_log"])
+    groups_ok    = results.get("main", False)
+    channels_ok  = results.get("channels", False)
+    subconfig_ok = results.get("botconfig", False)
+    chats_log_ok = results.get("chats_log", False)
     if groups_ok and channels_ok and subconfig_ok and chats_log_ok:
         logger.info("Control Sheet synced at startup (GROUPS + CHANNELS + BOTCONFIG + chats_log).")
     else:
@@ -148,6 +169,53 @@ async def _sync_control_sheet_on_startup(application):
         )
 
 
+async def _sync_control_sheet_on_startup(application):
+    """
+    Runs once after the bot finishes initializing. If CONTROL_SHEET_ID is
+    configured, pushes the current all_groups + all_channels + feature
+    matrix to the Control Sheet right away - otherwise the sheet would stay
+    empty until the first /setsub call.
+
+    post_init runs BEFORE polling starts, so awaiting the pushes here would
+    hold back every update until four tabs' worth of Sheets round-trips
+    finished. Scheduled as a background task instead - the bot starts
+    answering clicks immediately, the Control Sheet catches up a few
+    seconds later.
+    """
+    if not CONTROL_SHEET_ID:
+        return
+    spawn("control_sheet", _push_control_sheet_on_startup())
+
+
+async def _post_init(application):
+    """Startup work that must not hold back the first update - each piece schedules itself in the background."""
+    await _sync_control_sheet_on_startup(application)
+    # /refreshusersall runs a restart cut short carry on from their checkpoints
+    await resume_refresh_jobs(application)
+    # keeps the chat_admins index DM hub resolution reads filled in
+    await start_admin_snapshot_sweeper(application)
+    if METRICS_PORT:
+        await metrics.start_metrics_server(METRICS_LISTEN, METRICS_PORT)
+    if LOOP_LAG_THRESHOLD_MS > 0:
+        await start_loop_watchdog(LOOP_LAG_THRESHOLD_MS, LOOP_LAG_INTERVAL_MS)
+
+
+async def _post_stop(application):
+    """
+    Runs after the last update has been handled, while the bot can still
+    talk to Telegram and Google (shutdown() closes those clients next).
+    Background /refreshusersall jobs are stopped outright - they resume
+    from their checkpoints next start; everything else in flight (view
+    re-renders, Sheets exports, a Control Sheet push) gets up to
+    BACKGROUND_DRAIN_SECONDS to finish before it's cancelled.
+    """
+    await stop_refresh_jobs(application)
+    await stop_admin_snapshot_sweeper()
+    await drain_background_tasks(application)
+    await stop_loop_watchdog()
+    await metrics.stop_metrics_server()
+
+
 async def on_my_chat_member_update(update, context):
     """
     Tracks the BOT'S OWN membership changes (added to / removed from a
@@ -156,9 +224,11 @@ async def on_my_chat_member_update(update, context):
     for OTHER users). Populates all_groups/all_channels the instant the bot
     joins a new chat (default type 'FREE' for groups), and moves that row
     into all_chats_bot_log with a removal timestamp the instant it's kicked
-    or leaves. Also pushes the Control Sheet's GROUPS/CHANNELS tabs right
-    away, so they never lag behind reality waiting for the next /setsub or
-    bot restart.
+    or leaves. A chat the bot joins also gets its admin list snapshotted
+    in the background (see hub_resolver.snapshot_chat_admins). Also pushes
+    the Control Sheet's GROUPS/CHANNELS tabs right away (a burst of changes
+    is coalesced into one trailing push per debounce window), so they never
+    lag behind reality waiting for the next /setsub or bot restart.
     """
     result = update.my_chat_member
     if not result:
@@ -181,8 +251,11 @@ async def on_my_chat_member_update(update, context):
         chat_type  = "channel" if chat.type == "channel" else "group"
         register_chat_added(chat_id, chat_name, chat_type, visibility, now2ddmmyy())
         logger.info(f"Bot added to {chat_type} {chat_id} ({chat_name}, {visibility})")
+        # Its admins can pick it from a DM right away, not after the next sweep
+        spawn("admin_snapshot", snapshot_chat_admins(context.bot, chat_id), key=chat_id)
     elif was_present and not is_present:
-        register_chat_removed(chat_id, now2ddmmyy())
+        removed_sheet_id = register_chat_removed(chat_id, now2ddmmyy())
+        invalidate_spreadsheet(removed_sheet_id)
         logger.info(f"Bot removed from chat {chat_id}")
     else:
         return  # neither an add nor a removal (e.g. restricted <-> member) - nothing to sync
@@ -190,24 +263,37 @@ async def on_my_chat_member_update(update, context):
     if not CONTROL_SHEET_ID:
         return
     try:
-        await _push_control_sheet_main()
-        await _push_control_sheet_channels()
-        await _push_control_sheet_chats_log()
+        # Debounced - a burst of adds/removes becomes one push per window
+        # (see subscription.request_control_sheet_sync).
+        await request_control_sheet_sync("main", "channels", "chats_log")
     except Exception as e:
         logger.error(f"Control Sheet sync after bot membership change failed: {e}")
 
 
-def main():
-    if not TELEGRAM_TOKEN:
-        logger.error("BOT_TOKEN is required in environment variables!")
-        return
+# The update types the bot asks Telegram for - identical in polling and
+# webhook mode. chat_member must be requested explicitly (Telegram leaves
+# it out by default), or on_chat_member_update never fires.
+ALLOWED_UPDATES = ["message", "callback_query", "chat_member", "my_chat_member"]
 
-    init_db()
 
+def build_application():
+    """
+    Builds the Application with every handler registered - everything
+    main() needs except actually running it, so the polling and webhook
+    modes (and scripts/bench_ingress.py) serve the exact same bot.
+    """
     proxy_kwargs = {}
     if TELEGRAM_PROXY:
         proxy_kwargs["proxy"] = TELEGRAM_PROXY
         logger.info("Using proxy for Telegram API requests.")
+    # With METRICS_PORT set, every Bot API call, handler and SQLite
+    # statement is timed (see metrics.py); with TRACE_FILE, each update's
+    # share of them is traced (see tracing.py). Neither - nothing is wrapped.
+    if METRICS_PORT:
+        metrics.enable()
+    if TRACE_FILE:
+        tracing.enable(TRACE_FILE, int(TRACE_MAX_MB * 1024 * 1024), TRACE_BACKUPS, TRACE_MIN_MS)
+    request_class = metrics.InstrumentedRequest if METRICS_PORT or TRACE_FILE else HTTPXRequest
 
     # Two SEPARATE HTTPXRequest instances, each with its own connection
     # pool - get_updates holds one connection open for a long time (long-
@@ -218,25 +304,43 @@ def main():
     # bot edits several child-chat messages concurrently via asyncio.gather
     # (see update_all_shared_views) - a too-small pool here causes exactly
     # "Pool timeout: All connections in the connection pool are occupied."
-    request = HTTPXRequest(
+    request = request_class(
         connect_timeout=20.0, read_timeout=20.0,
         connection_pool_size=16,
         **proxy_kwargs,
     )
-    get_updates_request = HTTPXRequest(
+    get_updates_request = request_class(
         connect_timeout=20.0, read_timeout=20.0,
         connection_pool_size=4,
         **proxy_kwargs,
     )
 
-    app = (
+    # Keyed concurrent processing (see update_processing.py): different
+    # events/chats are handled in parallel, each event's clicks and each
+    # chat's commands still one at a time, in order.
+    builder = (
         ApplicationBuilder()
+        .application_class(KeyedApplication)
+        .concurrent_updates(MAX_IN_FLIGHT_UPDATES)
         .token(TELEGRAM_TOKEN)
         .request(request)
         .get_updates_request(get_updates_request)
-        .post_init(_sync_control_sheet_on_startup)
-        .build()
+        # user_data/chat_data (DM hub selection etc.) survive restarts -
+        # written to SQLite in periodic batches, see persistence.py
+        .persistence(SQLitePersistence())
+        .post_init(_post_init)
+        # stops /refreshusersall jobs and drains other background work
+        # while the bot can still talk to Telegram - see _post_stop
+        .post_stop(_post_stop)
     )
+    if TELEGRAM_API_BASE_URL:
+        # A self-hosted Bot API server (or scripts/fake_bot_api.py)
+        builder = (
+            builder
+            .base_url(f"{TELEGRAM_API_BASE_URL.rstrip('/')}/bot")
+            .base_file_url(f"{TELEGRAM_API_BASE_URL.rstrip('/')}/file/bot")
+        )
+    app = builder.build()
 
     # 1. Inline button callbacks - pattern-specific handlers MUST be
     # registered before the catch-all button_handler. PTB checks handlers in
@@ -308,9 +412,36 @@ def main():
     # 5. Text message router (extra player input + @everyone)
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, global_text_router))
 
-    logger.info(f"Bot v{BOT_VERSION} started. Polling...")
+    if METRICS_PORT:
+        metrics.instrument_handlers(app)
+    if TRACE_FILE:
+        tracing.instrument_handlers(app)
+    return app
+
+
+def main():
+    if not TELEGRAM_TOKEN:
+        logger.error("BOT_TOKEN is required in environment variables!")
+        return
+
+    init_db()
+    app = build_application()
+
     logger.info(f"OWNER_USER_IDS configured: {OWNER_USER_IDS or '(empty - no owner-only commands will work)'}")
-    app.run_polling(allowed_updates=["message", "callback_query", "chat_member", "my_chat_member"])
+    if WEBHOOK_URL:
+        logger.info(f"Bot v{BOT_VERSION} started. Webhook mode ({WEBHOOK_URL})...")
+        run_webhook(
+            app,
+            webhook_url=WEBHOOK_URL,
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=ALLOWED_UPDATES,
+        )
+    else:
+        logger.info(f"Bot v{BOT_VERSION} started. Polling...")
+        app.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == "__main__":
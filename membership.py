@@ -0,0 +1,173 @@
+"""
+Bulk membership verification for /refreshusers and /refreshusersall.
+
+Both used to call getChatMember one tracked user at a time, in a plain
+for-loop, inside an open SQLite connection - a 3,000-member monitored
+channel took many minutes and held the DB handle for all of them. Here
+instead:
+
+  - up to MEMBER_CHECK_CONCURRENCY getChatMember calls are in flight at
+    once, paced bot-wide by a token bucket at MEMBER_CHECKS_PER_SECOND
+    (shared by every refresh running at the same time, so two hubs
+    refreshing together don't double the request rate Telegram sees), and
+    a 429's retry_after is honored before trying that user again;
+  - no DB connection is open while a Telegram call is awaited - results
+    are applied in batches of _WRITE_BATCH, each its own short
+    transaction (db.remove_tracked_users), as they come in.
+
+The caller decides what an unanswerable check (anything but a definite
+member/left answer) means: /refreshusers keeps that user, to avoid false
+removals; /refreshusersall drops them, as it always has.
+"""
+import asyncio
+import time
+
+from telegram.error import RetryAfter
+
+from config import logger, MEMBER_CHECK_CONCURRENCY, MEMBER_CHECKS_PER_SECOND
+from db import remove_tracked_users
+
+# Departures are deleted this many results at a time - one short
+# transaction per batch, never one per user, never one for the whole run.
+_WRITE_BATCH = 500
+# Times one user's check is retried after a 429 before it counts as
+# unanswerable.
+_MAX_RETRY_AFTER_ATTEMPTS = 3
+# Longest retry_after honored - past this, the check gives up instead of
+# stalling the whole refresh.
+_MAX_RETRY_AFTER_SECONDS = 60.0
+_DEPARTED_STATUSES = ("left", "kicked")
+
+
+class _RateBucket:
+    """
+    Token bucket, reservation-style (same idea as sheets._TokenBucket, per
+    second instead of per minute): take() never blocks, it returns how long
+    the caller must sleep before making its call. Never yielding inside
+    take() is what makes it safe without a lock on one asyncio loop.
+    """
+
+    def __init__(self, rate_per_second):
+        self.rate = max(float(rate_per_second), 0.1)
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+# The one bot-wide bucket, created on first use (and again if
+# MEMBER_CHECKS_PER_SECOND changes): {"bucket": _RateBucket}
+_limiter = {}
+
+
+def _bucket():
+    bucket = _limiter.get("bucket")
+    if bucket is None or bucket.rate != max(float(MEMBER_CHECKS_PER_SECOND), 0.1):
+        bucket = _RateBucket(MEMBER_CHECKS_PER_SECOND)
+        _limiter["bucket"] = bucket
+    return bucket
+
+
+async def _check_one(bot, chat_id, user_id):
+    """One user's getChatMember under the rate limit: ("present" | "left" | "error", ChatMember or exception)."""
+    attempt = 0
+    while True:
+        attempt += 1
+        delay = _bucket().take()
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            member = await bot.get_chat_member(chat_id=int(chat_id), user_id=int(user_id))
+        except RetryAfter as e:
+            retry_after = float(getattr(e, "retry_after", 1) or 1)
+            if attempt == _MAX_RETRY_AFTER_ATTEMPTS or retry_after > _MAX_RETRY_AFTER_SECONDS:
+                return "error", e
+            await asyncio.sleep(retry_after)
+            continue
+        except Exception as e:
+            return "error", e
+        return ("left" if member.status in _DEPARTED_STATUSES else "present"), member
+
+
+async def check_members(bot, chat_id, members, concurrency=None):
+    """
+    Async generator over getChatMember results for `members` - a list of
+    (username, user_id), user_id set - in batches of up to _WRITE_BATCH:
+    [((username, user_id), outcome, member_or_exception), ...] in
+    completion order. At most `concurrency` (MEMBER_CHECK_CONCURRENCY by
+    default) calls are in flight; stopping iteration early cancels the rest.
+    """
+    members = list(members)
+    if not members:
+        return
+    results = asyncio.Queue()
+    pending = iter(members)
+
+    async def worker():
+        # next() on the shared iterator never yields, so no two workers
+        # ever take the same member
+        for username, user_id in pending:
+            outcome, detail = await _check_one(bot, chat_id, user_id)
+            results.put_nowait(((username, user_id), outcome, detail))
+
+    workers = [
+        asyncio.create_task(worker())
+        for _ in range(min(concurrency or MEMBER_CHECK_CONCURRENCY, len(members)))
+    ]
+    try:
+        batch = []
+        for _ in range(len(members)):
+            batch.append(await results.get())
+            if len(batch) >= _WRITE_BATCH:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        for w in workers:
+            w.cancel()
+
+
+async def verify_tracked_members(bot, chat_id, members, remove_unverifiable=False, log_prefix="refreshusers"):
+    """
+    Checks every (username, user_id) in `members` against chat_id's live
+    membership and deletes the departed from main_group_users, a batch at
+    a time. Returns (removed usernames, present) - present as
+    (user_id, live username, first_name, last_name), the live username
+    being Telegram's current one so the Users sheet sync can see renames.
+    Both lists follow `members`' order, not the order checks finished in.
+
+    A check that couldn't be answered is logged, then either kept (with
+    the stored username, no names) or - remove_unverifiable - removed.
+    """
+    order = {username: i for i, (username, _) in enumerate(members)}
+    removed, present = [], []
+    async for batch in check_members(bot, chat_id, members):
+        departed = []
+        for (username, user_id), outcome, detail in batch:
+            if outcome == "left":
+                departed.append(username)
+            elif outcome == "present":
+                u = detail.user
+                live_username = getattr(u, "username", None) or getattr(u, "first_name", None) or username
+                present.append((order[username], (user_id, live_username, u.first_name, u.last_name)))
+            else:
+                logger.error(f"{log_prefix}: could not verify {username} (user_id={user_id}) in {chat_id}: {detail!r}")
+                if remove_unverifiable:
+                    departed.append(username)
+                else:
+                    present.append((order[username], (user_id, username, None, None)))
+        if departed:
+            remove_tracked_users(chat_id, departed)
+            removed.extend(departed)
+    removed.sort(key=order.get)
+    present.sort(key=lambda p: p[0])
+    return removed, [p for _, p in present]
@@ -0,0 +1,419 @@
+"""
+Built-in metrics, served in Prometheus text format - where the time goes
+in production, without attaching a profiler to the live bot.
+
+Set METRICS_PORT (see config.py) and GET /metrics on METRICS_LISTEN:
+METRICS_PORT returns:
+
+    bot_handler_seconds          histogram per handler (a command's name,
+                                 or the callback function's) and, for
+                                 button_handler, per action (going, add...)
+    bot_handler_errors_total     handler calls that raised
+    bot_sqlite_seconds           histogram per call site (the db.py / ...
+                                 function that opened the connection) and
+                                 op (execute, executemany, commit) - its
+                                 _count is the query count
+    bot_telegram_seconds         histogram per Bot API method and outcome
+                                 (ok, retry_after, bad_request, forbidden,
+                                 timeout, network_error, error)
+    bot_sheets_*_total           Sheets API calls, retries, failures and
+                                 time spent throttled, per spreadsheet
+                                 (sheets.get_throttle_stats)
+    bot_view_refresh_*           refresh requests vs. renders actually
+                                 run (schedule_view_refresh), and the share
+                                 of requests that never needed a render of
+                                 their own - counting the ones spawn()
+                                 already folded into a waiting task
+    bot_registry_entries         in-memory registry sizes - event_engine's
+                                 per-event locks/refresh state/click
+                                 buckets, sheets' _spreadsheet_cache
+    bot_background_tasks         background_tasks.task_stats() per class
+    bot_event_loop_lag_seconds   event loop scheduling lag, and the code
+    bot_event_loop_stalls_total  that was blocking it (loop_watchdog.py)
+
+prometheus_client isn't a dependency of this project, so this is a small
+registry of its own plus a one-route asyncio HTTP server (the same request
+parsing as webhook.py). Recording a sample is a perf_counter() call and a
+dict update; everything read from other modules' state (registry sizes,
+Sheets counters, task stats) is only collected when someone scrapes. With
+METRICS_PORT unset nothing is wrapped or timed at all - enable() is never
+called, db.connect() hands out plain sqlite3 connections, and
+inc()/observe() return straight away.
+"""
+import asyncio
+import bisect
+import functools
+import sqlite3
+import sys
+import time
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+from telegram.ext import CommandHandler
+from telegram.request import HTTPXRequest
+
+import tracing
+from config import logger
+
+METRICS_PATH = "/metrics"
+# Prometheus' own client defaults - 1ms to 10s covers everything from a
+# SQLite lookup to a Telegram call stuck behind flood control.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help). Only names listed here are ever rendered.
+METRICS = {
+    "bot_handler_seconds": ("histogram", "Time spent in one update handler call."),
+    "bot_handler_errors_total": ("counter", "Update handler calls that raised."),
+    "bot_sqlite_seconds": ("histogram", "SQLite statement/commit time, per call site."),
+    "bot_telegram_seconds": ("histogram", "Bot API call time, per method and outcome."),
+    "bot_view_refresh_requests_total": ("counter", "schedule_view_refresh calls."),
+    "bot_view_refresh_renders_total": ("counter", "update_all_shared_views passes schedule_view_refresh ran."),
+    "bot_view_refresh_coalescing_ratio": ("gauge", "Share of refresh requests folded into another render."),
+    "bot_sheets_calls_total": ("counter", "Sheets API calls, per spreadsheet."),
+    "bot_sheets_retries_total": ("counter", "Sheets API calls retried after a 429/5xx."),
+    "bot_sheets_failures_total": ("counter", "Sheets API calls that failed for good."),
+    "bot_sheets_throttled_seconds_total": ("counter", "Time Sheets calls waited on client-side pacing."),
+    "bot_registry_entries": ("gauge", "Entries in an in-memory per-event/per-sheet registry."),
+    "bot_background_tasks": ("gauge", "Background tasks per class and state (see background_tasks.py)."),
+    "bot_event_loop_lag_seconds": ("histogram", "How late the event loop ran a due wake-up."),
+    "bot_event_loop_stalls_total": ("counter", "Event loop stalls past LOOP_LAG_THRESHOLD_MS, per blocking frame."),
+}
+
+_state = {"enabled": False, "server": None}
+# (name, ((label, value), ...)) -> float
+_counters = {}
+# (name, ((label, value), ...)) -> [per-bucket counts (+Inf last), sum, count]
+_histograms = {}
+
+
+def enable():
+    """Turns recording on - build_application() calls this when METRICS_PORT is set."""
+    import db
+
+    _state["enabled"] = True
+    db._connection_factory["factory"] = TimedConnection
+
+
+def disable():
+    import db
+
+    _state["enabled"] = False
+    if not tracing.enabled():
+        db._connection_factory["factory"] = sqlite3.Connection
+
+
+def enabled() -> bool:
+    return _state["enabled"]
+
+
+def reset():
+    """Forgets every recorded sample (tests)."""
+    _counters.clear()
+    _histograms.clear()
+
+
+def inc(name: str, amount: float = 1, **labels):
+    if not _state["enabled"]:
+        return
+    key = (name, tuple(labels.items()))
+    _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name: str, seconds: float, **labels):
+    if not _state["enabled"]:
+        return
+    key = (name, tuple(labels.items()))
+    series = _histograms.get(key)
+    if series is None:
+        series = _histograms[key] = [[0] * (len(DEFAULT_BUCKETS) + 1), 0.0, 0]
+    series[0][bisect.bisect_left(DEFAULT_BUCKETS, seconds)] += 1
+    series[1] += seconds
+    series[2] += 1
+
+
+# ---------------------------------------------------------------------------
+# Handlers
+# ---------------------------------------------------------------------------
+
+def _callback_action(update) -> str:
+    """button_handler's action ("going", "add", ...) - the part before the first "_"."""
+    query = getattr(update, "callback_query", None)
+    data = getattr(query, "data", None) or ""
+    action = data.split(":", 1)[0].split("_", 1)[0]
+    # free-form callback data must not mint a new series per click
+    return action if action.isalpha() and len(action) <= 20 else "other"
+
+
+def _timed_callback(callback, name: str, by_action: bool):
+    @functools.wraps(callback)
+    async def timed(update, context):
+        action = _callback_action(update) if by_action else ""
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            inc("bot_handler_errors_total", handler=name, action=action)
+            raise
+        finally:
+            observe("bot_handler_seconds", time.perf_counter() - started, handler=name, action=action)
+    return timed
+
+
+def instrument_handlers(app):
+    """
+    Wraps the callback of every handler registered on `app` so each call
+    is timed into bot_handler_seconds. Run after the last add_handler().
+    """
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            if isinstance(handler, CommandHandler):
+                name = sorted(handler.commands)[0]
+            else:
+                name = getattr(handler.callback, "__name__", type(handler).__name__)
+            handler.callback = _timed_callback(handler.callback, name, by_action=name == "button_handler")
+
+
+# ---------------------------------------------------------------------------
+# Telegram
+# ---------------------------------------------------------------------------
+
+class InstrumentedRequest(HTTPXRequest):
+    """
+    HTTPXRequest that times every Bot API call by method and outcome -
+    into bot_telegram_seconds, and as a span when inside a trace (see
+    tracing.py).
+    """
+
+    async def post(self, url, *args, **kwargs):
+        method = url.rsplit("/", 1)[-1]
+        outcome = "ok"
+        started = time.perf_counter()
+        try:
+            return await super().post(url, *args, **kwargs)
+        except RetryAfter:
+            outcome = "retry_after"
+            raise
+        except BadRequest:
+            outcome = "bad_request"
+            raise
+        except Forbidden:
+            outcome = "forbidden"
+            raise
+        except TimedOut:
+            outcome = "timeout"
+            raise
+        except NetworkError:
+            outcome = "network_error"
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            observe("bot_telegram_seconds", elapsed, method=method, outcome=outcome)
+            if tracing.active():
+                request_data = args[0] if args else kwargs.get("request_data")
+                chat_id = getattr(request_data, "parameters", {}).get("chat_id")
+                tracing.add_span(f"telegram {method}", elapsed, outcome=outcome, chat_id=chat_id)
+
+
+# ---------------------------------------------------------------------------
+# SQLite
+# ---------------------------------------------------------------------------
+
+# Frames that open a connection on someone else's behalf - the call site
+# is whoever called them.
+_CONNECT_HELPERS = ("__init__", "connect", "get_connection", "__enter__")
+
+
+def call_site() -> str:
+    """"module.function" of the code that (through db.connect/get_connection) opened a connection."""
+    frame = sys._getframe(1)
+    while frame is not None and (frame.f_code.co_name in _CONNECT_HELPERS
+                                 or frame.f_code.co_filename.endswith("contextlib.py")):
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{frame.f_code.co_name}"
+
+
+def _timed(op):
+    def wrap(method):
+        @functools.wraps(method)
+        def timed(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                site = self.site if isinstance(self, TimedConnection) else self.connection.site
+                observe("bot_sqlite_seconds", elapsed, site=site, op=op)
+                if tracing.active():
+                    sql = " ".join(args[0].split())[:80] if args and isinstance(args[0], str) else None
+                    tracing.add_span(f"sqlite {op}", elapsed, site=site, sql=sql)
+        return timed
+    return wrap
+
+
+class TimedCursor(sqlite3.Cursor):
+    execute = _timed("execute")(sqlite3.Cursor.execute)
+    executemany = _timed("executemany")(sqlite3.Cursor.executemany)
+
+
+class TimedConnection(sqlite3.Connection):
+    """
+    sqlite3 connection factory (see db.connect) timing every statement and
+    commit into bot_sqlite_seconds - and a trace, if one is running - under
+    the connection's call site.
+    Connection.execute() makes its cursor in C, bypassing cursor(), so
+    both are wrapped.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.site = call_site()
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    execute = _timed("execute")(sqlite3.Connection.execute)
+    executemany = _timed("executemany")(sqlite3.Connection.executemany)
+    commit = _timed("commit")(sqlite3.Connection.commit)
+
+
+# ---------------------------------------------------------------------------
+# Scrape-time collectors
+# ---------------------------------------------------------------------------
+
+def _collect():
+    """(name, labels, value) for every gauge/counter read from other modules' state."""
+    # imported here: these modules import this one
+    import background_tasks
+    import event_engine
+    import sheets
+
+    samples = []
+    task_stats = background_tasks.task_stats()
+    # a refresh spawned while another for the same event was still waiting
+    # never reaches schedule_view_refresh at all - coalesced one step earlier
+    requests = (_counters.get(("bot_view_refresh_requests_total", ()), 0)
+                + task_stats.get("view_refresh", {}).get("coalesced", 0))
+    renders = _counters.get(("bot_view_refresh_renders_total", ()), 0)
+    if requests:
+        samples.append(("bot_view_refresh_coalescing_ratio", (), max(0.0, 1 - renders / requests)))
+
+    for sheet_id, stats in sheets.get_throttle_stats().items():
+        labels = (("sheet_id", sheet_id),)
+        samples.append(("bot_sheets_calls_total", labels, stats["calls"]))
+        samples.append(("bot_sheets_retries_total", labels, stats["retries"]))
+        samples.append(("bot_sheets_failures_total", labels, stats["failures"]))
+        samples.append(("bot_sheets_throttled_seconds_total", labels, stats["throttled_seconds"]))
+
+    for registry, size in event_engine.registry_sizes().items():
+        samples.append(("bot_registry_entries", (("registry", registry),), size))
+    samples.append(("bot_registry_entries", (("registry", "spreadsheet_cache"),), len(sheets._spreadsheet_cache)))
+
+    for task_class, stats in task_stats.items():
+        for state in ("in_flight", "waiting", "done", "failed", "coalesced"):
+            samples.append(("bot_background_tasks", (("class", task_class), ("state", state)), stats[state]))
+    return samples
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(name, labels, value, extra=()):
+    pairs = [f'{k}="{_escape(v)}"' for k, v in (*labels, *extra)]
+    return f"{name}{{{','.join(pairs)}}} {value}" if pairs else f"{name} {value}"
+
+
+def render() -> str:
+    """Every metric, in the Prometheus text exposition format (0.0.4)."""
+    by_name = {}
+    # snapshots - loop_watchdog's thread increments counters while this runs
+    for (name, labels), value in list(_counters.items()):
+        by_name.setdefault(name, []).append(_series(name, labels, value))
+    for name, labels, value in _collect():
+        by_name.setdefault(name, []).append(_series(name, labels, value))
+    for (name, labels), (buckets, total, count) in list(_histograms.items()):
+        lines = by_name.setdefault(name, [])
+        cumulative = 0
+        for bound, n in zip(DEFAULT_BUCKETS, buckets):
+            cumulative += n
+            lines.append(_series(f"{name}_bucket", labels, cumulative, (("le", repr(bound)),)))
+        lines.append(_series(f"{name}_bucket", labels, count, (("le", "+Inf"),)))
+        lines.append(_series(f"{name}_sum", labels, total))
+        lines.append(_series(f"{name}_count", labels, count))
+
+    out = []
+    for name, (kind, help_text) in METRICS.items():
+        if name in by_name:
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(by_name[name])
+    return "\n".join(out) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# HTTP endpoint
+# ---------------------------------------------------------------------------
+
+class MetricsServer:
+    """Answers GET /metrics, one request per connection; anything else is a 404."""
+
+    def __init__(self, listen: str, port: int):
+        self.listen = listen
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+        # port=0 means "any free port" - report the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Metrics server listening on {self.listen}:{self.port}{METRICS_PATH}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader, writer):
+        from webhook import _read_request
+
+        try:
+            request = await asyncio.wait_for(_read_request(reader), timeout=10.0)
+            if request is None or isinstance(request, int):
+                status, body = (request or 400), b""
+            elif request[1].split("?", 1)[0] != METRICS_PATH:
+                status, body = 404, b""
+            elif request[0] != "GET":
+                status, body = 405, b""
+            else:
+                status, body = 200, render().encode()
+            writer.write(
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Metrics request failed: {e!r}")
+        finally:
+            writer.close()
+
+
+async def start_metrics_server(listen: str, port: int) -> MetricsServer:
+    server = MetricsServer(listen, port)
+    await server.start()
+    _state["server"] = server
+    return server
+
+
+async def stop_metrics_server():
+    server, _state["server"] = _state["server"], None
+    if server is not None:
+        await server.stop()
@@ -0,0 +1,167 @@
+"""
+Keeps context.user_data / context.chat_data across restarts, in the bot's
+own SQLite database (tables persisted_user_data / persisted_chat_data).
+
+What lives there is small but annoying to lose on every deploy: the group
+a DM conversation is "stuck" to (selected_hub_chat_id) and a command
+waiting on the group picker (pending_hub_command) - see hub_resolver.py -
+and an admin halfway through adding an extra player
+(awaiting_extra_player_for, see handlers.handle_extra_player_input).
+
+PTB already tracks which users/chats were touched and hands them over in
+rounds, every update_interval seconds (PERSISTENCE_FLUSH_SECONDS) and
+once more at shutdown - never per update. On top of that, SQLitePersistence:
+
+  - writes each round in ONE transaction, and skips entries whose data is
+    the same as what's already stored - every click marks its user as
+    touched, but almost nobody's user_data actually changes;
+  - loads nothing at startup (get_user_data/get_chat_data return empty) -
+    a user's or chat's stored data is read the first time an update from
+    them arrives (refresh_user_data/refresh_chat_data), so startup cost
+    doesn't grow with the number of users the bot has ever seen.
+
+Values must be JSON-serializable (everything stored today is strings,
+lists and dicts); an entry that isn't is logged and skipped, not fatal.
+"""
+import asyncio
+import json
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from config import logger, PERSISTENCE_FLUSH_SECONDS
+from db import load_persisted_data, save_persisted_data
+
+
+class SQLitePersistence(BasePersistence):
+    def __init__(self, update_interval: float = None):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=True, callback_data=False),
+            update_interval=PERSISTENCE_FLUSH_SECONDS if update_interval is None else update_interval,
+        )
+        # Per kind ('user'/'chat'): key -> the JSON last read from or
+        # written to the DB ("{}" when nothing is stored). A key being
+        # here at all means it's been loaded already.
+        self._stored = {"user": {}, "chat": {}}
+        # Per kind: key -> JSON waiting to be written, or None to delete.
+        self._pending = {"user": {}, "chat": {}}
+        self._flush_task = None
+
+    # ── Loading (lazy) ────────────────────────────────────────────────────
+
+    async def get_user_data(self):
+        return {}
+
+    async def get_chat_data(self):
+        return {}
+
+    def _load_into(self, kind, key, data):
+        if key in self._stored[kind]:
+            return
+        stored = None
+        try:
+            stored = load_persisted_data(kind, key)
+        except Exception as e:
+            logger.error(f"Could not load persisted {kind}_data for {key}: {e}")
+        self._stored[kind][key] = stored or "{}"
+        if stored:
+            for name, value in json.loads(stored).items():
+                data.setdefault(name, value)
+
+    async def refresh_user_data(self, user_id, user_data):
+        self._load_into("user", user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        self._load_into("chat", chat_id, chat_data)
+
+    # ── Writing (coalesced) ───────────────────────────────────────────────
+
+    def _stage(self, kind, key, data):
+        try:
+            encoded = json.dumps(data, sort_keys=True)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Not persisting {kind}_data for {key}: {e}")
+            return
+        if self._pending[kind].get(key, self._stored[kind].get(key, "{}")) == encoded:
+            return
+        self._pending[kind][key] = encoded
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        # PTB hands over a round as a batch of update_*_data calls run
+        # together - the write waits until they've all staged their entry,
+        # then commits them in one go.
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        try:
+            await asyncio.sleep(0)
+        finally:
+            self._flush_task = None
+        self._write_pending()
+
+    def _write_pending(self):
+        for kind in ("user", "chat"):
+            pending = self._pending[kind]
+            if not pending:
+                continue
+            self._pending[kind] = {}
+            writes = {key: data for key, data in pending.items() if data is not None}
+            deletes = [key for key, data in pending.items() if data is None]
+            try:
+                save_persisted_data(kind, writes, deletes)
+            except Exception as e:
+                logger.error(f"Could not persist {len(pending)} {kind}_data entries: {e}")
+                # keep them for the next round, unless newer data was staged meanwhile
+                for key, data in pending.items():
+                    self._pending[kind].setdefault(key, data)
+                continue
+            for key, data in pending.items():
+                self._stored[kind][key] = data if data is not None else "{}"
+
+    async def update_user_data(self, user_id, data):
+        self._stage("user", user_id, data)
+
+    async def update_chat_data(self, chat_id, data):
+        self._stage("chat", chat_id, data)
+
+    async def drop_user_data(self, user_id):
+        self._pending["user"][user_id] = None
+        self._schedule_flush()
+
+    async def drop_chat_data(self, chat_id):
+        self._pending["chat"][chat_id] = None
+        self._schedule_flush()
+
+    async def flush(self):
+        """Shutdown: writes whatever is still staged, right now."""
+        task = self._flush_task
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._write_pending()
+
+    # ── Not stored ────────────────────────────────────────────────────────
+    # bot_data, callback_data and ConversationHandler states aren't used by
+    # this bot; store_data above tells PTB not to ask for them.
+
+    async def get_bot_data(self):
+        return {}
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_conversation(self, name, key, new_state):
+        pass
@@ -0,0 +1,245 @@
+"""
+Click-storm benchmark for button_handler and update_all_shared_views - no
+Telegram, no token, no network.
+
+One event in a hub, shared to --children child chats, and --users users
+spread across the hub and the children, all clicking at once: every user
+runs --clicks clicks, each a random Going / Not Going / +1 / -1 (seeded,
+so two runs click the same way), --think seconds apart on average. With
+--limit the event has a headcount cap, so Going/Not Going churn the
+waitlist and every freed spot promotes someone.
+
+The engine is the real one - button_handler against a throwaway SQLite
+file, the real view refresh coalescing and broadcast, the real background
+task supervisor. Only the Bot is a mock (tests/helpers.make_bot), every
+call answering after --latency seconds. Reported:
+
+  clicks_per_second       clicks handled / time until the last one returned
+  click_to_edit p50/p95/p99/max
+                          per click: from the click arriving until an edit
+                          of that click's chat's message that STARTED after
+                          the click was committed (so it shows the click)
+                          finished - what the clicker waits to see
+  clicks_without_edit     clicks no later edit of their chat covered
+  rejected_clicks         clicks answered by flood protection / dedupe
+  sqlite_connections      sqlite3.connect calls during the storm
+  telegram_calls          Bot API calls made, total and by method
+
+Run from the project root:
+    python3 scripts/bench_clicks.py
+    python3 scripts/bench_clicks.py --users 200 --children 10 --clicks 5 --limit 50 --latency 0.05 --json
+
+--json prints one object, for diffing runs of two versions.
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from unittest.mock import AsyncMock, MagicMock
+
+sys.path.insert(0, ".")
+import db  # noqa: E402
+import event_engine  # noqa: E402
+from background_tasks import drain_background_tasks  # noqa: E402
+from tests.helpers import make_bot, make_callback_update, make_context, make_user  # noqa: E402
+
+HUB = "-1001000000001"
+EVENT_ID = "benchclicks"
+ACTIONS = ("going", "notgoing", "add", "sub")
+
+
+def _child(j):
+    return str(-1003000000000 - j)
+
+
+def _seed(children, limit):
+    db.init_db(db_path=db.DB_PATH)
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.execute(
+        "INSERT INTO events (event_id, chat_id, message_id, name, going_icon, notgoing_icon, "
+        "event_status, going_data, notgoing_data, counters_data, kicked_data, total_limit) "
+        "VALUES (?, ?, '1', 'Bench Event', '✅', '❌', 0, '[]', '[]', '{}', '[]', ?)",
+        (EVENT_ID, HUB, limit),
+    )
+    conn.executemany(
+        "INSERT INTO event_shares (event_id, chat_id, message_id, share_mode, chat_type) "
+        "VALUES (?, ?, '1', '-visible', 'group')",
+        [(EVENT_ID, _child(j)) for j in range(children)],
+    )
+    conn.commit()
+    conn.close()
+
+
+class _Recorder:
+    """Counts Bot API calls and times every edit, per chat."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = Counter()
+        # chat_id -> ([edit start times], [edit finish times]), in start order
+        self.edits = {}
+
+    def wrap(self, bot, method, default, name=None):
+        async def call(*args, **kwargs):
+            self.calls[name or method] += 1
+            started = time.monotonic()
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if method == "edit_message_text":
+                starts, finishes = self.edits.setdefault(str(kwargs.get("chat_id")), ([], []))
+                starts.append(started)
+                finishes.append(time.monotonic())
+            return default
+        setattr(bot, method, AsyncMock(side_effect=call))
+
+    def first_edit_after(self, chat_id, committed_at):
+        starts, finishes = self.edits.get(str(chat_id), ([], []))
+        i = bisect.bisect_left(starts, committed_at)
+        return finishes[i] if i < len(finishes) else None
+
+
+def _make_bot(recorder):
+    bot = make_bot()
+    recorder.wrap(bot, "edit_message_text", None)
+    recorder.wrap(bot, "send_message", MagicMock(message_id=99))
+    recorder.wrap(bot, "get_chat", MagicMock(title="Bench Chat", type="group", username=None))
+    recorder.wrap(bot, "get_chat_member", MagicMock(status="member"))
+    recorder.wrap(bot, "get_chat_administrators", [])
+    return bot
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+async def _storm(args, recorder):
+    bot = _make_bot(recorder)
+    ctx = make_context(bot=bot)
+    rng = random.Random(args.seed)
+    chats = [HUB] + [_child(j) for j in range(args.children)]
+    plans = [
+        (make_user(user_id=10000 + u, username=f"user{u}"), chats[u % len(chats)],
+         [(rng.choice(ACTIONS), rng.expovariate(1 / args.think) if args.think else 0) for _ in range(args.clicks)])
+        for u in range(args.users)
+    ]
+    results = []  # (chat_id, arrived_at, committed_at, rejected)
+
+    async def user_clicks(user, chat_id, plan):
+        for action, pause in plan:
+            await asyncio.sleep(pause)
+            upd = make_callback_update(f"{action}_{EVENT_ID}", chat_id=int(chat_id), user=user)
+            recorder.wrap(upd.callback_query, "answer", True, name="answer_callback_query")
+            arrived = time.monotonic()
+            await event_engine.button_handler(upd, ctx)
+            rejected = any(c.kwargs.get("text") == event_engine.CLICK_RATE_LIMITED_TEXT
+                           for c in upd.callback_query.answer.await_args_list)
+            results.append((chat_id, arrived, time.monotonic(), rejected))
+
+    started = time.monotonic()
+    await asyncio.gather(*(user_clicks(*plan) for plan in plans))
+    clicks_done = time.monotonic()
+    await drain_background_tasks(timeout=args.drain)
+    settled = time.monotonic()
+    return results, started, clicks_done, settled
+
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="bench_clicks_")
+    db.DB_PATH = os.path.join(workdir, "bench.db")
+    _seed(args.children, args.limit)
+    if args.no_flood_limit:
+        event_engine.CLICK_BURST = 10 ** 9
+        event_engine.CLICK_DEDUPE_SECONDS = 0
+
+    connections = Counter()
+    real_connect = sqlite3.connect
+
+    def counting_connect(*a, **k):
+        connections["opened"] += 1
+        return real_connect(*a, **k)
+
+    recorder = _Recorder(args.latency)
+    sqlite3.connect = counting_connect
+    try:
+        results, started, clicks_done, settled = await _storm(args, recorder)
+    finally:
+        sqlite3.connect = real_connect
+
+    latencies, uncovered = [], 0
+    for chat_id, arrived, committed, rejected in results:
+        if rejected:
+            continue
+        finished = recorder.first_edit_after(chat_id, committed)
+        if finished is None:
+            uncovered += 1
+        else:
+            latencies.append(finished - arrived)
+    latencies.sort()
+    handled = len(results)
+    return {
+        "users": args.users,
+        "children": args.children,
+        "clicks": handled,
+        "limit": args.limit,
+        "latency_ms": _ms(args.latency),
+        "clicks_per_second": round(handled / max(clicks_done - started, 1e-9), 1),
+        "wall_seconds": round(settled - started, 3),
+        "click_to_edit_ms": {
+            "p50": _ms(_percentile(latencies, 0.50)),
+            "p95": _ms(_percentile(latencies, 0.95)),
+            "p99": _ms(_percentile(latencies, 0.99)),
+            "max": _ms(latencies[-1] if latencies else None),
+        },
+        "clicks_without_edit": uncovered,
+        "rejected_clicks": sum(1 for r in results if r[3]),
+        "sqlite_connections": connections["opened"],
+        "telegram_calls": sum(recorder.calls.values()),
+        "telegram_calls_by_method": dict(sorted(recorder.calls.items())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="concurrent clicking users")
+    parser.add_argument("--children", type=int, default=5, help="child chats the event is shared to")
+    parser.add_argument("--clicks", type=int, default=4, help="clicks per user")
+    parser.add_argument("--think", type=float, default=0.05, help="mean pause between a user's clicks, seconds")
+    parser.add_argument("--limit", type=int, default=None, help="event headcount limit (waitlist churn)")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake Telegram latency per call, seconds")
+    parser.add_argument("--drain", type=float, default=120.0, help="max seconds to wait for the last re-renders")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-flood-limit", action="store_true",
+                        help="disable per-user click rate limiting and double-tap dedupe")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    r = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(r, indent=2))
+        return
+    lat = r["click_to_edit_ms"]
+    print(f"{r['clicks']} clicks ({r['users']} users, {r['children']} child chats, limit={r['limit']}) "
+          f"at {r['latency_ms']}ms Telegram latency")
+    print(f"  {r['clicks_per_second']} clicks/s, settled in {r['wall_seconds']}s")
+    print(f"  click-to-edit p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms max={lat['max']}ms")
+    print(f"  clicks without a covering edit: {r['clicks_without_edit']}, rejected: {r['rejected_clicks']}")
+    print(f"  sqlite connections: {r['sqlite_connections']}, telegram calls: {r['telegram_calls']}")
+    for method, count in r["telegram_calls_by_method"].items():
+        print(f"    {method:<24} {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+End-to-end click storm: the REAL bot - main.main(), run_polling, PTB's own
+HTTPX client and connection pool, every handler, the post_stop drain -
+against the local fake Bot API in scripts/fake_bot_api.py, with Telegram's
+latency, per-chat flood control (429 retry_after) and "message is not
+modified" errors switched on. Unlike scripts/bench_clicks.py (mocked Bot),
+this measures serialization, the HTTP layer and what flood control does to
+the shared views.
+
+One event in a hub, shared to --children child chats. --users users spread
+over the hub and the children each click --clicks times (seeded random
+Going / Not Going / +1 / -1, --think seconds apart on average); the fake
+delivers the clicks through getUpdates while main.main() runs in the main
+thread, as in production. Once the bot has gone --settle seconds without
+calling anything, the driver sends it SIGINT - the same graceful stop a
+deploy does - and reports:
+
+  click_to_answer p50/p95/p99/max
+                        from the fake having the update until the bot's
+                        answerCallbackQuery for it arrives back
+  outcomes              Bot API calls per method and answer (ok/429/400)
+  chats_rate_limited    chats that got at least one 429
+  chats_stale           chats whose latest edit was refused (429) or came
+                        back before the storm's last click was answered -
+                        their post may not show the final state
+  peak_in_flight        most Bot API calls the bot had open at once
+
+Run from the project root:
+    python3 scripts/bench_e2e.py
+    python3 scripts/bench_e2e.py --users 200 --children 10 --latency 0.05 --jitter 0.05 --chat-rate 1 --json
+    python3 scripts/bench_e2e.py --db /tmp/synthetic.db        # a copy of it, see gen_synthetic_db.py
+
+--json prints one object, for diffing runs of two versions.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, ".")
+import db  # noqa: E402
+from scripts.fake_bot_api import FakeBotAPI  # noqa: E402
+
+HUB = "-1001000000001"
+EVENT_ID = "benche2e"
+ACTIONS = ("going", "notgoing", "add", "sub")
+ADMIN_ID = 4242
+
+
+def _child(j):
+    return str(-1003000000000 - j)
+
+
+def _seed(children, limit):
+    db.init_db(db_path=db.DB_PATH)
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.execute("DELETE FROM events WHERE event_id = ?", (EVENT_ID,))
+    conn.execute("DELETE FROM event_shares WHERE event_id = ?", (EVENT_ID,))
+    conn.execute(
+        "INSERT INTO events (event_id, chat_id, message_id, name, going_icon, notgoing_icon, "
+        "event_status, going_data, notgoing_data, counters_data, kicked_data, total_limit) "
+        "VALUES (?, ?, '1', 'E2E Bench', '✅', '❌', 0, '[]', '[]', '{}', '[]', ?)",
+        (EVENT_ID, HUB, limit),
+    )
+    conn.executemany(
+        "INSERT INTO event_shares (event_id, chat_id, message_id, share_mode, chat_type) "
+        "VALUES (?, ?, '1', '-visible', 'group')",
+        [(EVENT_ID, _child(j)) for j in range(children)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _click(n, user_id, chat_id, action):
+    return {"callback_query": {
+        "id": f"cq{n}",
+        "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"},
+        "chat_instance": chat_id,
+        "data": f"{action}_{EVENT_ID}",
+        "message": {"message_id": 1, "date": int(time.time()), "text": "E2E Bench",
+                    "chat": {"id": int(chat_id), "type": "supergroup", "title": f"Chat {chat_id}"}},
+    }}
+
+
+async def _storm(fake, args):
+    """Runs on the fake's loop: waits for the bot to poll, clicks, waits for quiet."""
+    await fake.wait_for_call("getUpdates", timeout=60)
+    rng = random.Random(args.seed)
+    chats = [HUB] + [_child(j) for j in range(args.children)]
+    injected = {}  # callback_query_id -> (chat_id, injected_at)
+    counter = iter(range(10 ** 9))
+
+    async def user_clicks(u):
+        user_id, chat_id = 5000 + u, chats[u % len(chats)]
+        for _ in range(args.clicks):
+            await asyncio.sleep(rng.expovariate(1 / args.think) if args.think else 0)
+            n = next(counter)
+            injected[f"cq{n}"] = (chat_id, time.monotonic())
+            fake.inject_update(_click(n, user_id, chat_id, rng.choice(ACTIONS)))
+
+    started = time.monotonic()
+    await asyncio.gather(*(user_clicks(u) for u in range(args.users)))
+    clicks_done = time.monotonic()
+    while True:
+        await asyncio.sleep(args.settle / 4)
+        last = max((ts for ts, m, _ in fake.calls if m != "getUpdates"), default=clicks_done)
+        if time.monotonic() - last >= args.settle:
+            break
+    return injected, started, clicks_done
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def _report(fake, args, injected, started, clicks_done, settled):
+    answered = {p.get("callback_query_id"): ts for ts, m, p in fake.calls if m == "answerCallbackQuery"}
+    latencies = sorted(answered[cq] - at for cq, (_, at) in injected.items() if cq in answered)
+    last_answer = max(answered.values(), default=clicks_done)
+
+    # a chat's post is current if its latest edit, answered after the last
+    # click was, went through - or was "not modified", i.e. already current
+    chats = [HUB] + [_child(j) for j in range(args.children)]
+    stale = []
+    for chat_id in chats:
+        at, outcome = fake.last_answer.get(("editMessageText", chat_id), (0, None))
+        if at < last_answer or outcome not in ("ok", "400"):
+            stale.append(chat_id)
+
+    outcomes = {}
+    for (method, outcome), count in sorted(fake.outcomes.items()):
+        outcomes.setdefault(method, {})[outcome] = count
+    return {
+        "users": args.users,
+        "children": args.children,
+        "clicks": len(injected),
+        "answered": len(latencies),
+        "limit": args.limit,
+        "latency_ms": _ms(args.latency),
+        "jitter_ms": _ms(args.jitter),
+        "chat_rate": args.chat_rate,
+        "clicks_per_second": round(len(injected) / max(clicks_done - started, 1e-9), 1),
+        "wall_seconds": round(settled - started, 3),
+        "click_to_answer_ms": {
+            "p50": _ms(_percentile(latencies, 0.50)),
+            "p95": _ms(_percentile(latencies, 0.95)),
+            "p99": _ms(_percentile(latencies, 0.99)),
+            "max": _ms(latencies[-1] if latencies else None),
+        },
+        "outcomes": outcomes,
+        "chats_rate_limited": sum(1 for c in chats if fake.retry_after.get(c)),
+        "chats_stale": len(stale),
+        "peak_in_flight": fake.peak_in_flight,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="concurrent clicking users")
+    parser.add_argument("--children", type=int, default=5, help="child chats the event is shared to")
+    parser.add_argument("--clicks", type=int, default=4, help="clicks per user")
+    parser.add_argument("--think", type=float, default=0.05, help="mean pause between a user's clicks, seconds")
+    parser.add_argument("--limit", type=int, default=None, help="event headcount limit (waitlist churn)")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake Telegram latency per call, seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="mean random extra latency, seconds")
+    parser.add_argument("--chat-rate", type=float, default=1.0,
+                        help="per-chat sends/edits per second before 429s (0 = no flood control)")
+    parser.add_argument("--chat-burst", type=int, default=3, help="per-chat burst allowed before the rate applies")
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds of bot silence that end the run")
+    parser.add_argument("--db", default=None, help="start from a copy of this database")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    db.DB_PATH = os.path.join(workdir, "bench.db")
+    if args.db:
+        shutil.copyfile(args.db, db.DB_PATH)
+    _seed(args.children, args.limit)
+
+    fake = FakeBotAPI(latency=args.latency, jitter=args.jitter, chat_rate=args.chat_rate or None,
+                      chat_burst=args.chat_burst, admins={HUB: [ADMIN_ID]}, seed=args.seed)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(fake.start(), loop).result()
+
+    # config reads these at import - set before main is imported; empty
+    # CONTROL_SHEET_ID/WEBHOOK_URL win over a .env that sets them
+    os.environ["BOT_TOKEN"] = "123456:BENCH"
+    os.environ["TELEGRAM_API_BASE_URL"] = fake.base_url
+    os.environ["WEBHOOK_URL"] = ""
+    os.environ["CONTROL_SHEET_ID"] = ""
+    import main as bot_main
+
+    result = {}
+
+    def drive():
+        try:
+            injected, started, clicks_done = asyncio.run_coroutine_threadsafe(_storm(fake, args), loop).result()
+            result.update(_report(fake, args, injected, started, clicks_done, time.monotonic()))
+        finally:
+            os.kill(os.getpid(), signal.SIGINT)  # run_polling's own graceful stop
+
+    driver = threading.Thread(target=drive, daemon=True)
+    driver.start()
+    bot_main.main()
+    driver.join()
+    asyncio.run_coroutine_threadsafe(fake.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    if not result:
+        print("the storm did not complete - see the log above")
+        return
+    lat = result["click_to_answer_ms"]
+    print(f"{result['clicks']} clicks ({result['users']} users, {result['children']} child chats, "
+          f"limit={result['limit']}), {result['answered']} answered")
+    print(f"  Telegram latency {result['latency_ms']}ms + ~{result['jitter_ms']}ms, "
+          f"flood control {result['chat_rate'] or 'off'}/s per chat")
+    print(f"  {result['clicks_per_second']} clicks/s, settled in {result['wall_seconds']}s")
+    print(f"  click-to-answer p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms max={lat['max']}ms")
+    print(f"  chats rate limited: {result['chats_rate_limited']}, stale at the end: {result['chats_stale']}, "
+          f"peak in-flight calls: {result['peak_in_flight']}")
+    for method, answers in result["outcomes"].items():
+        print(f"    {method:<24} " + "  ".join(f"{k}={v}" for k, v in answers.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmarks end-to-end click latency in polling vs webhook mode, against
+the local fake Bot API in scripts/fake_bot_api.py - no Telegram, no token.
+
+Both modes run the REAL bot: main.build_application() with every handler
+registered, PTB's own HTTP client talking to the fake over localhost, the
+real button_handler writing to a throwaway SQLite file. Only Telegram is
+faked. For each mode it injects --clicks Going clicks spread over --hubs
+hubs at --rate clicks/second and measures, per click, the time from the
+fake "Telegram" having the update to the bot's answerCallbackQuery for it
+arriving back - what a user perceives as the button's response time.
+
+Run from the project root:
+    python3 scripts/bench_ingress.py
+    python3 scripts/bench_ingress.py --clicks 500 --hubs 50 --rate 200 --latency 0.03 --json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, ".")
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+import db  # noqa: E402
+import main as bot_main  # noqa: E402
+from scripts.fake_bot_api import FakeBotAPI  # noqa: E402
+from webhook import serve_webhook  # noqa: E402
+
+WEBHOOK_PATH = "/tg-webhook"
+
+
+def _hub(h):
+    return str(-1002000000000 - h)
+
+
+def _seed(hubs):
+    db.init_db(db_path=db.DB_PATH)
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.execute("DELETE FROM events")
+    conn.execute("DELETE FROM action_log")
+    conn.executemany(
+        "INSERT INTO events (event_id, chat_id, message_id, name, going_icon, notgoing_icon, "
+        "event_status, going_data, notgoing_data, counters_data, kicked_data) "
+        "VALUES (?, ?, '1', ?, '✅', '❌', 0, '[]', '[]', '{}', '[]')",
+        [(f"bench{h}", _hub(h), f"Event {h}") for h in range(hubs)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _click(n, hubs):
+    h = n % hubs
+    return {"callback_query": {
+        "id": f"cq{n}",
+        "from": {"id": 5000 + n, "is_bot": False, "first_name": f"User{n}", "username": f"user{n}"},
+        "chat_instance": str(h),
+        "data": f"going_bench{h}",
+        "message": {"message_id": 1, "date": int(time.time()),
+                    "chat": {"id": int(_hub(h)), "type": "supergroup", "title": f"Hub {h}"}},
+    }}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _start_polling(app):
+    await app.initialize()
+    await app.updater.start_polling(poll_interval=0.0, timeout=10, allowed_updates=bot_main.ALLOWED_UPDATES)
+    await app.start()
+
+    async def stop():
+        await app.updater.stop()
+        await app.stop()
+        await app.shutdown()
+    return stop
+
+
+async def _start_webhook(app, fake):
+    stop_event = asyncio.Event()
+    port = _free_port()
+    task = asyncio.get_running_loop().create_task(serve_webhook(
+        app, stop_event, webhook_url=f"http://127.0.0.1:{port}{WEBHOOK_PATH}", listen="127.0.0.1", port=port,
+        max_connections=40, allowed_updates=bot_main.ALLOWED_UPDATES,
+    ))
+    while not (app.running and fake.webhook):
+        await asyncio.sleep(0.01)
+
+    async def stop():
+        stop_event.set()
+        await task
+    return stop
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+async def _run_mode(mode, args):
+    _seed(args.hubs)
+    fake = FakeBotAPI(latency=args.latency)
+    await fake.start()
+    bot_main.TELEGRAM_API_BASE_URL = fake.base_url
+    app = bot_main.build_application()
+    stop = await (_start_polling(app) if mode == "polling" else _start_webhook(app, fake))
+
+    injected = {}
+    started = time.monotonic()
+    for n in range(args.clicks):
+        injected[f"cq{n}"] = time.monotonic()
+        fake.inject_update(_click(n, args.hubs))
+        await asyncio.sleep(1.0 / args.rate)
+
+    latencies = []
+    for cq_id, t0 in injected.items():
+        answered_at, _ = await fake.wait_for_call(
+            "answerCallbackQuery", lambda p, cq_id=cq_id: p.get("callback_query_id") == cq_id, timeout=30,
+        )
+        latencies.append(answered_at - t0)
+    wall = time.monotonic() - started
+    await stop()
+    await fake.stop()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "clicks": args.clicks,
+        "wall_seconds": round(wall, 3),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+        "get_updates_calls": sum(1 for _, m, _ in fake.calls if m == "getUpdates"),
+    }
+
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="bench_ingress_")
+    db.DB_PATH = os.path.join(workdir, "bench.db")
+    bot_main.CONTROL_SHEET_ID = None  # no Control Sheet push from post_init
+    return [await _run_mode(mode, args) for mode in ("polling", "webhook")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clicks", type=int, default=200)
+    parser.add_argument("--hubs", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=100.0, help="clicks injected per second")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake Bot API latency per call, seconds")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(f"{r['mode']:<8} {r['clicks']} clicks in {r['wall_seconds']:.3f}s  "
+              f"p50={r['p50_ms']}ms p95={r['p95_ms']}ms p99={r['p99_ms']}ms max={r['max_ms']}ms  "
+              f"getUpdates={r['get_updates_calls']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Microbenchmarks for the pure-ish functions that run on every click or
+re-render - no Telegram, no token, no network.
+
+Each function is run against synthetic inputs of increasing size (--sizes,
+read as "participants" / "waitlist entries" / "tokens" depending on the
+function) and reported per call:
+
+  time        mean wall time of one call, over as many calls as fit in
+              --min-time seconds (at least --min-calls)
+  peak        the most memory one call had allocated at once (tracemalloc)
+  retained    memory still held after the call - normally just its result
+  growth      how time scaled from the previous size: 1.0 is linear, 2.0
+              quadratic. Anything past 1.2 is flagged as superlinear.
+
+Measured: escape_markdown, parse_event_args, parse_shareevent_args,
+parse_event_date, create_event_keyboard (open and verification mode),
+dedupe_waitlist, _render_waitlist_local, _render_waitlist_count and
+parse_going_list (update_all_shared_views' going_data split).
+_render_waitlist_local resolves display names, so it runs against a
+throwaway SQLite file seeded with one main_group_users row per user.
+
+Run from the project root:
+    python3 scripts/bench_micro.py
+    python3 scripts/bench_micro.py --sizes 10 100 1000 5000 --only waitlist --json
+
+--json prints one object, for diffing runs of two versions.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, ".")
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+import db  # noqa: E402
+from db import dedupe_waitlist  # noqa: E402
+from event_engine import _render_waitlist_count, _render_waitlist_local, parse_going_list  # noqa: E402
+from handlers import parse_event_args, parse_shareevent_args  # noqa: E402
+from keyboard import create_event_keyboard  # noqa: E402
+from utils import escape_markdown, parse_event_date  # noqa: E402
+
+CHAT = "-1001000000001"
+EVENT_ID = "benchmicro"
+SUPERLINEAR = 1.2
+
+
+def _seed_users(n):
+    db.init_db(db_path=db.DB_PATH)
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.executemany(
+        "INSERT OR IGNORE INTO main_group_users (chat_id, username, user_id, first_name, last_name) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [(CHAT, f"user{i}", str(10000 + i), f"First{i}", f"Last{i}") for i in range(n)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _going(n):
+    # every 10th entry predates user_id tracking and is a bare username
+    return [f"user{i}" if i % 10 == 9 else f"user{i} ({10000 + i})" for i in range(n)]
+
+
+def _waitlist(n):
+    # ~20% guest slots, ~10% stale duplicate person entries
+    entries = []
+    for i in range(n):
+        if i % 5 == 4:
+            owner = i // 2
+            entries.append({"user_id": str(10000 + owner), "username": f"user{owner}", "chat_id": CHAT,
+                            "is_guest": True, "timestamp": f"2026-01-01 00:00:{i % 60:02d}"})
+        else:
+            who = i - 1 if i % 10 == 3 else i
+            entries.append({"user_id": str(10000 + who), "username": f"user{who}", "chat_id": CHAT,
+                            "is_guest": False, "timestamp": f"2026-01-01 00:00:{i % 60:02d}"})
+    return entries
+
+
+def _verification_keyboard(n):
+    going = _going(n)
+    counters = {f"user{i}": 1 + i % 3 for i in range(0, n, 4)}
+    kicked = {f"user{i}" for i in range(n, n + n // 20)}
+    child_rows = [(f"child{i}", i % 2, "going" if i % 3 else "kicked") for i in range(n // 4)]
+    names = {f"user{i}": f"First{i} Last{i}" for i in range(n)}
+    return lambda: create_event_keyboard(
+        EVENT_ID, 1, "✅", "❌", going, counters,
+        child_users_rows=child_rows, kicked_users=kicked, display_names=names,
+    )
+
+
+def _escape_text(n):
+    text = " ".join(f"user_{i}.name (x{i})!" for i in range(n))
+    return lambda: escape_markdown(text)
+
+
+def _event_args(n):
+    args = [f"Word{i}" for i in range(n)] + ["-gi", "⚽", "-date", "14.07.2026", "19:00", "-limit", "20", "-wl", "visible"]
+    return lambda: parse_event_args(args)
+
+
+def _share_args(n):
+    args = ["-swl", "visible", "-clc", "off"] * max(1, n // 4) + ["-onlycount", "@myalias"]
+    return lambda: parse_shareevent_args(args)
+
+
+def _waitlist_local(n):
+    waitlist = _waitlist(n)
+    return lambda: _render_waitlist_local(waitlist, CHAT)
+
+
+def _dedupe(n):
+    waitlist = _waitlist(n)
+    return lambda: dedupe_waitlist(waitlist)
+
+
+def _going_split(n):
+    going = _going(n)
+    return lambda: parse_going_list(going)
+
+
+def _waitlist_count(n):
+    waitlist = _waitlist(n)
+    return lambda: _render_waitlist_count(waitlist)
+
+
+# name -> (make(n) -> zero-arg callable, sized?)
+CASES = {
+    "escape_markdown": (_escape_text, True),
+    "parse_event_args": (_event_args, True),
+    "parse_shareevent_args": (_share_args, True),
+    "parse_event_date": (lambda n: lambda: parse_event_date("14.07.2026 19:00"), False),
+    "create_event_keyboard[open]": (lambda n: lambda: create_event_keyboard(EVENT_ID, 0, "✅", "❌"), False),
+    "create_event_keyboard[verification]": (_verification_keyboard, True),
+    "dedupe_waitlist": (_dedupe, True),
+    "_render_waitlist_local": (_waitlist_local, True),
+    "_render_waitlist_count": (_waitlist_count, True),
+    "parse_going_list": (_going_split, True),
+}
+
+
+def _time_per_call(fn, min_time, min_calls):
+    fn()  # warm-up: first-call imports, regex compiles, sqlite page cache
+    calls, elapsed = 0, 0.0
+    batch = 1
+    gc.disable()
+    try:
+        while elapsed < min_time or calls < min_calls:
+            started = time.perf_counter()
+            for _ in range(batch):
+                fn()
+            elapsed += time.perf_counter() - started
+            calls += batch
+            batch = min(batch * 2, 10000)
+    finally:
+        gc.enable()
+    return elapsed / calls
+
+
+def _allocations(fn):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = fn()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak - before, after - before
+
+
+def _growth(prev, size, seconds):
+    if prev is None or prev[0] == size or prev[1] <= 0:
+        return None
+    return round(math.log(seconds / prev[1]) / math.log(size / prev[0]), 2)
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="bench_micro_")
+    db.DB_PATH = os.path.join(workdir, "bench.db")
+    _seed_users(max(args.sizes) + 1)
+
+    results = {}
+    for name, (make, sized) in CASES.items():
+        if args.only and not any(word in name for word in args.only):
+            continue
+        rows, prev = [], None
+        for size in (args.sizes if sized else [None]):
+            fn = make(size)
+            seconds = _time_per_call(fn, args.min_time, args.min_calls)
+            peak, retained = _allocations(fn)
+            growth = _growth(prev, size, seconds) if sized else None
+            rows.append({
+                "size": size,
+                "us_per_call": round(seconds * 1e6, 2),
+                "peak_bytes": peak,
+                "retained_bytes": retained,
+                "growth": growth,
+            })
+            prev = (size, seconds)
+        results[name] = rows
+    return {"sizes": args.sizes, "functions": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="input sizes to run every sized function at")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to spend timing each function/size")
+    parser.add_argument("--min-calls", type=int, default=5, help="fewest calls to time, however slow")
+    parser.add_argument("--only", nargs="+", default=None, help="run only functions whose name contains one of these")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+    args.sizes = sorted(set(args.sizes))
+
+    r = run(args)
+    if args.json:
+        print(json.dumps(r, indent=2))
+        return
+    print(f"{'function':<38}{'size':>7}{'per call':>13}{'peak':>11}{'retained':>11}{'growth':>8}")
+    for name, rows in r["functions"].items():
+        for row in rows:
+            growth = row["growth"]
+            flag = "  superlinear" if growth is not None and growth > SUPERLINEAR else ""
+            print(f"{name:<38}{row['size'] if row['size'] is not None else '-':>7}"
+                  f"{row['us_per_call']:>10.1f} us"
+                  f"{row['peak_bytes'] / 1024:>8.1f} KB{row['retained_bytes'] / 1024:>8.1f} KB"
+                  f"{growth if growth is not None else '':>8}{flag}")
+
+
+if __name__ == "__main__":
+    main()
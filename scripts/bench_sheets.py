@@ -0,0 +1,226 @@
+"""
+Benchmarks the Sheets pipeline against the offline stand-in in
+scripts/fake_sheets.py - no Google credentials, no quota spent. Drives the
+three flows that hit Sheets hardest, through the real handlers and the real
+scheduler in sheets.py:
+
+  save_close    - Save & Close on N events in one PRO hub (Events row
+                  update + EventUsers export + the click's Actions row)
+  refreshusers  - /refreshusers on a hub with U tracked members (Users tab
+                  diff, per-cell updates, appends)
+  control_sync  - a full four-tab Control Sheet push over G groups, then a
+                  one-row change (diff push), then a burst of B bot
+                  add/remove notifications (debounced)
+
+and reports, per scenario, wall time and how many API calls of each kind
+it took (plus 429s seen and time spent throttled by our own pacing).
+
+Run from the project root:
+    python3 scripts/bench_sheets.py
+    python3 scripts/bench_sheets.py --latency 0.1 --events 20 --global-rpm 600 --json
+
+Everything runs against a throwaway SQLite file in a temp directory - the
+real database.db is never touched.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+sys.path.insert(0, ".")
+import db  # noqa: E402
+import sheets  # noqa: E402
+import subscription  # noqa: E402
+from background_tasks import drain_background_tasks  # noqa: E402
+from scripts.fake_sheets import FakeSheetsBackend, install  # noqa: E402
+from tests.helpers import make_bot, make_callback_update, make_chat, make_context, make_update, make_user  # noqa: E402
+
+HUB = "-1001000000001"
+HUB_SHEET = "bench-hub-sheet"
+CONTROL_SHEET = "bench-control-sheet"
+
+_HUB_TABS = {
+    "Users": [["USER_ID", "FIRST_NAME", "LAST_NAME", "USER_NAME", "CHAT_ID", "STATUS",
+               "DATE_start", "DATE_end", "ARCHIVED_USER_NAME"]],
+    "Events": [["EVENT_ID", "EVENT_NAME", "CREATED_DATE", "CREATED_BY", "EVENT_DATE",
+                "CLOSED_AT", "STATUS", "GOING_COUNT"]],
+    "Actions": [["EVENT_ID", "ACTION", "USER_NAME", "USER_ID", "DATE", "CHAT_ID"]],
+    "EventUsers": [["EVENT_ID", "USER_ID"]],
+    "UserPresenceLog": [["USER_ID", "CHAT_ID", "DATE_start", "DATE_end"]],
+}
+_CONTROL_TABS = {"GROUPS": [], "CHANNELS": [], "chats_log": [], "BOTCONFIG": []}
+
+
+def _seed_hub(conn, members):
+    now = datetime.now()
+    conn.execute(
+        "INSERT INTO all_groups (chat_id, chat_name, type, sheet_id, sheet_name, subs_date_start, subs_date_end) "
+        "VALUES (?, 'Bench Hub', 'PRO', ?, 'Bench', ?, ?)",
+        (HUB, HUB_SHEET, now.strftime("%Y-%m-%d %H:%M:%S"),
+         (now + timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")),
+    )
+    conn.executemany(
+        "INSERT INTO main_group_users (chat_id, username, user_id, status, first_name, last_name) "
+        "VALUES (?, ?, ?, 'active', ?, 'Bench')",
+        [(HUB, f"user{i}", str(1000 + i), f"First{i}") for i in range(members)],
+    )
+
+
+async def _scenario_save_close(backend, events, going):
+    conn = sqlite3.connect(db.DB_PATH)
+    for n in range(events):
+        event_id = f"bench{n}"
+        going_list = [f"user{i} ({1000 + i})" for i in range(going)]
+        conn.execute(
+            "INSERT INTO events (event_id, chat_id, message_id, name, going_icon, notgoing_icon, "
+            "event_status, going_data, notgoing_data, counters_data, kicked_data) "
+            "VALUES (?, ?, '1', ?, '✅', '❌', 1, ?, '[]', '{}', '[]')",
+            (event_id, HUB, f"Event {n}", json.dumps(going_list)),
+        )
+        backend.tab(HUB_SHEET, "Events").append([event_id, f"Event {n}", "", "", "", "", "OPEN", ""])
+    conn.commit()
+    conn.close()
+
+    from handlers import button_handler
+    bot = make_bot()
+    admin = make_user(user_id=1, username="admin")
+    for n in range(events):
+        upd = make_callback_update(f"save_bench{n}", chat_id=int(HUB), user=admin)
+        await button_handler(upd, make_context(bot=bot))
+    # the EventUsers exports and view refreshes are part of what's measured
+    await drain_background_tasks(timeout=600)
+
+
+async def _scenario_refreshusers(backend, members):
+    from handlers import refreshusers
+
+    admin = make_user(user_id=1, username="admin")
+
+    async def get_chat_member(chat_id, user_id):
+        if user_id == admin.id:
+            return MagicMock(status="administrator")  # the /refreshusers admin check
+        user = MagicMock(username=f"user{user_id - 1000}", first_name=f"First{user_id - 1000}", last_name="Bench")
+        # every 10th member has left, so the run exercises LEFT transitions too
+        return MagicMock(status="left" if user_id % 10 == 0 else "member", user=user)
+
+    bot = make_bot()
+    bot.get_chat_member = AsyncMock(side_effect=get_chat_member)
+    upd = make_update(chat=make_chat(chat_id=int(HUB)), user=admin, text="/refreshusers")
+    await refreshusers(upd, make_context(bot=bot))
+
+
+async def _scenario_control_sync(groups, burst):
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.executemany(
+        "INSERT OR IGNORE INTO all_groups (chat_id, chat_name, type, visibility, date_bot_add) "
+        "VALUES (?, ?, 'FREE', 'private', '01.01.2026')",
+        [(str(-1002000000000 - i), f"Group {i}") for i in range(groups)],
+    )
+    conn.commit()
+    await subscription.push_control_sheet_tabs(["main", "channels", "botconfig", "chats_log"])
+
+    conn.execute("UPDATE all_groups SET chat_name = 'Renamed' WHERE chat_id = ?", (str(-1002000000000),))
+    conn.commit()
+    await subscription.push_control_sheet_tabs(["main"])
+
+    for i in range(burst):
+        conn.execute(
+            "INSERT INTO all_groups (chat_id, chat_name, type, visibility, date_bot_add) "
+            "VALUES (?, ?, 'FREE', 'private', '02.01.2026')",
+            (str(-1003000000000 - i), f"Burst {i}"),
+        )
+        conn.commit()
+        await subscription.request_control_sheet_sync("main", "channels", "chats_log")
+    conn.close()
+    trailing = subscription._control_sheet_trailing["task"]
+    if trailing is not None:
+        await trailing
+
+
+async def _measure(name, backend, coro):
+    backend.reset_counters()
+    sheets._throttle_stats.clear()
+    started = time.perf_counter()
+    await coro
+    wall = time.perf_counter() - started
+    stats = sheets.get_throttle_stats()
+    return {
+        "scenario": name,
+        "wall_seconds": round(wall, 3),
+        "api_calls": backend.total_calls,
+        "calls_by_method": dict(sorted(backend.call_counts.items())),
+        "http_429": backend.throttled,
+        "retries": sum(s["retries"] for s in stats.values()),
+        "throttled_seconds": round(sum(s["throttled_seconds"] for s in stats.values()), 3),
+    }
+
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="bench_sheets_")
+    db.DB_PATH = os.path.join(workdir, "bench.db")
+    db.init_db(db_path=db.DB_PATH)
+    conn = sqlite3.connect(db.DB_PATH)
+    _seed_hub(conn, args.members)
+    conn.commit()
+    conn.close()
+
+    if args.global_rpm:
+        sheets.SHEETS_GLOBAL_RPM = args.global_rpm
+    if args.per_sheet_rpm:
+        sheets.SHEETS_PER_SHEET_RPM = args.per_sheet_rpm
+    if args.in_flight:
+        sheets.SHEETS_MAX_IN_FLIGHT = args.in_flight
+    backend = FakeSheetsBackend(
+        latency=args.latency, quota_per_minute=args.quota, error_rate=args.error_rate, seed=args.seed,
+    )
+    backend.add_spreadsheet(HUB_SHEET, "Bench Hub", tabs=_HUB_TABS)
+    backend.add_spreadsheet(CONTROL_SHEET, "Bench Control", tabs=_CONTROL_TABS)
+    install(backend)
+    sheets.CONTROL_SHEET_ID = CONTROL_SHEET
+    subscription._CONTROL_SHEET_DEBOUNCE_SECONDS = args.debounce
+
+    results = [
+        await _measure("save_close", backend, _scenario_save_close(backend, args.events, args.going)),
+        await _measure("refreshusers", backend, _scenario_refreshusers(backend, args.members)),
+        await _measure("control_sync", backend, _scenario_control_sync(args.groups, args.burst)),
+    ]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake per-call latency, seconds")
+    parser.add_argument("--quota", type=int, default=None, help="fake rolling per-minute quota (429 above it)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of an injected 429 per call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--events", type=int, default=5, help="events to Save & Close")
+    parser.add_argument("--going", type=int, default=30, help="going users per event")
+    parser.add_argument("--members", type=int, default=50, help="tracked hub members for /refreshusers")
+    parser.add_argument("--groups", type=int, default=40, help="all_groups rows for the Control Sheet")
+    parser.add_argument("--burst", type=int, default=10, help="bot add notifications in the debounce burst")
+    parser.add_argument("--debounce", type=float, default=0.5, help="Control Sheet debounce window, seconds")
+    parser.add_argument("--global-rpm", type=int, default=None, help="override SHEETS_GLOBAL_RPM")
+    parser.add_argument("--per-sheet-rpm", type=int, default=None, help="override SHEETS_PER_SHEET_RPM")
+    parser.add_argument("--in-flight", type=int, default=None, help="override SHEETS_MAX_IN_FLIGHT")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(f"{r['scenario']:<14} {r['wall_seconds']:>8.3f}s  {r['api_calls']:>4} calls  "
+              f"429s={r['http_429']} retries={r['retries']} throttled={r['throttled_seconds']}s")
+        for method, count in r["calls_by_method"].items():
+            print(f"    {method:<16} {count}")
+
+
+if __name__ == "__main__":
+    main()
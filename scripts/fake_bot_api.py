@@ -0,0 +1,338 @@
+"""
+A local, in-process stand-in for the Telegram Bot API HTTP server - for
+running the REAL bot (main.build_application(), every handler, PTB's own
+HTTP client) end to end without Telegram, a token or a network.
+
+Point the bot at it with TELEGRAM_API_BASE_URL=<fake.base_url> (see
+config.py) and it answers the Bot API methods the bot calls, records every
+call with a timestamp, and delivers injected updates either through
+getUpdates long polling or - once the bot has called setWebhook - by
+POSTing them to the webhook, secret token header included, the way
+Telegram does.
+
+What it answers the way Telegram would, rather than with a plain "ok":
+
+  latency       every call (and webhook delivery) takes `latency` seconds,
+                plus an exponentially distributed extra with mean `jitter`
+                - most calls are quick, a few are slow
+  flood control with `chat_rate` set, sendMessage/editMessageText to one
+                chat are limited to that many per second (bursts of up to
+                `chat_burst`); past it the chat gets 429 with retry_after,
+                and keeps getting 429 until that time has passed
+  not modified  an editMessageText whose text and reply_markup are the
+                same as the message's current ones gets Telegram's 400
+                "message is not modified"
+  admins        getChatAdministrators / getChatMember answer from
+                `admins` ({chat_id: [user_id, ...]}, the first one is the
+                creator) - every other user is a plain member
+  chats         getChat answers from `chats` ({chat_id: {"type", "title"}})
+                where given, a supergroup "Chat <id>" otherwise
+
+`outcomes` counts calls per (method, "ok" / "429" / "400"), `retry_after`
+the 429s per chat, `last_answer` what the latest call of each method to
+each chat got and when, and `peak_in_flight` the most calls (getUpdates
+long polls aside) the bot had open at once - i.e. how much of its HTTP
+connection pool it actually used.
+
+Usage (inside a running event loop):
+    fake = FakeBotAPI(latency=0.02)   # simulated round trip per Bot API call
+    await fake.start()
+    os.environ["TELEGRAM_API_BASE_URL"] = fake.base_url
+    ...                                       # start the bot
+    fake.inject_update({"callback_query": {...}})   # update_id is filled in
+    await fake.wait_for_call("answerCallbackQuery", lambda p: p["callback_query_id"] == "42")
+    fake.calls                                # [(monotonic_ts, method, params), ...]
+    await fake.stop()
+
+scripts/bench_e2e.py drives click storms through it against main.main().
+"""
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from urllib.parse import parse_qsl
+
+import httpx
+
+BOT_USER = {"id": 777000, "is_bot": True, "first_name": "FakeBot", "username": "fake_event_bot",
+            "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+
+# Methods that post into a chat - what Telegram's per-chat flood control counts.
+FLOOD_CONTROLLED = ("sendMessage", "editMessageText")
+NOT_MODIFIED = ("Bad Request: message is not modified: specified new message content and reply markup "
+                "are exactly the same as a current content and reply markup of the message")
+
+
+class BotAPIError(Exception):
+    """An error answer: HTTP status = error_code, like the real Bot API."""
+
+    def __init__(self, error_code, description, retry_after=None):
+        super().__init__(description)
+        self.error_code = error_code
+        self.description = description
+        self.retry_after = retry_after
+
+
+class FakeBotAPI:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 chat_rate: float = None, chat_burst: int = 3, admins: dict = None, chats: dict = None,
+                 seed: int = 0):
+        self.host = host
+        self.port = port
+        self.latency = latency       # simulated one-way network delay: added to every method call
+                                     # and to every webhook delivery
+        self.jitter = jitter         # mean of the random extra on top of it
+        self.chat_rate = chat_rate   # per-chat sendMessage/editMessageText per second, None = unlimited
+        self.chat_burst = chat_burst
+        self.admins = {str(k): [int(u) for u in v] for k, v in (admins or {}).items()}
+        self.chats = {str(k): v for k, v in (chats or {}).items()}
+        self.calls = []
+        self.outcomes = Counter()    # (method, "ok"/"429"/"400") -> calls
+        self.retry_after = Counter()  # chat_id -> 429s sent to it
+        self.last_answer = {}        # (method, chat_id) -> (monotonic ts, "ok"/"429"/"400") of the latest
+        self.peak_in_flight = 0
+        self._in_flight = 0
+        self._rng = random.Random(seed)
+        self._buckets = {}           # chat_id -> [tokens, updated_at, flood_until]
+        self._messages = {}          # (chat_id, message_id) -> (text, reply_markup) as last set
+        self.webhook = None          # {"url":..., "secret_token":...} once setWebhook is called
+        self._updates = []           # pending for getUpdates
+        self._next_update_id = 1
+        self._new_update = asyncio.Event()
+        self._call_seen = asyncio.Event()
+        self._server = None
+        self._connections = set()
+        self._client = None
+        self._next_message_id = 1000
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._client = httpx.AsyncClient(timeout=10.0)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # keep-alive connections and long polls the client left open
+            for task in self._connections:
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+        if self._client is not None:
+            await self._client.aclose()
+
+    # ── Updates ────────────────────────────────────────────────────────────
+
+    def inject_update(self, update: dict) -> int:
+        """Queues one update (update_id assigned here); returns its update_id."""
+        update = dict(update, update_id=self._next_update_id)
+        self._next_update_id += 1
+        if self.webhook:
+            asyncio.get_running_loop().create_task(self._deliver(update))
+        else:
+            self._updates.append(update)
+            self._new_update.set()
+        return update["update_id"]
+
+    async def _deliver(self, update):
+        headers = {}
+        if self.webhook.get("secret_token"):
+            headers["X-Telegram-Bot-Api-Secret-Token"] = self.webhook["secret_token"]
+        await self._delay()
+        for _ in range(5):
+            try:
+                resp = await self._client.post(self.webhook["url"], json=update, headers=headers)
+                if resp.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.05)
+
+    async def wait_for_call(self, method: str, predicate=None, timeout: float = 10.0):
+        """Waits until a call to `method` (whose params satisfy `predicate`) has been recorded."""
+        deadline = time.monotonic() + timeout
+        while True:
+            for ts, m, params in self.calls:
+                if m == method and (predicate is None or predicate(params)):
+                    return ts, params
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"no {method} call within {timeout}s")
+            self._call_seen.clear()
+            try:
+                await asyncio.wait_for(self._call_seen.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _delay(self):
+        delay = self.latency + (self._rng.expovariate(1 / self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+
+    # ── Telegram's answers ─────────────────────────────────────────────────
+
+    def _check_flood(self, chat_id):
+        if self.chat_rate is None:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.setdefault(chat_id, [float(self.chat_burst), now, 0.0])
+        if now < bucket[2]:
+            retry_after = math.ceil(bucket[2] - now)
+        else:
+            bucket[0] = min(float(self.chat_burst), bucket[0] + (now - bucket[1]) * self.chat_rate)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return
+            retry_after = math.ceil((1 - bucket[0]) / self.chat_rate)
+            bucket[2] = now + retry_after
+        self.retry_after[chat_id] += 1
+        raise BotAPIError(429, f"Too Many Requests: retry after {retry_after}", retry_after=retry_after)
+
+    def _chat(self, chat_id):
+        return {"id": int(chat_id), "type": "supergroup", "title": f"Chat {chat_id}",
+                **self.chats.get(str(chat_id), {})}
+
+    def _member(self, chat_id, user_id):
+        user = {"id": int(user_id), "is_bot": False, "first_name": f"User{user_id}"}
+        admins = self.admins.get(str(chat_id), [])
+        if int(user_id) not in admins:
+            return {"status": "member", "user": user}
+        if admins[0] == int(user_id):
+            return {"status": "creator", "user": user, "is_anonymous": False}
+        return {"status": "administrator", "user": user, "can_be_edited": False, "is_anonymous": False,
+                "can_manage_chat": True, "can_delete_messages": True, "can_manage_video_chats": True,
+                "can_restrict_members": True, "can_promote_members": False, "can_change_info": True,
+                "can_invite_users": True, "can_pin_messages": True}
+
+    def _message(self, params):
+        chat_id = str(params.get("chat_id", 0))
+        message_id = params.get("message_id")
+        if message_id is None:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        content = (params.get("text", ""), json.dumps(params.get("reply_markup"), sort_keys=True))
+        if "message_id" in params and self._messages.get((chat_id, int(message_id))) == content:
+            raise BotAPIError(400, NOT_MODIFIED)
+        self._messages[(chat_id, int(message_id))] = content
+        return {"message_id": int(message_id), "date": int(time.time()), "chat": self._chat(chat_id),
+                "text": params.get("text", "")}
+
+    async def _method(self, method, params):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            offset = int(params.get("offset") or 0)
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            if not self._updates:
+                self._new_update.clear()
+                try:
+                    await asyncio.wait_for(self._new_update.wait(), timeout=float(params.get("timeout") or 0))
+                except asyncio.TimeoutError:
+                    pass
+            limit = int(params.get("limit") or 100)
+            return self._updates[:limit]
+        if method == "setWebhook":
+            self.webhook = {"url": params["url"], "secret_token": params.get("secret_token")}
+            pending, self._updates = self._updates, []
+            for update in pending:
+                asyncio.get_running_loop().create_task(self._deliver(update))
+            return True
+        if method == "deleteWebhook":
+            self.webhook = None
+            return True
+        if method in FLOOD_CONTROLLED:
+            self._check_flood(str(params.get("chat_id", 0)))
+            return self._message(params)
+        if method == "getChat":
+            return self._chat(params.get("chat_id", 0))
+        if method == "getChatMember":
+            return self._member(params.get("chat_id", 0), params.get("user_id", 0))
+        if method == "getChatAdministrators":
+            chat_id = str(params.get("chat_id", 0))
+            return [self._member(chat_id, user_id) for user_id in self.admins.get(chat_id, [])]
+        return True  # answerCallbackQuery, deleteMessage, pinChatMessage...
+
+    # ── HTTP plumbing ──────────────────────────────────────────────────────
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                body = await reader.readexactly(length) if length else b""
+
+                method = path.split("?", 1)[0].rsplit("/", 1)[-1]
+                params = _decode_params(headers.get("content-type", ""), body)
+                self.calls.append((time.monotonic(), method, params))
+                self._call_seen.set()
+                counted = method != "getUpdates"
+                if counted:
+                    self._in_flight += 1
+                    self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+                try:
+                    try:
+                        result = await self._method(method, params)
+                        status, answer = 200, {"ok": True, "result": result}
+                        self.outcomes[(method, "ok")] += 1
+                    except BotAPIError as e:
+                        status, answer = e.error_code, {"ok": False, "error_code": e.error_code,
+                                                        "description": e.description}
+                        if e.retry_after is not None:
+                            answer["parameters"] = {"retry_after": e.retry_after}
+                        self.outcomes[(method, str(e.error_code))] += 1
+                    # on the way back - so a long poll woken by a new update
+                    # pays it too, like a webhook delivery does
+                    await self._delay()
+                    if "chat_id" in params:
+                        self.last_answer[(method, str(params["chat_id"]))] = (
+                            time.monotonic(), "ok" if status == 200 else str(status))
+                finally:
+                    if counted:
+                        self._in_flight -= 1
+                payload = json.dumps(answer).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n".encode()
+                    + b"Content-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # client went away, or stop() cut a long poll short
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+
+def _decode_params(content_type, body):
+    """PTB posts form-encoded parameters whose values are JSON-encoded where they aren't plain strings."""
+    if not body:
+        return {}
+    if "json" in content_type:
+        return json.loads(body)
+    params = {}
+    for key, value in parse_qsl(body.decode(), keep_blank_values=True):
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
@@ -0,0 +1,322 @@
+"""
+An offline, in-memory stand-in for the Google Sheets/Drive API - for
+load-testing sheets.py (and everything that writes through it) without
+spending real quota or needing credentials at all.
+
+It fakes the API at the gspread level, NOT the gspread_asyncio level: the
+fake Client/Spreadsheet/Worksheet below replace what gspread.authorize()
+would return, and gspread_asyncio's own wrappers sit on top of them exactly
+as in production. So every call still goes through sheets.agcm's _call() -
+the token buckets, in-flight cap, retry/backoff and handle cache all run
+for real, and what a benchmark measures is what production would do.
+
+Implements what this codebase actually uses: open_by_key, worksheet
+(+ get_worksheet/sheet1), get_all_records, get_all_values, update,
+batch_update, batch_clear, append_row(s), acell/update_cell.
+
+Usage:
+    backend = FakeSheetsBackend(latency=0.05, quota_per_minute=60)
+    backend.add_spreadsheet("hub-sheet", "Hub", tabs={"Events": [[...header]]})
+    install(backend)     # swaps sheets.agcm for one backed by `backend`
+    ...                  # drive handlers / sheets.* as usual
+    backend.call_counts  # {"append_row": 12, "update": 3, ...}
+
+Knobs (all optional, all adjustable on the instance at any time):
+    latency           seconds every call blocks for (it runs in an executor
+                      thread, like a real HTTP round-trip would)
+    quota_per_minute  rolling-60s request budget across ALL spreadsheets
+                      (Google's per-user quota) - exceeding it raises 429
+    error_rate        probability (0..1) of a spurious 429 on any call
+    fail_next(n, status)  makes exactly the next n calls fail with `status`
+    seed              seeds the error_rate RNG, for reproducible runs
+"""
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+import gspread
+import gspread_asyncio
+from gspread.utils import a1_to_rowcol, numericise_all, rowcol_to_a1
+
+sys.path.insert(0, ".")
+import sheets  # noqa: E402
+
+
+class _FakeResponse:
+    """Just enough of requests.Response for gspread.exceptions.APIError,
+    and for the scheduler's status/Retry-After inspection."""
+
+    def __init__(self, status_code, message, retry_after=None):
+        self.status_code = status_code
+        self.text = message
+        self.headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+        self._message = message
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self._message, "status": "FAKE"}}
+
+
+def _api_error(status_code, message, retry_after=None):
+    return gspread.exceptions.APIError(_FakeResponse(status_code, message, retry_after))
+
+
+def _parse_range(range_name):
+    """
+    "B3" -> (3, 2, None, None); "A2:C4" -> (2, 1, 4, 3); "A5:Z" -> (5, 1,
+    None, 26) - open-ended rows, as used to trim Control Sheet tabs. Rows/
+    cols are 1-based; None means "to the end". A leading "'Tab'!" is
+    ignored.
+    """
+    if "!" in range_name:
+        range_name = range_name.split("!", 1)[1]
+    start, _, end = range_name.partition(":")
+    row1, col1 = a1_to_rowcol(start)
+    if not end:
+        return row1, col1, None, None
+    if end.isalpha():
+        _, col2 = a1_to_rowcol(f"{end}1")
+        return row1, col1, None, col2
+    row2, col2 = a1_to_rowcol(end)
+    return row1, col1, row2, col2
+
+
+class FakeSheetsBackend:
+    """All fake spreadsheets' data, plus the knobs and counters shared by
+    every fake object created from it. Thread-safe - calls arrive from the
+    default executor's threads."""
+
+    def __init__(self, latency=0.0, quota_per_minute=None, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.quota_per_minute = quota_per_minute
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent_calls = deque()
+        self.spreadsheets = {}  # key -> {"title": str, "tabs": {title: [[str]]}}
+        self.call_counts = Counter()
+        self.throttled = 0  # 429s raised (quota + injected)
+        self._forced_errors = deque()
+
+    def add_spreadsheet(self, key, title="Fake Sheet", tabs=None):
+        with self._lock:
+            self.spreadsheets[key] = {
+                "title": title,
+                "tabs": {name: [list(map(str, row)) for row in rows] for name, rows in (tabs or {}).items()},
+            }
+
+    def fail_next(self, count=1, status=429):
+        """Makes the next `count` calls (of any kind) fail with `status` -
+        deterministic error injection, e.g. for a 5xx blip or a 403."""
+        with self._lock:
+            self._forced_errors.extend([status] * count)
+
+    def tab(self, key, title):
+        """The raw rows of one tab - for assertions/reports."""
+        return self.spreadsheets[key]["tabs"][title]
+
+    @property
+    def total_calls(self):
+        return sum(self.call_counts.values())
+
+    def reset_counters(self):
+        with self._lock:
+            self.call_counts.clear()
+            self.throttled = 0
+
+    def _request(self, method):
+        """Accounts for one API request: latency, then 429 injection and
+        quota. Called at the top of every fake API method."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.call_counts[method] += 1
+            now = time.monotonic()
+            while self._recent_calls and now - self._recent_calls[0] > 60:
+                self._recent_calls.popleft()
+            if self._forced_errors:
+                status = self._forced_errors.popleft()
+                if status == 429:
+                    self.throttled += 1
+                raise _api_error(status, f"Injected: HTTP {status} (fake)")
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.throttled += 1
+                raise _api_error(429, "Injected: Quota exceeded (fake)")
+            if self.quota_per_minute is not None and len(self._recent_calls) >= self.quota_per_minute:
+                self.throttled += 1
+                retry_after = max(1, int(60 - (now - self._recent_calls[0])) + 1)
+                raise _api_error(429, "Quota exceeded for quota metric 'Requests' (fake)", retry_after)
+            self._recent_calls.append(now)
+
+
+class FakeClient:
+    """Stands in for gspread.Client."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def open_by_key(self, key):
+        self.backend._request("open_by_key")
+        if key not in self.backend.spreadsheets:
+            raise gspread.exceptions.SpreadsheetNotFound(key)
+        return FakeSpreadsheet(self.backend, key)
+
+
+class FakeSpreadsheet(gspread.Spreadsheet):
+    """Stands in for gspread.Spreadsheet - subclassed (without running its
+    network-fetching __init__) so sheets._sheet_id_of_call recognizes it."""
+
+    def __init__(self, backend, key):
+        self.backend = backend
+        self.client = None
+        self._properties = {"id": key, "title": backend.spreadsheets[key]["title"]}
+
+    def _tab_titles(self):
+        return list(self.backend.spreadsheets[self.id]["tabs"])
+
+    def worksheet(self, title):
+        self.backend._request("worksheet")
+        if title not in self.backend.spreadsheets[self.id]["tabs"]:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return FakeWorksheet(self, title, self._tab_titles().index(title))
+
+    def get_worksheet(self, index):
+        self.backend._request("get_worksheet")
+        titles = self._tab_titles()
+        if index >= len(titles):
+            return None
+        return FakeWorksheet(self, titles[index], index)
+
+    @property
+    def sheet1(self):
+        return self.get_worksheet(0)
+
+
+class FakeWorksheet(gspread.Worksheet):
+    """Stands in for gspread.Worksheet. Values are stored as strings, like
+    the formatted values the real API returns."""
+
+    def __init__(self, spreadsheet, title, index):
+        self.spreadsheet = spreadsheet
+        self.client = None
+        self.backend = spreadsheet.backend
+        self._properties = {"sheetId": index, "title": title, "index": index}
+
+    @property
+    def _rows(self):
+        return self.backend.spreadsheets[self.spreadsheet.id]["tabs"][self.title]
+
+    def _write(self, row, col, values):
+        rows = self._rows
+        for r_offset, values_row in enumerate(values):
+            r = row - 1 + r_offset
+            while len(rows) <= r:
+                rows.append([])
+            target = rows[r]
+            for c_offset, value in enumerate(values_row):
+                c = col - 1 + c_offset
+                while len(target) <= c:
+                    target.append("")
+                target[c] = "" if value is None else str(value)
+
+    def _last_row(self):
+        rows = self._rows
+        n = len(rows)
+        while n and not any(rows[n - 1]):
+            n -= 1
+        return n
+
+    def get_all_values(self, **kwargs):
+        self.backend._request("get_all_values")
+        rows = self._rows[: self._last_row()]
+        width = max((len(r) for r in rows), default=0)
+        return [r + [""] * (width - len(r)) for r in rows]
+
+    def get_all_records(self, empty2zero=False, head=1, default_blank="", **kwargs):
+        self.backend._request("get_all_records")
+        rows = self._rows[: self._last_row()]
+        if len(rows) < head:
+            return []
+        keys = rows[head - 1]
+        records = []
+        for row in rows[head:]:
+            padded = row + [""] * (len(keys) - len(row))
+            values = numericise_all(padded[: len(keys)], empty2zero=empty2zero, default_blank=default_blank)
+            records.append(dict(zip(keys, values)))
+        return records
+
+    def update(self, range_name, values=None, **kwargs):
+        self.backend._request("update")
+        row, col, _, _ = _parse_range(range_name)
+        with self.backend._lock:
+            self._write(row, col, values or [])
+        return {"updatedRange": range_name}
+
+    def batch_update(self, data, **kwargs):
+        self.backend._request("batch_update")
+        with self.backend._lock:
+            for item in data:
+                row, col, _, _ = _parse_range(item["range"])
+                self._write(row, col, item["values"])
+        return {"totalUpdatedRanges": len(data)}
+
+    def batch_clear(self, ranges):
+        self.backend._request("batch_clear")
+        with self.backend._lock:
+            rows = self._rows
+            for range_name in ranges:
+                row1, col1, row2, col2 = _parse_range(range_name)
+                last = len(rows) if row2 is None else min(row2, len(rows))
+                for r in range(row1 - 1, last):
+                    end = len(rows[r]) if col2 is None else min(col2, len(rows[r]))
+                    for c in range(col1 - 1, end):
+                        rows[r][c] = ""
+        return {"clearedRanges": list(ranges)}
+
+    def append_row(self, values, **kwargs):
+        self.backend._request("append_row")
+        with self.backend._lock:
+            self._write(self._last_row() + 1, 1, [values])
+        return {"updates": {"updatedRows": 1}}
+
+    def append_rows(self, values, **kwargs):
+        self.backend._request("append_rows")
+        with self.backend._lock:
+            self._write(self._last_row() + 1, 1, values)
+        return {"updates": {"updatedRows": len(values)}}
+
+    def acell(self, label, **kwargs):
+        self.backend._request("acell")
+        row, col = a1_to_rowcol(label)
+        rows = self._rows
+        value = rows[row - 1][col - 1] if row <= len(rows) and col <= len(rows[row - 1]) else ""
+        return gspread.Cell(row, col, value)
+
+    def update_cell(self, row, col, value):
+        self.backend._request("update_cell")
+        with self.backend._lock:
+            self._write(row, col, [[value]])
+        return {"updatedRange": rowcol_to_a1(row, col)}
+
+
+class FakeClientManager(sheets._SheetsClientManager):
+    """The real scheduler (pacing, retries, cache busting), authorizing
+    against a FakeSheetsBackend instead of Google."""
+
+    def __init__(self, backend, **kwargs):
+        super().__init__(lambda: None, **kwargs)
+        self.backend = backend
+
+    async def _authorize(self):
+        if self.auth_time is None:
+            self.auth_time = time.monotonic()
+            self._agc_cache = {self.auth_time: gspread_asyncio.AsyncioGspreadClient(self, FakeClient(self.backend))}
+        return self._agc_cache[self.auth_time]
+
+
+def install(backend):
+    """Routes all of sheets.py through `backend`. Returns the manager."""
+    manager = FakeClientManager(backend)
+    sheets.set_client_manager(manager)
+    return manager
@@ -0,0 +1,361 @@
+"""
+Generates a production-shaped SQLite database for load testing - the real
+schema (db.init_db), filled with synthetic but realistic data:
+
+  all_groups          --hubs hubs, a mix of tiers / Sheet-bound / export modes
+  main_group_users    a roster per hub (--roster members on average, drawn
+                      from a shared pool of --people users, so the same
+                      person sits in several hubs), plus smaller rosters
+                      for child groups
+  chat_admins         2-4 admins per hub, with a snapshot row
+  sub_chats           aliased / monitored child groups and channels per hub
+                      (--subchats on average), all_channels for the channels
+  events              --events events, spread over the hubs with a long
+                      tail (a few busy hubs hold most of them): real
+                      going/notgoing/counters/kicked JSON, -limit events
+                      with waitlists (person and guest slots), every status
+  event_shares        each event shared to --shares of its hub's child
+                      chats on average, with event_users rows for the
+                      group shares
+  action_log          one row per click that would have produced that state
+  command_log         --commands rows (millions is fine - streamed)
+
+Everything is drawn from one random.Random(--seed): the same arguments
+always give the same database, row for row, so benchmark runs against it
+are comparable between versions.
+
+Run from the project root:
+    python3 scripts/gen_synthetic_db.py --out /tmp/synthetic.db
+    python3 scripts/gen_synthetic_db.py --out /tmp/big.db --hubs 5000 --events 50000 --commands 3000000 --seed 7
+
+The output file must not exist yet (--force replaces it). To run the bot
+or a benchmark against it, set db.DB_PATH to a copy of it - they write.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, ".")
+import db  # noqa: E402
+
+# Fixed, not now() - the same seed must give the same rows tomorrow.
+EPOCH = datetime(2025, 1, 1)
+SPAN_DAYS = 540
+
+FIRST_NAMES = ["Alex", "Sam", "Maria", "Ivan", "Olga", "John", "Ana", "Luca", "Noah", "Mia", "Yuki", "Omar"]
+LAST_NAMES = ["Smith", "Ivanova", "Rossi", "Garcia", "Kim", "Novak", "Silva", None, None]
+EVENT_NAMES = ["Football", "Volleyball", "5-a-side", "Basketball", "Padel", "Board games", "Run club", "Futsal"]
+COMMANDS = [
+    ("newevent", 30), ("editevent", 8), ("shareevent", 10), ("listusers", 6), ("waitlist", 5),
+    ("refreshusers", 3), ("help", 12), ("start", 6), ("notify", 4), ("setalias", 2), ("adduser", 3),
+]
+ACTIONS_PER_STATUS = {2: 80, -1: 5, 0: 12, 1: 3}
+VISIBILITIES = ("visible", "hidden", "onlycount")
+
+
+def _hub_id(h):
+    return str(-1001000000000 - h)
+
+
+def _child_id(c):
+    return str(-1002000000000 - c)
+
+
+def _ts(moment, fmt="%Y-%m-%d %H:%M:%S"):
+    return moment.strftime(fmt)
+
+
+def _ts_ms(moment):
+    return moment.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+class _Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.counts = {}
+        self.rosters = {}      # hub chat_id -> [user_id, ...]
+        self.children = {}     # hub chat_id -> [(child chat_id, chat_type), ...]
+        self.child_rosters = {}  # child chat_id -> [user_id, ...]
+        self.admins = {}       # hub chat_id -> [user_id, ...]
+        self.hub_weights = []
+
+    def _insert(self, cursor, table, columns, rows):
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        before = cursor.connection.total_changes
+        cursor.executemany(sql, rows)
+        self.counts[table] = self.counts.get(table, 0) + cursor.connection.total_changes - before
+
+    def _moment(self):
+        return EPOCH + timedelta(seconds=self.rng.randrange(SPAN_DAYS * 86400))
+
+    # ── Chats and people ──────────────────────────────────────────────────
+
+    def hubs(self, cursor):
+        rng, args = self.rng, self.args
+        rows, users, admins, snapshots = [], [], [], []
+        for h in range(args.hubs):
+            chat_id = _hub_id(h)
+            tier = rng.choices(("FREE", "PRO", "ADMIN"), (70, 28, 2))[0]
+            has_sheet = tier != "FREE" or rng.random() < 0.3
+            added = self._moment()
+            rows.append((
+                chat_id, f"Hub {h}", tier,
+                f"synthetic-sheet-{h}" if has_sheet else None,
+                f"Hub {h} sheet" if has_sheet else None,
+                _ts(added, "%d.%m.%Y") if tier != "FREE" else None,
+                _ts(added + timedelta(days=365), "%d.%m.%Y") if tier != "FREE" else None,
+                rng.choice(("public", "private")),
+                _ts_ms(added),
+                rng.choices(("live", "deferred"), (80, 20))[0],
+            ))
+            size = max(3, min(args.people, int(rng.lognormvariate(0, 0.8) * args.roster)))
+            roster = rng.sample(range(args.people), size)
+            self.rosters[chat_id] = roster
+            self.hub_weights.append(rng.paretovariate(1.2))
+            users.extend(self._roster_rows(chat_id, roster))
+            hub_admins = roster[:rng.randint(2, 4)]
+            self.admins[chat_id] = hub_admins
+            admins.extend((str(10 ** 8 + uid), chat_id, _ts(added)) for uid in hub_admins)
+            snapshots.append((chat_id, added.timestamp()))
+        self._insert(cursor, "all_groups", (
+            "chat_id", "chat_name", "type", "sheet_id", "sheet_name", "subs_date_start",
+            "subs_date_end", "visibility", "date_bot_add", "sheet_export_mode"), rows)
+        self._insert(cursor, "main_group_users",
+                     ("chat_id", "username", "user_id", "status", "first_name", "last_name"), users)
+        self._insert(cursor, "chat_admins", ("user_id", "chat_id", "updated_at"), admins)
+        self._insert(cursor, "chat_admin_snapshots", ("chat_id", "taken_at"), snapshots)
+
+    def _roster_rows(self, chat_id, roster):
+        rng = self.rng
+        for uid in roster:
+            first = FIRST_NAMES[uid % len(FIRST_NAMES)]
+            last = LAST_NAMES[uid % len(LAST_NAMES)]
+            yield (chat_id, f"user{uid}", str(10 ** 8 + uid),
+                   "left" if rng.random() < 0.05 else "active", first, last)
+
+    def sub_chats(self, cursor):
+        rng, args = self.rng, self.args
+        subs, channels, users = [], [], []
+        c = 0
+        for h in range(args.hubs):
+            hub = _hub_id(h)
+            children = []
+            for _ in range(int(rng.expovariate(1 / args.subchats)) if args.subchats else 0):
+                child, c = _child_id(c), c + 1
+                chat_type = rng.choices(("group", "channel"), (75, 25))[0]
+                children.append((child, chat_type))
+                subs.append((child, hub, f"alias{len(children)}" if rng.random() < 0.7 else None,
+                             int(rng.random() < 0.6), chat_type, f"Child {c}"))
+                if chat_type == "channel":
+                    channels.append((child, f"Child {c}", "public", _ts_ms(self._moment())))
+                else:
+                    hub_roster = self.rosters[hub]
+                    roster = rng.sample(hub_roster, max(1, len(hub_roster) // 3)) + \
+                        rng.sample(range(args.people), max(1, len(hub_roster) // 4))
+                    roster = list(dict.fromkeys(roster))
+                    self.child_rosters[child] = roster
+                    users.extend(self._roster_rows(child, roster))
+            self.children[hub] = children
+        self._insert(cursor, "sub_chats",
+                     ("chat_id", "owner_chat_id", "alias", "is_monitored", "chat_type", "chat_name"), subs)
+        self._insert(cursor, "all_channels", ("chat_id", "chat_name", "visibility", "date_bot_add"), channels)
+        self._insert(cursor, "main_group_users",
+                     ("chat_id", "username", "user_id", "status", "first_name", "last_name"), users)
+
+    # ── Events ────────────────────────────────────────────────────────────
+
+    def events(self, cursor):
+        rng, args = self.rng, self.args
+        hubs = [_hub_id(h) for h in range(args.hubs)]
+        owners = rng.choices(hubs, self.hub_weights, k=args.events)
+        seen_ids = set()
+        events, shares, event_users, actions = [], [], [], []
+        for hub in owners:
+            event_id = f"{rng.getrandbits(32):08x}"
+            while event_id in seen_ids:
+                event_id = f"{rng.getrandbits(32):08x}"
+            seen_ids.add(event_id)
+            created = self._moment()
+            row, clicks = self._event(event_id, hub, created)
+            events.append(row)
+            actions.extend(clicks)
+            for child, chat_type in self._shared_to(hub):
+                shares.append((event_id, child, str(rng.randint(2, 10 ** 6)),
+                               rng.choices(("-onlycount", "-visible", "-hidden"), (60, 30, 10))[0], chat_type,
+                               rng.choice((None, None) + VISIBILITIES), rng.choice((None, None) + VISIBILITIES),
+                               rng.choice((None, None, "on", "off"))))
+                if chat_type == "group":
+                    for user_row, click in self._child_participants(event_id, child, created):
+                        event_users.append(user_row)
+                        actions.append(click)
+        self._insert(cursor, "events", (
+            "event_id", "chat_id", "message_id", "name", "going_icon", "notgoing_icon", "event_status",
+            "going_data", "notgoing_data", "counters_data", "event_date", "kicked_data", "feature_snapshot",
+            "total_limit", "waitlist_data", "waitlist_open", "waitlist_visibility", "notgoing_visibility",
+            "clickability", "created_by_user_id"), events)
+        self._insert(cursor, "event_shares", (
+            "event_id", "chat_id", "message_id", "share_mode", "chat_type", "share_notgoing_visibility",
+            "share_waitlist_visibility", "share_clickability"), shares)
+        self._insert(cursor, "event_users", ("event_id", "chat_id", "user_id", "username", "status", "guests"),
+                     event_users)
+        actions.sort(key=lambda a: a[5])
+        self._insert(cursor, "action_log", ("event_id", "chat_id", "user_id", "username", "action", "ts",
+                                            "sheet_pending"), actions)
+
+    def _event(self, event_id, hub, created):
+        rng = self.rng
+        status = rng.choices(list(ACTIONS_PER_STATUS), list(ACTIONS_PER_STATUS.values()))[0]
+        roster = self.rosters[hub]
+        total_limit = rng.randint(8, 40) if rng.random() < 0.3 else None
+        wanted = min(len(roster), max(1, int(rng.lognormvariate(2.5, 0.6))))
+        people = rng.sample(roster, min(len(roster), wanted + rng.randint(0, 6)))
+        going_ids, notgoing_ids = people[:wanted], people[wanted:]
+
+        overflow = []
+        if total_limit is not None:
+            overflow, going_ids = going_ids[total_limit:], going_ids[:total_limit]
+        counters = {f"user{uid}": rng.randint(1, 3) for uid in going_ids if rng.random() < 0.25}
+        waitlist = []
+        if overflow:
+            for n, uid in enumerate(overflow):
+                waitlist.append({"chat_id": hub, "chat_name": "Hub", "username": f"user{uid}",
+                                 "user_id": str(10 ** 8 + uid),
+                                 "timestamp": _ts(created + timedelta(minutes=n + 1))})
+            if counters:
+                owner = next(iter(counters))
+                waitlist.append({"chat_id": hub, "chat_name": "Hub", "username": owner,
+                                 "user_id": str(10 ** 8 + int(owner[4:])), "is_guest": True,
+                                 "timestamp": _ts(created + timedelta(minutes=len(overflow) + 1))})
+        going = [f"user{uid}" if rng.random() < 0.05 else f"user{uid} ({10 ** 8 + uid})" for uid in going_ids]
+        kicked = []
+        if status == 2 and going_ids and rng.random() < 0.05:
+            kicked = [f"user{uid}" for uid in going_ids[-rng.randint(1, min(2, len(going_ids))):]]
+
+        clicks = []
+        for n, uid in enumerate(people):
+            action = "GOING" if uid in going_ids or any(w["user_id"] == str(10 ** 8 + uid) for w in waitlist) \
+                else "NOT_GOING"
+            clicks.append((event_id, hub, str(10 ** 8 + uid), f"user{uid}", action,
+                           _ts_ms(created + timedelta(seconds=30 * n + rng.randrange(30))),
+                           0))
+        event_date = created + timedelta(days=rng.randint(1, 14))
+        row = (
+            event_id, hub, str(rng.randint(2, 10 ** 6)), f"{rng.choice(EVENT_NAMES)} #{rng.randint(1, 999)}",
+            "✅", "❌", status,
+            json.dumps(going), json.dumps([f"user{uid}" for uid in notgoing_ids]), json.dumps(counters),
+            _ts(event_date.replace(hour=rng.randint(8, 21), minute=0), "%d.%m.%Y %H:%M")
+            if rng.random() < 0.7 else None,
+            json.dumps(kicked),
+            json.dumps({"verification": rng.random() < 0.8, "add_extra_member": rng.random() < 0.6}),
+            total_limit,
+            json.dumps(waitlist),
+            int(bool(waitlist)),
+            rng.choices(VISIBILITIES, (30, 50, 20))[0] if total_limit else "hidden",
+            rng.choices(VISIBILITIES, (70, 15, 15))[0],
+            rng.choices(("on", "off"), (90, 10))[0],
+            str(10 ** 8 + rng.choice(self.admins[hub])),
+        )
+        return row, clicks
+
+    def _shared_to(self, hub):
+        children = self.children[hub]
+        if not children or not self.args.shares:
+            return []
+        k = min(len(children), int(self.rng.expovariate(1 / self.args.shares) + 0.5))
+        return self.rng.sample(children, k)
+
+    def _child_participants(self, event_id, child, created):
+        rng = self.rng
+        roster = self.child_rosters.get(child, [])
+        for n, uid in enumerate(rng.sample(roster, min(len(roster), int(rng.lognormvariate(1.2, 0.7))))):
+            status = rng.choices(("going", "notgoing", "kicked"), (75, 22, 3))[0]
+            guests = rng.randint(1, 2) if status == "going" and rng.random() < 0.15 else 0
+            yield ((event_id, child, str(10 ** 8 + uid), f"user{uid}", status, guests),
+                   (event_id, child, str(10 ** 8 + uid), f"user{uid}",
+                    "GOING" if status != "notgoing" else "NOT_GOING",
+                    _ts_ms(created + timedelta(seconds=45 * n + rng.randrange(45))), 0))
+
+    # ── Command log ───────────────────────────────────────────────────────
+
+    def command_log(self, cursor):
+        rng, args = self.rng, self.args
+        hubs = [_hub_id(h) for h in range(args.hubs)]
+        names = [c for c, _ in COMMANDS]
+        # cumulative once, not per row - choices() re-sums plain weights every call
+        command_cum = list(accumulate(w for _, w in COMMANDS))
+        hub_cum = list(accumulate(self.hub_weights))
+        step = SPAN_DAYS * 86400 / max(1, args.commands)
+
+        def rows():
+            moment = EPOCH
+            for _ in range(args.commands):
+                moment += timedelta(seconds=rng.expovariate(1 / step))
+                hub = rng.choices(hubs, cum_weights=hub_cum)[0]
+                command = rng.choices(names, cum_weights=command_cum)[0]
+                uid = rng.choice(self.rosters[hub])
+                text = f"/{command} {rng.choice(EVENT_NAMES)} -limit 20" if command == "newevent" else f"/{command}"
+                yield (hub, str(10 ** 8 + uid), command, text, moment.strftime("%d.%m.%Y %H:%M:%S.%f")[:-3])
+
+        self._insert(cursor, "command_log", ("chat_id", "user_id", "command", "command_text", "timestamp"), rows())
+
+
+def generate(args) -> dict:
+    """Builds args.out from scratch; returns {table: rows inserted}."""
+    db.init_db(db_path=args.out)
+    gen = _Generator(args)
+    conn = sqlite3.connect(args.out)
+    try:
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA journal_mode = MEMORY")
+        cursor = conn.cursor()
+        gen.hubs(cursor)
+        gen.sub_chats(cursor)
+        gen.events(cursor)
+        gen.command_log(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+    return dict(sorted(gen.counts.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="database file to create")
+    parser.add_argument("--force", action="store_true", help="replace --out if it already exists")
+    parser.add_argument("--hubs", type=int, default=2000, help="hub groups (all_groups rows)")
+    parser.add_argument("--people", type=int, default=200000, help="distinct users across every chat")
+    parser.add_argument("--roster", type=int, default=150, help="mean members per hub")
+    parser.add_argument("--subchats", type=float, default=3, help="mean child chats per hub")
+    parser.add_argument("--events", type=int, default=20000, help="events across all hubs")
+    parser.add_argument("--shares", type=float, default=1.5, help="mean child chats each event is shared to")
+    parser.add_argument("--commands", type=int, default=1000000, help="command_log rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print row counts as JSON")
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        if not args.force:
+            parser.error(f"{args.out} already exists (use --force to replace it)")
+        os.remove(args.out)
+
+    started = time.monotonic()
+    counts = generate(args)
+    elapsed = time.monotonic() - started
+    if args.json:
+        print(json.dumps({"out": args.out, "seed": args.seed, "seconds": round(elapsed, 1), "rows": counts},
+                         indent=2))
+        return
+    print(f"{args.out}: generated in {elapsed:.1f}s (seed {args.seed}), {os.path.getsize(args.out) / 2 ** 20:.1f} MB")
+    for table, rows in counts.items():
+        print(f"  {table:<22} {rows:>10}")
+
+
+if __name__ == "__main__":
+    main()
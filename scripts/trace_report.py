@@ -0,0 +1,132 @@
+"""
+Prints the slowest traces from TRACE_FILE (see tracing.py) as waterfalls -
+every span on its own line, indented under its parent, with its offset
+from the start of the trace, its duration and a bar showing where in the
+trace it ran:
+
+    trace 1  1394.3ms  handler button_handler  chat_id=-1003000000002 data=notgoing_ev1
+          +0.0ms      36.5ms  handler button_handler                      |#                                       |  chat_id=...
+          +0.2ms      31.6ms    telegram answerCallbackQuery              |#                                       |  outcome=ok
+         +37.0ms     342.6ms    event_engine.update_all_shared_views      | ##########                             |
+         +37.9ms      39.8ms      telegram getChat                        | #                                      |  outcome=ok chat_id=...
+        +158.3ms      49.0ms      telegram editMessageText                |    #                                   |  outcome=ok chat_id=...
+        ...
+
+A trace's lines are merged by trace_id first - a view refresh that ran
+after its click's handler returned is written as a line of its own (see
+tracing.py) but belongs to the same waterfall. Rotated files (traces.jsonl.1,
+.2, ...) can be passed alongside the current one.
+
+Run from the project root:
+    python3 scripts/trace_report.py traces.jsonl
+    python3 scripts/trace_report.py traces.jsonl traces.jsonl.1 --top 5 --name button_handler
+    python3 scripts/trace_report.py traces.jsonl --min-span-ms 1 --json
+
+--json prints the selected traces, merged, instead of drawing them.
+"""
+import argparse
+import json
+import sys
+
+BAR_WIDTH = 40
+
+
+def load_traces(paths):
+    """trace_id -> every span written for it, across all files."""
+    traces = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash or a rotation
+                traces.setdefault(record["trace_id"], []).extend(record["spans"])
+    return traces
+
+
+def _extent(spans):
+    start = min(s["start"] for s in spans)
+    end = max(s["start"] + s["ms"] / 1000 for s in spans)
+    return start, end
+
+
+def slowest(traces, top, name=None):
+    """The `top` longest traces - optionally only those with a root span containing `name`."""
+    picked = []
+    for trace_id, spans in traces.items():
+        if name and not any(s["parent"] is None and name in s["name"] for s in spans):
+            continue
+        start, end = _extent(spans)
+        picked.append((end - start, trace_id, spans))
+    picked.sort(key=lambda t: t[0], reverse=True)
+    return picked[:top]
+
+
+def _attrs(span):
+    return " ".join(f"{k}={v}" for k, v in (span.get("attrs") or {}).items() if v is not None)
+
+
+def waterfall(trace_id, spans, min_span_ms=0.0):
+    """The waterfall for one trace, as a list of lines."""
+    start, end = _extent(spans)
+    total = max(end - start, 1e-9)
+    ids = {s["id"] for s in spans}
+    children = {}
+    for s in spans:
+        # a parent that was never written (cut off by a rotation) - show as a root
+        parent = s["parent"] if s["parent"] in ids else None
+        children.setdefault(parent, []).append(s)
+    for group in children.values():
+        group.sort(key=lambda s: s["start"])
+
+    roots = children.get(None, [])
+    head = roots[0] if roots else spans[0]
+    lines = [f"trace {trace_id}  {total * 1000:.1f}ms  {head['name']}  {_attrs(head)}".rstrip()]
+
+    def walk(span, depth):
+        if span["ms"] >= min_span_ms or span["parent"] is None:
+            offset = span["start"] - start
+            left = int(offset / total * BAR_WIDTH)
+            width = max(1, int(round(span["ms"] / 1000 / total * BAR_WIDTH)))
+            bar = (" " * left + "#" * width)[:BAR_WIDTH].ljust(BAR_WIDTH)
+            label = ("  " * depth + span["name"]).ljust(44)
+            lines.append(f"  {'+' + format(offset * 1000, '.1f') + 'ms':>10} {span['ms']:>9.1f}ms  {label}"
+                         f"|{bar}|  {_attrs(span)}".rstrip())
+        for child in children.get(span["id"], []):
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="TRACE_FILE and, optionally, its rotated backups")
+    parser.add_argument("--top", type=int, default=10, help="how many of the slowest traces to show")
+    parser.add_argument("--name", default=None, help="only traces with a root span containing this (e.g. button_handler)")
+    parser.add_argument("--min-span-ms", type=float, default=0.0, help="hide spans shorter than this (their children still show)")
+    parser.add_argument("--json", action="store_true", help="print the selected traces as JSON")
+    args = parser.parse_args()
+
+    traces = load_traces(args.files)
+    picked = slowest(traces, args.top, args.name)
+    if args.json:
+        print(json.dumps([{"trace_id": trace_id, "ms": round(seconds * 1000, 3), "spans": spans}
+                          for seconds, trace_id, spans in picked], indent=2))
+        return
+    if not picked:
+        print("no traces found", file=sys.stderr)
+        return
+    print(f"{len(picked)} slowest of {len(traces)} traces\n")
+    for _, trace_id, spans in picked:
+        print("\n".join(waterfall(trace_id, spans, args.min_span_ms)))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,21 @@
+import asyncio
+import functools
 import json
+import random
+import time
+import google.auth.exceptions
+import gspread
 import gspread_asyncio
+import requests
 from datetime import datetime
 from google.oauth2.service_account import Credentials
-from config import GOOGLE_CREDENTIALS_JSON, CONTROL_SHEET_ID, logger
+from config import (
+    GOOGLE_CREDENTIALS_JSON, CONTROL_SHEET_ID, SHEETS_GLOBAL_RPM, SHEETS_PER_SHEET_RPM,
+    SHEETS_MAX_IN_FLIGHT, SHEETS_OFFLOAD, logger,
+)
+import db
+import tracing
 from utils import now2ddmmyy
-import sqlite3
 
 def get_credentials():
     credentials_info = json.loads(GOOGLE_CREDENTIALS_JSON)
@@ -27,13 +38,337 @@ def get_service_account_email():
     except (json.JSONDecodeError, AttributeError):
         return None
 
-agcm = gspread_asyncio.AsyncioGspreadClientManager(get_credentials)
+# How long an opened spreadsheet handle - and the worksheet handles
+# gspread_asyncio caches on it - is trusted before being re-resolved from
+# scratch. Long enough that steady-state writes (button clicks appending to
+# Actions, Save & Close updating Events) never pay for open_by_key() or the
+# ss.worksheet() metadata fetch, short enough that a tab renamed/recreated
+# by hand in the Sheets UI is picked up again without a bot restart.
+_SPREADSHEET_TTL_SECONDS = 30 * 60
 
-# Cache of already-opened spreadsheets, keyed by spreadsheet ID.
+# HTTP statuses that mean "this cached handle is no longer usable as-is":
+# 401 - the access token / credentials themselves were rejected,
+# 403 - the service account lost access to this particular spreadsheet,
+# 404 - the spreadsheet (or tab) was deleted.
+_AUTH_ERROR_STATUSES = (401, 403, 404)
+
+
+def _sheet_id_of_call(method, args):
+    """
+    Best-effort: which spreadsheet a wrapped gspread call was aimed at.
+    Worksheet methods carry it on .spreadsheet, Spreadsheet methods on .id,
+    and Client.open_by_key takes it as its first argument. None if it
+    can't be told (e.g. Client.openall) - callers treat that as "unknown".
+    """
+    owner = getattr(method, "__self__", None)
+    if isinstance(owner, gspread.Worksheet):
+        return owner.spreadsheet.id
+    if isinstance(owner, gspread.Spreadsheet):
+        return owner.id
+    if getattr(method, "__name__", "") == "open_by_key" and args:
+        return args[0]
+    return None
+
+
+def _bust_cache_on_auth_error(sheet_id, exc):
+    """
+    Drops whatever cached handles `exc` proves stale, so the NEXT call
+    re-resolves from scratch instead of failing the same way forever on a
+    handle that was opened back when access was still fine:
+      - rejected credentials (RefreshError / 401) -> re-authorize the
+        client and forget every handle opened through the old one,
+      - 403/404 or SpreadsheetNotFound/WorksheetNotFound on one sheet ->
+        forget just that spreadsheet.
+    Anything else (quota, 5xx, a bad range) leaves the cache alone.
+    """
+    status = None
+    if isinstance(exc, gspread.exceptions.APIError):
+        status = getattr(exc.response, "status_code", None)
+    if isinstance(exc, google.auth.exceptions.RefreshError) or status == 401:
+        logger.warning(f"Sheets credentials rejected ({repr(exc)}) - re-authorizing on next call")
+        invalidate_client()
+        return
+    if status in _AUTH_ERROR_STATUSES or isinstance(
+        exc, (gspread.exceptions.SpreadsheetNotFound, gspread.exceptions.WorksheetNotFound)
+    ):
+        if sheet_id:
+            logger.warning(f"Dropping cached handle for sheet {sheet_id} after {repr(exc)}")
+            invalidate_spreadsheet(sheet_id)
+
+
+# Token-bucket burst sizes: how many calls may go out back-to-back after an
+# idle stretch before the steady RPM pacing kicks in. Small on purpose -
+# Google counts quota per rolling minute, so a big burst just moves the 429
+# a few seconds later.
+_GLOBAL_BURST = 10
+_PER_SHEET_BURST = 5
+
+# Retry policy for 429 (quota) and 5xx (Google having a moment) - and for
+# socket-level requests errors. gspread_asyncio's default retries those
+# forever at a flat 1.1s; here the delay doubles per attempt, capped, with
+# jitter so concurrent callers that got throttled together don't all come
+# back in the same instant. After _MAX_ATTEMPTS the error is raised to the
+# caller like any other (which, everywhere in this codebase, logs it).
+_MAX_ATTEMPTS = 6
+_BACKOFF_BASE_SECONDS = 1.0
+_BACKOFF_CAP_SECONDS = 32.0
+
+
+class _TokenBucket:
+    """
+    Classic token bucket, reservation-style: take() always succeeds
+    immediately and returns how long the caller must sleep before actually
+    using its token. Letting the balance go negative means callers are
+    served strictly in arrival order without a lock - fine on a single
+    asyncio loop, where take() itself never yields.
+    """
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = max(rate_per_minute, 1) / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+# Per-spreadsheet token buckets, created on first use. Keyed by sheet_id;
+# calls whose spreadsheet can't be told (None) share one bucket.
+_sheet_buckets = {}
+
+# Per-spreadsheet scheduler counters, keyed by sheet_id (None = calls not
+# tied to one spreadsheet, e.g. the initial authorize). throttled_seconds is
+# everything a call spent waiting on OUR side: token buckets, the in-flight
+# cap and retry backoff - i.e. latency added by pacing, not by Google.
+# See get_throttle_stats() / get_throttle_stats_by_hub().
+_throttle_stats = {}
+
+
+def _stats_for(sheet_id):
+    stats = _throttle_stats.get(sheet_id)
+    if stats is None:
+        stats = {"calls": 0, "throttled_seconds": 0.0, "retries": 0, "failures": 0}
+        _throttle_stats[sheet_id] = stats
+    return stats
+
+
+def _retryable_status(exc):
+    """The HTTP status if `exc` is a 429/5xx gspread APIError, else None."""
+    if not isinstance(exc, gspread.exceptions.APIError):
+        return None
+    status = getattr(exc.response, "status_code", None)
+    if status == 429 or (isinstance(status, int) and 500 <= status <= 599):
+        return status
+    return None
+
+
+def _backoff_delay(attempt, exc):
+    """
+    Seconds to wait before retry number `attempt` (1-based). Honors a
+    Retry-After header when Google sends one, otherwise exponential with
+    full jitter.
+    """
+    response = getattr(exc, "response", None)
+    retry_after = None
+    try:
+        retry_after = float(response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        pass
+    if retry_after is not None and retry_after >= 0:
+        return min(retry_after, _BACKOFF_CAP_SECONDS)
+    ceiling = min(_BACKOFF_CAP_SECONDS, _BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class _SheetsClientManager(gspread_asyncio.AsyncioGspreadClientManager):
+    """
+    The Sheets request scheduler. Every gspread call made through
+    gspread_asyncio - whether from this module or from event_engine/handlers
+    holding a handle returned by open_spreadsheet() - funnels through
+    _call(), so this is the one place that can pace, retry and account for
+    all of them.
+
+    Replaces gspread_asyncio's own pacing (one global lock, one call per
+    1.1s, retry forever) with:
+      - a global token bucket (SHEETS_GLOBAL_RPM) AND one per spreadsheet
+        (SHEETS_PER_SHEET_RPM) - a call waits for whichever is slower,
+      - at most SHEETS_MAX_IN_FLIGHT requests running at once,
+      - exponential backoff with jitter on 429/5xx/network errors, giving
+        up after _MAX_ATTEMPTS,
+      - per-spreadsheet counters in _throttle_stats,
+      - cache busting on auth/permission errors (see
+        _bust_cache_on_auth_error), even for call sites that just
+        catch-and-log on their own.
+    """
+
+    def __init__(self, credentials_fn, **kwargs):
+        super().__init__(credentials_fn, **kwargs)
+        self._global_bucket = _TokenBucket(SHEETS_GLOBAL_RPM, _GLOBAL_BURST)
+        self._per_sheet_rpm = SHEETS_PER_SHEET_RPM
+        self._in_flight = asyncio.Semaphore(max(SHEETS_MAX_IN_FLIGHT, 1))
+
+    async def _acquire_slot(self, sheet_id):
+        """Waits out both token buckets. Returns seconds spent waiting."""
+        bucket = _sheet_buckets.get(sheet_id)
+        if bucket is None:
+            bucket = _TokenBucket(self._per_sheet_rpm, _PER_SHEET_BURST)
+            _sheet_buckets[sheet_id] = bucket
+        wait = max(self._global_bucket.take(), bucket.take())
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    async def _call(self, method, *args, **kwargs):
+        if not tracing.active():
+            return await self._paced_call(method, *args, **kwargs)
+        with tracing.span(f"sheets {getattr(method, '__name__', method)}", sheet_id=_sheet_id_of_call(method, args)):
+            return await self._paced_call(method, *args, **kwargs)
+
+    async def _paced_call(self, method, *args, **kwargs):
+        # Some gspread_asyncio wrappers (e.g. batch helpers) declare they
+        # cost more than one API request - charge the buckets accordingly.
+        api_call_count = kwargs.pop("api_call_count", 1)
+        sheet_id = _sheet_id_of_call(method, args)
+        stats = _stats_for(sheet_id)
+        stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        fn = functools.partial(method, *args, **kwargs)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            waited = 0.0
+            for _ in range(api_call_count):
+                waited += await self._acquire_slot(sheet_id)
+            queued_at = time.monotonic()
+            async with self._in_flight:
+                waited += time.monotonic() - queued_at
+                stats["throttled_seconds"] += waited
+                await self.before_gspread_call(method, args, kwargs)
+                try:
+                    return await loop.run_in_executor(None, fn)
+                except (gspread.exceptions.APIError, requests.RequestException) as e:
+                    error = e
+                except Exception as e:
+                    _bust_cache_on_auth_error(sheet_id, e)
+                    stats["failures"] += 1
+                    raise
+
+            # Outside the in-flight slot from here on - a call sleeping off
+            # a 429 must not block everyone else's requests.
+            retryable = isinstance(error, requests.RequestException) or _retryable_status(error)
+            if not retryable or attempt >= _MAX_ATTEMPTS:
+                _bust_cache_on_auth_error(sheet_id, error)
+                stats["failures"] += 1
+                raise error
+            delay = _backoff_delay(attempt, error)
+            stats["retries"] += 1
+            stats["throttled_seconds"] += delay
+            logger.warning(
+                f"Sheets {getattr(method, '__name__', method)} on {sheet_id} failed "
+                f"({repr(error)}), retry {attempt}/{_MAX_ATTEMPTS - 1} in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+
+def get_throttle_stats():
+    """
+    Snapshot of the scheduler's per-spreadsheet counters:
+    {sheet_id: {"calls", "throttled_seconds", "retries", "failures"}}.
+    """
+    return {sheet_id: dict(stats) for sheet_id, stats in _throttle_stats.items()}
+
+
+def get_throttle_stats_by_hub(db_path=None):
+    """
+    Same counters as get_throttle_stats(), re-keyed by the hub (chat_id)
+    each spreadsheet is bound to - sheet_id is UNIQUE in all_groups, so
+    that's a 1:1 mapping. The Control Sheet and anything not (or no
+    longer) bound to a hub keep their sheet_id as key, prefixed "sheet:".
+    """
+    if db_path is None:
+        db_path = db.DB_PATH
+    conn = db.connect(db_path)
+    try:
+        hub_by_sheet = dict(
+            conn.execute("SELECT sheet_id, chat_id FROM all_groups WHERE sheet_id IS NOT NULL").fetchall()
+        )
+    finally:
+        conn.close()
+    result = {}
+    for sheet_id, stats in get_throttle_stats().items():
+        key = hub_by_sheet.get(sheet_id) or f"sheet:{sheet_id}"
+        result[key] = stats
+    return result
+
+
+agcm = _SheetsClientManager(get_credentials)
+
+# Cache of already-opened spreadsheets, keyed by spreadsheet ID, as
+# (handle, opened_at) with opened_at on the monotonic clock.
 # Without this, every button click re-resolves the spreadsheet via the
-# Drive API, which is slow and eats into API quota.
+# Drive API, which is slow and eats into API quota. The worksheet handles
+# live on the spreadsheet handle itself (gspread_asyncio caches
+# ss.worksheet() results per spreadsheet object), so they share its TTL
+# and get dropped together with it.
 _spreadsheet_cache = {}
 
+# One asyncio.Lock per sheet_id, serializing cold-cache opens (see
+# open_spreadsheet). Bounded by the number of bound sheets.
+_open_locks = {}
+
+
+def invalidate_spreadsheet(sheet_id):
+    """
+    Forgets the cached handle (and its worksheets) for one spreadsheet, so
+    the next open_spreadsheet() goes back to the API. Called explicitly
+    wherever a hub's binding changes (/setsheet, bot removed from the hub)
+    and automatically on auth/permission errors. No-op for a falsy or
+    not-cached sheet_id.
+    """
+    if not sheet_id:
+        return
+    _spreadsheet_cache.pop(sheet_id, None)
+    # gspread_asyncio's client keeps its own per-key cache underneath ours -
+    # without dropping that too, a "re-open" would just hand back the very
+    # same stale object.
+    for gc in list(getattr(agcm, "_agc_cache", {}).values()):
+        getattr(gc, "_ss_cache_key", {}).pop(sheet_id, None)
+        titles = getattr(gc, "_ss_cache_title", {})
+        for title, cached in list(titles.items()):
+            if getattr(cached, "id", None) == sheet_id:
+                del titles[title]
+
+
+def set_client_manager(manager):
+    """
+    Swaps the client manager every Sheets call in this module goes
+    through, dropping all handles opened via the old one. For pointing the
+    whole Sheets layer at an offline stand-in (scripts/fake_sheets.py) in
+    benchmarks and tests - production never calls this.
+    """
+    global agcm
+    invalidate_client()
+    agcm = manager
+    _control_sheet_pushed.clear()
+
+
+def invalidate_client():
+    """
+    Forces a fresh agcm.authorize() on the next call (new credentials, new
+    client) and drops every spreadsheet handle opened through the old one.
+    """
+    agcm.auth_time = None
+    for sheet_id in list(_spreadsheet_cache):
+        invalidate_spreadsheet(sheet_id)
+
 # Matches subscription.SUBS_DATE_FORMAT - duplicated here (rather than
 # imported) to avoid a sheets<->subscription circular import, since
 # subscription.py already imports sync_control_sheet_main/subconfig FROM
@@ -41,6 +376,7 @@ _spreadsheet_cache = {}
 _SUBS_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
+@tracing.traced
 async def open_spreadsheet(sheet_id):
     """
     Opens a spreadsheet by its ID (gc.open_by_key), not by title. A title
@@ -53,15 +389,30 @@ async def open_spreadsheet(sheet_id):
     Returns None (no network call at all) if sheet_id is falsy - the normal,
     expected case for a free-tier hub or a premium hub that hasn't
     configured a sheet yet. Callers must check for a None return.
+
+    Handles are cached for _SPREADSHEET_TTL_SECONDS - see
+    invalidate_spreadsheet() for dropping one early.
     """
     if not sheet_id:
         return None
-    if sheet_id in _spreadsheet_cache:
-        return _spreadsheet_cache[sheet_id]
-    gc = await agcm.authorize()
-    ss = await gc.open_by_key(sheet_id)
-    _spreadsheet_cache[sheet_id] = ss
-    return ss
+    cached = _spreadsheet_cache.get(sheet_id)
+    if cached is not None and time.monotonic() - cached[1] < _SPREADSHEET_TTL_SECONDS:
+        return cached[0]
+    # Several callers racing on a cold cache (e.g. the four concurrent
+    # Control Sheet pushes at startup) must share ONE open_by_key, not
+    # each spend a metadata fetch of their own.
+    lock = _open_locks.setdefault(sheet_id, asyncio.Lock())
+    async with lock:
+        cached = _spreadsheet_cache.get(sheet_id)
+        if cached is not None:
+            ss, opened_at = cached
+            if time.monotonic() - opened_at < _SPREADSHEET_TTL_SECONDS:
+                return ss
+            invalidate_spreadsheet(sheet_id)  # expired - re-resolve below
+        gc = await agcm.authorize()
+        ss = await gc.open_by_key(sheet_id)
+        _spreadsheet_cache[sheet_id] = (ss, time.monotonic())
+        return ss
 
 
 async def get_sheet_for_chat(chat_id):
@@ -72,7 +423,7 @@ async def get_sheet_for_chat(chat_id):
       - premium, no sheet_id   -> None (nothing configured yet to write to)
       - premium, has sheet_id  -> that sheet_id
     """
-    conn = sqlite3.connect("database.db")
+    conn = db.connect(db.DB_PATH)
     cursor = conn.cursor()
     cursor.execute(
         "SELECT type, sheet_id, subs_date_end FROM all_groups WHERE chat_id = ?",
@@ -99,6 +450,76 @@ async def get_sheet_for_chat(chat_id):
     return sheet_id or None
 
 
+def action_log_row(entry: dict) -> list:
+    """
+    An action_log entry (see db.record_action) as an Actions-tab row:
+    EVENT_ID, ACTION, USER_NAME, USER_ID, DATE, CHAT_ID - DATE in the same
+    "dd.mm.YYYY HH:MM:SS.mmm" form now2ddmmyy() writes everywhere else.
+    """
+    date = datetime.strptime(entry["ts"], "%Y-%m-%d %H:%M:%S.%f").strftime("%d.%m.%Y %H:%M:%S.%f")[:-3]
+    return [entry["event_id"], entry["action"], entry["username"], str(entry["user_id"]), date, str(entry["chat_id"])]
+
+
+# Every Sheets write that can run in sheets_worker.py instead of the bot
+# process, by registry key ("<module>.<function>") -> the undecorated
+# coroutine function. Filled in by @sheets_job at import time - the worker
+# imports a job's module on demand to get it registered.
+_SHEETS_JOBS = {}
+
+# Turned on by sheets_worker.py only. A job's own "catch, log, carry on"
+# handling keeps a Sheets problem from ever reaching a button click in the
+# bot process - but in the worker the same swallowed exception would make
+# a failed write look done, and it'd be deleted instead of retried.
+SHEETS_JOB_RERAISE = False
+
+
+def reraise_in_worker():
+    """
+    Called from a @sheets_job's `except` block, after logging: re-raises
+    the exception being handled when running in sheets_worker.py (so the
+    job is retried), does nothing in the bot process.
+    """
+    if SHEETS_JOB_RERAISE:
+        raise
+
+
+def sheets_job(fn):
+    """
+    Marks a coroutine function as an offloadable Sheets write. With
+    SHEETS_OFFLOAD off (the default) the decorated function behaves exactly
+    as before: calling it runs it. With it on, calling it just queues a
+    sheets_jobs row (see db.enqueue_sheets_job) and returns True at once -
+    the bot never waits on Google, and sheets_worker.py performs the write
+    later, in its own process.
+
+    Because of that, a job's arguments must be JSON-serializable (chat ids,
+    sheet ids, lists of row values - never an Update or a handle), and it
+    can't hand a result back to its caller beyond "queued". Anything the
+    bot itself must decide (is a sheet bound at all? what goes in the row?)
+    stays at the call site, before the job is called. Tuples come back as
+    lists on the worker side.
+
+    Reads SHEETS_OFFLOAD at call time, not import time - sheets_worker.py
+    turns it off in its own process, so a job that calls another job (e.g.
+    sync_users_sheet -> log_user_presence_if_not_exists) just runs it
+    inline there.
+    """
+    name = f"{fn.__module__}.{fn.__name__}"
+    _SHEETS_JOBS[name] = fn
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if SHEETS_OFFLOAD:
+            db.enqueue_sheets_job(name, json.dumps({"args": list(args), "kwargs": kwargs}))
+            return True
+        with tracing.span(name):
+            return await fn(*args, **kwargs)
+
+    wrapper.sheets_job_name = name
+    return wrapper
+
+
+@sheets_job
 async def sync_users_sheet(chat_id, current_members: list):
     """
     Syncs the "Users" worksheet for a given chat/place with its current
@@ -197,8 +618,10 @@ async def sync_users_sheet(chat_id, current_members: list):
                 # If status is already LEFT, do nothing
     except Exception as e:
         logger.error(f"Google Sheets Users synchronization failed: {repr(e)}")
+        reraise_in_worker()
 
 
+@sheets_job
 async def sync_event_users_sheet(chat_id, event_id, user_ids):
     """
     Writes all going user_ids (master + child chats) to the EventUsers sheet.
@@ -218,8 +641,10 @@ async def sync_event_users_sheet(chat_id, event_id, user_ids):
             logger.info("Roster was empty at commitment index. Skipping EventUsers rows insert.")
     except Exception as e:
         logger.error(f"Google Sheets EventUsers synchronization failed: {repr(e)}")
+        reraise_in_worker()
 
 
+@sheets_job
 async def log_user_presence_if_not_exists(chat_id, user_id, presence_chat_id, date_start, date_end):
     """
     Logs user presence to UserPresenceLog sheet when a user leaves a monitored
@@ -244,8 +669,82 @@ async def log_user_presence_if_not_exists(chat_id, user_id, presence_chat_id, da
         await ws.append_row([str(user_id), str(presence_chat_id), str(date_start), str(date_end)])
     except Exception as e:
         logger.error(f"Google Sheets UserPresenceLog check failed: {repr(e)}")
+        reraise_in_worker()
+
 
+# What each Control Sheet tab was last successfully pushed as, keyed by tab
+# name -> (grid, pushed_at monotonic). Lets every push after the first
+# write only the rows that actually changed, instead of re-reading and
+# rewriting the whole tab - a bot added to one new chat changes ONE row of
+# GROUPS, not all of them. Dropped on any failed push (the tab's real
+# contents are unknown at that point), and trusted for at most
+# _CONTROL_SHEET_FULL_RESYNC_SECONDS, after which the next push rewrites
+# the tab in full again - so a cell someone edited by hand in the Sheets UI
+# gets put back eventually even if its row never changes in SQLite.
+_control_sheet_pushed = {}
+_CONTROL_SHEET_FULL_RESYNC_SECONDS = 6 * 60 * 60
 
+
+def _changed_row_ranges(previous, grid):
+    """
+    Yields (start_index, rows) for each contiguous run of rows in `grid`
+    that differ from `previous` (or lie past its end), 0-based - so a
+    handful of scattered edits become a handful of small ranges in ONE
+    batch_update call, not one call per row.
+    """
+    run_start = None
+    for i, row in enumerate(grid):
+        changed = i >= len(previous) or previous[i] != row
+        if changed and run_start is None:
+            run_start = i
+        elif not changed and run_start is not None:
+            yield run_start, grid[run_start:i]
+            run_start = None
+    if run_start is not None:
+        yield run_start, grid[run_start:]
+
+
+async def _push_control_grid(tab, grid):
+    """
+    Writes `grid` (header row included) to Control Sheet tab `tab`,
+    touching as little as possible:
+      - first push this process (or after a failure / the full-resync
+        interval): write everything from A1, then clear everything below it
+        with an open-ended range - no get_all_values() round-trip just to
+        learn how many stale rows there were to trim,
+      - afterwards: only the changed rows (one batch_update), plus a
+        bounded clear if the tab shrank - or NO API call at all if nothing
+        changed.
+    Still write-first-then-trim, so a failure midway never leaves the tab
+    blank, just a few harmless stale rows below the fresh data. Raises on
+    failure - callers keep their own catch-log-return-False handling.
+    """
+    previous = _control_sheet_pushed.get(tab)
+    if previous is not None and time.monotonic() - previous[1] >= _CONTROL_SHEET_FULL_RESYNC_SECONDS:
+        previous = None
+    if previous is not None and previous[0] == grid:
+        return
+
+    ss = await open_spreadsheet(CONTROL_SHEET_ID)
+    ws = await ss.worksheet(tab)
+    _control_sheet_pushed.pop(tab, None)
+    if previous is None:
+        await ws.update("A1", grid)
+        await ws.batch_clear([f"A{len(grid) + 1}:Z"])
+    else:
+        last_grid = previous[0]
+        data = [
+            {"range": f"A{start + 1}", "values": rows}
+            for start, rows in _changed_row_ranges(last_grid, grid)
+        ]
+        if data:
+            await ws.batch_update(data)
+        if len(last_grid) > len(grid):
+            await ws.batch_clear([f"A{len(grid) + 1}:Z{len(last_grid)}"])
+    _control_sheet_pushed[tab] = ([list(row) for row in grid], time.monotonic())
+
+
+@sheets_job
 async def sync_control_sheet_main(rows: list) -> bool:
     """
     Overwrites the "GROUPS" tab of the Control Sheet (CONTROL_SHEET_ID) with
@@ -256,7 +755,8 @@ async def sync_control_sheet_main(rows: list) -> bool:
     This is a ONE-WAY push (SQLite -> Sheet). Editing a cell in the Sheet by
     hand does NOT change anything back in SQLite - /setsub remains the only
     way to actually change a subscription. This tab is a read-only mirror
-    for visibility, not a control surface (yet).
+    for visibility, not a control surface (yet). Only rows that changed
+    since the last push are actually written - see _push_control_grid().
 
     rows: list of (chat_id, chat_name, type, sheet_id, sheet_name,
     subs_date_start, subs_date_end, visibility, date_bot_add) tuples.
@@ -267,35 +767,20 @@ async def sync_control_sheet_main(rows: list) -> bool:
         logger.error("sync_control_sheet_main: CONTROL_SHEET_ID is not configured.")
         return False
     try:
-        ss = await open_spreadsheet(CONTROL_SHEET_ID)
-        ws = await ss.worksheet("GROUPS")
         header = ["CHAT_ID", "CHAT_NAME", "TYPE", "SHEET_ID", "SHEET_NAME",
                    "SUBS_DATE_START", "SUBS_DATE_END", "VISIBILITY", "DATE_BOT_ADD"]
         body   = [[str(v) if v is not None else "" for v in row] for row in rows]
         grid   = [header] + body
 
-        # Find out how many rows this tab currently holds BEFORE writing,
-        # so we know whether any stale trailing rows need clearing after -
-        # deliberately done this way round (write first, trim leftovers
-        # after) so a failure never leaves the tab completely blank: worst
-        # case on a partial failure is a few harmless stale rows left below
-        # the fresh data, not "everything is gone".
-        try:
-            existing_row_count = len(await ws.get_all_values())
-        except Exception:
-            existing_row_count = 0
-
-        await ws.update("A1", grid)
-
-        if existing_row_count > len(grid):
-            await ws.batch_clear([f"A{len(grid) + 1}:Z{existing_row_count}"])
-
+        await _push_control_grid("GROUPS", grid)
         return True
     except Exception as e:
         logger.error(f"Google Sheets Control/Groups sync failed: {repr(e)}")
+        reraise_in_worker()
         return False
 
 
+@sheets_job
 async def sync_control_sheet_channels(rows: list) -> bool:
     """
     Overwrites the "CHANNELS" tab of the Control Sheet with the current
@@ -310,28 +795,19 @@ async def sync_control_sheet_channels(rows: list) -> bool:
         logger.error("sync_control_sheet_channels: CONTROL_SHEET_ID is not configured.")
         return False
     try:
-        ss = await open_spreadsheet(CONTROL_SHEET_ID)
-        ws = await ss.worksheet("CHANNELS")
         header = ["CHAT_ID", "CHAT_NAME", "VISIBILITY", "DATE_BOT_ADD"]
         body   = [[str(v) if v is not None else "" for v in row] for row in rows]
         grid   = [header] + body
 
-        try:
-            existing_row_count = len(await ws.get_all_values())
-        except Exception:
-            existing_row_count = 0
-
-        await ws.update("A1", grid)
-
-        if existing_row_count > len(grid):
-            await ws.batch_clear([f"A{len(grid) + 1}:Z{existing_row_count}"])
-
+        await _push_control_grid("CHANNELS", grid)
         return True
     except Exception as e:
         logger.error(f"Google Sheets Control/Channels sync failed: {repr(e)}")
+        reraise_in_worker()
         return False
 
 
+@sheets_job
 async def sync_control_sheet_chats_log(rows: list) -> bool:
     """
     Overwrites the "chats_log" tab of the Control Sheet with the current
@@ -348,31 +824,22 @@ async def sync_control_sheet_chats_log(rows: list) -> bool:
         logger.error("sync_control_sheet_chats_log: CONTROL_SHEET_ID is not configured.")
         return False
     try:
-        ss = await open_spreadsheet(CONTROL_SHEET_ID)
-        ws = await ss.worksheet("chats_log")
         header = ["CHAT_ID", "DATE_BOT_ADD", "DATE_BOT_REMOVED"]
         body   = [[str(v) if v is not None else "" for v in row] for row in rows]
         grid   = [header] + body
 
-        try:
-            existing_row_count = len(await ws.get_all_values())
-        except Exception:
-            existing_row_count = 0
-
-        await ws.update("A1", grid)
-
-        if existing_row_count > len(grid):
-            await ws.batch_clear([f"A{len(grid) + 1}:Z{existing_row_count}"])
-
+        await _push_control_grid("chats_log", grid)
         return True
     except Exception as e:
         logger.error(f"Google Sheets Control/chats_log sync failed: {repr(e)}")
+        reraise_in_worker()
         return False
 
 
 _TIER_ORDER = {"FREE": 0, "PRO": 1, "ADMIN": 2}
 
 
+@sheets_job
 async def sync_control_sheet_botconfig(feature_rows: list):
     """
     Overwrites the "BOTCONFIG" tab of the Control Sheet with the current
@@ -393,8 +860,6 @@ async def sync_control_sheet_botconfig(feature_rows: list):
         logger.error("sync_control_sheet_botconfig: CONTROL_SHEET_ID is not configured.")
         return False
     try:
-        ss = await open_spreadsheet(CONTROL_SHEET_ID)
-        ws = await ss.worksheet("BOTCONFIG")
         header = ["FEATURE_KEY", "FEATURE", "FREE", "PRO", "ADMIN", "DESCRIPTION"]
         body = []
         for feature_key, feature_label, min_tier, limit_count, description in feature_rows:
@@ -417,17 +882,9 @@ async def sync_control_sheet_botconfig(feature_rows: list):
             ])
         grid = [header] + body
 
-        try:
-            existing_row_count = len(await ws.get_all_values())
-        except Exception:
-            existing_row_count = 0
-
-        await ws.update("A1", grid)
-
-        if existing_row_count > len(grid):
-            await ws.batch_clear([f"A{len(grid) + 1}:Z{existing_row_count}"])
-
+        await _push_control_grid("BOTCONFIG", grid)
         return True
     except Exception as e:
         logger.error(f"Google Sheets Control/BOTCONFIG sync failed: {repr(e)}")
+        reraise_in_worker()
         return False
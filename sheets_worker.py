@@ -0,0 +1,129 @@
+"""
+Standalone Sheets worker - performs the Google Sheets writes the bot
+queued in the sheets_jobs table while running with SHEETS_OFFLOAD=1.
+
+With offloading on, the bot process never talks to Google at all: every
+@sheets_job call (Actions appends, Save & Close's Events/EventUsers export,
+/refreshusers' Users sync, Control Sheet pushes...) becomes one INSERT
+into sheets_jobs, and this process - pointed at the SAME database.db -
+drains that table oldest-first and runs each job for real, through the
+same sheets.py code path (handle cache, quota-aware scheduler, retries)
+the bot would have used inline. A slow or throttled Sheets API then only
+ever slows down this process's queue, never a button click.
+
+Run exactly ONE worker per database (job claiming is race-safe, but jobs
+for the same sheet are meant to land in order):
+
+    python sheets_worker.py
+
+A job that fails is retried with a growing delay, up to _MAX_ATTEMPTS
+tries, then parked as status='failed' with its last_error. Failing means
+raising - the jobs' own catch-and-log handling re-raises in this process
+(see sheets.reraise_in_worker) - or returning False, which the jobs that
+report an outcome use for "nothing was written" (no CONTROL_SHEET_ID, the
+hub's sheet unbound since the job was queued...).
+"""
+import asyncio
+import importlib
+import json
+import signal
+import time
+
+import db
+import sheets
+from config import logger
+
+# How long to sleep when the queue is empty before looking again. The bot
+# doesn't notify this process of new work, so this is the worst-case
+# extra delay before a queued write starts.
+_POLL_SECONDS = 1.0
+_MAX_ATTEMPTS = 5
+_RETRY_BASE_SECONDS = 30.0
+
+
+def _resolve_job(job_name):
+    """
+    Maps a sheets_jobs.job_name ("<module>.<function>") to its undecorated
+    coroutine function, importing the module first so its @sheets_job
+    registrations exist. Returns None for a name nothing registers (e.g.
+    a job queued by an older/newer version of the bot).
+    """
+    module_name = job_name.rpartition(".")[0]
+    if module_name:
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            return None
+    return sheets._SHEETS_JOBS.get(job_name)
+
+
+async def run_one_job(db_path: str = None) -> bool:
+    """
+    Claims and runs the oldest runnable job. Returns False if there was
+    nothing to run, True otherwise (whatever the job's outcome).
+    """
+    job = db.claim_sheets_job(time.time(), db_path=db_path)
+    if job is None:
+        return False
+    job_id, job_name, payload, attempts = job
+    try:
+        fn = _resolve_job(job_name)
+        if fn is None:
+            raise LookupError(f"no Sheets job registered as {job_name!r}")
+        data = json.loads(payload)
+        if await fn(*data.get("args", []), **data.get("kwargs", {})) is False:
+            raise RuntimeError(f"{job_name} reported that nothing was written")
+    except Exception as e:
+        if attempts >= _MAX_ATTEMPTS:
+            logger.error(f"Sheets job {job_id} ({job_name}) failed for good after {attempts} attempts: {e!r}")
+            db.fail_sheets_job(job_id, repr(e), db_path=db_path)
+        else:
+            delay = _RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            logger.warning(f"Sheets job {job_id} ({job_name}) failed, retrying in {delay:.0f}s: {e!r}")
+            db.fail_sheets_job(job_id, repr(e), retry_at=time.time() + delay, db_path=db_path)
+    else:
+        db.complete_sheets_job(job_id, db_path=db_path)
+    return True
+
+
+async def run_worker(stop: asyncio.Event, db_path: str = None):
+    """
+    Drains the queue until `stop` is set. A job already running when stop
+    is set is allowed to finish - SIGTERM from `docker compose stop` never
+    cuts a multi-call job (e.g. a Users sync) off halfway.
+    """
+    # This process is where offloaded jobs actually RUN - a job calling
+    # another job (sync_users_sheet -> log_user_presence_if_not_exists)
+    # must execute it inline, not queue it again - and a write that failed
+    # must surface here, to be retried, not be logged and forgotten.
+    sheets.SHEETS_OFFLOAD = False
+    sheets.SHEETS_JOB_RERAISE = True
+    requeued = db.requeue_running_sheets_jobs(db_path=db_path)
+    if requeued:
+        logger.info(f"Requeued {requeued} Sheets job(s) interrupted by a previous worker.")
+    while not stop.is_set():
+        if await run_one_job(db_path=db_path):
+            continue
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    logger.info("Sheets worker started.")
+    await run_worker(stop)
+    logger.info("Sheets worker stopped.")
+
+
+def main():
+    db.init_db()
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
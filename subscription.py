@@ -6,8 +6,10 @@ Payment itself is confirmed by hand (crypto, checked by the bot owner) -
 there is deliberately no payment automation here.
 """
 
+import asyncio
 import re
 import sqlite3
+import time
 from datetime import datetime, timedelta
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -15,12 +17,16 @@ from telegram.ext import ContextTypes
 
 from config import ICON_WARNING, ICON_STATS, OWNER_USER_IDS, logger
 from utils import escape_markdown, is_real_admin, GROUP_ANONYMOUS_BOT_ID
-from db import get_connection, get_feature_flags, update_feature_flag, _NO_CHANGE as _LIMIT_NO_CHANGE
+from db import (
+    get_connection, get_feature_flags, update_feature_flag, SHEET_EXPORT_MODES,
+    _NO_CHANGE as _LIMIT_NO_CHANGE,
+)
 from hub_resolver import resolve_hub_chat_id, register_hub_command
 from sheets import (
     sync_control_sheet_main, sync_control_sheet_botconfig, sync_control_sheet_channels,
-    sync_control_sheet_chats_log, open_spreadsheet, get_service_account_email,
+    sync_control_sheet_chats_log, open_spreadsheet, get_service_account_email, invalidate_spreadsheet,
 )
+from background_tasks import spawn
 
 SUBS_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"  # ISO-ish, chosen so string comparison
 # isn't relied upon anywhere - always parsed via strptime, but kept
@@ -286,6 +292,16 @@ async def setsub(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+# One-line explanation of each Sheets export mode, for /setsheet's reply.
+_EXPORT_MODE_NOTES = {
+    "live": "Every click is written to the Actions tab as it happens\\.",
+    "deferred": (
+        "Running events make no Sheets calls \\- Actions, the Events row and EventUsers are "
+        "all written at Save & Close or Cancel\\."
+    ),
+}
+
+
 @register_hub_command("setsheet")
 async def setsheet(update: Update, context: ContextTypes.DEFAULT_TYPE, override_chat_id: str = None):
     """
@@ -298,6 +314,10 @@ async def setsheet(update: Update, context: ContextTypes.DEFAULT_TYPE, override_
     (GOOGLE_CREDENTIALS_JSON's client_email) with Editor access - this is
     verified immediately by actually opening it and reading its title,
     rather than trusting the ID blindly.
+
+    `-export live|deferred` sets the hub's export mode (see
+    db.get_sheet_export_mode), either together with a sheet or on its own
+    (`/setsheet -export deferred`) to switch modes without re-binding.
     """
     chat_id = await resolve_hub_chat_id(update, context, "setsheet", override_chat_id)
     if chat_id is None:
@@ -313,7 +333,30 @@ async def setsheet(update: Update, context: ContextTypes.DEFAULT_TYPE, override_
         await update.message.reply_text("⛔️ Only admins can use /setsheet\\.", parse_mode="MarkdownV2")
         return
 
-    args = context.args
+    args = list(context.args or [])
+    export_mode = None
+    if "-export" in args:
+        i = args.index("-export")
+        export_mode = args[i + 1].lower() if i + 1 < len(args) else None
+        if export_mode not in SHEET_EXPORT_MODES:
+            await update.message.reply_text(
+                "❌ *Syntax:* `/setsheet [sheetid|sheeturl] -export live|deferred`", parse_mode="MarkdownV2"
+            )
+            return
+        del args[i:i + 2]
+
+    if not args and export_mode is not None:
+        with get_connection() as conn:
+            conn.execute(
+                "UPDATE all_groups SET sheet_export_mode = ? WHERE chat_id = ?", (export_mode, chat_id)
+            )
+            conn.commit()
+        await update.message.reply_text(
+            f"✅ Sheets export mode: *{export_mode}*\\. {_EXPORT_MODE_NOTES[export_mode]}",
+            parse_mode="MarkdownV2",
+        )
+        return
+
     if not args:
         await update.message.reply_text(
             "❌ *Syntax:* `/setsheet <sheetid|sheeturl>`", parse_mode="MarkdownV2"
@@ -324,6 +367,10 @@ async def setsheet(update: Update, context: ContextTypes.DEFAULT_TYPE, override_
     m = re.search(r"/d/([a-zA-Z0-9-_]+)", raw)
     sheet_id = m.group(1) if m else raw
 
+    # Always probe a fresh handle: a retry right after the customer fixed
+    # the sharing must not be answered from a handle cached back when the
+    # bot had no (or only Viewer) access.
+    invalidate_spreadsheet(sheet_id)
     try:
         ss = await open_spreadsheet(sheet_id)
         if not ss:
@@ -355,11 +402,18 @@ async def setsheet(update: Update, context: ContextTypes.DEFAULT_TYPE, override_
 
     with get_connection() as conn:
         cursor = conn.cursor()
+        cursor.execute("SELECT sheet_id FROM all_groups WHERE chat_id = ?", (chat_id,))
+        prev = cursor.fetchone()
+        previous_sheet_id = prev[0] if prev else None
         try:
             cursor.execute(
                 "UPDATE all_groups SET sheet_id = ?, sheet_name = ? WHERE chat_id = ?",
                 (sheet_id, sheet_name, chat_id),
             )
+            if export_mode is not None:
+                cursor.execute(
+                    "UPDATE all_groups SET sheet_export_mode = ? WHERE chat_id = ?", (export_mode, chat_id)
+                )
             conn.commit()
         except sqlite3.IntegrityError:
             await update.message.reply_text(
@@ -368,6 +422,11 @@ async def setsheet(update: Update, context: ContextTypes.DEFAULT_TYPE, override_
             )
             return
 
+    # The hub moved off its old sheet - nothing should write there anymore,
+    # so don't keep its handle alive until the TTL runs out.
+    if previous_sheet_id and previous_sheet_id != sheet_id:
+        invalidate_spreadsheet(previous_sheet_id)
+
     warning = ""
     if not edit_access_confirmed:
         sa_email = get_service_account_email()
@@ -378,8 +437,9 @@ async def setsheet(update: Update, context: ContextTypes.DEFAULT_TYPE, override_
             f"not just Viewer\\."
         )
 
+    mode_note = f"\n\nExport mode: *{export_mode}*\\. {_EXPORT_MODE_NOTES[export_mode]}" if export_mode else ""
     await update.message.reply_text(
-        f"✅ This group is now bound to `{sheet_name}`\\.{warning}",
+        f"✅ This group is now bound to `{sheet_name}`\\.{mode_note}{warning}",
         parse_mode="MarkdownV2",
     )
     await _push_control_sheet_main()
@@ -400,7 +460,7 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE, ove
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT type, subs_date_end, sheet_id, sheet_name FROM all_groups WHERE chat_id = ?",
+            "SELECT type, subs_date_end, sheet_id, sheet_name, sheet_export_mode FROM all_groups WHERE chat_id = ?",
             (chat_id,),
         )
         row = cursor.fetchone()
@@ -423,6 +483,8 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE, ove
     if pro:
         sheet_line = escape_markdown(row[3]) if row and row[2] and row[3] else "not bound \\- see /setsheet"
         lines.append(f"Sheet: {sheet_line}")
+        if row and row[2]:
+            lines.append(f"Export: {row[4] or 'live'}")
 
     await update.message.reply_text("\n".join(lines), parse_mode="MarkdownV2")
 
@@ -611,6 +673,87 @@ async def _push_control_sheet_botconfig() -> bool:
     return await sync_control_sheet_botconfig(rows)
 
 
+# ---------------------------------------------------------------------------
+# Debounced Control Sheet sync
+# ---------------------------------------------------------------------------
+# The bot being added to / removed from many chats in a burst (a batch of
+# invites, a spam wave of kicks) fires one my_chat_member update per chat -
+# each used to push three whole tabs right away. request_control_sheet_sync()
+# instead marks tabs dirty and pushes at most once per window: the first
+# request after a quiet spell is pushed immediately (a single add still
+# shows up in the Control Sheet right away), everything arriving within the
+# next _CONTROL_SHEET_DEBOUNCE_SECONDS is folded into ONE trailing push that
+# reads SQLite at flush time, so it always reflects the latest state.
+
+_CONTROL_SHEET_DEBOUNCE_SECONDS = 5.0
+
+_CONTROL_SHEET_PUSHERS = {
+    "main": _push_control_sheet_main,
+    "channels": _push_control_sheet_channels,
+    "chats_log": _push_control_sheet_chats_log,
+    "botconfig": _push_control_sheet_botconfig,
+}
+
+_control_sheet_dirty = set()
+_control_sheet_last_flush = {"at": None}
+_control_sheet_trailing = {"task": None}
+
+
+async def push_control_sheet_tabs(tabs) -> dict:
+    """
+    Pushes the given tabs (keys of _CONTROL_SHEET_PUSHERS) concurrently -
+    they're independent tabs, and the scheduler in sheets.py does the
+    pacing. Returns {tab: True/False}.
+    """
+    tabs = [tab for tab in _CONTROL_SHEET_PUSHERS if tab in set(tabs)]
+    results = await asyncio.gather(
+        *(_CONTROL_SHEET_PUSHERS[tab]() for tab in tabs), return_exceptions=True
+    )
+    outcome = {}
+    for tab, result in zip(tabs, results):
+        if isinstance(result, Exception):
+            logger.error(f"Control Sheet push for '{tab}' failed: {repr(result)}")
+            result = False
+        outcome[tab] = bool(result)
+    return outcome
+
+
+async def _flush_control_sheet_dirty() -> dict:
+    _control_sheet_last_flush["at"] = time.monotonic()
+    tabs = set(_control_sheet_dirty)
+    _control_sheet_dirty.clear()
+    if not tabs:
+        return {}
+    return await push_control_sheet_tabs(tabs)
+
+
+async def _flush_control_sheet_after(delay: float):
+    try:
+        await asyncio.sleep(delay)
+        await _flush_control_sheet_dirty()
+    finally:
+        _control_sheet_trailing["task"] = None
+
+
+async def request_control_sheet_sync(*tabs):
+    """
+    Marks `tabs` (keys of _CONTROL_SHEET_PUSHERS) as needing a push and
+    either pushes right away (nothing pushed within the debounce window)
+    or leaves it to the already-scheduled trailing push for this window.
+    """
+    _control_sheet_dirty.update(tabs)
+    if _control_sheet_trailing["task"] is not None:
+        return  # a trailing push is already coming - it'll pick these up
+    last = _control_sheet_last_flush["at"]
+    elapsed = None if last is None else time.monotonic() - last
+    if elapsed is None or elapsed >= _CONTROL_SHEET_DEBOUNCE_SECONDS:
+        await _flush_control_sheet_dirty()
+        return
+    _control_sheet_trailing["task"] = spawn(
+        "control_sheet", _flush_control_sheet_after(_CONTROL_SHEET_DEBOUNCE_SECONDS - elapsed),
+    )
+
+
 async def set_feature_flag(feature_key: str, min_tier: str, limit_count=_LIMIT_NO_CHANGE) -> bool:
     """
     THE way to change what tier a feature requires (and optionally its
@@ -24,8 +24,15 @@ from unittest.mock import AsyncMock, MagicMock, patch
 # ---------------------------------------------------------------------------
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
+import background_tasks as background_tasks_module
 import db as db_module
 import event_engine as event_engine_module
+import handlers as handlers_module
+import membership as membership_module
+import metrics as metrics_module
+import sheets as sheets_module
+import subscription as subscription_module
+import utils as utils_module
 from db import init_db
 from tests.helpers import (          # re-export so conftest consumers can use them
     make_user, make_chat, make_message, make_bot, make_update, make_context
@@ -62,6 +69,43 @@ def db_conn(db_path):
     conn.close()
 
 
+# ---------------------------------------------------------------------------
+# Metrics fixtures
+# ---------------------------------------------------------------------------
+
+@pytest.fixture()
+def metrics_on():
+    """
+    Turns metrics.py recording on for one test, starting from and leaving
+    behind an empty registry - recording is off for every other test.
+    """
+    metrics_module.reset()
+    metrics_module.enable()
+    yield
+    metrics_module.disable()
+    metrics_module.reset()
+
+
+def _clear_module_level_state():
+    event_engine_module._event_locks.clear()
+    event_engine_module._refresh_state.clear()
+    event_engine_module._click_buckets.clear()
+    event_engine_module._event_status_index.clear()
+    sheets_module._spreadsheet_cache.clear()
+    sheets_module._open_locks.clear()
+    sheets_module._sheet_buckets.clear()
+    sheets_module._throttle_stats.clear()
+    sheets_module._control_sheet_pushed.clear()
+    subscription_module._control_sheet_dirty.clear()
+    subscription_module._control_sheet_last_flush["at"] = None
+    subscription_module._control_sheet_trailing["task"] = None
+    utils_module._admin_rosters.clear()
+    utils_module._member_statuses.clear()
+    membership_module._limiter.clear()
+    handlers_module._refresh_job_tasks.clear()
+    background_tasks_module._task_classes.clear()
+
+
 @pytest.fixture(autouse=True)
 def _reset_module_level_state():
     """
@@ -74,12 +118,36 @@ def _reset_module_level_state():
     by one test (e.g. a cancelled task) could cause an unrelated later test
     using the same event_id to hang waiting on it. Clearing both dicts before
     every test keeps tests fully isolated from each other.
+
+    sheets.py's `_spreadsheet_cache` (and the scheduler's per-sheet token
+    buckets/counters, the Control Sheet's last-pushed grids) are reset for
+    the same reason - tests reuse fake sheet IDs like "fake_id", and a
+    handle cached or a bucket drained by one test must never leak into
+    another. Likewise subscription.py's Control Sheet debounce state, or
+    one test's push would defer the next test's into a trailing window.
+    utils.py's admin cache too: tests reuse chat/user ids with different
+    get_chat_member mocks. And event_engine's click buckets: every test
+    clicks as the same few users on "ev1", and one test's clicks must not
+    count against the next one's - nor one test's closed "ev1" turn the
+    next test's open "ev1" away.
+    background_tasks.py's per-class state holds semaphores bound to the
+    test's own event loop, which is gone by the next test.
     """
-    event_engine_module._event_locks.clear()
-    event_engine_module._refresh_state.clear()
+    _clear_module_level_state()
     yield
-    event_engine_module._event_locks.clear()
-    event_engine_module._refresh_state.clear()
+    _clear_module_level_state()
+
+
+@pytest.fixture(autouse=True)
+async def _cancel_background_tasks():
+    """
+    Background work a test kicks off through background_tasks.spawn (view
+    re-renders, Sheets exports...) and doesn't explicitly drain itself is
+    cancelled at the end of that test, inside its own event loop - not
+    left half-run for the loop's teardown to complain about.
+    """
+    yield
+    await background_tasks_module.drain_background_tasks(timeout=0)
 
 
 # ---------------------------------------------------------------------------
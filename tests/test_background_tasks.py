@@ -0,0 +1,125 @@
+"""
+Tests for background_tasks.py - the supervisor every fire-and-forget task
+goes through: per-class concurrency limits, same-key coalescing while
+waiting, failure logging/counting, and the shutdown drain's deadline.
+"""
+import asyncio
+
+import pytest
+
+import background_tasks
+from background_tasks import spawn, task_stats, drain_background_tasks
+
+
+class TestSpawn:
+    async def test_class_limit_caps_concurrency(self, monkeypatch):
+        monkeypatch.setitem(background_tasks.TASK_CLASS_LIMITS, "sheets", 3)
+        in_flight = {"now": 0, "peak": 0}
+
+        async def job():
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+            await asyncio.sleep(0.005)
+            in_flight["now"] -= 1
+
+        tasks = [spawn("sheets", job()) for _ in range(10)]
+        await asyncio.sleep(0)
+        assert task_stats()["sheets"]["in_flight"] == 3
+        assert task_stats()["sheets"]["waiting"] == 7
+
+        await asyncio.gather(*tasks)
+        assert in_flight["peak"] == 3
+        assert task_stats()["sheets"] == {
+            "limit": 3, "in_flight": 0, "waiting": 0, "done": 10, "failed": 0, "coalesced": 0,
+        }
+
+    async def test_same_key_coalesces_only_while_waiting(self, monkeypatch):
+        monkeypatch.setitem(background_tasks.TASK_CLASS_LIMITS, "view_refresh", 1)
+        runs = []
+        release = asyncio.Event()
+
+        async def render(event_id):
+            runs.append(event_id)
+            await release.wait()
+
+        first = spawn("view_refresh", render("ev1"), key="ev1")
+        await asyncio.sleep(0)  # ev1 is now running - a new ev1 render must queue
+        second = spawn("view_refresh", render("ev1"), key="ev1")
+        assert spawn("view_refresh", render("ev1"), key="ev1") is second
+        assert spawn("view_refresh", render("ev1"), key="ev1") is second
+        other = spawn("view_refresh", render("ev2"), key="ev2")
+
+        release.set()
+        await asyncio.gather(first, second, other)
+        assert runs == ["ev1", "ev1", "ev2"]
+        assert task_stats()["view_refresh"]["coalesced"] == 2
+
+    async def test_failure_is_logged_and_counted(self, caplog):
+        async def boom():
+            raise RuntimeError("sheet gone")
+
+        await spawn("sheets", boom(), key="ev1")
+
+        assert task_stats()["sheets"]["failed"] == 1
+        assert "Background task sheets [ev1] failed" in caplog.text
+
+    def test_unknown_class_is_rejected(self):
+        async def job():
+            pass
+
+        coro = job()
+        with pytest.raises(ValueError):
+            spawn("nope", coro)
+        coro.close()
+
+
+class TestDrain:
+    async def test_waits_for_running_and_waiting_tasks(self, monkeypatch):
+        monkeypatch.setitem(background_tasks.TASK_CLASS_LIMITS, "sheets", 1)
+        finished = []
+
+        async def job(i):
+            await asyncio.sleep(0.01)
+            finished.append(i)
+
+        for i in range(3):
+            spawn("sheets", job(i))
+
+        assert await drain_background_tasks(timeout=5) == 0
+        assert finished == [0, 1, 2]
+
+    async def test_deadline_cancels_what_is_left(self):
+        cancelled = []
+
+        async def stuck():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def quick():
+            pass
+
+        spawn("sheets", stuck())
+        spawn("view_refresh", quick(), key="ev1")
+
+        assert await drain_background_tasks(timeout=0.05) == 1
+        assert cancelled == [True]
+        assert task_stats()["view_refresh"]["done"] == 1
+        assert task_stats()["sheets"]["in_flight"] == 0
+
+    async def test_task_cancelled_before_it_starts_is_cleaned_up(self, monkeypatch):
+        monkeypatch.setitem(background_tasks.TASK_CLASS_LIMITS, "control_sheet", 1)
+
+        async def job():
+            await asyncio.sleep(60)
+
+        spawn("control_sheet", job())
+        queued = spawn("control_sheet", job(), key="push")
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+
+        assert task_stats()["control_sheet"]["waiting"] == 0
+        assert background_tasks._task_classes["control_sheet"]["waiting_keys"] == {}
+        await drain_background_tasks(timeout=0)
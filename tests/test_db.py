@@ -8,6 +8,7 @@ We import `init_db` and `track_user` directly and pass `db_path` explicitly,
 since those functions accept an optional path argument.
 """
 
+import argparse
 import sqlite3
 import pytest
 from datetime import datetime, timedelta
@@ -15,8 +16,10 @@ from db import (
     init_db, track_user, get_feature_flags, update_feature_flag, log_command_usage,
     get_event_total_going_headcount, add_to_waitlist, promote_next_from_waitlist,
     register_chat_added, register_chat_removed, get_feature_limit_for_chat, get_display_name,
-    dedupe_waitlist, get_shareevent_remaining_for_chat,
+    dedupe_waitlist, get_shareevent_remaining_for_chat, replace_chat_admins, set_chat_admin,
+    get_indexed_admin_chats, get_chats_needing_admin_snapshot, record_admin_snapshot_failure,
 )
+from scripts.gen_synthetic_db import generate
 
 
 # ---------------------------------------------------------------------------
@@ -138,7 +141,7 @@ class TestInitDb:
         init_db(db_path=path)
         cols = get_columns(path, "all_groups")
         for expected in ("chat_id", "type", "sheet_id", "sheet_name", "subs_date_start",
-                         "subs_date_end", "visibility", "date_bot_add"):
+                         "subs_date_end", "visibility", "date_bot_add", "sheet_export_mode"):
             assert expected in cols, f"all_groups missing '{expected}'"
 
     def test_sub_chats_columns(self, tmp_path):
@@ -523,6 +526,86 @@ class TestCommandLog:
         assert "command_text" in get_columns(path, "command_log")
 
 
+class TestActionLogTable:
+    """action_log: every click, kept locally, indexed for per-event/user/chat lookups."""
+
+    def test_indexes_exist(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        init_db(db_path=path)
+        indexes = {row[0] for row in fetch_all(
+            path, "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='action_log'")}
+        assert {"idx_action_log_event", "idx_action_log_user", "idx_action_log_chat_ts"} <= indexes
+
+
+class TestChatAdminsIndex:
+    """chat_admins: which user administers which chat, for DM hub resolution."""
+
+    def test_lookup_by_user_uses_the_primary_key(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        init_db(db_path=path)
+        plan = " ".join(row[3] for row in fetch_all(
+            path, "EXPLAIN QUERY PLAN SELECT chat_id FROM chat_admins WHERE user_id = ?", ("1",)))
+        assert "USING" in plan and "SCAN chat_admins" not in plan
+
+    def test_snapshot_replaces_a_chats_admins(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        init_db(db_path=path)
+        run_sql(path, "INSERT INTO all_groups (chat_id, chat_name, type) VALUES ('-100', 'Football', 'FREE')")
+        replace_chat_admins("-100", [1, 2], 1000.0, db_path=path)
+        replace_chat_admins("-100", [2, 3], 2000.0, db_path=path)
+
+        assert get_indexed_admin_chats(1, db_path=path) == []
+        assert get_indexed_admin_chats(3, db_path=path) == [("-100", "Football")]
+        assert fetch_all(path, "SELECT taken_at FROM chat_admin_snapshots WHERE chat_id='-100'") == [(2000.0,)]
+
+    def test_single_promotion_and_demotion(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        init_db(db_path=path)
+        set_chat_admin("-100", 7, True, db_path=path)
+        assert get_indexed_admin_chats(7, db_path=path) == [("-100", None)]
+        set_chat_admin("-100", 7, False, db_path=path)
+        assert get_indexed_admin_chats(7, db_path=path) == []
+
+    def test_chats_needing_a_snapshot(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        init_db(db_path=path)
+        run_sql(path, "INSERT INTO all_groups (chat_id, chat_name, type) VALUES ('-1', 'Fresh', 'FREE')")
+        run_sql(path, "INSERT INTO all_groups (chat_id, chat_name, type) VALUES ('-2', 'Stale', 'FREE')")
+        track_user("-3", "alice", "active", db_path=path)  # known only via main_group_users
+        replace_chat_admins("-1", [1], 5000.0, db_path=path)
+        replace_chat_admins("-2", [1], 100.0, db_path=path)
+
+        # never-snapshotted first, then the stalest
+        assert get_chats_needing_admin_snapshot(1000.0, 6000.0, 10, db_path=path) == [("-3", None), ("-2", "Stale")]
+        assert get_chats_needing_admin_snapshot(1000.0, 6000.0, 1, db_path=path) == [("-3", None)]
+
+    def test_failed_snapshots_back_off_exponentially(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        init_db(db_path=path)
+        run_sql(path, "INSERT INTO all_groups (chat_id, chat_name, type) VALUES ('-1', 'Gone', 'FREE')")
+
+        record_admin_snapshot_failure("-1", 1000.0, 60.0, 200.0, db_path=path)
+        assert get_chats_needing_admin_snapshot(0.0, 1059.0, 10, db_path=path) == []
+        assert get_chats_needing_admin_snapshot(0.0, 1060.0, 10, db_path=path) == [("-1", "Gone")]
+        record_admin_snapshot_failure("-1", 2000.0, 60.0, 200.0, db_path=path)
+        record_admin_snapshot_failure("-1", 3000.0, 60.0, 200.0, db_path=path)
+        assert fetch_all(path, "SELECT failures, retry_after FROM chat_admin_snapshots") == [(3, 3200.0)]  # capped
+
+        # a snapshot that works clears the backoff
+        replace_chat_admins("-1", [1], 3100.0, db_path=path)
+        assert fetch_all(path, "SELECT taken_at, failures, retry_after FROM chat_admin_snapshots") == [(3100.0, 0, None)]
+
+    def test_removing_the_bot_forgets_the_chats_admins(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        init_db(db_path=path)
+        register_chat_added("-100", "Football", "supergroup", "public", "2026-01-01 00:00:00", db_path=path)
+        replace_chat_admins("-100", [1], 1000.0, db_path=path)
+        register_chat_removed("-100", "2026-02-01 00:00:00", db_path=path)
+
+        assert fetch_all(path, "SELECT * FROM chat_admins") == []
+        assert fetch_all(path, "SELECT * FROM chat_admin_snapshots") == []
+
+
 class TestFeatureFlags:
     """
     feature_flags is the single source of truth for what's available at
@@ -856,6 +939,21 @@ class TestRegisterChatRemoved:
         conn = sqlite3.connect(path)
         assert conn.execute("SELECT COUNT(*) FROM all_chats_bot_log WHERE chat_id='-999'").fetchone()[0] == 0
 
+    def test_returns_the_removed_groups_sheet_id(self, tmp_path):
+        """main.py drops the cached Sheets handle for whatever sheet the
+        removed hub was bound to - that needs the sheet_id handed back."""
+        path = str(tmp_path / "t.db")
+        init_db(db_path=path)
+        register_chat_added("-1", "Bound", "supergroup", "public", "2026-01-01 00:00:00", db_path=path)
+        register_chat_added("-2", "Unbound", "supergroup", "public", "2026-01-01 00:00:00", db_path=path)
+        conn = sqlite3.connect(path)
+        conn.execute("UPDATE all_groups SET sheet_id='sheet-1' WHERE chat_id='-1'")
+        conn.commit()
+        conn.close()
+        assert register_chat_removed("-1", "2026-01-03 00:00:00", db_path=path) == "sheet-1"
+        assert register_chat_removed("-2", "2026-01-03 00:00:00", db_path=path) is None
+        assert register_chat_removed("-999", "2026-01-03 00:00:00", db_path=path) is None
+
 
 # ---------------------------------------------------------------------------
 # get_feature_limit_for_chat - core per-tier usage-limit lookup, used by
@@ -1085,3 +1183,47 @@ class TestGetShareeventRemainingForChat:
         limit, remaining = get_shareevent_remaining_for_chat("-100", db_path=path)
         assert limit == 1
         assert remaining == 0
+
+
+class TestSyntheticDatabase:
+    """scripts/gen_synthetic_db.py - must keep working against init_db's
+    schema, and the same seed must always give the same database."""
+
+    @staticmethod
+    def _generate(path, seed=0):
+        return generate(argparse.Namespace(
+            out=str(path), hubs=12, people=400, roster=25, subchats=2, events=60, shares=1.5,
+            commands=500, seed=seed,
+        ))
+
+    def test_same_seed_same_rows(self, tmp_path):
+        counts = self._generate(tmp_path / "a.db")
+        self._generate(tmp_path / "b.db")
+        self._generate(tmp_path / "c.db", seed=1)
+        dumps = [list(sqlite3.connect(str(tmp_path / f"{n}.db")).iterdump()) for n in "abc"]
+
+        assert dumps[0] == dumps[1]
+        assert dumps[0] != dumps[2]
+        for table in ("all_groups", "main_group_users", "events", "event_shares", "event_users",
+                      "sub_chats", "action_log", "command_log"):
+            assert counts[table] > 0, table
+        assert counts["command_log"] == 500
+
+    def test_event_blobs_read_like_real_ones(self, tmp_path):
+        path = str(tmp_path / "s.db")
+        self._generate(path)
+        conn = sqlite3.connect(path)
+        rows = conn.execute(
+            "SELECT chat_id, going_data, counters_data, waitlist_data, total_limit FROM events"
+        ).fetchall()
+        conn.close()
+
+        for chat_id, going_data, counters_data, waitlist_data, total_limit in rows:
+            going = json.loads(going_data)
+            if total_limit is not None:
+                assert len(going) <= total_limit
+            assert set(json.loads(counters_data)) <= {g.split(" (")[0] for g in going}
+            assert dedupe_waitlist(json.loads(waitlist_data)) == json.loads(waitlist_data)
+        chat_id, going = next((r[0], json.loads(r[1])) for r in rows if "(" in r[1])
+        username, user_id = next(g[:-1].split(" (") for g in going if "(" in g)
+        assert get_display_name(chat_id, user_id, username, db_path=path) != username
@@ -0,0 +1,59 @@
+"""
+Tests for scripts/fake_bot_api.py - the local Bot API stand-in the
+end-to-end benchmarks run the real bot against. Driven through a real PTB
+Bot, so what's checked is what the bot's own error handling will see:
+flood control as RetryAfter, an unchanged edit as the BadRequest the view
+refresh code ignores, admin lists PTB can parse.
+"""
+import pytest
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, RetryAfter
+
+from scripts.fake_bot_api import FakeBotAPI
+
+
+@pytest.fixture
+async def fake():
+    api = FakeBotAPI()
+    await api.start()
+    yield api
+    await api.stop()
+
+
+def _bot(api):
+    return Bot("123:TEST", base_url=f"{api.base_url}/bot")
+
+
+class TestFakeBotAPI:
+    async def test_per_chat_flood_control_answers_retry_after(self, fake):
+        fake.chat_rate, fake.chat_burst = 1.0, 2
+        async with _bot(fake) as bot:
+            await bot.send_message(chat_id=-100, text="a")
+            await bot.send_message(chat_id=-100, text="b")
+            with pytest.raises(RetryAfter) as exc:
+                await bot.send_message(chat_id=-100, text="c")
+            assert exc.value.retry_after == 1
+            await bot.send_message(chat_id=-200, text="another chat is unaffected")
+
+        assert fake.retry_after == {"-100": 1}
+        assert fake.outcomes[("sendMessage", "429")] == 1
+        assert fake.outcomes[("sendMessage", "ok")] == 3
+
+    async def test_unchanged_edit_is_not_modified(self, fake):
+        markup = InlineKeyboardMarkup([[InlineKeyboardButton("Going", callback_data="going_ev1")]])
+        async with _bot(fake) as bot:
+            await bot.edit_message_text(chat_id=-100, message_id=1, text="v1", reply_markup=markup)
+            with pytest.raises(BadRequest, match="Message is not modified"):
+                await bot.edit_message_text(chat_id=-100, message_id=1, text="v1", reply_markup=markup)
+            await bot.edit_message_text(chat_id=-100, message_id=1, text="v2", reply_markup=markup)
+
+        assert fake.last_answer[("editMessageText", "-100")][1] == "ok"
+
+    async def test_admins_and_members(self, fake):
+        fake.admins = {"-100": [1, 2]}
+        async with _bot(fake) as bot:
+            admins = await bot.get_chat_administrators(chat_id=-100)
+            member = await bot.get_chat_member(chat_id=-100, user_id=3)
+
+        assert [(a.user.id, a.status) for a in admins] == [(1, "creator"), (2, "administrator")]
+        assert member.status == "member"
@@ -8,23 +8,31 @@ pytest-asyncio is configured in "auto" mode (see pytest.ini) so individual
 test functions don't need the @pytest.mark.asyncio decorator.
 """
 
+import asyncio
 import json
+import logging
 import sqlite3
+import time
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from telegram.error import BadRequest
+
 from tests.helpers import (
     make_user, make_chat, make_message, make_bot,
     make_update, make_context, make_callback_update,
 )
 import handlers
 import event_engine
+import sheets
 import monitors
 import subscription
 import aliases
 import help_system
 import db
 import config
+import background_tasks
+import utils
 
 
 # ── helpers ──────────────────────────────────────────────────────────────────
@@ -57,6 +65,14 @@ def insert_premium(db_path, chat_id="-100123", days=30):
     conn.close()
 
 
+def index_admin(db_path, chat_id, user_id=111):
+    """
+    Lists user_id as an admin of chat_id in the chat_admins index - what DM
+    hub resolution reads (filled by admin snapshots in production).
+    """
+    db.set_chat_admin(chat_id, user_id, True, db_path=db_path)
+
+
 def get_event(db_path, event_id="ev1"):
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
@@ -99,6 +115,17 @@ def get_event_user(db_path, event_id="ev1", chat_id="-200", user_id="1"):
     return row
 
 
+
+async def run_refreshusersall(upd, ctx):
+    """
+    /refreshusersall only starts a background job - runs the command, waits
+    for that job, and returns the final text of its progress message.
+    """
+    await handlers.refreshusersall(upd, ctx)
+    await asyncio.gather(*list(handlers._refresh_job_tasks.values()))
+    return ctx.bot.edit_message_text.call_args.kwargs["text"]
+
+
 class FakeWorksheet:
     """Records every append/update call instead of touching the network."""
 
@@ -1705,9 +1732,8 @@ class TestRefreshusersall:
         ctx  = make_context(bot=bot, args=[])
 
         with patch("handlers.sync_users_sheet", new_callable=AsyncMock):
-            await handlers.refreshusersall(upd, ctx)
+            reply = await run_refreshusersall(upd, ctx)
 
-        reply = msg.reply_text.call_args.args[0]
         assert "The Hub" in reply
         assert "No monitored" not in reply
 
@@ -1744,13 +1770,120 @@ class TestRefreshusersall:
         fake_ss = FakeSpreadsheet()
         with patch("sheets.get_sheet_for_chat", new_callable=AsyncMock), \
              patch("sheets.open_spreadsheet", new_callable=AsyncMock, return_value=fake_ss):
-            await handlers.refreshusersall(upd, ctx)
+            reply = await run_refreshusersall(upd, ctx)
 
-        reply = msg.reply_text.call_args.args[0]
         assert "Downtown" in reply
         assert "Synced" in reply
 
 
+class TestRefreshusersallJobs:
+    """
+    /refreshusersall as a background job: one progress message edited in
+    place, a checkpoint per chat to resume from after a restart, and only
+    one run per hub at a time.
+    """
+
+    @staticmethod
+    def _hub_with_monitors(db_path, n):
+        insert_premium(db_path, chat_id="-100123")
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            "INSERT INTO sub_chats (chat_id, chat_name, is_monitored, owner_chat_id) VALUES (?, ?, 1, '-100123')",
+            [(f"-20{i}", f"Child {i}") for i in range(n)],
+        )
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _command(bot):
+        chat = make_chat(chat_id=-100123)
+        msg  = make_message(chat=chat)
+        msg.reply_text = AsyncMock(return_value=MagicMock(chat_id=-100123, message_id=77))
+        return msg, make_update(chat=chat, message=msg), make_context(bot=bot, args=[])
+
+    async def test_command_returns_at_once_and_job_edits_one_message(self, db_path):
+        self._hub_with_monitors(db_path, 3)
+        bot = make_bot()
+        bot.get_chat = AsyncMock(return_value=MagicMock(title="Hub"))
+        msg, upd, ctx = self._command(bot)
+
+        with patch("handlers.sync_users_sheet", new_callable=AsyncMock):
+            await handlers.refreshusersall(upd, ctx)
+            assert "0/4 done" in msg.reply_text.call_args.args[0]
+            await asyncio.gather(*list(handlers._refresh_job_tasks.values()))
+
+        edits = bot.edit_message_text.call_args_list
+        assert {(c.kwargs["chat_id"], c.kwargs["message_id"]) for c in edits} == {("-100123", 77)}
+        final = edits[-1].kwargs["text"]
+        assert final.count("Synced") == 4 and "done" not in final
+        assert db.get_running_refresh_job_id("-100123") is None
+
+    async def test_second_run_for_the_same_hub_is_refused(self, db_path):
+        self._hub_with_monitors(db_path, 1)
+        db.create_refresh_job("-100123", [("-100123", "Hub")], "01.01.2026 00:00")
+        bot = make_bot()
+        msg, upd, ctx = self._command(bot)
+
+        await handlers.refreshusersall(upd, ctx)
+
+        assert "already running" in msg.reply_text.call_args.args[0]
+        assert handlers._refresh_job_tasks == {}
+        assert db.create_refresh_job("-100123", [("-100123", "Hub")], "01.01.2026 00:00") is None
+
+    async def test_resumes_from_the_first_unfinished_chat(self, db_path):
+        self._hub_with_monitors(db_path, 2)
+        job_id = db.create_refresh_job(
+            "-100123", [("-100123", "Hub"), ("-200", "Child 0"), ("-201", "Child 1")], "01.01.2026 00:00",
+        )
+        db.set_refresh_job_progress_message(job_id, "-100123", "77")
+        db.complete_refresh_job_chat(job_id, 0, "done", removed=2)  # finished before the "restart"
+
+        bot = make_bot()
+        synced = []
+
+        async def fake_sync(cid, members):
+            synced.append(cid)
+
+        with patch("handlers.sync_users_sheet", side_effect=fake_sync):
+            await handlers.resume_refresh_jobs(MagicMock(bot=bot))
+            await asyncio.gather(*list(handlers._refresh_job_tasks.values()))
+
+        assert synced == ["-200", "-201"]
+        final = bot.edit_message_text.call_args.kwargs
+        assert final["message_id"] == 77
+        assert "Hub` \\(-2\\)" in final["text"] and "Child 1" in final["text"]
+        assert db.get_refresh_job(job_id)[1] == "done"
+
+    async def test_stopping_leaves_the_job_resumable(self, db_path):
+        self._hub_with_monitors(db_path, 1)
+        job_id = db.create_refresh_job("-100123", [("-100123", "Hub"), ("-200", "Child 0")], "01.01.2026 00:00")
+        started = asyncio.Event()
+
+        async def slow_sync(cid, members):
+            started.set()
+            await asyncio.sleep(10)
+
+        with patch("handlers.sync_users_sheet", side_effect=slow_sync):
+            handlers.start_refresh_job(make_bot(), job_id)
+            await started.wait()
+            await handlers.stop_refresh_jobs()
+
+        assert handlers._refresh_job_tasks == {}
+        assert db.get_running_refresh_job_ids() == [job_id]
+        assert [row[3] for row in db.get_refresh_job_chats(job_id)] == ["pending", "pending"]
+
+    async def test_job_stopped_before_it_started_is_forgotten(self, db_path):
+        self._hub_with_monitors(db_path, 1)
+        job_id = db.create_refresh_job("-100123", [("-100123", "Hub"), ("-200", "Child 0")], "01.01.2026 00:00")
+
+        handlers.start_refresh_job(make_bot(), job_id)
+        await handlers.stop_refresh_jobs()  # cancelled before its first step
+        await asyncio.sleep(0)
+
+        assert handlers._refresh_job_tasks == {}
+        assert db.get_running_refresh_job_ids() == [job_id]
+
+
 class TestStatusCommand:
     """/status - shows Type/Due Date/Sheet for the current (or DM-selected) hub."""
 
@@ -2282,6 +2415,495 @@ class TestButtonHandlerActionsLogNaming:
         assert ws.appended_rows[0][1] == "GOING"
 
 
+class TestDeferredSheetExport:
+    """
+    A hub in 'deferred' export mode (/setsheet -export deferred) makes no
+    Sheets calls while an event runs - clicks stay sheet_pending in
+    action_log - and exports Actions, the Events row and EventUsers
+    together at Save & Close / Cancel.
+    """
+
+    @staticmethod
+    def _set_deferred(db_path):
+        insert_premium(db_path, chat_id=MAIN_CHAT)
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE all_groups SET sheet_export_mode = 'deferred', sheet_id = 'sheet' WHERE chat_id = ?",
+                     (MAIN_CHAT,))
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _park(db_path, event_id, action, user_id, username):
+        conn = sqlite3.connect(db_path)
+        db.record_action(conn.cursor(), event_id, MAIN_CHAT, user_id, username, action, sheet_pending=True)
+        conn.commit()
+        conn.close()
+
+    async def test_click_is_parked_without_any_sheets_call(self, db_path):
+        self._set_deferred(db_path)
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        upd = make_callback_update("going_ev1", chat_id=int(MAIN_CHAT), user=make_user(user_id=1, username="alice"))
+
+        with patch("event_engine.get_sheet_for_chat", new_callable=AsyncMock, return_value="sheet"), \
+             patch("event_engine.open_spreadsheet", new_callable=AsyncMock) as open_mock:
+            await handlers.button_handler(upd, make_context(bot=make_bot()))
+
+        open_mock.assert_not_called()
+        parked = db.get_pending_sheet_actions("ev1")
+        assert [entry["action"] for entry in parked] == ["GOING"]
+
+    async def test_click_is_not_parked_when_the_hub_has_no_sheet(self, db_path):
+        self._set_deferred(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE all_groups SET sheet_id = NULL WHERE chat_id = ?", (MAIN_CHAT,))
+        conn.commit()
+        conn.close()
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        upd = make_callback_update("going_ev1", chat_id=int(MAIN_CHAT), user=make_user(user_id=1, username="alice"))
+
+        await handlers.button_handler(upd, make_context(bot=make_bot()))
+
+        assert [entry["action"] for entry in db.get_event_actions("ev1")] == ["GOING"]
+        assert db.get_pending_sheet_actions("ev1") == []
+
+    async def test_save_exports_actions_events_row_and_event_users_together(self, db_path):
+        self._set_deferred(db_path)
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT, event_status=1, going=json.dumps(["alice (1)"]))
+        self._park(db_path, "ev1", "GOING", 1, "alice")
+        ctx = make_context(bot=make_bot())
+        upd = make_callback_update("save_ev1", chat_id=int(MAIN_CHAT), user=make_user(user_id=9, username="admin"))
+
+        fake_ss = FakeSpreadsheet()
+        sync_mock = AsyncMock()
+        with patch("event_engine.get_sheet_for_chat", new_callable=AsyncMock, return_value="sheet"), \
+             patch("event_engine.open_spreadsheet", new_callable=AsyncMock, return_value=fake_ss), \
+             patch("event_engine.sync_event_users_sheet", sync_mock):
+            await handlers.button_handler(upd, ctx)
+            assert fake_ss.worksheets == {}, "nothing may be written before the export task runs"
+            await background_tasks.drain_background_tasks(timeout=5)
+
+        actions = fake_ss.worksheets["Actions"].appended_rows
+        assert [row[1] for row in actions] == ["GOING", "SAVE"]
+        events_row = fake_ss.worksheets["Events"].appended_rows[0]
+        assert events_row[0] == "ev1" and events_row[6] == "CLOSED"
+        sync_mock.assert_awaited_once()
+        assert sync_mock.call_args.args[2] == ["1"]
+        assert db.get_pending_sheet_actions("ev1") == []
+        # exported, not deleted - the local log keeps every click
+        assert [e["action"] for e in db.get_event_actions("ev1")] == ["GOING", "SAVE"]
+
+    async def test_cancel_exports_actions_and_events_row_but_no_event_users(self, db_path):
+        self._set_deferred(db_path)
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT, going=json.dumps(["alice (1)"]))
+        self._park(db_path, "ev1", "GOING", 1, "alice")
+        ctx = make_context(bot=make_bot())
+        upd = make_callback_update("cancel_ev1", chat_id=int(MAIN_CHAT), user=make_user(user_id=9, username="admin"))
+
+        fake_ss = FakeSpreadsheet()
+        sync_mock = AsyncMock()
+        with patch("event_engine.get_sheet_for_chat", new_callable=AsyncMock, return_value="sheet"), \
+             patch("event_engine.open_spreadsheet", new_callable=AsyncMock, return_value=fake_ss), \
+             patch("event_engine.sync_event_users_sheet", sync_mock), \
+             patch("event_engine.is_real_admin", new_callable=AsyncMock, return_value=True):
+            await handlers.button_handler(upd, ctx)
+            await background_tasks.drain_background_tasks(timeout=5)
+
+        assert fake_ss.worksheets["Actions"].appended_rows[0][1] == "GOING"
+        assert fake_ss.worksheets["Events"].appended_rows[0][6] == "CANCELED"
+        sync_mock.assert_not_called()
+
+    async def test_failed_export_keeps_parked_rows(self, db_path):
+        self._park(db_path, "ev1", "GOING", 1, "alice")
+        with patch("event_engine.open_spreadsheet", new_callable=AsyncMock, side_effect=RuntimeError("down")):
+            await event_engine._sheets_export_event("sheet", MAIN_CHAT, "ev1", "CANCELED", 0, ["ev1"])
+
+        assert len(db.get_pending_sheet_actions("ev1")) == 1
+
+    async def test_setsheet_export_flag_alone_switches_mode(self, db_path):
+        insert_premium(db_path, chat_id=MAIN_CHAT)
+        bot = make_bot()
+        bot.get_chat_member = AsyncMock(return_value=MagicMock(status="administrator"))
+        chat = make_chat(chat_id=int(MAIN_CHAT), chat_type="supergroup")
+        msg = make_message(chat=chat)
+        upd = make_update(chat=chat, user=make_user(user_id=1), message=msg)
+
+        with patch("subscription.open_spreadsheet", new_callable=AsyncMock) as open_mock:
+            await subscription.setsheet(upd, make_context(bot=bot, args=["-export", "deferred"]))
+
+        open_mock.assert_not_called()
+        assert db.get_sheet_export_mode(MAIN_CHAT) == "deferred"
+        assert "deferred" in msg.reply_text.call_args.args[0]
+
+    async def test_setsheet_rejects_unknown_export_mode(self, db_path):
+        insert_premium(db_path, chat_id=MAIN_CHAT)
+        bot = make_bot()
+        bot.get_chat_member = AsyncMock(return_value=MagicMock(status="administrator"))
+        chat = make_chat(chat_id=int(MAIN_CHAT), chat_type="supergroup")
+        msg = make_message(chat=chat)
+        upd = make_update(chat=chat, user=make_user(user_id=1), message=msg)
+
+        await subscription.setsheet(upd, make_context(bot=bot, args=["abc", "-export", "weekly"]))
+
+        assert "Syntax" in msg.reply_text.call_args.args[0]
+        assert db.get_sheet_export_mode(MAIN_CHAT) == "live"
+
+
+class TestActionLog:
+    """
+    Every button click lands in the local action_log table, inside the
+    click's own transaction - for every hub, Sheets bound or not - and the
+    Actions tab is exported from those rows.
+    """
+
+    async def test_click_is_logged_for_a_free_hub_without_sheets(self, db_path):
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        upd = make_callback_update("going_ev1", chat_id=int(MAIN_CHAT), user=make_user(user_id=1, username="alice"))
+
+        with patch("event_engine.open_spreadsheet", new_callable=AsyncMock) as open_mock:
+            await handlers.button_handler(upd, make_context(bot=make_bot()))
+
+        open_mock.assert_not_called()
+        (entry,) = db.get_event_actions("ev1")
+        assert (entry["action"], entry["user_id"], entry["username"], entry["chat_id"]) == ("GOING", "1", "alice", MAIN_CHAT)
+        assert entry["sheet_pending"] == 0
+
+    async def test_live_hub_exports_the_logged_row(self, db_path):
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        upd = make_callback_update("notgoing_ev1", chat_id=int(MAIN_CHAT), user=make_user(user_id=1, username="alice"))
+
+        fake_ss = FakeSpreadsheet()
+        with patch("event_engine.get_sheet_for_chat", new_callable=AsyncMock, return_value="sheet"), \
+             patch("event_engine.open_spreadsheet", new_callable=AsyncMock, return_value=fake_ss):
+            await handlers.button_handler(upd, make_context(bot=make_bot()))
+
+        (entry,) = db.get_event_actions("ev1")
+        (row,) = fake_ss.worksheets["Actions"].appended_rows
+        assert row == sheets.action_log_row(entry)
+        assert row[:4] == ["ev1", "NOTGOING", "alice", "1"]
+        assert row[5] == MAIN_CHAT
+
+    def test_guest_edits_are_logged_under_their_editmode_names(self):
+        assert event_engine._logged_action_name("incgst") == "ADD_editmode"
+        assert event_engine._logged_action_name("decgst") == "SUB_editmode"
+        assert event_engine._logged_action_name("kick") == "KICK"
+
+    async def test_user_and_chat_history_queries(self, db_path):
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+        db.record_action(cur, "ev1", MAIN_CHAT, 1, "alice", "GOING")
+        db.record_action(cur, "ev2", "-200", 1, "alice", "NOTGOING")
+        db.record_action(cur, "ev1", MAIN_CHAT, 2, "bob", "GOING")
+        conn.commit()
+        conn.close()
+
+        assert [e["event_id"] for e in db.get_user_actions(1)] == ["ev2", "ev1"]
+        assert [e["event_id"] for e in db.get_user_actions(1, chat_id="-200")] == ["ev2"]
+        assert [e["username"] for e in db.get_chat_actions(MAIN_CHAT)] == ["alice", "bob"]
+        assert db.get_chat_actions(MAIN_CHAT, since="2999-01-01") == []
+
+
+class TestAdminStatusCache:
+    """
+    is_real_admin answers from a per-chat cache (admin rosters from
+    getChatAdministrators, single getChatMember answers, live chat_member
+    updates) instead of a Telegram round trip on every check - and
+    button_handler doesn't ask at all for clicks that aren't admin-gated.
+    """
+
+    async def test_second_check_is_served_from_cache(self):
+        bot = make_bot()
+        user = make_user(user_id=5)
+        assert await utils.is_real_admin(bot, -100, user) is True
+        assert await utils.is_real_admin(bot, -100, user) is True
+        bot.get_chat_member.assert_awaited_once()
+
+    async def test_failed_lookup_is_not_cached(self):
+        bot = make_bot()
+        bot.get_chat_member = AsyncMock(side_effect=[RuntimeError("timeout"), MagicMock(status="creator")])
+        user = make_user(user_id=5)
+        assert await utils.is_real_admin(bot, -100, user) is False
+        assert await utils.is_real_admin(bot, -100, user) is True
+
+    async def test_admin_roster_snapshot_answers_without_get_chat_member(self):
+        bot = make_bot()
+        utils.remember_chat_admins(-100, [MagicMock(user=make_user(user_id=5))])
+        assert await utils.is_real_admin(bot, -100, make_user(user_id=5)) is True
+        assert await utils.is_real_admin(bot, -100, make_user(user_id=6)) is False
+        bot.get_chat_member.assert_not_called()
+
+    async def test_chat_member_update_overrides_cached_answer(self):
+        bot = make_bot()
+        user = make_user(user_id=5)
+        utils.remember_chat_admins(-100, [MagicMock(user=user)])
+        assert await utils.is_real_admin(bot, -100, user) is True
+        utils.note_chat_member_status(-100, 5, "member")
+        assert await utils.is_real_admin(bot, -100, user) is False
+
+    async def test_expired_entries_are_looked_up_again(self, monkeypatch):
+        bot = make_bot()
+        user = make_user(user_id=5)
+        monkeypatch.setattr(utils, "ADMIN_CACHE_TTL_SECONDS", -1.0)
+        await utils.is_real_admin(bot, -100, user)
+        await utils.is_real_admin(bot, -100, user)
+        assert bot.get_chat_member.await_count == 2
+
+    async def test_going_click_skips_the_admin_lookup(self, db_path):
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        bot = make_bot()
+        upd = make_callback_update("going_ev1", chat_id=int(MAIN_CHAT), user=make_user(user_id=1, username="alice"))
+
+        await handlers.button_handler(upd, make_context(bot=bot))
+
+        bot.get_chat_member.assert_not_called()
+        assert db.get_event_actions("ev1")[0]["action"] == "GOING"
+
+
+class TestClickFloodProtection:
+    """
+    event_engine.admit_click, checked before the event lock: a per-(user,
+    event) token bucket, and double-taps of the same button dropped.
+    Rejected clicks are only ever answered - no DB read, no broadcast.
+    """
+
+    async def _click(self, data, user, chat_id=int(MAIN_CHAT), message_id=1, bot=None):
+        upd = make_callback_update(data, chat_id=chat_id, user=user, message_id=message_id)
+        with patch("event_engine.schedule_view_refresh", new_callable=AsyncMock) as refresh:
+            await handlers.button_handler(upd, make_context(bot=bot or make_bot()))
+        return upd.callback_query, refresh
+
+    async def test_double_tap_is_applied_once(self, db_path):
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        alice = make_user(user_id=1, username="alice")
+
+        await self._click("add_ev1", alice)
+        query, refresh = await self._click("add_ev1", alice)
+
+        assert db.get_event_actions("ev1")[0]["action"] == "ADD"
+        assert len(db.get_event_actions("ev1")) == 1
+        query.answer.assert_awaited_once_with()
+        refresh.assert_not_called()
+
+    async def test_same_button_on_another_chats_copy_is_not_a_repeat(self):
+        assert event_engine.admit_click(1, "ev1", "going_ev1", "-200", 5) == (True, None)
+        assert event_engine.admit_click(1, "ev1", "going_ev1", "-300", 9) == (True, None)
+        assert event_engine.admit_click(1, "ev1", "going_ev1", "-300", 9) == (False, None)
+
+    async def test_flood_is_rejected_with_a_short_answer(self, db_path, monkeypatch):
+        monkeypatch.setattr(event_engine, "CLICK_BURST", 3)
+        monkeypatch.setattr(event_engine, "CLICKS_PER_SECOND", 0.01)
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        alice = make_user(user_id=1, username="alice")
+
+        for data in ("add_ev1", "sub_ev1", "add_ev1"):
+            await self._click(data, alice)
+        query, refresh = await self._click("sub_ev1", alice)
+
+        query.answer.assert_awaited_once_with(text=event_engine.CLICK_RATE_LIMITED_TEXT)
+        refresh.assert_not_called()
+        assert len(db.get_event_actions("ev1")) == 3
+
+        # another user on the same event has their own bucket
+        _, refresh = await self._click("add_ev1", make_user(user_id=2, username="bob"))
+        refresh.assert_called_once()
+
+    async def test_bucket_refills_over_time(self, monkeypatch):
+        monkeypatch.setattr(event_engine, "CLICK_BURST", 1)
+        monkeypatch.setattr(event_engine, "CLICKS_PER_SECOND", 1000)
+        monkeypatch.setattr(event_engine, "CLICK_DEDUPE_SECONDS", 0)
+        assert event_engine.admit_click(1, "ev1", "add_ev1")[0] is True
+        time.sleep(0.005)
+        assert event_engine.admit_click(1, "ev1", "add_ev1")[0] is True
+
+    async def test_rejected_click_never_takes_the_event_lock(self, db_path, monkeypatch):
+        monkeypatch.setattr(event_engine, "CLICK_BURST", 1)
+        monkeypatch.setattr(event_engine, "CLICKS_PER_SECOND", 0.01)
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        alice = make_user(user_id=1, username="alice")
+        await self._click("going_ev1", alice)
+
+        async with event_engine.event_lock("ev1"):  # a rejected click must not queue behind this
+            query, _ = await asyncio.wait_for(self._click("notgoing_ev1", alice), timeout=1)
+        assert query.answer.await_args.kwargs["text"] == event_engine.CLICK_RATE_LIMITED_TEXT
+
+    async def test_admin_verification_taps_are_not_rate_limited(self, db_path):
+        names = [f"p{i}" for i in range(20)]
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT, event_status=1,
+                     going=json.dumps([f"{n} ({i})" for i, n in enumerate(names, 100)]))
+        admin = make_user(user_id=9, username="admin")
+
+        def kicked():
+            conn = sqlite3.connect(db_path)
+            (data,) = conn.execute("SELECT kicked_data FROM events WHERE event_id = 'ev1'").fetchone()
+            conn.close()
+            return json.loads(data)
+
+        answers = []
+        with patch("event_engine.is_real_admin", new_callable=AsyncMock, return_value=True):
+            for action in ("kick", "return"):
+                for n in names:
+                    query, _ = await self._click(f"{action}_ev1:{n}", admin)
+                    answers.append(query.answer.await_args)
+                if action == "kick":
+                    assert kicked() == names
+
+        assert all(a.kwargs.get("text") != event_engine.CLICK_RATE_LIMITED_TEXT for a in answers)
+        assert kicked() == []
+        # still deduplicated
+        assert event_engine.admit_click(9, "ev2", "kick_ev2:p0", metered=False) == (True, None)
+        assert event_engine.admit_click(9, "ev2", "kick_ev2:p0", metered=False) == (False, None)
+
+
+class TestCallbackPreDispatch:
+    """
+    button_handler's in-memory pre-dispatch: clicks on events the status
+    index knows are closed/canceled never reach the lock or SQLite, and
+    admin status is only looked up for admin-gated actions.
+    """
+
+    async def _click(self, data, user_id=1, bot=None):
+        upd = make_callback_update(data, chat_id=int(MAIN_CHAT), user=make_user(user_id=user_id, username=f"u{user_id}"))
+        await handlers.button_handler(upd, make_context(bot=bot or make_bot()))
+        return upd.callback_query
+
+    async def test_closed_event_is_indexed_then_rejected_without_sqlite(self, db_path, monkeypatch):
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT, event_status=2)
+        await self._click("going_ev1")
+        assert event_engine._event_status_index == {"ev1": 2}
+
+        def _no_db(*a, **k):
+            raise AssertionError("SQLite touched for a click on a closed event")
+        monkeypatch.setattr(event_engine, "get_connection", _no_db)
+        bot = make_bot()
+        query = await self._click("close_ev1", user_id=2, bot=bot)
+
+        query.answer.assert_awaited_once_with()
+        bot.get_chat_member.assert_not_called()
+
+    async def test_cancel_click_indexes_the_event(self, db_path):
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        await self._click("cancel_ev1")
+        assert event_engine.is_event_final("ev1")
+        assert get_event(db_path, "ev1")[6] == -1  # event_status column
+
+    async def test_open_events_are_not_indexed(self, db_path):
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        await self._click("going_ev1")
+        assert event_engine._event_status_index == {}
+
+    async def test_admin_lookup_only_for_admin_gated_actions(self, db_path):
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        bot = make_bot()
+        for data in ("going_ev1", "add_ev1", "sub_ev1", "notgoing_ev1"):
+            await self._click(data, bot=bot)
+        bot.get_chat_member.assert_not_called()
+
+        await self._click("close_ev1", bot=bot)
+        bot.get_chat_member.assert_awaited_once()
+
+    def test_index_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(event_engine, "_STATUS_INDEX_MAX", 3)
+        for i in range(5):
+            event_engine.note_event_status(f"ev{i}", 2)
+        assert list(event_engine._event_status_index) == ["ev2", "ev3", "ev4"]
+
+
+class TestEventRegistries:
+    """
+    event_engine's per-event registries free themselves: a lock entry lives
+    only while someone holds or waits for it, refresh state only while a
+    broadcast runs, click buckets go when the event closes or cancels.
+    """
+
+    async def test_lock_entry_lives_exactly_as_long_as_its_users(self):
+        order = []
+        release = asyncio.Event()
+
+        async def hold(name):
+            async with event_engine.event_lock("ev1"):
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.create_task(hold("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold("second"))
+        await asyncio.sleep(0)
+        assert event_engine._event_locks["ev1"]["users"] == 2
+        assert order == ["first"]  # still serialized
+
+        release.set()
+        await asyncio.gather(first, second)
+        assert order == ["first", "second"]
+        assert event_engine._event_locks == {}
+
+    async def test_refresh_state_is_dropped_after_the_broadcast_even_on_error(self):
+        with patch("event_engine.update_all_shared_views", new_callable=AsyncMock, side_effect=RuntimeError("x")):
+            with pytest.raises(RuntimeError):
+                await event_engine.schedule_view_refresh(make_context(), "ev1")
+        assert event_engine._refresh_state == {}
+
+        with patch("event_engine.update_all_shared_views", new_callable=AsyncMock):
+            await event_engine.schedule_view_refresh(make_context(), "ev1")
+        assert event_engine._refresh_state == {}
+
+    async def test_cancel_frees_the_events_click_buckets(self, db_path):
+        insert_event(db_path, event_id="ev1", chat_id=MAIN_CHAT)
+        insert_event(db_path, event_id="ev2", chat_id=MAIN_CHAT)
+        ctx = make_context()
+        for data, user_id in (("going_ev1", 1), ("going_ev1", 2), ("going_ev2", 1), ("cancel_ev1", 3)):
+            upd = make_callback_update(data, chat_id=int(MAIN_CHAT), user=make_user(user_id=user_id, username=f"u{user_id}"))
+            await handlers.button_handler(upd, ctx)
+
+        assert set(event_engine._click_buckets) == {(1, "ev2")}
+        assert event_engine.registry_sizes() == {
+            "event_locks": 0, "refresh_state": 0, "click_buckets": 1, "event_status_index": 1,
+        }
+
+    async def test_soak_memory_stays_flat_over_many_events(self):
+        """
+        Every event goes through what a real one does to these registries -
+        clicks under its lock, a broadcast, a cancel - 20,000 times. Memory
+        after the last 15,000 must be no higher than after the first 5,000.
+        """
+        import gc
+        import tracemalloc
+
+        ctx = make_context()
+
+        async def render(context, event_id):
+            await asyncio.sleep(0)
+
+        async def one_event(i):
+            event_id = f"soak{i}"
+            for user_id in (1, 2, 3):
+                admitted, _ = event_engine.admit_click(user_id, event_id, f"going_{event_id}")
+                assert admitted
+                async with event_engine.event_lock(event_id):
+                    pass
+            await event_engine.schedule_view_refresh(ctx, event_id)
+            event_engine.note_event_status(event_id, -1)
+            event_engine.forget_event(event_id)
+
+        with patch("event_engine.update_all_shared_views", render), \
+             patch.object(event_engine, "_STATUS_INDEX_MAX", 1000):
+            tracemalloc.start()
+            try:
+                for i in range(5000):
+                    await one_event(i)
+                gc.collect()
+                baseline, _ = tracemalloc.get_traced_memory()
+                for i in range(5000, 20000):
+                    await one_event(i)
+                gc.collect()
+                after, _ = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            sizes = event_engine.registry_sizes()
+
+        assert sizes == {"event_locks": 0, "refresh_state": 0, "click_buckets": 0, "event_status_index": 1000}
+        # a few stray allocator/interning effects, nowhere near per-event growth
+        assert after - baseline < 64 * 1024, f"grew by {after - baseline} bytes"
+
+
 class TestSharedLabelAndIcon:
     """The child-chat broadcast text uses only the ↪️ icon, no 'SHARED' word."""
 
@@ -2457,6 +3079,7 @@ class TestHubResolver:
         conn.execute("INSERT INTO sub_chats (chat_id, alias, owner_chat_id) VALUES ('-999','downtown','-100111')")
         conn.commit()
         conn.close()
+        index_admin(db_path, "-100111")
 
         import aliases
         bot = make_bot()
@@ -2480,6 +3103,8 @@ class TestHubResolver:
         conn.execute("UPDATE all_groups SET chat_name='Basketball' WHERE chat_id='-100222'")
         conn.commit()
         conn.close()
+        index_admin(db_path, "-100111")
+        index_admin(db_path, "-100222")
 
         import aliases
         bot = make_bot()
@@ -2510,6 +3135,8 @@ class TestHubResolver:
         conn.execute("INSERT INTO sub_chats (chat_id, alias, owner_chat_id) VALUES ('-888','hoopsalias','-100222')")
         conn.commit()
         conn.close()
+        index_admin(db_path, "-100111")
+        index_admin(db_path, "-100222")
 
         import aliases, hub_resolver
         bot = make_bot()
@@ -2551,6 +3178,7 @@ class TestStartCommand:
         conn.execute("UPDATE all_groups SET chat_name='Football' WHERE chat_id='-100111'")
         conn.commit()
         conn.close()
+        index_admin(db_path, "-100111")
 
         import hub_resolver
         bot = make_bot()
@@ -2581,6 +3209,8 @@ class TestStartCommand:
         conn.execute("UPDATE all_groups SET chat_name='Basketball' WHERE chat_id='-100222'")
         conn.commit()
         conn.close()
+        index_admin(db_path, "-100111")
+        index_admin(db_path, "-100222")
 
         import hub_resolver
         bot = make_bot()
@@ -2631,8 +3261,9 @@ class TestStartCommand:
         """
         Regression test: a group the bot was added to BEFORE all_groups
         existed has no row there at all - only in main_group_users (which
-        has existed since v2.0). /start (and resolve_hub_chat_id) must
-        still find it via that fallback, not just all_groups.
+        has existed since v2.0). Once the admin sweep has indexed it,
+        /start (and resolve_hub_chat_id) must still find it - its name
+        fetched live, since all_groups has none.
         """
         conn = sqlite3.connect(db_path)
         conn.execute(
@@ -2640,6 +3271,7 @@ class TestStartCommand:
         )
         conn.commit()
         conn.close()
+        index_admin(db_path, "-100999")
 
         import hub_resolver
         bot = make_bot()
@@ -2657,6 +3289,142 @@ class TestStartCommand:
         assert "Old Legacy Group" in reply
 
 
+class TestChatAdminsIndexResolution:
+    """
+    DM hub resolution reads the chat_admins index instead of asking
+    Telegram about every chat the bot is in - only the chats the index
+    returns are re-verified live.
+    """
+
+    @staticmethod
+    def _groups(db_path, n):
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            "INSERT INTO all_groups (chat_id, chat_name, type) VALUES (?, ?, 'FREE')",
+            [(f"-100{i}", f"Group {i}") for i in range(n)],
+        )
+        conn.commit()
+        conn.close()
+
+    async def test_indexed_user_only_costs_lookups_for_their_chats(self, db_path):
+        import hub_resolver
+        self._groups(db_path, 30)
+        for i in range(30):
+            db.replace_chat_admins(f"-100{i}", [1000 + i], time.time(), db_path=db_path)
+        db.set_chat_admin("-1007", 555555, True, db_path=db_path)
+
+        bot = make_bot()
+        bot.get_chat_member = AsyncMock(return_value=MagicMock(status="administrator"))
+        ctx = make_context(bot=bot, args=[])
+
+        admin_of = await hub_resolver._get_known_candidate_chats(ctx, 555555)
+
+        assert admin_of == [("-1007", "Group 7")]
+        assert bot.get_chat_member.await_count == 1
+        bot.get_chat_administrators.assert_not_awaited()
+
+    async def test_dm_never_probes_chats_the_index_doesnt_list(self, db_path):
+        import hub_resolver
+        self._groups(db_path, 50)  # none of them snapshotted yet
+        bot = make_bot()
+        ctx = make_context(bot=bot, args=[])
+
+        assert await hub_resolver._get_known_candidate_chats(ctx, 555555) == []
+        bot.get_chat_administrators.assert_not_awaited()
+        bot.get_chat_member.assert_not_awaited()
+
+    async def test_sweep_snapshots_due_chats_and_backs_off_failing_ones(self, db_path, monkeypatch):
+        import hub_resolver
+        monkeypatch.setattr(hub_resolver, "_SWEEP_CALLS_PER_SECOND", 1000.0)
+        self._groups(db_path, 3)
+
+        async def get_chat_administrators(chat_id):
+            if chat_id == -1002:
+                raise BadRequest("Chat not found")
+            return [MagicMock(user=make_user(user_id=555555 if chat_id == -1001 else 1))]
+
+        bot = make_bot()
+        bot.get_chat_administrators = AsyncMock(side_effect=get_chat_administrators)
+        app = MagicMock(bot=bot)
+        await hub_resolver.start_admin_snapshot_sweeper(app)
+        try:
+            while bot.get_chat_administrators.await_count < 3:
+                await asyncio.sleep(0.01)
+        finally:
+            await hub_resolver.stop_admin_snapshot_sweeper()
+
+        assert db.get_indexed_admin_chats(555555, db_path=db_path) == [("-1001", "Group 1")]
+        now = time.time()
+        # the two snapshotted chats aren't due again, and the failing one is backing off
+        assert db.get_chats_needing_admin_snapshot(now - hub_resolver.ADMIN_SNAPSHOT_MAX_AGE_SECONDS, now, 10) == []
+        assert db.get_chats_needing_admin_snapshot(
+            now - hub_resolver.ADMIN_SNAPSHOT_MAX_AGE_SECONDS, now + hub_resolver._SNAPSHOT_RETRY_SECONDS, 10,
+        ) == [("-1002", "Group 2")]
+
+    async def test_sweep_survives_a_failed_pass(self, db_path, monkeypatch, caplog):
+        import hub_resolver
+        monkeypatch.setattr(hub_resolver, "_SWEEP_CALLS_PER_SECOND", 1000.0)
+        monkeypatch.setattr(hub_resolver, "_SWEEP_ERROR_RETRY_SECONDS", 0.01)
+        self._groups(db_path, 1)
+        real_query = hub_resolver.get_chats_needing_admin_snapshot
+        calls = []
+
+        def locked_once(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError("database is locked")
+            return real_query(*args)
+
+        monkeypatch.setattr(hub_resolver, "get_chats_needing_admin_snapshot", locked_once)
+        bot = make_bot()
+        bot.get_chat_administrators = AsyncMock(return_value=[MagicMock(user=make_user(user_id=555555))])
+        with caplog.at_level(logging.ERROR):
+            await hub_resolver.start_admin_snapshot_sweeper(MagicMock(bot=bot))
+            try:
+                while bot.get_chat_administrators.await_count < 1:
+                    await asyncio.sleep(0.01)
+            finally:
+                await hub_resolver.stop_admin_snapshot_sweeper()
+
+        assert "database is locked" in caplog.text
+        assert "stopped unexpectedly" not in caplog.text
+        assert db.get_indexed_admin_chats(555555, db_path=db_path) == [("-1000", "Group 0")]
+
+    async def test_demotion_found_on_recheck_drops_the_index_row(self, db_path):
+        import hub_resolver
+        self._groups(db_path, 1)
+        db.replace_chat_admins("-1000", [555555], time.time(), db_path=db_path)
+        bot = make_bot()
+        bot.get_chat_member = AsyncMock(return_value=MagicMock(status="member"))
+        ctx = make_context(bot=bot, args=[])
+
+        assert await hub_resolver._get_known_candidate_chats(ctx, 555555) == []
+        assert db.get_indexed_admin_chats(555555, db_path=db_path) == []
+
+    async def test_rechecks_run_concurrently(self, db_path):
+        import hub_resolver
+        self._groups(db_path, 20)
+        for i in range(20):
+            db.replace_chat_admins(f"-100{i}", [555555], time.time(), db_path=db_path)
+        in_flight = {"now": 0, "max": 0}
+
+        async def slow_member(chat_id, user_id):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            return MagicMock(status="administrator")
+
+        bot = make_bot()
+        bot.get_chat_member = AsyncMock(side_effect=slow_member)
+        ctx = make_context(bot=bot, args=[])
+
+        admin_of = await hub_resolver._get_known_candidate_chats(ctx, 555555)
+
+        assert len(admin_of) == 20
+        assert in_flight["max"] == hub_resolver._VERIFY_CONCURRENCY
+
+
 class TestStickyHubSelection:
     """
     Once a group is picked (or auto-detected as the only option) for a DM
@@ -2672,6 +3440,8 @@ class TestStickyHubSelection:
         conn.execute("UPDATE all_groups SET chat_name='Basketball' WHERE chat_id='-100222'")
         conn.commit()
         conn.close()
+        index_admin(db_path, "-100111")
+        index_admin(db_path, "-100222")
 
         import hub_resolver
         bot = make_bot()
@@ -2715,6 +3485,8 @@ class TestStickyHubSelection:
         conn.execute("UPDATE all_groups SET chat_name='Basketball' WHERE chat_id='-100222'")
         conn.commit()
         conn.close()
+        index_admin(db_path, "-100111")
+        index_admin(db_path, "-100222")
 
         import hub_resolver
         bot = make_bot()
@@ -2764,6 +3536,7 @@ class TestShareeventFromDM:
         )
         conn.commit()
         conn.close()
+        index_admin(db_path, "-100111")
 
         bot = make_bot()
         bot.get_chat_member = AsyncMock(return_value=MagicMock(status="administrator"))
@@ -2800,6 +3573,7 @@ class TestHelpPremiumIconsInDM:
         (genuinely PRO) group. Must auto-detect it, same as other commands.
         """
         insert_premium(db_path, chat_id="-100111")
+        index_admin(db_path, "-100111")
 
         bot = make_bot()
         bot.get_chat_member = AsyncMock(return_value=MagicMock(status="administrator"))
@@ -5020,7 +5794,7 @@ class TestChildChatClickTracksUserForSheetsSync:
             sync_calls.append((cid, members))
 
         with patch("handlers.sync_users_sheet", side_effect=fake_sync):
-            await handlers.refreshusersall(upd2, ctx2)
+            await run_refreshusersall(upd2, ctx2)
 
         # The hub itself is now always processed too, alongside the
         # monitored child - so 2 sync calls, not 1.
@@ -5372,9 +6146,8 @@ class TestRefreshusersallCoversHubItself:
             sync_calls.append((cid, [m[1] for m in members]))
 
         with patch("handlers.sync_users_sheet", side_effect=fake_sync):
-            await handlers.refreshusersall(upd, ctx)
+            reply = await run_refreshusersall(upd, ctx)
 
-        reply = msg.reply_text.call_args.args[0]
         assert "Real Hub Name" in reply
         assert "Monitored Child" in reply
         assert any(cid == "-100" and "hubperson" in members for cid, members in sync_calls)
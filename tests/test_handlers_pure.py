@@ -5,6 +5,8 @@ Covered:
   * parse_event_args  — flag parsing for /newevent and /editevent
   * parse_user_args   — @-stripping and comma/space splitting
   * create_event_keyboard — inline keyboard shape for every event_status state
+  * parse_callback_data — button_handler's one-time callback_data split
+  * parse_going_list — going_data "username (user_id)" entries, split
 
 No mocking needed here; these functions have zero side-effects.
 """
@@ -12,6 +14,7 @@ No mocking needed here; these functions have zero side-effects.
 import pytest
 from handlers import parse_event_args, parse_user_args, create_event_keyboard, parse_shareevent_args
 from telegram import InlineKeyboardMarkup
+from event_engine import ParsedCallback, parse_callback_data, parse_going_list
 
 
 # ---------------------------------------------------------------------------
@@ -528,3 +531,42 @@ class TestParseShareeventArgs:
             "-200", "-mgl", "visible", "-sngl", "onlycount", "-swl", "hidden", "-clc", "off",
         ])
         assert result == ("-200", "-visible", "onlycount", "hidden", "off")
+
+
+# ---------------------------------------------------------------------------
+# parse_callback_data
+# ---------------------------------------------------------------------------
+
+class TestParseCallbackData:
+    """event_engine.parse_callback_data() - what button_handler dispatches on."""
+
+    def test_plain_action(self):
+        assert parse_callback_data("going_ev1") == ParsedCallback("going", "ev1", None)
+
+    def test_per_person_action_keeps_underscores_in_the_username(self):
+        parsed = parse_callback_data("kick_ev1:ch-alice_b")
+        assert parsed == ParsedCallback("kick", "ev1", "ch-alice_b")
+        assert parsed.needs_admin is True
+
+    def test_plain_clicks_do_not_need_admin(self):
+        for action in ("going", "notgoing", "add", "sub"):
+            assert parse_callback_data(f"{action}_ev1").needs_admin is False
+
+    @pytest.mark.parametrize("data", ["noop", "help_alias", "", "going", "_ev1", "going_", "going_:bob"])
+    def test_non_event_buttons_and_malformed_data(self, data):
+        assert parse_callback_data(data) is None
+
+
+class TestParseGoingList:
+    """event_engine.parse_going_list() - going_data entries as (username, user_id)."""
+
+    def test_entries_with_and_without_user_id(self):
+        assert parse_going_list(["alice (101)", "bob", "carol_x (303)"]) == [
+            ("alice", "101"), ("bob", None), ("carol_x", "303"),
+        ]
+
+    def test_placeholder_id_is_passed_through(self):
+        assert parse_going_list(["dave (no_id_in_main_group)"]) == [("dave", "no_id_in_main_group")]
+
+    def test_empty(self):
+        assert parse_going_list([]) == []
@@ -0,0 +1,48 @@
+"""
+Tests for loop_watchdog.py - the event loop lag watchdog: a blocking call
+is caught while it's still running and named by its innermost frame in
+this project's code, once per stall, and the lag lands in the metrics
+histogram.
+"""
+import asyncio
+import logging
+import time
+
+import metrics
+from loop_watchdog import start_loop_watchdog, stop_loop_watchdog
+
+
+def _blocking_call(seconds):
+    time.sleep(seconds)  # stands in for a slow sqlite3 call / json.loads
+
+
+class TestLoopWatchdog:
+    async def test_blocking_call_is_named_and_logged_once(self, metrics_on, caplog):
+        watchdog = await start_loop_watchdog(threshold_ms=50, interval_ms=10)
+        try:
+            await asyncio.sleep(0.05)
+            with caplog.at_level(logging.WARNING):
+                _blocking_call(0.3)
+                await asyncio.sleep(0.05)
+        finally:
+            await stop_loop_watchdog()
+
+        assert watchdog.stalls == ["tests.test_loop_watchdog._blocking_call"]
+        blocked = [r.getMessage() for r in caplog.records if "Event loop blocked" in r.getMessage()]
+        assert len(blocked) == 1
+        assert "_blocking_call" in blocked[0] and "time.sleep" in blocked[0]
+        assert any("Event loop unblocked" in r.getMessage() for r in caplog.records)
+        assert watchdog.max_lag >= 0.25
+
+        counts = [line for line in metrics.render().splitlines() if line.startswith("bot_event_loop")]
+        assert 'bot_event_loop_stalls_total{site="tests.test_loop_watchdog._blocking_call"} 1' in counts
+        assert any(line.startswith("bot_event_loop_lag_seconds_count ") for line in counts)
+
+    async def test_quiet_loop_reports_nothing(self, caplog):
+        with caplog.at_level(logging.WARNING):
+            watchdog = await start_loop_watchdog(threshold_ms=200, interval_ms=10)
+            await asyncio.sleep(0.1)
+            await stop_loop_watchdog()
+
+        assert watchdog.stalls == []
+        assert not [r for r in caplog.records if "Event loop" in r.getMessage()]
@@ -21,7 +21,20 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+import background_tasks
 import main
+import subscription
+
+
+@pytest.fixture(autouse=True)
+def _no_control_sheet_debounce(monkeypatch):
+    """
+    These tests check WHAT gets pushed for each individual add/remove, so
+    the Control Sheet debounce (which folds a quick add-then-remove into
+    one trailing push - see TestControlSheetDebounce) is switched off:
+    with a 0s window every request is pushed right away.
+    """
+    monkeypatch.setattr(subscription, "_CONTROL_SHEET_DEBOUNCE_SECONDS", 0.0)
 
 
 def _my_chat_member_update(chat_id, chat_type, chat_title, old_status, new_status):
@@ -66,6 +79,18 @@ class TestBotAddedToGroup:
         conn = sqlite3.connect(db_path)
         assert conn.execute("SELECT chat_id FROM all_groups WHERE chat_id='-100'").fetchone() is not None
 
+    async def test_joined_chat_gets_its_admins_snapshotted(self, db_path):
+        main.CONTROL_SHEET_ID = None
+        context = MagicMock()
+        context.bot.get_chat_administrators = AsyncMock(return_value=[MagicMock(user=MagicMock(id=7))])
+        upd = _my_chat_member_update(-100, "supergroup", "My Group", "left", "member")
+        await main.on_my_chat_member_update(upd, context)
+        await background_tasks.drain_background_tasks(timeout=5)
+
+        context.bot.get_chat_administrators.assert_awaited_once_with(-100)
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT user_id, chat_id FROM chat_admins").fetchall() == [("7", "-100")]
+
 
 class TestBotAddedToChannel:
     async def test_channel_added_goes_to_all_channels_not_all_groups(self, db_path):
@@ -279,3 +304,80 @@ class TestOnChatMemberUpdateCapturesRealName:
         conn = sqlite3.connect(db_path)
         row = conn.execute("SELECT user_id, first_name, last_name, status FROM main_group_users WHERE chat_id='-1'").fetchone()
         assert row == ("888", "Leaver", "Person", "passive")
+
+
+class TestOnChatMemberUpdateRefreshesAdminCache:
+    """A promotion/demotion seen as a chat_member update is applied to
+    is_real_admin's cache right away, not after its TTL."""
+
+    async def test_promotion_is_visible_without_a_lookup(self, db_path):
+        import utils
+        result = MagicMock()
+        result.chat.id = -1
+        new_member = MagicMock()
+        new_member.status = "administrator"
+        user = MagicMock()
+        user.id = 777
+        user.username = "promoted"
+        user.first_name = "Pro"
+        user.last_name = "Moted"
+        new_member.user = user
+        result.new_chat_member = new_member
+        upd = MagicMock()
+        upd.chat_member = result
+
+        await main.on_chat_member_update(upd, MagicMock())
+
+        bot = MagicMock()
+        bot.get_chat_member = AsyncMock(return_value=MagicMock(status="member"))
+        assert await utils.is_real_admin(bot, -1, user) is True
+        bot.get_chat_member.assert_not_called()
+
+
+class TestControlSheetDebounce:
+    """A burst of bot adds/removes is folded into one push per debounce
+    window: the first change goes out right away, the rest of the burst
+    in a single trailing push that reads SQLite at flush time."""
+
+    async def test_burst_of_adds_becomes_one_immediate_and_one_trailing_push(self, db_path, monkeypatch):
+        import asyncio
+        main.CONTROL_SHEET_ID = "fake_sheet_id"
+        monkeypatch.setattr(subscription, "_CONTROL_SHEET_DEBOUNCE_SECONDS", 0.05)
+        with patch("subscription.sync_control_sheet_main", new_callable=AsyncMock, return_value=True) as sync_main, \
+             patch("subscription.sync_control_sheet_channels", new_callable=AsyncMock, return_value=True), \
+             patch("subscription.sync_control_sheet_chats_log", new_callable=AsyncMock, return_value=True):
+            for i in range(5):
+                await main.on_my_chat_member_update(
+                    _my_chat_member_update(-100 - i, "supergroup", f"G{i}", "left", "member"), MagicMock()
+                )
+            assert sync_main.await_count == 1  # only the leading push so far
+            await subscription._control_sheet_trailing["task"]
+            assert sync_main.await_count == 2
+
+        pushed_ids = {r[0] for r in sync_main.call_args.args[0]}
+        assert pushed_ids == {str(-100 - i) for i in range(5)}
+
+    async def test_startup_pushes_run_in_background_and_concurrently(self, db_path):
+        import asyncio
+        main.CONTROL_SHEET_ID = "fake_sheet_id"
+        in_flight = {"now": 0, "peak": 0}
+
+        async def slow_push(*args):
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            return True
+
+        app = MagicMock()
+        with patch("subscription.sync_control_sheet_main", side_effect=slow_push), \
+             patch("subscription.sync_control_sheet_channels", side_effect=slow_push), \
+             patch("subscription.sync_control_sheet_chats_log", side_effect=slow_push), \
+             patch("subscription.sync_control_sheet_botconfig", side_effect=slow_push):
+            await main._sync_control_sheet_on_startup(app)
+            # post_init only schedules - polling isn't held back
+            assert in_flight["peak"] == 0
+            assert background_tasks.task_stats()["control_sheet"]["waiting"] == 1
+            await background_tasks.drain_background_tasks(timeout=5)
+
+        assert in_flight["peak"] == 4
@@ -0,0 +1,140 @@
+"""
+Tests for metrics.py - the built-in Prometheus endpoint: nothing recorded
+while it's off, SQLite timings attributed to the function that opened the
+connection, handler and Bot API timings (RetryAfter included), the refresh
+coalescing ratio, and the /metrics route itself.
+"""
+import asyncio
+import sqlite3
+from unittest.mock import patch
+
+import httpx
+import pytest
+from telegram import Bot
+from telegram.error import RetryAfter
+from telegram.ext import ApplicationBuilder, CallbackQueryHandler, CommandHandler
+
+import db
+import event_engine
+import metrics
+from scripts.fake_bot_api import FakeBotAPI
+from tests.helpers import make_callback_update, make_context
+
+
+def _lines(name):
+    return [line for line in metrics.render().splitlines() if line.startswith(name)]
+
+
+class TestRecording:
+    def test_off_by_default_records_nothing(self, db_path):
+        metrics.inc("bot_view_refresh_requests_total")
+        metrics.observe("bot_handler_seconds", 0.1, handler="help", action="")
+        conn = db.connect(db_path)
+        try:
+            assert type(conn) is sqlite3.Connection
+        finally:
+            conn.close()
+        assert metrics._counters == {} and metrics._histograms == {}
+
+    def test_sqlite_timed_per_call_site(self, db_path, metrics_on):
+        db.log_command_usage("-100", 1, "help", "/help", "01.01.26 00:00")
+        db.get_display_name("-100", "1", "fallback")
+
+        counts = _lines("bot_sqlite_seconds_count")
+        assert 'bot_sqlite_seconds_count{site="db.log_command_usage",op="execute"} 1' in counts
+        assert 'bot_sqlite_seconds_count{site="db.log_command_usage",op="commit"} 1' in counts
+        assert any('site="db.get_display_name",op="execute"' in line for line in counts)
+
+    def test_histogram_buckets_are_cumulative(self, metrics_on):
+        for seconds in (0.0005, 0.003, 0.003, 20.0):
+            metrics.observe("bot_telegram_seconds", seconds, method="sendMessage", outcome="ok")
+
+        text = metrics.render()
+        assert "# TYPE bot_telegram_seconds histogram" in text
+        assert 'bot_telegram_seconds_bucket{method="sendMessage",outcome="ok",le="0.001"} 1' in text
+        assert 'bot_telegram_seconds_bucket{method="sendMessage",outcome="ok",le="0.005"} 3' in text
+        assert 'bot_telegram_seconds_bucket{method="sendMessage",outcome="ok",le="10.0"} 3' in text
+        assert 'bot_telegram_seconds_bucket{method="sendMessage",outcome="ok",le="+Inf"} 4' in text
+        assert 'bot_telegram_seconds_count{method="sendMessage",outcome="ok"} 4' in text
+
+
+class TestInstrumentation:
+    async def test_handlers_timed_by_command_and_button_action(self, metrics_on):
+        async def help_command(update, context):
+            pass
+
+        async def button_handler(update, context):
+            raise ValueError("boom")
+
+        app = ApplicationBuilder().token("123:TEST").build()
+        app.add_handler(CommandHandler("help", help_command))
+        app.add_handler(CallbackQueryHandler(button_handler))
+        metrics.instrument_handlers(app)
+        command, button = app.handlers[0]
+
+        await command.callback(make_callback_update("x"), make_context())
+        with pytest.raises(ValueError):
+            await button.callback(make_callback_update("going_ev1"), make_context())
+        with pytest.raises(ValueError):
+            await button.callback(make_callback_update("weird-data!" * 10), make_context())
+
+        counts = _lines("bot_handler_seconds_count")
+        assert 'bot_handler_seconds_count{handler="help",action=""} 1' in counts
+        assert 'bot_handler_seconds_count{handler="button_handler",action="going"} 1' in counts
+        assert 'bot_handler_seconds_count{handler="button_handler",action="other"} 1' in counts
+        assert 'bot_handler_errors_total{handler="button_handler",action="going"} 1' in _lines("bot_handler_errors")
+
+    async def test_bot_api_calls_by_method_and_outcome(self, metrics_on):
+        fake = FakeBotAPI(chat_rate=1.0, chat_burst=1)
+        await fake.start()
+        try:
+            async with Bot("123:TEST", base_url=f"{fake.base_url}/bot",
+                           request=metrics.InstrumentedRequest()) as bot:
+                await bot.send_message(chat_id=-100, text="a")
+                with pytest.raises(RetryAfter):
+                    await bot.send_message(chat_id=-100, text="b")
+        finally:
+            await fake.stop()
+
+        counts = _lines("bot_telegram_seconds_count")
+        assert 'bot_telegram_seconds_count{method="sendMessage",outcome="ok"} 1' in counts
+        assert 'bot_telegram_seconds_count{method="sendMessage",outcome="retry_after"} 1' in counts
+
+    async def test_refresh_coalescing_ratio(self, db_path, metrics_on):
+        release = asyncio.Event()
+
+        async def slow_render(context, event_id):
+            await release.wait()
+
+        ctx = make_context()
+        with patch("event_engine.update_all_shared_views", side_effect=slow_render):
+            first = asyncio.create_task(event_engine.schedule_view_refresh(ctx, "ev1"))
+            await asyncio.sleep(0)
+            for _ in range(3):
+                await event_engine.schedule_view_refresh(ctx, "ev1")  # folded into one trailing pass
+            release.set()
+            await first
+
+        assert "bot_view_refresh_requests_total 4" in _lines("bot_view_refresh_requests")
+        assert "bot_view_refresh_renders_total 2" in _lines("bot_view_refresh_renders")
+        assert "bot_view_refresh_coalescing_ratio 0.5" in _lines("bot_view_refresh_coalescing")
+
+
+class TestMetricsServer:
+    async def test_serves_metrics_and_404s_anything_else(self, metrics_on):
+        event_engine._event_locks["ev1"] = asyncio.Lock()
+        metrics.inc("bot_view_refresh_requests_total")
+        server = await metrics.start_metrics_server("127.0.0.1", 0)
+        try:
+            async with httpx.AsyncClient() as client:
+                resp = await client.get(f"http://127.0.0.1:{server.port}/metrics")
+                missing = await client.get(f"http://127.0.0.1:{server.port}/healthz")
+        finally:
+            await metrics.stop_metrics_server()
+
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert "# TYPE bot_view_refresh_requests_total counter" in resp.text
+        assert 'bot_registry_entries{registry="event_locks"} 1' in resp.text
+        assert 'bot_registry_entries{registry="spreadsheet_cache"} 0' in resp.text
+        assert missing.status_code == 404
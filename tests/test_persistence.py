@@ -0,0 +1,102 @@
+"""
+Tests for persistence.py - SQLite-backed user_data/chat_data: lazy
+per-user loading, one transaction per flush round, unchanged data not
+rewritten, and a round trip through a real PTB Application.
+"""
+import asyncio
+
+from telegram.ext import ApplicationBuilder
+
+import db
+import persistence
+from persistence import SQLitePersistence
+
+
+async def _let_flush_run():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+class TestSQLitePersistence:
+    async def test_nothing_is_loaded_up_front(self, db_path):
+        db.save_persisted_data("user", {"1": '{"selected_hub_chat_id": "-100"}'})
+        p = SQLitePersistence()
+        assert await p.get_user_data() == {}
+        assert await p.get_chat_data() == {}
+
+    async def test_user_is_loaded_on_first_access_only(self, db_path, monkeypatch):
+        db.save_persisted_data("user", {"1": '{"selected_hub_chat_id": "-100"}'})
+        loads = []
+        monkeypatch.setattr(persistence, "load_persisted_data",
+                            lambda kind, key: loads.append((kind, key)) or db.load_persisted_data(kind, key))
+        p = SQLitePersistence()
+
+        user_data = {}
+        await p.refresh_user_data(1, user_data)
+        await p.refresh_user_data(1, user_data)
+        await p.refresh_user_data(2, {})
+
+        assert user_data == {"selected_hub_chat_id": "-100"}
+        assert loads == [("user", 1), ("user", 2)]
+
+    async def test_a_round_of_updates_is_one_transaction(self, db_path, monkeypatch):
+        saves = []
+        monkeypatch.setattr(persistence, "save_persisted_data",
+                            lambda kind, writes, deletes=(): saves.append((kind, len(writes), len(deletes)))
+                            or db.save_persisted_data(kind, writes, deletes))
+        p = SQLitePersistence()
+
+        await asyncio.gather(*(p.update_user_data(uid, {"selected_hub_chat_id": str(uid)}) for uid in range(50)))
+        await p.update_chat_data(-100, {"note": "x"})
+        await _let_flush_run()
+
+        assert sorted(saves) == [("chat", 1, 0), ("user", 50, 0)]
+        assert db.load_persisted_data("user", 7) == '{"selected_hub_chat_id": "7"}'
+
+    async def test_unchanged_and_empty_data_is_not_rewritten(self, db_path, monkeypatch):
+        saves = []
+        monkeypatch.setattr(persistence, "save_persisted_data",
+                            lambda kind, writes, deletes=(): saves.append(dict(writes)))
+        p = SQLitePersistence()
+        await p.refresh_user_data(1, {})
+
+        await p.update_user_data(1, {})  # a click from someone with no state
+        await _let_flush_run()
+        assert saves == []
+
+        await p.update_user_data(1, {"selected_hub_chat_id": "-100"})
+        await _let_flush_run()
+        await p.update_user_data(1, {"selected_hub_chat_id": "-100"})
+        await _let_flush_run()
+        assert len(saves) == 1
+
+    async def test_drop_deletes_the_row(self, db_path):
+        db.save_persisted_data("user", {"1": '{"a": 1}'})
+        p = SQLitePersistence()
+        await p.drop_user_data(1)
+        await p.flush()
+        assert db.load_persisted_data("user", 1) is None
+
+    async def test_unserializable_data_is_skipped(self, db_path):
+        p = SQLitePersistence()
+        await p.update_user_data(1, {"obj": object()})
+        await p.update_user_data(2, {"ok": True})
+        await p.flush()
+        assert db.load_persisted_data("user", 1) is None
+        assert db.load_persisted_data("user", 2) == '{"ok": true}'
+
+    async def test_survives_an_application_restart(self, db_path):
+        first = ApplicationBuilder().token("123:TEST").persistence(SQLitePersistence()).build()
+        first.user_data[5]["selected_hub_chat_id"] = "-100123"
+        first.user_data[5]["pending_hub_command"] = {"command": "listusers", "args": []}
+        first.mark_data_for_update_persistence(user_ids=5)
+        await first.update_persistence()
+        await first.persistence.flush()
+
+        restarted = SQLitePersistence()
+        user_data = {}
+        await restarted.refresh_user_data(5, user_data)
+        assert user_data == {
+            "selected_hub_chat_id": "-100123",
+            "pending_hub_command": {"command": "listusers", "args": []},
+        }
@@ -139,3 +139,352 @@ class TestSyncUsersSheetColumnOrder:
         calls = {c.args[0] for c in ws.update.call_args_list}
         assert "F2" not in calls  # STATUS untouched - already MEMBER
         assert "D2" not in calls  # USER_NAME untouched - unchanged
+
+
+def _api_error(status):
+    import gspread
+    resp = MagicMock()
+    resp.status_code = status
+    resp.json.return_value = {"error": {"code": status, "message": "boom", "status": "X"}}
+    return gspread.exceptions.APIError(resp)
+
+
+class TestSpreadsheetHandleCache:
+    """open_spreadsheet()'s TTL cache and its invalidation paths."""
+
+    def _fake_agcm(self):
+        gc = MagicMock()
+        gc.open_by_key = AsyncMock(side_effect=lambda key: MagicMock(id=key, title=f"T-{key}"))
+        agcm = MagicMock()
+        agcm.authorize = AsyncMock(return_value=gc)
+        agcm._agc_cache = {}
+        return agcm, gc
+
+    async def test_second_open_is_served_from_cache(self):
+        agcm, gc = self._fake_agcm()
+        with patch("sheets.agcm", agcm):
+            first = await sheets.open_spreadsheet("s1")
+            second = await sheets.open_spreadsheet("s1")
+        assert first is second
+        assert gc.open_by_key.await_count == 1
+
+    async def test_expired_handle_is_reopened(self):
+        agcm, gc = self._fake_agcm()
+        with patch("sheets.agcm", agcm), patch("sheets._SPREADSHEET_TTL_SECONDS", 0):
+            await sheets.open_spreadsheet("s1")
+            await sheets.open_spreadsheet("s1")
+        assert gc.open_by_key.await_count == 2
+
+    async def test_invalidate_spreadsheet_forces_reopen(self):
+        agcm, gc = self._fake_agcm()
+        with patch("sheets.agcm", agcm):
+            await sheets.open_spreadsheet("s1")
+            sheets.invalidate_spreadsheet("s1")
+            await sheets.open_spreadsheet("s1")
+        assert gc.open_by_key.await_count == 2
+
+    async def test_invalidate_also_drops_client_level_cache(self):
+        """gspread_asyncio's client has its own per-key cache under ours -
+        it has to go too, or a "re-open" returns the same stale object."""
+        agcm, gc = self._fake_agcm()
+        stale = MagicMock(id="s1")
+        client = MagicMock(_ss_cache_key={"s1": stale}, _ss_cache_title={"Old": stale})
+        agcm._agc_cache = {0.0: client}
+        with patch("sheets.agcm", agcm):
+            sheets.invalidate_spreadsheet("s1")
+        assert client._ss_cache_key == {}
+        assert client._ss_cache_title == {}
+
+    def test_permission_error_drops_only_that_sheet(self):
+        sheets._spreadsheet_cache["s1"] = (MagicMock(), 0)
+        sheets._spreadsheet_cache["s2"] = (MagicMock(), 0)
+        sheets._bust_cache_on_auth_error("s1", _api_error(403))
+        assert "s1" not in sheets._spreadsheet_cache
+        assert "s2" in sheets._spreadsheet_cache
+
+    def test_rejected_credentials_reauthorize_and_drop_everything(self):
+        sheets._spreadsheet_cache["s1"] = (MagicMock(), 0)
+        sheets._spreadsheet_cache["s2"] = (MagicMock(), 0)
+        agcm = MagicMock(_agc_cache={}, auth_time=123.0)
+        with patch("sheets.agcm", agcm):
+            sheets._bust_cache_on_auth_error("s1", _api_error(401))
+        assert sheets._spreadsheet_cache == {}
+        assert agcm.auth_time is None
+
+    def test_quota_and_server_errors_keep_the_cache(self):
+        sheets._spreadsheet_cache["s1"] = (MagicMock(), 0)
+        sheets._bust_cache_on_auth_error("s1", _api_error(429))
+        sheets._bust_cache_on_auth_error("s1", _api_error(503))
+        sheets._bust_cache_on_auth_error("s1", RuntimeError("network"))
+        assert "s1" in sheets._spreadsheet_cache
+
+    def test_sheet_id_of_call_resolves_worksheet_spreadsheet_and_client_calls(self):
+        import gspread
+        ss = MagicMock(spec=gspread.Spreadsheet)
+        ss.id = "s1"
+        ws = MagicMock(spec=gspread.Worksheet)
+        ws.spreadsheet = ss
+        ws.append_row = MagicMock()
+        ws.append_row.__self__ = ws
+        ss.fetch_sheet_metadata = MagicMock()
+        ss.fetch_sheet_metadata.__self__ = ss
+
+        def open_by_key(key):
+            return None
+
+        assert sheets._sheet_id_of_call(ws.append_row, ()) == "s1"
+        assert sheets._sheet_id_of_call(ss.fetch_sheet_metadata, ()) == "s1"
+        assert sheets._sheet_id_of_call(open_by_key, ("s9",)) == "s9"
+
+
+class TestSheetsScheduler:
+    """_SheetsClientManager._call - the pacing/retry layer every gspread
+    call goes through."""
+
+    def _manager(self, global_rpm=6000, per_sheet_rpm=6000, in_flight=4):
+        with patch("sheets.SHEETS_GLOBAL_RPM", global_rpm), \
+             patch("sheets.SHEETS_PER_SHEET_RPM", per_sheet_rpm), \
+             patch("sheets.SHEETS_MAX_IN_FLIGHT", in_flight):
+            return sheets._SheetsClientManager(lambda: None)
+
+    async def test_success_passes_through_and_counts_the_call(self):
+        mgr = self._manager()
+        assert await mgr._call(lambda a, b=0: a + b, 2, b=3) == 5
+        assert sheets.get_throttle_stats()[None]["calls"] == 1
+
+    async def test_429_is_retried_with_backoff_then_succeeds(self):
+        mgr = self._manager()
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise _api_error(429)
+            return "ok"
+
+        with patch("sheets._backoff_delay", return_value=0.0):
+            assert await mgr._call(flaky) == "ok"
+        assert len(attempts) == 3
+        assert sheets.get_throttle_stats()[None]["retries"] == 2
+
+    async def test_5xx_gives_up_after_max_attempts(self):
+        mgr = self._manager()
+        calls = []
+
+        def down():
+            calls.append(1)
+            raise _api_error(503)
+
+        with patch("sheets._backoff_delay", return_value=0.0), patch("sheets._MAX_ATTEMPTS", 3):
+            with pytest.raises(Exception):
+                await mgr._call(down)
+        assert len(calls) == 3
+        assert sheets.get_throttle_stats()[None]["failures"] == 1
+
+    async def test_other_4xx_is_raised_immediately_without_retry(self):
+        mgr = self._manager()
+        calls = []
+
+        def bad_range():
+            calls.append(1)
+            raise _api_error(400)
+
+        with pytest.raises(Exception):
+            await mgr._call(bad_range)
+        assert len(calls) == 1
+
+    async def test_in_flight_cap_is_respected(self):
+        import asyncio
+        import threading
+        import time as _time
+        mgr = self._manager(in_flight=2)
+        lock = threading.Lock()
+        state = {"now": 0, "peak": 0}
+
+        def slow():
+            with lock:
+                state["now"] += 1
+                state["peak"] = max(state["peak"], state["now"])
+            _time.sleep(0.02)
+            with lock:
+                state["now"] -= 1
+
+        await asyncio.gather(*(mgr._call(slow) for _ in range(6)))
+        assert state["peak"] <= 2
+
+    def test_token_bucket_paces_after_the_burst(self):
+        bucket = sheets._TokenBucket(rate_per_minute=60, burst=2)
+        assert bucket.take() == 0.0
+        assert bucket.take() == 0.0
+        wait = bucket.take()
+        assert 0.9 < wait <= 1.0  # 1 token/second once the burst is spent
+
+    def test_backoff_honors_retry_after(self):
+        err = _api_error(429)
+        err.response.headers = {"Retry-After": "7"}
+        assert sheets._backoff_delay(1, err) == 7.0
+
+    def test_backoff_grows_exponentially_and_is_capped(self):
+        err = RuntimeError("x")
+        assert sheets._backoff_delay(1, err) <= sheets._BACKOFF_BASE_SECONDS
+        assert sheets._backoff_delay(4, err) >= sheets._BACKOFF_BASE_SECONDS * 4
+        assert sheets._backoff_delay(50, err) <= sheets._BACKOFF_CAP_SECONDS
+
+    def test_stats_by_hub_maps_sheet_to_its_hub(self, db_path):
+        import sqlite3
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO all_groups (chat_id, chat_name, sheet_id) VALUES ('-100', 'Hub', 'sh1')")
+        conn.commit()
+        conn.close()
+        sheets._stats_for("sh1")["calls"] = 3
+        sheets._stats_for("control")["calls"] = 1
+        by_hub = sheets.get_throttle_stats_by_hub()
+        assert by_hub["-100"]["calls"] == 3
+        assert by_hub["sheet:control"]["calls"] == 1
+
+
+class TestControlSheetDiffPush:
+    """_push_control_grid writes only what changed since the last push and
+    never reads the tab back just to count its rows."""
+
+    def _ws(self):
+        ws = MagicMock()
+        ws.update = AsyncMock()
+        ws.batch_update = AsyncMock()
+        ws.batch_clear = AsyncMock()
+        ws.get_all_values = AsyncMock(return_value=[])
+        ss = MagicMock()
+        ss.worksheet = AsyncMock(return_value=ws)
+        return ws, ss
+
+    async def test_first_push_writes_everything_and_trims_open_ended(self):
+        ws, ss = self._ws()
+        grid = [["H"], ["a"], ["b"]]
+        with patch("sheets.open_spreadsheet", new_callable=AsyncMock, return_value=ss), \
+             patch("sheets.CONTROL_SHEET_ID", "ctrl"):
+            await sheets._push_control_grid("GROUPS", grid)
+        ws.update.assert_awaited_once_with("A1", grid)
+        ws.batch_clear.assert_awaited_once_with(["A4:Z"])
+        ws.get_all_values.assert_not_called()
+
+    async def test_unchanged_grid_makes_no_api_call_at_all(self):
+        ws, ss = self._ws()
+        grid = [["H"], ["a"]]
+        with patch("sheets.open_spreadsheet", new_callable=AsyncMock, return_value=ss) as opener, \
+             patch("sheets.CONTROL_SHEET_ID", "ctrl"):
+            await sheets._push_control_grid("GROUPS", grid)
+            opener.reset_mock()
+            await sheets._push_control_grid("GROUPS", [["H"], ["a"]])
+        opener.assert_not_called()
+
+    async def test_only_changed_rows_are_written_in_one_batch(self):
+        ws, ss = self._ws()
+        with patch("sheets.open_spreadsheet", new_callable=AsyncMock, return_value=ss), \
+             patch("sheets.CONTROL_SHEET_ID", "ctrl"):
+            await sheets._push_control_grid("GROUPS", [["H"], ["a"], ["b"], ["c"]])
+            ws.update.reset_mock()
+            await sheets._push_control_grid("GROUPS", [["H"], ["A"], ["b"], ["C"], ["d"]])
+        ws.update.assert_not_called()
+        ws.batch_update.assert_awaited_once_with([
+            {"range": "A2", "values": [["A"]]},
+            {"range": "A4", "values": [["C"], ["d"]]},
+        ])
+
+    async def test_shrunk_tab_clears_exactly_the_leftover_rows(self):
+        ws, ss = self._ws()
+        with patch("sheets.open_spreadsheet", new_callable=AsyncMock, return_value=ss), \
+             patch("sheets.CONTROL_SHEET_ID", "ctrl"):
+            await sheets._push_control_grid("GROUPS", [["H"], ["a"], ["b"], ["c"]])
+            ws.batch_clear.reset_mock()
+            await sheets._push_control_grid("GROUPS", [["H"], ["a"]])
+        ws.batch_update.assert_not_called()
+        ws.batch_clear.assert_awaited_once_with(["A3:Z4"])
+
+    async def test_failed_push_forgets_state_so_next_push_is_full(self):
+        ws, ss = self._ws()
+        with patch("sheets.open_spreadsheet", new_callable=AsyncMock, return_value=ss), \
+             patch("sheets.CONTROL_SHEET_ID", "ctrl"):
+            await sheets._push_control_grid("GROUPS", [["H"], ["a"]])
+            ws.batch_update.side_effect = RuntimeError("quota")
+            with pytest.raises(RuntimeError):
+                await sheets._push_control_grid("GROUPS", [["H"], ["b"]])
+            ws.update.reset_mock()
+            await sheets._push_control_grid("GROUPS", [["H"], ["b"]])
+        ws.update.assert_awaited_once_with("A1", [["H"], ["b"]])
+
+    async def test_sync_control_sheet_main_reports_failure_as_false(self):
+        with patch("sheets.open_spreadsheet", new_callable=AsyncMock, side_effect=RuntimeError("down")), \
+             patch("sheets.CONTROL_SHEET_ID", "ctrl"):
+            assert await sheets.sync_control_sheet_main([("-1", "G", "FREE", None, None, None, None, "public", "d")]) is False
+
+
+@pytest.fixture()
+def fake_backend():
+    """Routes sheets.py through scripts/fake_sheets.py's offline backend
+    for one test, restoring the real client manager afterwards."""
+    from scripts.fake_sheets import FakeSheetsBackend, install
+    original = sheets.agcm
+    backend = FakeSheetsBackend()
+    with patch("sheets.SHEETS_GLOBAL_RPM", 6000), patch("sheets.SHEETS_PER_SHEET_RPM", 6000):
+        install(backend)
+    yield backend
+    sheets.set_client_manager(original)
+
+
+class TestAgainstFakeBackend:
+    """End-to-end through the real scheduler + gspread_asyncio wrappers,
+    with only the Google API itself faked."""
+
+    async def test_control_sheet_push_then_diff_against_real_tab_contents(self, fake_backend):
+        fake_backend.add_spreadsheet("ctrl", tabs={"GROUPS": [["stale"]] * 6})
+        rows = [("-1", "One", "FREE", None, None, None, None, "public", "d1"),
+                ("-2", "Two", "PRO", "s2", "S", "a", "b", "private", "d2")]
+        with patch("sheets.CONTROL_SHEET_ID", "ctrl"):
+            assert await sheets.sync_control_sheet_main(rows) is True
+            tab = fake_backend.tab("ctrl", "GROUPS")
+            assert tab[0][0] == "CHAT_ID" and tab[2][0] == "-2"
+            assert all(not any(r) for r in tab[3:])  # stale rows trimmed
+            assert "get_all_values" not in fake_backend.call_counts
+
+            fake_backend.reset_counters()
+            rows[1] = ("-2", "Two renamed", "PRO", "s2", "S", "a", "b", "private", "d2")
+            assert await sheets.sync_control_sheet_main(rows) is True
+        assert dict(fake_backend.call_counts) == {"batch_update": 1}
+        assert fake_backend.tab("ctrl", "GROUPS")[2][1] == "Two renamed"
+
+    async def test_sync_users_sheet_appends_and_marks_left(self, fake_backend):
+        header = ["USER_ID", "FIRST_NAME", "LAST_NAME", "USER_NAME", "CHAT_ID", "STATUS",
+                  "DATE_start", "DATE_end", "ARCHIVED_USER_NAME"]
+        fake_backend.add_spreadsheet("hub", tabs={
+            "Users": [header, ["1", "A", "", "gone", "-100", "MEMBER", "01.01.2026", "", ""]],
+            "UserPresenceLog": [["USER_ID", "CHAT_ID", "DATE_start", "DATE_end"]],
+        })
+        with patch("sheets.get_sheet_for_chat", new_callable=AsyncMock, return_value="hub"):
+            await sheets.sync_users_sheet("-100", [("2", "new", "N", "U")])
+        users = fake_backend.tab("hub", "Users")
+        assert users[1][5] == "LEFT"
+        assert users[2][:6] == ["2", "N", "U", "new", "-100", "MEMBER"]
+
+    async def test_injected_429s_are_retried_by_the_scheduler(self, fake_backend):
+        fake_backend.add_spreadsheet("hub", tabs={"EventUsers": [["EVENT_ID", "USER_ID"]]})
+        fake_backend.fail_next(3, status=429)
+        with patch("sheets.get_sheet_for_chat", new_callable=AsyncMock, return_value="hub"), \
+             patch("sheets._backoff_delay", return_value=0.0):
+            await sheets.sync_event_users_sheet("-100", "ev1", ["5"])
+        assert fake_backend.throttled == 3
+        assert sheets.get_throttle_stats()["hub"]["retries"] == 3
+        assert fake_backend.tab("hub", "EventUsers")[1] == ["ev1", "5"]
+
+    async def test_403_drops_the_cached_handle(self, fake_backend):
+        fake_backend.add_spreadsheet("hub", tabs={"EventUsers": [["EVENT_ID", "USER_ID"]]})
+        await sheets.open_spreadsheet("hub")
+        assert "hub" in sheets._spreadsheet_cache
+        fake_backend.fail_next(1, status=403)
+        with patch("sheets.get_sheet_for_chat", new_callable=AsyncMock, return_value="hub"):
+            await sheets.sync_event_users_sheet("-100", "ev1", ["5"])
+        assert "hub" not in sheets._spreadsheet_cache
+
+    async def test_missing_spreadsheet_is_not_cached(self, fake_backend):
+        with pytest.raises(Exception):
+            await sheets.open_spreadsheet("nope")
+        assert "nope" not in sheets._spreadsheet_cache
@@ -0,0 +1,175 @@
+"""
+Tests for the SHEETS_OFFLOAD queue: @sheets_job functions queueing a
+sheets_jobs row instead of calling the API, and sheets_worker.py draining
+that table - running each job through the real (undecorated) function,
+retrying failures, and recovering jobs a previous worker died in.
+"""
+import asyncio
+import json
+import sqlite3
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+import db
+import event_engine
+import sheets
+import sheets_worker
+
+
+def _jobs(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT job_id, job_name, payload, status, attempts, last_error, run_after FROM sheets_jobs ORDER BY job_id"
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def _fake_ss():
+    ws = MagicMock()
+    ws.append_row = AsyncMock()
+    ws.append_rows = AsyncMock()
+    ss = MagicMock()
+    ss.worksheet = AsyncMock(return_value=ws)
+    return ss, ws
+
+
+class TestOffloadQueueing:
+    async def test_offloaded_call_queues_a_job_instead_of_writing(self, db_path, monkeypatch):
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", True)
+        with patch("sheets.open_spreadsheet", new_callable=AsyncMock) as open_mock:
+            result = await sheets.sync_event_users_sheet("-100", "e1", ["1", "2"])
+
+        assert result is True
+        open_mock.assert_not_called()
+        (job,) = _jobs(db_path)
+        assert job[1] == "sheets.sync_event_users_sheet"
+        assert json.loads(job[2]) == {"args": ["-100", "e1", ["1", "2"]], "kwargs": {}}
+        assert job[3] == "pending"
+
+    async def test_without_offload_the_job_runs_inline(self, db_path):
+        ss, ws = _fake_ss()
+        with patch("sheets.get_sheet_for_chat", new_callable=AsyncMock, return_value="sheet"), \
+             patch("sheets.open_spreadsheet", new_callable=AsyncMock, return_value=ss):
+            await sheets.sync_event_users_sheet("-100", "e1", ["1"])
+
+        ws.append_rows.assert_awaited_once_with([["e1", "1"]])
+        assert _jobs(db_path) == []
+
+
+class TestSheetsWorker:
+    async def test_worker_runs_a_queued_job_and_deletes_it(self, db_path, monkeypatch):
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", True)
+        await sheets.sync_event_users_sheet("-100", "e1", ["1", "2"])
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", False)
+
+        ss, ws = _fake_ss()
+        with patch("sheets.get_sheet_for_chat", new_callable=AsyncMock, return_value="sheet"), \
+             patch("sheets.open_spreadsheet", new_callable=AsyncMock, return_value=ss):
+            assert await sheets_worker.run_one_job() is True
+            assert await sheets_worker.run_one_job() is False
+
+        ws.append_rows.assert_awaited_once_with([["e1", "1"], ["e1", "2"]])
+        assert _jobs(db_path) == []
+
+    async def test_jobs_from_other_modules_resolve_by_name(self, db_path, monkeypatch):
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", True)
+        await event_engine._sheets_log_action("sheet", ["e1", "GOING", "alice", "1", "01.01.26", "-100"])
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", False)
+        assert _jobs(db_path)[0][1] == "event_engine._sheets_log_action"
+
+        ss, ws = _fake_ss()
+        with patch("event_engine.open_spreadsheet", new_callable=AsyncMock, return_value=ss):
+            await sheets_worker.run_one_job()
+
+        ws.append_row.assert_awaited_once_with(["e1", "GOING", "alice", "1", "01.01.26", "-100"])
+
+    async def test_jobs_run_oldest_first(self, db_path, monkeypatch):
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", True)
+        await sheets.sync_event_users_sheet("-100", "first", ["1"])
+        await sheets.sync_event_users_sheet("-100", "second", ["1"])
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", False)
+
+        ss, ws = _fake_ss()
+        with patch("sheets.get_sheet_for_chat", new_callable=AsyncMock, return_value="sheet"), \
+             patch("sheets.open_spreadsheet", new_callable=AsyncMock, return_value=ss):
+            await sheets_worker.run_one_job()
+            await sheets_worker.run_one_job()
+
+        assert [c.args[0][0][0] for c in ws.append_rows.await_args_list] == ["first", "second"]
+
+    async def test_failed_job_is_retried_later_then_parked(self, db_path, monkeypatch):
+        db.enqueue_sheets_job("sheets.no_such_job", json.dumps({"args": [], "kwargs": {}}))
+
+        assert await sheets_worker.run_one_job() is True
+        (job,) = _jobs(db_path)
+        assert job[3] == "pending"
+        assert job[4] == 1
+        assert "no_such_job" in job[5]
+        assert job[6] > time.time()
+        # not claimable again before its retry time
+        assert await sheets_worker.run_one_job() is False
+
+        monkeypatch.setattr(sheets_worker, "_MAX_ATTEMPTS", 2)
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE sheets_jobs SET run_after = 0")
+        conn.commit()
+        conn.close()
+        await sheets_worker.run_one_job()
+        (job,) = _jobs(db_path)
+        assert job[3] == "failed"
+        assert job[4] == 2
+
+    async def test_job_that_returns_false_is_retried(self, db_path, monkeypatch):
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", True)
+        monkeypatch.setattr(sheets, "CONTROL_SHEET_ID", None)
+        await sheets.sync_control_sheet_channels([["-100", "Channel", "public", "01.01.26"]])
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", False)
+
+        assert await sheets_worker.run_one_job() is True
+        (job,) = _jobs(db_path)
+        assert job[3] == "pending"
+        assert job[4] == 1
+        assert "nothing was written" in job[5]
+        assert job[6] > time.time()
+
+    async def test_job_whose_api_call_fails_is_retried_not_dropped(self, db_path, monkeypatch):
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", True)
+        await event_engine._sheets_log_action("sheet", ["e1", "GOING", "alice", "1", "01.01.26", "-100"])
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", False)
+        monkeypatch.setattr(sheets, "SHEETS_JOB_RERAISE", True)
+
+        ss, ws = _fake_ss()
+        ws.append_row = AsyncMock(side_effect=ConnectionError("sheets down"))
+        with patch("event_engine.open_spreadsheet", new_callable=AsyncMock, return_value=ss):
+            assert await sheets_worker.run_one_job() is True
+
+        (job,) = _jobs(db_path)
+        assert job[3] == "pending"
+        assert "sheets down" in job[5]
+
+    async def test_startup_requeues_jobs_a_dead_worker_left_running(self, db_path, monkeypatch):
+        monkeypatch.setattr(sheets, "SHEETS_OFFLOAD", True)
+        monkeypatch.setattr(sheets, "SHEETS_JOB_RERAISE", False)  # restored after run_worker turns it on
+        job_id = db.enqueue_sheets_job("sheets.sync_event_users_sheet",
+                                       json.dumps({"args": ["-100", "e1", ["1"]], "kwargs": {}}))
+        assert db.claim_sheets_job(time.time())[0] == job_id  # claimed, then the worker "died"
+
+        stop = asyncio.Event()
+        ss, ws = _fake_ss()
+
+        async def append_rows_then_stop(rows):
+            stop.set()
+
+        ws.append_rows = AsyncMock(side_effect=append_rows_then_stop)
+        with patch("sheets.get_sheet_for_chat", new_callable=AsyncMock, return_value="sheet"), \
+             patch("sheets.open_spreadsheet", new_callable=AsyncMock, return_value=ss):
+            await asyncio.wait_for(sheets_worker.run_worker(stop), timeout=5)
+
+        # the worker ran it inline (offload forced off in its own process)
+        ws.append_rows.assert_awaited_once()
+        assert sheets.SHEETS_OFFLOAD is False
+        assert sheets.SHEETS_JOB_RERAISE is True
+        assert _jobs(db_path) == []
@@ -0,0 +1,131 @@
+"""
+Tests for tracing.py and scripts/trace_report.py - per-update spans: a
+no-op while off, parent/child links through @traced functions, SQLite
+statements and background tasks a handler spawned, TRACE_MIN_MS, and the
+report merging a trace's lines back into one waterfall.
+"""
+import asyncio
+import json
+
+import pytest
+from telegram.ext import ApplicationBuilder, CommandHandler
+
+import db
+import tracing
+from scripts.trace_report import load_traces, slowest, waterfall
+from tests.helpers import make_context, make_update
+
+
+@tracing.traced
+async def _lookup(chat_id):
+    return db.get_display_name(chat_id, "1", "fallback")
+
+
+@tracing.traced
+async def _background_render():
+    await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.enable(str(path), max_bytes=1024 * 1024, backups=1)
+    yield path
+    tracing.disable()
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestTracing:
+    async def test_off_nothing_is_traced(self, db_path):
+        assert await _lookup("-100") == "fallback"
+        with tracing.span("handler x", trace_id=1) as span:
+            assert span is None
+        assert not tracing.active()
+
+    async def test_handler_trace_with_sqlite_and_background_continuation(self, trace_file, db_path):
+        background = []
+
+        async def going(update, context):
+            await _lookup("-100")
+            background.append(asyncio.create_task(_background_render()))
+
+        app = ApplicationBuilder().token("123:TEST").build()
+        app.add_handler(CommandHandler("going", going))
+        tracing.instrument_handlers(app)
+        update = make_update()
+        update.update_id = 777
+        await app.handlers[0][0].callback(update, make_context())
+        await asyncio.gather(*background)
+
+        records = _records(trace_file)
+        assert [r["trace_id"] for r in records] == [777, 777]  # the handler, then the late background render
+        spans = {s["name"]: s for r in records for s in r["spans"]}
+        root = spans["handler going"]
+        assert root["parent"] is None
+        assert spans["tests.test_tracing._lookup"]["parent"] == root["id"]
+        assert spans["tests.test_tracing._background_render"]["parent"] == root["id"]
+        query = spans["sqlite execute"]
+        assert query["parent"] == spans["tests.test_tracing._lookup"]["id"]
+        assert query["attrs"]["site"] == "db.get_display_name"
+        assert query["attrs"]["sql"].startswith("SELECT first_name, last_name FROM main_group_users")
+
+    async def test_traces_faster_than_min_ms_are_not_written(self, tmp_path):
+        path = tmp_path / "slow_only.jsonl"
+        tracing.enable(str(path), max_bytes=1024 * 1024, backups=1, min_ms=50)
+        try:
+            with tracing.span("handler fast", trace_id=1):
+                pass
+            with tracing.span("handler slow", trace_id=2):
+                await asyncio.sleep(0.06)
+        finally:
+            tracing.disable()
+
+        assert [r["trace_id"] for r in _records(path)] == [2]
+
+
+    async def test_leaf_span_after_the_trace_closed_gets_its_own_line(self, trace_file):
+        tasks = []
+
+        async def late_query():
+            await asyncio.sleep(0.01)
+            tracing.add_span("sqlite execute", 0.002, sql="SELECT 1")
+
+        with tracing.span("handler going", trace_id=42):
+            tasks.append(asyncio.create_task(late_query()))
+        await asyncio.gather(*tasks)
+
+        root, late = _records(trace_file)
+        assert root["trace_id"] == late["trace_id"] == 42
+        assert [s["name"] for s in late["spans"]] == ["sqlite execute"]
+        assert late["spans"][0]["parent"] == root["spans"][0]["id"]
+
+
+class TestTraceReport:
+    def test_slowest_first_and_lines_of_one_trace_merged(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        lines = [
+            {"trace_id": 1, "spans": [{"id": 1, "parent": None, "name": "handler going", "start": 100.0, "ms": 10.0}]},
+            {"trace_id": 2, "spans": [
+                {"id": 3, "parent": 2, "name": "telegram getChat", "start": 200.001, "ms": 5.0},
+                {"id": 2, "parent": None, "name": "handler button_handler", "start": 200.0, "ms": 20.0},
+            ]},
+            # trace 1's view refresh, finished after its handler returned
+            {"trace_id": 1, "spans": [{"id": 4, "parent": 1, "name": "update_all_shared_views",
+                                       "start": 100.005, "ms": 95.0}]},
+        ]
+        path.write_text("\n".join(json.dumps(line) for line in lines) + "\n{truncated")
+
+        traces = load_traces([str(path)])
+        picked = slowest(traces, top=10)
+        assert [trace_id for _, trace_id, _ in picked] == [1, 2]
+        assert round(picked[0][0] * 1000) == 100
+
+        assert [trace_id for _, trace_id, _ in slowest(traces, top=10, name="button_handler")] == [2]
+
+        drawn = waterfall(2, traces[2])
+        assert drawn[0].startswith("trace 2  20.0ms  handler button_handler")
+        assert "  handler button_handler" in drawn[1]
+        assert "    telegram getChat" in drawn[2]  # indented under its parent
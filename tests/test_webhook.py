@@ -0,0 +1,135 @@
+"""
+Tests for webhook.py - the built-in webhook server: secret-token
+validation, updates landing on the application's update_queue, the health
+endpoint, the connection cap, and serve_webhook's start/stop lifecycle.
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+
+import webhook
+
+SECRET = "s3cret-token"
+UPDATE = {"update_id": 42, "message": {"message_id": 1, "date": 0, "chat": {"id": -100, "type": "group"},
+                                       "text": "/help"}}
+
+
+def _app(running=True):
+    app = MagicMock()
+    app.running = running
+    app.bot.defaults = None
+    app.update_queue = asyncio.Queue()
+    return app
+
+
+@pytest.fixture
+async def server():
+    srv = webhook.WebhookServer(_app(), "127.0.0.1", 0, "/hook", SECRET, max_connections=4)
+    await srv.start()
+    yield srv
+    await srv.stop()
+
+
+def _url(srv, path):
+    return f"http://127.0.0.1:{srv.port}{path}"
+
+
+class TestWebhookServer:
+    async def test_update_with_valid_secret_is_queued(self, server):
+        async with httpx.AsyncClient() as client:
+            resp = await client.post(_url(server, "/hook"), json=UPDATE,
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+        assert resp.status_code == 200
+        update = server.app.update_queue.get_nowait()
+        assert update.update_id == 42
+        assert update.message.text == "/help"
+
+    async def test_wrong_or_missing_secret_is_rejected(self, server):
+        async with httpx.AsyncClient() as client:
+            bad = await client.post(_url(server, "/hook"), json=UPDATE,
+                                    headers={"X-Telegram-Bot-Api-Secret-Token": "nope"})
+            missing = await client.post(_url(server, "/hook"), json=UPDATE)
+        assert bad.status_code == 403
+        assert missing.status_code == 403
+        assert server.app.update_queue.empty()
+
+    async def test_garbage_body_is_a_400(self, server):
+        async with httpx.AsyncClient() as client:
+            resp = await client.post(_url(server, "/hook"), content=b"not json",
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+        assert resp.status_code == 400
+
+    async def test_health_endpoint_follows_application_state(self, server):
+        async with httpx.AsyncClient() as client:
+            up = await client.get(_url(server, "/healthz"))
+            server.app.running = False
+            down = await client.get(_url(server, "/healthz"))
+            unknown = await client.get(_url(server, "/elsewhere"))
+        assert up.status_code == 200 and up.json()["ok"] is True
+        assert down.status_code == 503
+        assert unknown.status_code == 404
+
+    async def test_connections_over_the_cap_get_503(self):
+        srv = webhook.WebhookServer(_app(), "127.0.0.1", 0, "/hook", SECRET, max_connections=1)
+        await srv.start()
+        try:
+            # one keep-alive connection holds the only slot...
+            reader1, writer1 = await asyncio.open_connection("127.0.0.1", srv.port)
+            writer1.write(b"GET /healthz HTTP/1.1\r\nHost: x\r\n\r\n")
+            await writer1.drain()
+            assert (await reader1.readline()).startswith(b"HTTP/1.1 200")
+            # ...so a second one is turned away
+            async with httpx.AsyncClient() as client:
+                resp = await client.get(_url(srv, "/healthz"))
+            assert resp.status_code == 503
+            writer1.close()
+            await writer1.wait_closed()
+        finally:
+            await srv.stop()
+
+
+class TestServeWebhook:
+    async def test_lifecycle_registers_webhook_and_shuts_down(self):
+        app = _app(running=False)
+        app.bot.token = "123:TEST"
+        app.initialize = AsyncMock()
+        app.post_init = AsyncMock()
+        app.post_stop = None
+        app.post_shutdown = AsyncMock()
+        app.shutdown = AsyncMock()
+        app.bot.set_webhook = AsyncMock()
+
+        async def start():
+            app.running = True
+
+        async def stop():
+            app.running = False
+
+        app.start = AsyncMock(side_effect=start)
+        app.stop = AsyncMock(side_effect=stop)
+
+        stop_event = asyncio.Event()
+        task = asyncio.create_task(webhook.serve_webhook(
+            app, stop_event, webhook_url="https://bot.example.com/tg/hook", listen="127.0.0.1", port=0,
+            max_connections=10, allowed_updates=["message", "callback_query"],
+        ))
+        while not app.running:
+            await asyncio.sleep(0.01)
+        stop_event.set()
+        srv = await task
+
+        kwargs = app.bot.set_webhook.call_args.kwargs
+        assert kwargs["url"] == "https://bot.example.com/tg/hook"
+        assert kwargs["allowed_updates"] == ["message", "callback_query"]
+        assert kwargs["max_connections"] == 10
+        # no WEBHOOK_SECRET_TOKEN: derived from the bot token, the same on every replica
+        assert kwargs["secret_token"] == srv.secret_token == webhook.derive_secret_token("123:TEST")
+        assert len(srv.secret_token) >= 32
+        assert webhook.derive_secret_token("123:TEST") != webhook.derive_secret_token("456:OTHER")
+        assert srv.url_path == "/tg/hook"
+        app.post_init.assert_awaited_once()
+        app.stop.assert_awaited_once()
+        app.shutdown.assert_awaited_once()
+        app.post_shutdown.assert_awaited_once()
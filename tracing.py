@@ -0,0 +1,263 @@
+"""
+Per-update tracing - where one slow click's seconds actually went.
+
+metrics.py says which handler is slow on average; a trace says why THIS
+click took 8 seconds: was it is_real_admin's getChatAdministrators, the
+SQLite reads, _mention_link's per-name lookups, a getChat title fetch, the
+Sheets Actions append or the edit fan-out to every shared copy?
+
+Set TRACE_FILE (see config.py) and every update handled becomes a trace,
+keyed by its update_id, made of nested spans:
+
+    handler <name>              root: one per handler run for the update
+    <module>.<function>         functions marked @traced - is_real_admin,
+                                update_all_shared_views, _mention_link,
+                                every Sheets job (sheets_job)
+    sheets <gspread method>     one Sheets API call, throttling and
+                                retries included (sheets._SheetsClientManager)
+    telegram <method>           one Bot API call (metrics.InstrumentedRequest)
+    sqlite execute/commit       one statement, with the function that
+                                opened the connection and the SQL's start
+
+Parent/child links follow the asyncio task context, so work a handler
+hands to a background task (a view refresh spawned after a click) stays
+in the click's trace even though it finishes after the handler returned.
+The extra passes a coalesced refresh runs (see schedule_view_refresh)
+land in the trace of the click that started the broadcast.
+
+Traces are written to TRACE_FILE as JSON lines, rotated at TRACE_MAX_MB
+with TRACE_BACKUPS old files kept: one line per trace, written once all
+of its open spans have finished - a background continuation that starts
+later gets a line of its own with the same trace_id. With TRACE_MIN_MS,
+traces faster than that aren't written at all. scripts/trace_report.py
+prints the slowest ones as a waterfall.
+
+Off (TRACE_FILE unset), a @traced function costs one ContextVar lookup,
+and nothing else is wrapped. Only the standard library is imported here:
+utils uses this module, and utils must stay importable without config.
+"""
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import logging
+import logging.handlers
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+_state = {"enabled": False, "min_seconds": 0.0}
+_current_span = contextvars.ContextVar("tracing_current_span", default=None)
+_ids = itertools.count(1)
+# guards every trace's span list/open count - sqlite spans are recorded
+# from run_db's worker threads too
+_lock = threading.Lock()
+
+_trace_log = logging.getLogger("traces")
+_trace_log.propagate = False
+_trace_log.setLevel(logging.INFO)
+
+
+class _Trace:
+    __slots__ = ("trace_id", "spans", "open", "written")
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+        self.open = 0
+        self.written = False
+
+
+class _Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attrs", "start", "started")
+
+    def __init__(self, trace, parent_id, name, attrs):
+        self.trace = trace
+        self.span_id = next(_ids)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.started = time.perf_counter()
+
+
+def enable(path: str, max_bytes: int, backups: int, min_ms: float = 0.0):
+    """Starts writing traces to `path` - build_application() calls this when TRACE_FILE is set."""
+    import db
+    import metrics
+
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True,
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    for old in _trace_log.handlers:
+        old.close()
+    _trace_log.handlers = [handler]
+    _state["enabled"] = True
+    _state["min_seconds"] = min_ms / 1000
+    # the same statement-timing connections metrics uses (see db.connect)
+    db._connection_factory["factory"] = metrics.TimedConnection
+
+
+def disable():
+    import db
+    import metrics
+
+    _state["enabled"] = False
+    for handler in _trace_log.handlers:
+        handler.close()
+    _trace_log.handlers = []
+    if not metrics.enabled():
+        db._connection_factory["factory"] = sqlite3.Connection
+
+
+def enabled() -> bool:
+    return _state["enabled"]
+
+
+def active() -> bool:
+    """True inside a trace - for callers that would rather skip building a span's attributes."""
+    return _current_span.get() is not None
+
+
+def _record(span, seconds, attrs):
+    entry = {"id": span.span_id, "parent": span.parent_id, "name": span.name,
+             "start": round(span.start, 6), "ms": round(seconds * 1000, 3)}
+    if attrs:
+        entry["attrs"] = attrs
+    return entry
+
+
+def _flush(trace, spans):
+    start = min(s["start"] for s in spans)
+    end = max(s["start"] + s["ms"] / 1000 for s in spans)
+    if not trace.written and end - start < _state["min_seconds"]:
+        return
+    trace.written = True
+    _trace_log.info(json.dumps({"trace_id": trace.trace_id, "spans": spans}, default=str))
+
+
+def _finish(span):
+    seconds = time.perf_counter() - span.started
+    trace = span.trace
+    with _lock:
+        trace.spans.append(_record(span, seconds, span.attrs))
+        trace.open -= 1
+        spans = None
+        if trace.open == 0:
+            spans, trace.spans = trace.spans, []
+    if spans:
+        _flush(trace, spans)
+
+
+@contextmanager
+def span(name: str, trace_id=None, **attrs):
+    """
+    A span around the `with` body, child of the current one. With no
+    current span, only a `trace_id` starts a new trace (a root span) -
+    otherwise, as with tracing off, the body just runs.
+    """
+    parent = _current_span.get()
+    if parent is None and (trace_id is None or not _state["enabled"]):
+        yield None
+        return
+    trace = parent.trace if parent is not None else _Trace(trace_id)
+    current = _Span(trace, parent.span_id if parent is not None else None, name, attrs)
+    with _lock:
+        trace.open += 1
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+        _finish(current)
+
+
+def add_span(name: str, seconds: float, **attrs):
+    """
+    Records an already-timed leaf span (a query, an API call) under the
+    current span, if any. A task spawned without a span of its own still
+    sees the span that spawned it as current - once that trace has no open
+    spans left nothing would flush it, so the leaf is written as a line of
+    its own under the same trace_id.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return
+    entry = {"id": next(_ids), "parent": parent.span_id, "name": name,
+             "start": round(time.time() - seconds, 6), "ms": round(seconds * 1000, 3)}
+    if attrs:
+        entry["attrs"] = attrs
+    trace = parent.trace
+    with _lock:
+        if trace.open > 0:
+            trace.spans.append(entry)
+            return
+    _flush(trace, [entry])
+
+
+def traced(fn):
+    """Marks a function (sync or async) as a span "<module>.<name>" whenever it runs inside a trace."""
+    name = f"{fn.__module__}.{fn.__name__}"
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return await fn(*args, **kwargs)
+            with span(name):
+                return await fn(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _current_span.get() is None:
+            return fn(*args, **kwargs)
+        with span(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def _trace_id_of(update):
+    update_id = getattr(update, "update_id", None)
+    return update_id if isinstance(update_id, int) else f"local-{next(_ids)}"
+
+
+def _root_attrs(update, name):
+    attrs = {}
+    chat = getattr(update, "effective_chat", None)
+    chat_id = getattr(chat, "id", None)
+    if isinstance(chat_id, int):
+        attrs["chat_id"] = chat_id
+    if name == "button_handler":
+        query = getattr(update, "callback_query", None)
+        data = getattr(query, "data", None)
+        if isinstance(data, str):
+            attrs["data"] = data[:64]
+    return attrs
+
+
+def _traced_callback(callback, name: str):
+    @functools.wraps(callback)
+    async def root(update, context):
+        with span(f"handler {name}", trace_id=_trace_id_of(update), **_root_attrs(update, name)):
+            return await callback(update, context)
+    return root
+
+
+def instrument_handlers(app):
+    """
+    Wraps the callback of every handler registered on `app` in a root
+    span keyed by the update's update_id. Run after the last add_handler().
+    """
+    from telegram.ext import CommandHandler
+
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            if isinstance(handler, CommandHandler):
+                name = sorted(handler.commands)[0]
+            else:
+                name = getattr(handler.callback, "__name__", type(handler).__name__)
+            handler.callback = _traced_callback(handler.callback, name)
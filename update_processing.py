@@ -0,0 +1,135 @@
+"""
+Keyed concurrent update processing - unrelated hubs in parallel, one
+event (or chat) at a time.
+
+PTB's default is strictly sequential: every update waits for the one
+before it to finish, so a slow /refreshusersall in one hub, or a click
+stuck behind a Sheets stall, holds up every other hub's clicks. PTB's own
+concurrent_updates option goes to the other extreme - everything in
+parallel, in no particular order - which breaks what button_handler's
+event_lock assumes: that two clicks on the same event are applied in
+the order they arrived (the lock only serializes them, it doesn't order
+them - whichever task reaches it first wins).
+
+KeyedApplication sits in between. Every update gets a key:
+
+    callback on an event's keyboard   "event:<event_id>"
+    anything else with a chat         "chat:<chat_id>" (commands, text,
+                                      chat_member updates, /help menus...)
+
+Updates with the same key run one at a time, in arrival order; updates
+with different keys run concurrently, at most UPDATE_CONCURRENCY at once.
+A click on event A in hub 1 never waits behind hub 2's /refreshusersall,
+but two clicks on event A still land in the order Telegram sent them.
+
+PTB 20.3 has no pluggable update processor (BaseUpdateProcessor arrived
+in 20.4), so this is done by subclassing Application and wrapping
+process_update - PTB runs every update in its own task (concurrent_updates
+must be > 1, see main.py) and KeyedUpdateScheduler decides when each
+task may actually proceed.
+"""
+import asyncio
+
+from telegram.ext import Application
+
+from config import UPDATE_CONCURRENCY
+
+# What main.py passes to ApplicationBuilder.concurrent_updates(): how many
+# updates PTB keeps in flight (each in its own task, most of them just
+# queued on their key). Far above UPDATE_CONCURRENCY so a burst on one hot
+# event can't use up PTB's slots and hold back every other hub.
+MAX_IN_FLIGHT_UPDATES = 256
+
+# Callback prefixes that belong to menus, not to an event's keyboard (see
+# the pattern handlers registered before button_handler in main.py). Their
+# "<x>_<y>" data would otherwise parse as action=x, event_id=y.
+_NON_EVENT_CALLBACK_PREFIXES = ("help_", "upgrade_info_", "hubpick_", "switchpick_", "allgroups", "allchannels_")
+
+
+def update_key(update) -> str:
+    """
+    The serialization key for one update (see module docstring), or None
+    for an update that touches no chat at all - those run unordered.
+    """
+    query = getattr(update, "callback_query", None)
+    if query is not None and query.data:
+        data = query.data
+        if data != "noop" and not data.startswith(_NON_EVENT_CALLBACK_PREFIXES):
+            # Same parse as button_handler: "<action>_<event_id>[:<target>]"
+            action_prefix = data.split(":", 1)[0]
+            if "_" in action_prefix:
+                event_id = action_prefix.split("_", 1)[1]
+                if event_id:
+                    return f"event:{event_id}"
+    chat = getattr(update, "effective_chat", None)
+    if chat is not None:
+        return f"chat:{chat.id}"
+    return None
+
+
+class KeyedUpdateScheduler:
+    """
+    Runs coroutines under per-key FIFO ordering plus a global cap. Kept
+    separate from KeyedApplication so it can be exercised without a bot.
+
+    Order within a key relies on asyncio.Lock waking its waiters
+    first-come-first-served, and on run() taking the key's lock before
+    its first await - PTB starts one task per update in arrival order, so
+    they queue on the lock in that same order. The global cap is only
+    taken AFTER the key's lock: a burst of clicks on one hot event waits
+    on its own lock without occupying slots every other hub needs.
+    """
+
+    def __init__(self, max_concurrent: int):
+        self._slots = asyncio.Semaphore(max_concurrent)
+        # key -> [asyncio.Lock, number of runs holding or waiting for it].
+        # An entry is dropped once that count is back to zero, so this
+        # only ever holds keys with work in flight.
+        self._locks = {}
+        self.running = 0
+
+    @property
+    def pending_keys(self) -> int:
+        return len(self._locks)
+
+    async def run(self, key, coro_fn, *args):
+        if key is None:
+            async with self._slots:
+                return await self._run_counted(coro_fn, *args)
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._slots:
+                    return await self._run_counted(coro_fn, *args)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    async def _run_counted(self, coro_fn, *args):
+        self.running += 1
+        try:
+            return await coro_fn(*args)
+        finally:
+            self.running -= 1
+
+
+class KeyedApplication(Application):
+    """
+    Application whose process_update goes through a KeyedUpdateScheduler.
+    Build it with ApplicationBuilder().application_class(KeyedApplication)
+    and .concurrent_updates(MAX_IN_FLIGHT_UPDATES) - PTB's own limit only
+    needs to keep enough updates in flight to reach every key; the real
+    concurrency cap is the scheduler's.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.update_scheduler = KeyedUpdateScheduler(UPDATE_CONCURRENCY)
+
+    async def process_update(self, update: object) -> None:
+        await self.update_scheduler.run(update_key(update), super().process_update, update)
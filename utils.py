@@ -1,6 +1,10 @@
 import re
+import time
 from datetime import datetime
 
+from tracing import traced
+
+
 def escape_markdown(text):
     escape_chars = r'_*[]()~`>#+-=|{}.!'
     return re.sub(f'([{re.escape(escape_chars)}])', r'\\\1', str(text))
@@ -35,6 +39,65 @@ def parse_event_date(date_str: str):
 GROUP_ANONYMOUS_BOT_ID = 1087968824
 
 
+# Admin status cache for is_real_admin. Without it every admin-gated
+# click or command costs a getChatMember round trip before any work
+# starts. Two layers, both expiring after ADMIN_CACHE_TTL_SECONDS:
+#
+#   _admin_rosters    str(chat_id) -> (set of admin user_ids, expires_at)
+#                     a whole chat's admin list, seeded from any
+#                     getChatAdministrators snapshot the bot takes anyway
+#                     (see remember_chat_admins) - authoritative while fresh.
+#   _member_statuses  (str(chat_id), user_id) -> (is_admin, expires_at)
+#                     single answers, from getChatMember lookups and live
+#                     chat_member updates (see note_chat_member_status).
+#
+# chat_member updates keep both current between refreshes - a promotion or
+# demotion is visible on the next click, not after the TTL. The TTL only
+# covers the case those updates can't: the bot not being an admin of the
+# chat, so Telegram never sends it chat_member updates at all.
+ADMIN_CACHE_TTL_SECONDS = 300.0
+# Past this many cached single answers, expired ones are swept out on the
+# next insert - keeps a long-running bot's cache from growing forever.
+_MEMBER_STATUSES_SWEEP_AT = 10000
+_ADMIN_STATUSES = ("administrator", "creator")
+_admin_rosters = {}
+_member_statuses = {}
+
+
+def remember_chat_admins(chat_id, admins):
+    """
+    Stores a getChatAdministrators result as chat_id's admin roster. Call
+    it wherever the bot fetches that list for its own reasons (/refreshusers,
+    /adduser...) - a free refresh of the cache.
+    """
+    try:
+        roster = {a.user.id for a in admins}
+    except Exception:
+        return
+    _admin_rosters[str(chat_id)] = (roster, time.monotonic() + ADMIN_CACHE_TTL_SECONDS)
+
+
+def _cache_member_status(chat_id, user_id, is_admin, now):
+    if len(_member_statuses) >= _MEMBER_STATUSES_SWEEP_AT:
+        for key in [k for k, (_, expires) in _member_statuses.items() if expires <= now]:
+            del _member_statuses[key]
+    _member_statuses[(str(chat_id), user_id)] = (is_admin, now + ADMIN_CACHE_TTL_SECONDS)
+
+
+def note_chat_member_status(chat_id, user_id, status):
+    """Applies one user's new membership status (a chat_member update) to the cache."""
+    is_admin = status in _ADMIN_STATUSES
+    now = time.monotonic()
+    _cache_member_status(chat_id, user_id, is_admin, now)
+    cached = _admin_rosters.get(str(chat_id))
+    if cached and cached[1] > now:
+        if is_admin:
+            cached[0].add(user_id)
+        else:
+            cached[0].discard(user_id)
+
+
+@traced
 async def is_real_admin(bot, chat_id, user, message=None) -> bool:
     """
     True if `user` is an administrator/creator of `chat_id`.
@@ -48,13 +111,26 @@ async def is_real_admin(bot, chat_id, user, message=None) -> bool:
     admins/creators post anonymously in the first place, seeing that
     pseudo-account (or a message with `sender_chat` set) is trusted as
     "yes, an admin sent this" without needing to query get_chat_member at all.
+
+    Answered from the admin cache above when it can be; only a miss costs
+    a get_chat_member call (whose answer is then cached). A failed lookup
+    is NOT cached - it answers False this once and is retried next time.
     """
     if user and user.id == GROUP_ANONYMOUS_BOT_ID:
         return True
     if message is not None and getattr(message, "sender_chat", None) is not None:
         return True
+    now = time.monotonic()
+    roster = _admin_rosters.get(str(chat_id))
+    if roster and roster[1] > now:
+        return user.id in roster[0]
+    cached = _member_statuses.get((str(chat_id), user.id))
+    if cached and cached[1] > now:
+        return cached[0]
     try:
         member = await bot.get_chat_member(chat_id, user.id)
-        return member.status in ("administrator", "creator")
     except Exception:
         return False
+    is_admin = member.status in _ADMIN_STATUSES
+    _cache_member_status(chat_id, user.id, is_admin, now)
+    return is_admin
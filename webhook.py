@@ -0,0 +1,255 @@
+"""
+Webhook serving mode - an alternative to long polling (see main.main()).
+
+With polling, updates only reach the bot in batches, each one a full
+getUpdates round trip after the last; with a webhook, Telegram POSTs every
+update the moment it happens, over up to WEBHOOK_MAX_CONNECTIONS parallel
+connections - and several bot replicas can sit behind one load balancer.
+
+PTB's own run_webhook needs tornado (the python-telegram-bot[webhooks]
+extra), which this project doesn't install - and has no health endpoint
+for a container orchestrator to probe. So this is a small HTTP/1.1 server
+on plain asyncio streams instead, handling exactly three things:
+
+    POST <path of WEBHOOK_URL>   an update from Telegram: the
+                                 X-Telegram-Bot-Api-Secret-Token header
+                                 must match, then the update goes onto
+                                 app.update_queue - the same queue
+                                 run_polling feeds, so every handler (and
+                                 update_processing's keyed ordering)
+                                 behaves exactly as with polling
+    GET  /healthz                200 while the application is running,
+                                 503 otherwise, plus the update backlog
+    anything else                404
+
+Telegram needs HTTPS: terminate TLS in front of this (a reverse proxy or
+the platform's load balancer) and forward to WEBHOOK_LISTEN:WEBHOOK_PORT.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import signal
+from urllib.parse import urlparse
+
+from telegram import Update
+
+from config import logger
+
+HEALTH_PATH = "/healthz"
+# An update is a few KB at most; anything bigger isn't from Telegram.
+_MAX_BODY_BYTES = 1024 * 1024
+# How long a keep-alive connection may sit idle before it's closed.
+_IDLE_TIMEOUT_SECONDS = 75.0
+
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+def derive_secret_token(bot_token: str) -> str:
+    """
+    The default X-Telegram-Bot-Api-Secret-Token, for when
+    WEBHOOK_SECRET_TOKEN is unset: an HMAC of the bot token, so every
+    replica of the same bot computes the SAME secret. A random one per
+    start would be overwritten by the next replica's setWebhook, and every
+    other replica would then reject every update. Hex - Telegram only
+    allows A-Z, a-z, 0-9, _ and - in it.
+    """
+    return hmac.new(bot_token.encode(), b"tg_event_bot webhook secret", hashlib.sha256).hexdigest()
+
+
+class WebhookServer:
+    """
+    Feeds updates POSTed by Telegram into `app.update_queue`. At most
+    `max_connections` connections are served at once - past that, a new
+    connection gets an immediate 503 (Telegram retries it) instead of
+    queueing unboundedly.
+    """
+
+    def __init__(self, app, listen: str, port: int, url_path: str, secret_token: str,
+                 max_connections: int):
+        self.app = app
+        self.listen = listen
+        self.port = port
+        self.url_path = "/" + url_path.strip("/")
+        self.secret_token = secret_token
+        self.max_connections = max_connections
+        self.open_connections = 0
+        self.updates_received = 0
+        self._server = None
+        self._connections = {}  # handler task -> its writer
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+        # port=0 means "any free port" - report the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Webhook server listening on {self.listen}:{self.port}{self.url_path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # idle keep-alive connections too, or they'd outlive the server
+            for writer in self._connections.values():
+                writer.close()
+            if self._connections:
+                await asyncio.wait(list(self._connections), timeout=5.0)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader, writer):
+        if self.open_connections >= self.max_connections:
+            await self._respond(writer, 503, {"ok": False, "description": "too many connections"}, keep_alive=False)
+            writer.close()
+            return
+        self.open_connections += 1
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(_read_request(reader), timeout=_IDLE_TIMEOUT_SECONDS)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                if isinstance(request, int):  # malformed / oversized - answer and drop the connection
+                    await self._respond(writer, request, {"ok": False}, keep_alive=False)
+                    break
+                method, path, headers, body = request
+                status, payload = await self._dispatch(method, path, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except Exception as e:
+            logger.error(f"Webhook connection error: {e!r}")
+        finally:
+            self.open_connections -= 1
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _dispatch(self, method, path, headers, body):
+        path = path.split("?", 1)[0]
+        if path == HEALTH_PATH:
+            if method != "GET":
+                return 405, {"ok": False}
+            running = bool(self.app.running)
+            return (200 if running else 503), {
+                "ok": running,
+                "pending_updates": self.app.update_queue.qsize(),
+                "open_connections": self.open_connections,
+                "updates_received": self.updates_received,
+            }
+        if path != self.url_path:
+            return 404, {"ok": False}
+        if method != "POST":
+            return 405, {"ok": False}
+        given = headers.get("x-telegram-bot-api-secret-token", "")
+        if not hmac.compare_digest(given.encode(), self.secret_token.encode()):
+            logger.warning("Webhook request rejected: bad secret token.")
+            return 403, {"ok": False}
+        try:
+            update = Update.de_json(json.loads(body), self.app.bot)
+        except Exception as e:
+            logger.error(f"Webhook received an unparseable update: {e!r}")
+            return 400, {"ok": False}
+        if update is None:
+            return 400, {"ok": False}
+        self.updates_received += 1
+        await self.app.update_queue.put(update)
+        return 200, {"ok": True}
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+
+async def _read_request(reader):
+    """
+    Reads one HTTP/1.1 request. Returns (method, path, headers, body), None
+    on a cleanly closed connection, or an HTTP status code for a request
+    that can't be served.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3:
+        return 400
+    method, path, _ = parts
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        return 400
+    if length > _MAX_BODY_BYTES:
+        return 413
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+async def serve_webhook(app, stop: asyncio.Event, webhook_url: str, listen: str, port: int,
+                        secret_token: str = None, max_connections: int = 40,
+                        allowed_updates=None) -> WebhookServer:
+    """
+    Runs `app` in webhook mode until `stop` is set - the same lifecycle
+    Application.run_polling goes through (initialize, post_init, start ...
+    stop, post_stop, shutdown, post_shutdown), with WebhookServer in place
+    of the polling Updater.
+
+    The listening server comes up BEFORE setWebhook, so Telegram's first
+    delivery never hits a closed port. No secret_token means one derived
+    from the bot token (see derive_secret_token) - the same on every replica.
+    """
+    secret_token = secret_token or derive_secret_token(app.bot.token)
+    server = WebhookServer(app, listen, port, urlparse(webhook_url).path, secret_token, max_connections)
+
+    await app.initialize()
+    try:
+        if app.post_init:
+            await app.post_init(app)
+        await server.start()
+        await app.bot.set_webhook(
+            url=webhook_url,
+            allowed_updates=allowed_updates,
+            secret_token=secret_token,
+            max_connections=max_connections,
+        )
+        await app.start()
+        await stop.wait()
+    finally:
+        await server.stop()
+        if app.running:
+            await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+    return server
+
+
+def run_webhook(app, **kwargs):
+    """Blocking entry point for main.main(): serve_webhook until SIGINT/SIGTERM."""
+    async def _run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await serve_webhook(app, stop, **kwargs)
+
+    asyncio.run(_run())